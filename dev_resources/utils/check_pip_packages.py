@@ -2,7 +2,6 @@ import subprocess
 import sys
 
 packages = [
-    "aiolimiter",
     "python-dotenv",
     "openai",
     "opentelemetry-sdk",
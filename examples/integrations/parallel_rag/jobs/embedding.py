@@ -9,22 +9,15 @@ import asyncio
 from typing import List
 from openai import AsyncOpenAI
 
-# Global client (initialized once per event loop)
-_client = None
+from flow4ai.utils.client_pool import LoopClientPool
 
-
-def get_client() -> AsyncOpenAI:
-    """Get or create OpenAI client."""
-    global _client
-    if _client is None:
-        _client = AsyncOpenAI()
-    return _client
+# One client per event loop, so asyncio.run() calls and FlowManager threads never share one
+_clients = LoopClientPool("rag_embedding", lambda config: AsyncOpenAI())
 
 
-def reset_client():
-    """Reset the client (needed when switching event loops via asyncio.run)."""
-    global _client
-    _client = None
+def get_client() -> AsyncOpenAI:
+    """Get the OpenAI client for the running event loop."""
+    return _clients.get()
 
 
 async def embed_chunk(chunk_id: str, text: str, model: str = "text-embedding-3-small") -> dict:
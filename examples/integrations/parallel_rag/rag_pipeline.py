@@ -38,10 +38,10 @@ from flow4ai.dsl import job
 from utils.download import download_corpus, load_corpus
 from utils.chunking import chunk_corpus, Chunk
 from utils import output  # Output helpers
-from jobs.embedding import embed_chunk, reset_client as reset_embed_client
+from jobs.embedding import embed_chunk
 from jobs.indexing import index_chunks, search_collection, get_chroma_client
 from jobs.search import search_and_rerank
-from jobs.generation import generate_answer, reset_client as reset_gen_client
+from jobs.generation import generate_answer
 from jobs.query_jobs import (
     embed_query_job,
     vector_search_job,
@@ -161,9 +161,6 @@ async def run_query_pipeline(query: str) -> dict:
     output.section("QUERY PIPELINE (Direct Async)")
     output.detail(f"Query: {query}")
     
-    reset_embed_client()
-    reset_gen_client()
-    
     output.step("🔍", "Embedding query...")
     from jobs.embedding import embed_text
     query_embedding = await embed_text(query)
@@ -215,9 +212,6 @@ def run_query_pipeline_fm(query: str) -> dict:
     output.section("QUERY PIPELINE (FlowManager)")
     output.detail(f"Query: {query}")
     
-    reset_embed_client()
-    reset_gen_client()
-    
     # ----- FLOW4AI WORKFLOW (key code) -----
     query_workflow = (
         job(embed_query=embed_query_job)
@@ -296,10 +290,6 @@ def main():
         ])
     
     if args.mode in ["full", "query"]:
-        if args.mode == "full":
-            reset_embed_client()
-            reset_gen_client()
-        
         query_result = asyncio.run(run_query_pipeline(args.query))
         
         if query_result.get("status") != "success":
@@ -30,8 +30,6 @@ from flow4ai.dsl import job
 
 from jobs.search import search_and_rerank
 from jobs.generation import generate_answer
-from jobs.embedding import reset_client as reset_embed_client
-from jobs.generation import reset_client as reset_gen_client
 from jobs.query_jobs import (
     embed_query_job,
     vector_search_job,
@@ -124,9 +122,6 @@ EDGE_TESTS = [
 
 async def run_test(test: TestCase, verbose: bool = False) -> dict:
     """Run a single test case sequentially."""
-    reset_embed_client()
-    reset_gen_client()
-    
     result = {
         "name": test.name,
         "query": test.query,
@@ -186,9 +181,6 @@ def run_suite_parallel(tests: List[TestCase], verbose: bool = False) -> dict:
     """Run all tests in parallel using FlowManager."""
     print("\n🚀 Running tests in PARALLEL with FlowManager...")
     
-    reset_embed_client()
-    reset_gen_client()
-    
     # Define the query workflow
     query_workflow = (
         job(embed_query=embed_query_job)
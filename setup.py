@@ -9,7 +9,6 @@ setup(
       "flow4ai": ["resources/*"]
     },
     install_requires=[
-        'aiolimiter>=1.2.1',
         'python-dotenv>=1.0.1',
         'openai>=1.58.0',
         'opentelemetry-sdk>=1.28.1' ,
@@ -36,10 +35,18 @@ setup(
             'llama-index-embeddings-openai',
             'llama-index-llms-openai',
         ],
+        'bench': [
+            "aiohttp>=3.11.12",
+        ],
         'dev': [
           "gitingest>=0.1.3"
         ],
     },
+    entry_points={
+        'console_scripts': [
+            'flow4ai-analyze=flow4ai.utils.trace_analysis:main',
+        ],
+    },
     python_requires='>=3.8.5',
     # other options can be added here
 )
\ No newline at end of file
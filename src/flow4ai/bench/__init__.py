@@ -0,0 +1,15 @@
+"""
+Benchmarking tools that need no network access or API keys:
+
+- fake_llm: a local OpenAI-compatible server with configurable latency, token throughput,
+  error and 429 injection, streaming and embeddings
+- graphs: job graphs following the examples/integrations patterns
+- load: a load generator driving FlowManager or FlowManagerMP, reporting throughput and
+  p50/p95/p99 latency
+- logging_overhead: the time logging adds per task at INFO and DEBUG, in the sync and
+  queue log modes
+
+    python -m flow4ai.bench.load --graph fanout --manager mp --tasks 500 --p50-ms 40 --p99-ms 400
+"""
+
+# No convenience imports - modules should be imported directly
@@ -0,0 +1,376 @@
+"""
+A local fake of the OpenAI chat completions and embeddings API for benchmarks, so job
+graphs using OpenAIJob, the OpenAI client, LangChain or LlamaIndex can be load tested
+without network access or API keys:
+
+    with FakeLLMServer(latency={"distribution": "lognormal", "p50_ms": 50, "p99_ms": 400},
+                       tokens_per_second=200, rate_limit_rate=0.01) as server:
+        llm = OpenAIJob("llm", {"client": {"base_url": server.base_url, "api_key": "FLOW4AI_BENCH_API_KEY"}})
+
+Run it standalone with `python -m flow4ai.bench.fake_llm --port 8000`.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from flow4ai import f4a_logging as logging
+
+try:
+    from aiohttp import web
+except ImportError as e:
+    raise ImportError('The fake LLM server needs aiohttp, install it with: pip install "flow4ai[bench]"') from e
+
+logger = logging.getLogger(__name__)
+
+# Environment variable holding the API key of benchmark clients, any value is accepted
+API_KEY_ENV = "FLOW4AI_BENCH_API_KEY"
+
+# z-score of the 99th percentile of a normal distribution
+_Z99 = 2.326
+
+_WORDS = ("flow", "graph", "task", "job", "token", "stream", "latency", "model", "answer", "context")
+
+
+def latency_sampler(spec: Union[None, float, Dict[str, Any], Callable[[], float]],
+                    seed: Optional[int] = None) -> Callable[[], float]:
+    """
+    Returns a function sampling latencies in seconds from a latency specification:
+        a number of seconds, a function returning seconds, or a dict with a distribution of
+        "constant" (ms), "uniform" (min_ms, max_ms) or "lognormal" (p50_ms, p99_ms), and
+        optionally tail_rate and tail_ms, the fraction of responses taking tail_ms instead.
+
+    Raises:
+        ValueError: If the distribution is unknown
+    """
+    if spec is None:
+        return lambda: 0.0
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    rng = random.Random(seed)
+    distribution = spec.get("distribution", "constant")
+    if distribution == "constant":
+        base = lambda: spec.get("ms", 0.0) / 1000.0
+    elif distribution == "uniform":
+        base = lambda: rng.uniform(spec["min_ms"], spec["max_ms"]) / 1000.0
+    elif distribution == "lognormal":
+        mu = math.log(spec["p50_ms"])
+        sigma = max(0.0, math.log(spec["p99_ms"]) - mu) / _Z99
+        base = lambda: rng.lognormvariate(mu, sigma) / 1000.0
+    else:
+        raise ValueError(f"Unknown latency distribution {distribution!r}, use constant, uniform or lognormal")
+    tail_rate = spec.get("tail_rate", 0.0)
+    if not tail_rate:
+        return base
+    tail = spec["tail_ms"] / 1000.0
+    return lambda: tail if rng.random() < tail_rate else base()
+
+
+def _prompt_tokens(body: Dict[str, Any]) -> int:
+    text = json.dumps(body.get("messages") or body.get("input") or "")
+    return max(1, len(text) // 4)
+
+
+class FakeLLMServer:
+    """
+    Serves /v1/chat/completions and /v1/embeddings on a local port from a background thread.
+
+    Each chat response waits a sampled latency (time to first token), then produces
+    completion_tokens tokens at tokens_per_second, streamed as server-sent events when the
+    request sets stream. Requests fail with a 500 at error_rate and a 429 at rate_limit_rate,
+    or when more than max_concurrency requests are in flight, unless overload_latency is set:
+    then those requests are served after overload_latency instead, like a saturated server.
+    """
+
+    def __init__(
+        self,
+        latency: Union[None, float, Dict[str, Any], Callable[[], float]] = 0.0,
+        completion_tokens: int = 20,
+        tokens_per_second: Optional[float] = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        max_concurrency: Optional[int] = None,
+        retry_after: float = 0.1,
+        overload_latency: Union[None, float, Dict[str, Any], Callable[[], float]] = None,
+        content: Optional[Sequence[str]] = None,
+        prompt_tokens: Optional[int] = None,
+        error_status: int = 500,
+        embedding_dim: int = 64,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            latency: Time to first token, see latency_sampler().
+            completion_tokens: Tokens in every chat response.
+            tokens_per_second: Output token throughput, None to send all tokens at once.
+            error_rate: Fraction of requests answered with a 500 error.
+            rate_limit_rate: Fraction of requests answered with a 429 error.
+            max_concurrency: Requests allowed in flight before answering 429, None for no limit.
+            retry_after: Seconds sent in the Retry-After header of 429 responses.
+            overload_latency: Time to first token of requests beyond max_concurrency, served
+                instead of answered with a 429 when set, see latency_sampler().
+            content: The chunks of every chat response instead of completion_tokens generated words.
+            prompt_tokens: Prompt tokens reported in usage, None to estimate them from the request.
+            error_status: HTTP status of the errors injected at error_rate.
+            embedding_dim: Length of embedding vectors.
+            host: Interface to listen on.
+            port: Port to listen on, 0 for any free port.
+            seed: Seed for latencies and injected errors, for repeatable runs.
+        """
+        if not 0 <= error_rate <= 1 or not 0 <= rate_limit_rate <= 1:
+            raise ValueError(f"error_rate and rate_limit_rate must be between 0 and 1, "
+                             f"got {error_rate} and {rate_limit_rate}")
+        self.sample_latency = latency_sampler(latency, seed)
+        self.completion_tokens = completion_tokens
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.sample_overload_latency = latency_sampler(overload_latency, seed) if overload_latency is not None else None
+        self.content = list(content) if content is not None else None
+        self.prompt_tokens = prompt_tokens
+        self.error_status = error_status
+        self.embedding_dim = embedding_dim
+        self.host = host
+        self.port = port
+        self.base_url: Optional[str] = None
+        self._rng = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._stats = {'requests': 0, 'completed': 0, 'errors': 0, 'rate_limited': 0, 'streamed': 0,
+                       'embeddings': 0, 'in_flight': 0, 'peak_in_flight': 0,
+                       'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/embeddings", self._embeddings)
+        return app
+
+    async def _serve(self) -> None:
+        self._runner = web.AppRunner(self._app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> 'FakeLLMServer':
+        """Start serving from a background thread, sets base_url."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="FakeLLMServer", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._serve(), self._loop).result(10)
+        logger.info(f"Fake LLM server listening on {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and the background thread."""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self) -> 'FakeLLMServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _overloaded(self) -> bool:
+        return self.max_concurrency is not None and self._stats['in_flight'] > self.max_concurrency
+
+    def _latency(self) -> float:
+        if self.sample_overload_latency is not None and self._overloaded():
+            return self.sample_overload_latency()
+        return self.sample_latency()
+
+    def _error(self) -> Optional[web.Response]:
+        """Returns an injected error response, or None to serve the request."""
+        if self._overloaded() and self.sample_overload_latency is None:
+            self._stats['rate_limited'] += 1
+            return self._error_response(429, "rate_limit_exceeded", "Too many concurrent requests")
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            self._stats['rate_limited'] += 1
+            return self._error_response(429, "rate_limit_exceeded", "Rate limit reached")
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._stats['errors'] += 1
+            return self._error_response(self.error_status, "server_error", "Injected server error")
+        return None
+
+    def _error_response(self, status: int, code: str, message: str) -> web.Response:
+        headers = {"Retry-After": str(self.retry_after)} if status == 429 else None
+        return web.json_response({"error": {"message": message, "type": code, "code": code}},
+                                 status=status, headers=headers)
+
+    def _begin(self) -> None:
+        self._stats['requests'] += 1
+        self._stats['in_flight'] += 1
+        self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._stats['in_flight'])
+
+    def _tokens(self) -> List[str]:
+        if self.content is not None:
+            return self.content
+        return [_WORDS[i % len(_WORDS)] + " " for i in range(self.completion_tokens)]
+
+    def _prompt_tokens(self, body: Dict[str, Any]) -> int:
+        return self.prompt_tokens if self.prompt_tokens is not None else _prompt_tokens(body)
+
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        self._begin()
+        try:
+            body = await request.json()
+            error = self._error()
+            if error is not None:
+                return error
+            await asyncio.sleep(self._latency())
+            prompt_tokens = self._prompt_tokens(body)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": self.completion_tokens,
+                     "total_tokens": prompt_tokens + self.completion_tokens}
+            self._stats['prompt_tokens'] += prompt_tokens
+            self._stats['completion_tokens'] += self.completion_tokens
+            if body.get("stream"):
+                response = await self._stream(request, body, usage)
+            else:
+                if self.tokens_per_second:
+                    await asyncio.sleep(self.completion_tokens / self.tokens_per_second)
+                response = web.json_response({
+                    "id": f"chatcmpl-{self._stats['requests']}", "object": "chat.completion",
+                    "created": int(time.time()), "model": body.get("model", "fake-model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(self._tokens()).strip()}}],
+                    "usage": usage,
+                })
+            self._stats['completed'] += 1
+            return response
+        finally:
+            self._stats['in_flight'] -= 1
+
+    async def _stream(self, request: web.Request, body: Dict[str, Any], usage: Dict[str, int]) -> web.StreamResponse:
+        self._stats['streamed'] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        chunk_id = f"chatcmpl-{self._stats['requests']}"
+
+        async def send(choices, chunk_usage=None):
+            chunk = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model", "fake-model"), "choices": choices}
+            if chunk_usage is not None:
+                chunk["usage"] = chunk_usage
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        for index, token in enumerate(self._tokens()):
+            if index and self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            await send([{"index": 0, "finish_reason": None, "delta": {"role": "assistant", "content": token}}])
+        await send([{"index": 0, "finish_reason": "stop", "delta": {}}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send([], usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _embedding(self, text: str) -> List[float]:
+        # Deterministic unit vector per text, so similar benchmarks retrieve the same documents
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        rng = random.Random(digest)
+        vector = [rng.uniform(-1, 1) for _ in range(self.embedding_dim)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    async def _embeddings(self, request: web.Request) -> web.Response:
+        self._begin()
+        try:
+            body = await request.json()
+            error = self._error()
+            if error is not None:
+                return error
+            await asyncio.sleep(self._latency())
+            inputs = body.get("input")
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+            prompt_tokens = self._prompt_tokens(body)
+            self._stats['prompt_tokens'] += prompt_tokens
+            self._stats['embeddings'] += len(inputs)
+            self._stats['completed'] += 1
+            return web.json_response({
+                "object": "list", "model": body.get("model", "fake-embedding"),
+                "data": [{"object": "embedding", "index": i, "embedding": self._embedding(str(text))}
+                         for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+            })
+        finally:
+            self._stats['in_flight'] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns server metrics:
+            requests received, completed, errors (injected 500s), rate_limited (429s),
+            streamed responses, embeddings returned, in_flight and peak_in_flight requests,
+            and prompt_tokens and completion_tokens served.
+        """
+        return dict(self._stats)
+
+    def __repr__(self) -> str:
+        return f"FakeLLMServer(base_url={self.base_url!r})"
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the FakeLLMServer options to a command line parser."""
+    parser.add_argument("--p50-ms", type=float, default=50.0, help="Median time to first token")
+    parser.add_argument("--p99-ms", type=float, default=None, help="p99 time to first token, lognormal if set")
+    parser.add_argument("--completion-tokens", type=int, default=20)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def server_from_arguments(args: argparse.Namespace, **kwargs) -> FakeLLMServer:
+    """Create a FakeLLMServer from the options added by add_server_arguments()."""
+    if args.p99_ms:
+        latency = {"distribution": "lognormal", "p50_ms": args.p50_ms, "p99_ms": args.p99_ms}
+    else:
+        latency = {"distribution": "constant", "ms": args.p50_ms}
+    return FakeLLMServer(latency=latency, completion_tokens=args.completion_tokens,
+                         tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+                         rate_limit_rate=args.rate_limit_rate, max_concurrency=args.max_concurrency,
+                         seed=args.seed, **kwargs)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    server = server_from_arguments(args, host=args.host, port=args.port)
+    server.start()
+    print(f"Serving on {server.base_url}, set OPENAI_BASE_URL to use it. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(server.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
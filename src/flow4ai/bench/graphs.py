@@ -0,0 +1,96 @@
+"""
+Job graphs for benchmarks, following the patterns of examples/integrations, calling an
+OpenAI-compatible server such as FakeLLMServer. Jobs are module level classes and
+functions, so the graphs also run in FlowManagerMP.
+
+Every builder takes the server's base_url and job properties merged into each LLM job,
+e.g. {"retry": {...}, "hedge": {...}} to benchmark those options.
+"""
+import random
+from typing import Any, Dict, Optional
+
+from flow4ai.dsl import DSLComponent, job
+from flow4ai.job import JobABC
+from flow4ai.jobs.openai_jobs import OpenAIClient, OpenAIJob
+
+from .fake_llm import API_KEY_ENV
+
+
+def llm_properties(base_url: str, properties: Optional[Dict[str, Any]] = None,
+                   model: str = "fake-model") -> Dict[str, Any]:
+    """OpenAIJob properties calling base_url, without client retries or a binding rate limit."""
+    return {
+        "client": {"base_url": base_url, "api_key": API_KEY_ENV, "max_retries": 0},
+        "api": {"model": model, "temperature": 0},
+        "rate_limit": {"max_rate": 1_000_000, "time_period": 60},
+        **(properties or {}),
+    }
+
+
+def chat_graph(base_url: str, properties: Optional[Dict[str, Any]] = None) -> DSLComponent:
+    """A single LLM call per task, as in langchain_simple.py."""
+    return OpenAIJob("bench_chat", llm_properties(base_url, properties))
+
+
+def combine_perspectives(j_ctx):
+    inputs = j_ctx["inputs"]
+    return {"perspectives": sorted(name for name in inputs if name.startswith("bench_")),
+            "summary": " | ".join(result.get("response", "") for result in inputs.values()
+                                  if isinstance(result, dict))}
+
+
+def fanout_graph(base_url: str, properties: Optional[Dict[str, Any]] = None) -> DSLComponent:
+    """Three LLM calls in parallel joined by a summary, as in langchain_chains.py and model_comparison.py."""
+    perspectives = [OpenAIJob(f"bench_{name}", llm_properties(base_url, properties))
+                    for name in ("technical", "business", "risk")]
+    return (perspectives[0] | perspectives[1] | perspectives[2]) >> job(summary=combine_perspectives)
+
+
+class EmbedQuery(JobABC):
+    """Embeds the task's prompt with the pooled OpenAI client."""
+
+    async def run(self, task):
+        client = OpenAIClient.get_client(self.properties["client"])
+        response = await client.embeddings.create(model="fake-embedding", input=task["prompt"])
+        return {"embedding": response.data[0].embedding}
+
+
+class Retrieve(JobABC):
+    """Finds the documents closest to the query embedding in an in-memory corpus, a CPU bound step."""
+
+    def __init__(self, name: str, properties: Dict[str, Any] = {}):
+        super().__init__(name, properties)
+        rng = random.Random(0)
+        dim = properties.get("embedding_dim", 64)
+        self.top_k = properties.get("top_k", 3)
+        self.corpus = [[rng.uniform(-1, 1) for _ in range(dim)] for _ in range(properties.get("documents", 1000))]
+
+    async def run(self, task):
+        query = self.get_inputs()["bench_embed"]["embedding"]
+        scores = sorted(((sum(q * d for q, d in zip(query, document)), index)
+                         for index, document in enumerate(self.corpus)), reverse=True)
+        return {"context": [f"document {index}" for _, index in scores[:self.top_k]]}
+
+
+class GenerateAnswer(OpenAIJob):
+    """Answers the task's prompt from the retrieved context."""
+
+    async def run(self, task):
+        context = self.get_inputs()["bench_retrieve"]["context"]
+        prompt = f"Answer from {', '.join(context)}: {self.get_task()['prompt']}"
+        return await super().run({"prompt": prompt})
+
+
+def rag_graph(base_url: str, properties: Optional[Dict[str, Any]] = None) -> DSLComponent:
+    """Embed, retrieve and generate per task, as in parallel_rag."""
+    llm = llm_properties(base_url, properties)
+    return (EmbedQuery("bench_embed", {"client": llm["client"]})
+            >> Retrieve("bench_retrieve")
+            >> GenerateAnswer("bench_generate", llm))
+
+
+GRAPHS = {
+    "chat": chat_graph,
+    "fanout": fanout_graph,
+    "rag": rag_graph,
+}
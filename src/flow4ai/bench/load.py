@@ -0,0 +1,210 @@
+"""
+Load generator for job graphs: submits tasks to FlowManager or FlowManagerMP, all at once
+or at a fixed rate, and reports throughput and latency percentiles.
+
+    python -m flow4ai.bench.load --graph rag --manager mp --tasks 500 --p50-ms 40 --p99-ms 400
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from flow4ai import f4a_logging as logging
+from flow4ai.dsl import DSLComponent
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.job import JobABC
+from flow4ai.utils.hedging import percentile
+
+from .fake_llm import API_KEY_ENV, FakeLLMServer, add_server_arguments, server_from_arguments
+from .graphs import GRAPHS
+
+logger = logging.getLogger(__name__)
+
+MANAGERS = ("flowmanager", "mp")
+# Task key holding the submission time, wall clock so it is comparable across processes
+SUBMITTED_AT = "bench_submitted_at"
+
+
+class CompletionRecorder:
+    """
+    on_complete callback recording (submitted_at, completed_at, ok) of every task, picklable
+    for FlowManagerMP. A result with an "error" key, as OpenAIJob returns when its call fails,
+    is not ok.
+    """
+
+    def __init__(self, completions):
+        self.completions = completions
+
+    def __call__(self, result: Dict[str, Any]) -> None:
+        if not isinstance(result, dict):
+            return
+        task = result.get(JobABC.TASK_PASSTHROUGH_KEY) or {}
+        self.completions.append((task.get(SUBMITTED_AT), time.time(), "error" not in result))
+
+
+def make_tasks(count: int) -> List[Dict[str, Any]]:
+    """Tasks with a prompt each, varied so requests are not identical."""
+    return [{"prompt": f"Question {i}: how does Flow4AI run parallel jobs?"} for i in range(count)]
+
+
+def _submit(submit, tasks: List[Dict[str, Any]], rate: Optional[float]) -> float:
+    start = time.time()
+    for index, task in enumerate(tasks):
+        if rate:
+            # Open loop: tasks are submitted on schedule whether or not earlier ones have finished
+            delay = start + index / rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        task[SUBMITTED_AT] = time.time()
+        submit(task)
+    return start
+
+
+def _report(graph_name: str, manager: str, submitted: int, completions, errors: int,
+            start: float) -> Dict[str, Any]:
+    succeeded = [(submitted_at, done) for submitted_at, done, ok in completions if ok]
+    latencies = [done - submitted_at for submitted_at, done in succeeded if submitted_at is not None]
+    end = max((done for _, done, _ in completions), default=start)
+    duration = max(end - start, 1e-9)
+    return {
+        'graph': graph_name,
+        'manager': manager,
+        'tasks': submitted,
+        'completed': len(succeeded),
+        'errors': errors + len(completions) - len(succeeded),
+        'duration_s': duration,
+        'throughput_per_s': len(succeeded) / duration,
+        'latency_ms': {
+            'p50': percentile(latencies, 50) * 1000.0 if latencies else None,
+            'p95': percentile(latencies, 95) * 1000.0 if latencies else None,
+            'p99': percentile(latencies, 99) * 1000.0 if latencies else None,
+            'max': max(latencies) * 1000.0 if latencies else None,
+            'mean': sum(latencies) / len(latencies) * 1000.0 if latencies else None,
+        },
+    }
+
+
+def run_load(dsl: DSLComponent, tasks: List[Dict[str, Any]], manager: str = "flowmanager",
+             rate: Optional[float] = None, timeout: float = 300.0, graph_name: str = "bench") -> Dict[str, Any]:
+    """
+    Run tasks through a job graph and measure them.
+
+    Args:
+        dsl: The job graph.
+        tasks: Task dicts, a submission time is added to each.
+        manager: "flowmanager" or "mp" (FlowManagerMP).
+        rate: Tasks submitted per second, None to submit them all at once.
+        timeout: Seconds to wait for the tasks to finish.
+        graph_name: Name of the graph in the report.
+
+    Returns:
+        The report: graph, manager, tasks, completed, errors (failed tasks plus results with
+        an "error" key), duration_s (first submission to last completion), throughput_per_s,
+        and latency_ms p50, p95, p99, max and mean of completed tasks, from submission to
+        on_complete.
+
+    Raises:
+        ValueError: If manager is unknown
+        TimeoutError: If the tasks don't finish within timeout
+    """
+    if manager not in MANAGERS:
+        raise ValueError(f"manager must be one of {MANAGERS}, got {manager!r}")
+    # Benchmark clients need a key, any value is accepted by FakeLLMServer
+    os.environ.setdefault(API_KEY_ENV, "bench")
+
+    if manager == "flowmanager":
+        completions = []
+        fm = FlowManager(on_complete=CompletionRecorder(completions))
+        fq_name = fm.add_workflow(dsl, graph_name)
+        start = _submit(lambda task: fm.submit_task(task, fq_name), tasks, rate)
+        if not fm.wait_for_completion(timeout=timeout, check_interval=0.01, log_interval=60.0):
+            raise TimeoutError(f"Load test of {graph_name} didn't finish within {timeout}s")
+        return _report(graph_name, manager, len(tasks), list(completions), fm.get_counts()['errors'], start)
+
+    with mp.Manager() as sync_manager:
+        completions = sync_manager.list()
+        fm = FlowManagerMP({graph_name: dsl}, CompletionRecorder(completions))
+        # raise_on_error is class wide, errors are reported instead for this run only
+        raise_on_error = fm.get_raise_on_error()
+        fm.set_raise_on_error(False)
+        try:
+            fq_name = fm.get_fq_names()[0]
+            start = _submit(lambda task: fm.submit_task(task, fq_name), tasks, rate)
+            fm.close_processes(timeout=timeout, check_interval=0.01)
+        finally:
+            fm.set_raise_on_error(raise_on_error)
+        return _report(graph_name, manager, len(tasks), list(completions), fm.job_errors.value, start)
+
+
+def run_benchmark(graph: str = "chat", manager: str = "flowmanager", tasks: int = 100,
+                  rate: Optional[float] = None, server: Optional[FakeLLMServer] = None,
+                  properties: Optional[Dict[str, Any]] = None, timeout: float = 300.0) -> Dict[str, Any]:
+    """
+    Run one of the bench graphs against a FakeLLMServer, see run_load().
+
+    Args:
+        graph: A name in graphs.GRAPHS: "chat", "fanout" or "rag".
+        manager: "flowmanager" or "mp".
+        tasks: Number of tasks.
+        rate: Tasks submitted per second, None to submit them all at once.
+        server: The server to call, a default FakeLLMServer is started and stopped if None.
+        properties: Job properties merged into each LLM job, e.g. {"hedge": {...}}.
+        timeout: Seconds to wait for the tasks to finish.
+
+    Returns:
+        The run_load() report, with the server's stats under 'server'.
+    """
+    if graph not in GRAPHS:
+        raise ValueError(f"graph must be one of {list(GRAPHS)}, got {graph!r}")
+    owned = server is None
+    if owned:
+        server = FakeLLMServer().start()
+    try:
+        dsl = GRAPHS[graph](server.base_url, properties)
+        report = run_load(dsl, make_tasks(tasks), manager, rate, timeout, graph_name=graph)
+        report['server'] = server.stats()
+        return report
+    finally:
+        if owned:
+            server.stop()
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Format a report as a few lines of text."""
+    latency = report['latency_ms']
+    lines = [
+        f"{report['graph']} on {report['manager']}: {report['completed']}/{report['tasks']} tasks completed, "
+        f"{report['errors']} errors in {report['duration_s']:.2f}s ({report['throughput_per_s']:.1f} tasks/s)",
+    ]
+    if latency['p50'] is not None:
+        lines.append(f"latency ms: p50 {latency['p50']:.1f}, p95 {latency['p95']:.1f}, "
+                     f"p99 {latency['p99']:.1f}, max {latency['max']:.1f}")
+    if 'server' in report:
+        server = report['server']
+        lines.append(f"server: {server['requests']} requests, {server['rate_limited']} rate limited, "
+                     f"{server['errors']} errors, peak {server['peak_in_flight']} in flight")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test a Flow4AI job graph against a fake LLM server")
+    parser.add_argument("--graph", choices=sorted(GRAPHS), default="chat")
+    parser.add_argument("--manager", choices=MANAGERS, default="flowmanager")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=None, help="Tasks per second, all at once if not set")
+    parser.add_argument("--properties", type=json.loads, default=None,
+                        help='Job properties for the LLM jobs as JSON, e.g. \'{"hedge": {"percentile": 95}}\'')
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with server_from_arguments(args) as server:
+        report = run_benchmark(args.graph, args.manager, args.tasks, args.rate, server, args.properties)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
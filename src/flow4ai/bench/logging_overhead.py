@@ -0,0 +1,151 @@
+"""
+Measures what logging costs per task: runs a job graph through FlowManager with logging at
+a level, in the sync or queue log mode, and compares the time per task with a run where
+every record is filtered out.
+
+    python -m flow4ai.bench.logging_overhead --tasks 2000 --levels INFO DEBUG --modes sync queue
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from flow4ai import f4a_logging as logging
+from flow4ai.dsl import DSLComponent, job
+from flow4ai.flowmanager import FlowManager
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("INFO", "DEBUG")
+
+
+def retrieve(j_ctx):
+    # A result large enough for formatting it to show, like retrieved documents
+    documents = [{"id": i, "text": f"Document {i} about parallel jobs"} for i in range(50)]
+    logger.info("Retrieved %d documents", len(documents))
+    return {"documents": documents}
+
+
+def rank(j_ctx):
+    documents = j_ctx["inputs"]["retrieve"]["documents"]
+    logger.info("Ranking %d documents", len(documents))
+    return {"ranked": documents[:10]}
+
+
+def answer(j_ctx):
+    ranked = j_ctx["inputs"]["rank"]["ranked"]
+    logger.info("Answering from %d documents", len(ranked))
+    return {"answer": " ".join(document["text"] for document in ranked)}
+
+
+def bench_graph() -> DSLComponent:
+    """Three jobs logging a record each at INFO, returning results of some size."""
+    return job(retrieve=retrieve) >> job(rank=rank) >> job(answer=answer)
+
+
+def _time_tasks(fm: FlowManager, fq_name: str, tasks: int) -> float:
+    """Seconds to run tasks through the graph."""
+    start = time.perf_counter()
+    fm.submit_task([{"question": f"Question {i}"} for i in range(tasks)], fq_name)
+    if not fm.wait_for_completion(timeout=300, check_interval=0.001, log_interval=60.0):
+        raise TimeoutError(f"Logging benchmark of {tasks} tasks didn't finish within 300s")
+    elapsed = time.perf_counter() - start
+    fm.pop_results()
+    return elapsed
+
+
+def run_logging_benchmark(tasks: int = 1000, level: str = "INFO", mode: str = "sync",
+                          log_format: str = "text", repeat: int = 5,
+                          log_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Time tasks with logging at level to a file, against a baseline with logging at CRITICAL,
+    taking the fastest of repeat runs of each. Logging is set up again from the environment
+    afterwards.
+
+    Args:
+        tasks: Tasks per run.
+        level: INFO or DEBUG.
+        mode: The log mode, sync or queue.
+        log_format: text or json.
+        repeat: Runs of the baseline and the measurement, interleaved.
+        log_dir: Directory of the log file, a temporary one if None.
+
+    Returns:
+        {'level', 'mode', 'format', 'tasks', 'baseline_us', 'per_task_us', 'overhead_us':
+         per task, 'records_per_task', 'bytes_per_task', 'flush_ms': time to write the
+         records still queued when the last run finished, 0 in sync mode}
+
+    Raises:
+        ValueError: If level isn't INFO or DEBUG, or mode or log_format are unknown
+    """
+    if level not in LEVELS:
+        raise ValueError(f"level must be one of {LEVELS}, got {level!r}")
+    if mode not in logging.LOG_MODES:
+        raise ValueError(f"mode must be one of {logging.LOG_MODES}, got {mode!r}")
+    if log_format not in logging.LOG_FORMATS:
+        raise ValueError(f"log_format must be one of {logging.LOG_FORMATS}, got {log_format!r}")
+    fm = FlowManager()
+    fq_name = fm.add_workflow(bench_graph(), "logging_bench")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(log_dir or temp_dir, f"logging-bench-{os.getpid()}.log")
+        baseline = measured = float("inf")
+        flush_ms = 0.0
+        try:
+            for _ in range(repeat):
+                logging.setup_logging("CRITICAL", ["file"], mode, log_format, path)
+                baseline = min(baseline, _time_tasks(fm, fq_name, tasks))
+                logging.setup_logging(level, ["file"], mode, log_format, path)
+                start_size = os.path.getsize(path)
+                measured = min(measured, _time_tasks(fm, fq_name, tasks))
+                flush_started = time.perf_counter()
+                logging.stop_queue_listener()
+                flush_ms = (time.perf_counter() - flush_started) * 1000.0
+                with open(path, "rb") as f:
+                    f.seek(start_size)
+                    written = f.read()
+        finally:
+            logging.setup_logging()
+    return {
+        'level': level,
+        'mode': mode,
+        'format': log_format,
+        'tasks': tasks,
+        'baseline_us': round(baseline / tasks * 1e6, 2),
+        'per_task_us': round(measured / tasks * 1e6, 2),
+        'overhead_us': round((measured - baseline) / tasks * 1e6, 2),
+        'records_per_task': round(written.count(b"\n") / tasks, 2),
+        'bytes_per_task': round(len(written) / tasks, 1),
+        'flush_ms': round(flush_ms, 2),
+    }
+
+
+def format_report(reports: List[Dict[str, Any]]) -> str:
+    """Format reports as a table, a row per level, mode and format."""
+    lines = [f"{'level':<6} {'mode':<6} {'format':<6} {'tasks':>6} {'baseline us':>12} {'per task us':>12} "
+             f"{'overhead us':>12} {'records':>8} {'bytes':>8} {'flush ms':>9}"]
+    for report in reports:
+        lines.append(f"{report['level']:<6} {report['mode']:<6} {report['format']:<6} {report['tasks']:>6} "
+                     f"{report['baseline_us']:>12.1f} {report['per_task_us']:>12.1f} {report['overhead_us']:>12.1f} "
+                     f"{report['records_per_task']:>8.1f} {report['bytes_per_task']:>8.0f} {report['flush_ms']:>9.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the logging overhead per task of a job graph")
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--levels", nargs="+", choices=LEVELS, default=list(LEVELS))
+    parser.add_argument("--modes", nargs="+", choices=logging.LOG_MODES, default=list(logging.LOG_MODES))
+    parser.add_argument("--format", choices=logging.LOG_FORMATS, default="text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    args = parser.parse_args(argv)
+
+    reports = [run_logging_benchmark(args.tasks, level, mode, args.format, args.repeat)
+               for level in args.levels for mode in args.modes]
+    print(json.dumps(reports, indent=2) if args.json else format_report(reports))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 from functools import reduce
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from . import f4a_logging as logging
 from .job import JobABC
+from .jobs.batching_job import BatchingJob
+from .jobs.map_job import MapJob
+from .jobs.router_job import RouterJob
 from .jobs.wrapping_job import WrappingJob
 
 logger = logging.getLogger(__name__)
 
+# job() keyword arguments that are options rather than job names
+BATCH_OPTIONS = ("batch_size", "max_wait_ms")
+# Options that become job properties, and so also apply to JobABC instances
+PROPERTY_OPTIONS = ("retry", "max_concurrency", "concurrency_group", "adaptive_concurrency", "coalesce", "hedge", "circuit_breaker",
+                    "trace")
+# Property options that don't apply to batched calls
+UNBATCHED_OPTIONS = ("coalesce", "hedge")
+
 # Type definitions for DSL components
 DSLComponent = Union[JobABC, 'Parallel', 'Serial']
 JobsDict = Dict[str, JobABC]
@@ -74,19 +85,60 @@ def job(obj=None, **kwargs):
        job(obj_a_name=obj_a, obj_b_name=obj_b) or job({"obj_a_name": obj_a, "obj_b_name": obj_b})
        - Returns a collection of jobs following the rules above
        - If only one item, returns just that job
+
+    3. Batching options:
+       job(embed=embed_batch, batch_size=64, max_wait_ms=20)
+       - Wraps a function taking a list of items in a BatchingJob, which coalesces the
+         inputs of concurrent tasks into one call and returns each task its own result
+       - batch_size and max_wait_ms are reserved option names, not job names
+       - A sync function runs in a thread, and can't be combined with coalesce or hedge
+
+    4. Retry option:
+       job(embed=embed_chunk, retry={"max_attempts": 4, "initial_backoff": 0.5, "retry_on": [TimeoutError]})
+       - Re-runs only the failed job with the inputs it already received, see RetryPolicy
+       - Also applies to JobABC instances, and retry=3 is shorthand for three attempts
+
+    5. Concurrency options:
+       job(search=query_vector_db, max_concurrency=20, concurrency_group="vector_db")
+       - At most max_concurrency calls run at once across all in-flight tasks, see Bulkhead
+       - Jobs naming the same concurrency_group share one limit, across the graphs of a FlowManager
+       job(llm=call_llm, adaptive_concurrency={"initial_limit": 8, "max_limit": 64})
+       - The limit grows while calls are healthy and halves on errors, 429s and latency
+         spikes, see AdaptiveLimiter
+
+    6. Coalescing option:
+       job(embed=embed_text, coalesce=True)
+       - Concurrent calls with identical arguments share one in-flight call, see SingleFlight
+       - coalesce="embeddings" uses a named group instead of the default one
+
+    7. Hedging option:
+       job(llm=call_llm, hedge={"percentile": 95, "max_hedge_rate": 0.05})
+       - Async calls slower than the job's observed p95 latency are issued again, the first
+         response wins and the other call is cancelled, see HedgingPolicy
+
+    8. Circuit breaker option:
+       job(llm=call_llm, circuit_breaker={"group": "openai", "open_seconds": 30, "fallback": "skip"})
+       - Once calls keep failing, further calls are rejected at once for open_seconds, see CircuitBreaker
+       - fallback is "error" (fail fast), "skip" (skip the job) or a function returning a result instead
+
+    9. Tracing option:
+       job(normalize=normalize_text, trace=False)
+       - The job gets no span, e.g. for trivial jobs in high volume graphs, see trace_job_execution
+
+    Option names are only reserved for option values: a function or job passed under an
+    option name, e.g. job(retry=retry_fn), is a job named "retry".
     """
+    # Option values are never functions or jobs, so a function or job passed under an
+    # option name is a job with that name, e.g. job(trace=trace_fn)
+    options = {key: kwargs.pop(key) for key in BATCH_OPTIONS + PROPERTY_OPTIONS
+               if key in kwargs and not _is_job_value(kwargs[key])}
+
     # Case 1: Only keyword arguments provided (no positional argument)
     if obj is None and kwargs:
         # Process keyword arguments
         result = {}
         for name, value in kwargs.items():
-            if isinstance(value, JobABC):
-                value.name = name
-                result[name] = value
-            elif isinstance(value, (Parallel, Serial)):
-                result[name] = value
-            else:
-                result[name] = WrappingJob(value, name)
+            result[name] = _wrap(value, name, options)
         
         # If only one item, return just that item
         if len(result) == 1:
@@ -97,13 +149,7 @@ def job(obj=None, **kwargs):
     if isinstance(obj, dict):
         result = {}
         for name, value in obj.items():
-            if isinstance(value, JobABC):
-                value.name = name
-                result[name] = value
-            elif isinstance(value, (Parallel, Serial)):
-                result[name] = value
-            else:
-                result[name] = WrappingJob(value, name)
+            result[name] = _wrap(value, name, options)
         
         # If only one item, return just that item
         if len(result) == 1:
@@ -115,9 +161,36 @@ def job(obj=None, **kwargs):
     if obj is None:
         raise ValueError("job() requires at least one argument")
         
-    if isinstance(obj, (JobABC, Parallel, Serial)):
-        return obj  # Already has the operations we need
-    return WrappingJob(obj)
+    return _wrap(obj, None, options)
+
+def _is_job_value(value) -> bool:
+    """Whether a job() keyword argument is a function or job rather than an option value."""
+    return isinstance(value, (JobABC, Parallel, Serial)) or callable(value)
+
+def _wrap(value, name: Optional[str], options: Dict[str, Any]):
+    """Wrap a single value as a job, applying any job() options."""
+    batch_options = {key: options[key] for key in BATCH_OPTIONS if key in options}
+    properties = {key: options[key] for key in PROPERTY_OPTIONS if key in options}
+    if isinstance(value, (Parallel, Serial)) and options:
+        raise TypeError(f"job() options {sorted(options)} only apply to functions and jobs, "
+                        f"not {type(value).__name__}")
+    if isinstance(value, JobABC) and batch_options:
+        raise TypeError(f"job() options {sorted(batch_options)} only apply to functions, "
+                        f"not {type(value).__name__}")
+    unbatched = sorted(key for key in UNBATCHED_OPTIONS if options.get(key))
+    if batch_options and unbatched:
+        raise TypeError(f"job() options {unbatched} can't be combined with {sorted(batch_options)}, "
+                        f"batched calls are neither coalesced nor hedged")
+    if isinstance(value, (JobABC, Parallel, Serial)):
+        if isinstance(value, JobABC):
+            if name is not None:
+                value.name = name
+            if properties:
+                value.update_properties(properties)
+        return value  # Already has the operations we need
+    if batch_options:
+        return BatchingJob(value, name, properties=properties, **batch_options)
+    return WrappingJob(value, name, properties)
 
 # Legacy aliases - commented out to enforce job() usage
 # wrap = job  # Deprecated: use job() instead
@@ -249,4 +322,66 @@ def serial(*objects, **kwargs):
 # Synonym for serial
 s = serial
 
+def map_over(obj: Union[Callable, JobABC], items_key: str, max_concurrency: Optional[int] = None) -> MapJob:
+    """
+    Fan a job out over a list of items produced at runtime, gathering the results in order.
+
+    The whole fan-out happens inside a single task, so a "chunk -> embed each -> index" pipeline
+    is one graph execution rather than an external loop of submit_task calls.
+
+    Example:
+        workflow = job(chunk=chunk_text) >> map_over(job(embed=embed_chunk), "chunks", max_concurrency=16) >> job(index=index)
+
+        # The embed job receives one chunk per call and the index job receives
+        # inputs["embed"]["result"] == [embedding_1, embedding_2, ...] in chunk order.
+
+    Args:
+        obj: A function or JobABC instance applied to each item. Each item is passed as the only argument.
+            A mapped job's properties, e.g. retry or max_concurrency, apply to each item.
+            Sync functions run in a thread here, rather than on the event loop as in job(), so
+            they must be thread-safe. Streamed results are consumed into their aggregate.
+        items_key: The key under which the list of items is found, in a predecessor's output,
+            this job's task parameters, or the task itself.
+        max_concurrency: Maximum number of items in flight at once for a single task, None for unbounded.
+
+    Returns:
+        MapJob: A job that can be composed with | and >> like any other job. It takes the name of
+        the mapped job, and can be renamed with job(name=map_over(...)).
+    """
+    if isinstance(obj, (Parallel, Serial)):
+        raise TypeError("map_over requires a single job or callable, not a parallel or serial composition")
+    return MapJob(obj, items_key, max_concurrency)
+
+def route(selector: Callable, routes: Dict[str, Any], name: Optional[str] = None) -> Serial:
+    """
+    Execute only the branches chosen by a selector function, the other branches are skipped.
+
+    Unlike parallel composition, where every branch runs for every task, the selector picks the
+    branches per task. A job joining the branches runs once every branch was executed or skipped,
+    with the inputs of the executed branches.
+
+    Example:
+        workflow = route(pick_models, {"mini": job(mini=ask_mini), "large": job(large=ask_large)}) >> job(compare=compare)
+
+        # pick_models returns "mini", ["mini", "large"] or None. With "mini" only
+        # ask_mini runs and compare receives inputs == {"mini": {...}}.
+
+    Args:
+        selector: A function returning a branch key, a list of branch keys, or None for no branch.
+            It receives task parameters and j_ctx like any other wrapped function.
+        routes: The branches by key, each a function, job or parallel/serial composition.
+        name: Name of the router job, used to pass task parameters to the selector.
+
+    Returns:
+        Serial: The router followed by its branches, which can be composed with | and >>.
+    """
+    if not routes:
+        raise ValueError("route() requires at least one branch")
+    branches = {key: job(branch) for key, branch in routes.items()}
+    router = RouterJob(selector, branches, name)
+    branch_list = list(branches.values())
+    if len(branch_list) == 1:
+        return Serial(router, branch_list[0])
+    return Serial(router, Parallel(*branch_list))
+
 # Graph evaluation utilities have been moved to tests/test_utils/graph_evaluation.py
\ No newline at end of file
@@ -6,6 +6,11 @@ Environment Variables:
     FLOW4AI_LOG_HANDLERS: Set logging handlers. Options:
         - Not set or 'console': Log to console only (default)
         - 'console,file': Log to both console and file
+    FLOW4AI_LOG_MODE: 'sync' (default) writes records in the thread logging them, 'queue'
+        hands them to a QueueListener thread that writes them, so the event loop doesn't
+        wait on the console or the disk.
+    FLOW4AI_LOG_FORMAT: 'text' (default) or 'json', a JSON object per line carrying the
+        task_id and fq_name of the task being executed, see log_task().
         
 Example:
     To enable both console and file logging:
@@ -16,40 +21,157 @@ Example:
 """
 
 
+import atexit
+import copy
+import json
+import multiprocessing.util
 import os
+import queue
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
 
 # Initializing the flag here stops logging caching root levels to another value
 # for reasons I'm not completely sure about.
 WINDSURF_LOG_FLAG = None #None #"DEBUG"
 os.environ['FLOW4AI_LOG_LEVEL'] = WINDSURF_LOG_FLAG or os.getenv('FLOW4AI_LOG_LEVEL', 'INFO')
 import logging
+import logging.handlers
 from logging.config import dictConfig
 
+LOG_MODES = ("sync", "queue")
+LOG_FORMATS = ("text", "json")
+LOG_FILE = 'flow4ai.log'
+
+# (task_id, fq_name) of the task being executed, set by the flow managers, see log_task()
+task_log_context: ContextVar[Optional[Tuple[str, str]]] = ContextVar('task_log_context', default=None)
+
+
+@contextmanager
+def log_task(task_id: str, fq_name: Optional[str]) -> Iterator[None]:
+    """Records logged in the block, and the asyncio tasks it creates, carry task_id and fq_name."""
+    token = task_log_context.set((task_id, fq_name))
+    try:
+        yield
+    finally:
+        task_log_context.reset(token)
+
+
+class TaskContextFilter(logging.Filter):
+    """Sets the task_id and fq_name attributes of records, None outside a task, see log_task()."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Already set when a QueueListener passes the record on
+        if not hasattr(record, 'task_id'):
+            record.task_id, record.fq_name = task_log_context.get() or (None, None)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a JSON object on one line, with its task_id and fq_name."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'task_id': getattr(record, 'task_id', None),
+            'fq_name': getattr(record, 'fq_name', None),
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class TaskQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for a QueueListener, with the task context and the message formatted in the
+    thread logging them, as their arguments may change after, and the rest left to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks don't pickle, so they are formatted here
+            record.exc_text = record.exc_text or _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class _QueueLogging:
+    """The queue handler and listener of the queue log mode, one per process."""
+    handler: Optional[TaskQueueHandler] = None
+    listener: Optional[logging.handlers.QueueListener] = None
+
+
+_queue_logging = _QueueLogging()
+
+
+def get_logging_config(level: Optional[str] = None, handlers: Optional[List[str]] = None,
+                       log_format: Optional[str] = None, filename: Optional[str] = None):
+    """
+    Get the logging configuration based on current environment variables.
+
+    Args:
+        level: Overrides FLOW4AI_LOG_LEVEL.
+        handlers: Overrides FLOW4AI_LOG_HANDLERS, console and or file.
+        log_format: Overrides FLOW4AI_LOG_FORMAT, text or json.
+        filename: The file of the file handler, flow4ai.log by default.
+
+    Raises:
+        ValueError: If the log format isn't text or json
+    """
+    level = level or os.getenv('FLOW4AI_LOG_LEVEL', 'INFO')
+    log_format = log_format or os.getenv('FLOW4AI_LOG_FORMAT', 'text')
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"log format must be one of {LOG_FORMATS}, got {log_format!r}")
+    formatter = 'json' if log_format == 'json' else 'detailed'
 
-def get_logging_config():
-    """Get the logging configuration based on current environment variables."""
-    
-    
     return {
         'version': 1,
         'disable_existing_loggers': False,
         'formatters': {
             'detailed': {
                 'format': '%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s'
+            },
+            'json': {
+                '()': JsonFormatter
+            }
+        },
+        'filters': {
+            'task_context': {
+                '()': TaskContextFilter
             }
         },
         'handlers': {
             'console': {
                 'class': 'logging.StreamHandler',
-                'level': os.getenv('FLOW4AI_LOG_LEVEL', 'INFO'),
-                'formatter': 'detailed',
+                'level': level,
+                'formatter': formatter,
+                'filters': ['task_context'],
                 'stream': 'ext://sys.stdout'
             },
             'file': {
                 'class': 'logging.FileHandler',
-                'level': os.getenv('FLOW4AI_LOG_LEVEL', 'INFO'),
-                'formatter': 'detailed',
-                'filename': 'flow4ai.log',
+                'level': level,
+                'formatter': formatter,
+                'filters': ['task_context'],
+                'filename': filename or LOG_FILE,
                 'mode': 'a'
             }
         },
@@ -61,24 +183,88 @@ def get_logging_config():
             }
         },
         'root': {
-            'level':  os.getenv('FLOW4AI_LOG_LEVEL', 'INFO'),
+            'level':  level,
             # Set FLOW4AI_LOG_HANDLERS='console,file' to enable both console and file logging
-            'handlers': os.getenv('FLOW4AI_LOG_HANDLERS', 'console').split(',')
+            'handlers': handlers or os.getenv('FLOW4AI_LOG_HANDLERS', 'console').split(',')
         }
     }
 
-def setup_logging():
-    """Setup logging with current configuration."""
-    config = get_logging_config()
+def setup_logging(level: Optional[str] = None, handlers: Optional[List[str]] = None,
+                  mode: Optional[str] = None, log_format: Optional[str] = None,
+                  filename: Optional[str] = None):
+    """
+    Setup logging with current configuration, see get_logging_config().
+
+    Args:
+        mode: Overrides FLOW4AI_LOG_MODE, sync or queue.
+
+    Raises:
+        ValueError: If the mode isn't sync or queue
+    """
+    mode = mode or os.getenv('FLOW4AI_LOG_MODE', 'sync')
+    if mode not in LOG_MODES:
+        raise ValueError(f"log mode must be one of {LOG_MODES}, got {mode!r}")
+    config = get_logging_config(level, handlers, log_format, filename)
+    log_file = config['handlers']['file']['filename']
     
     # Always create log file with header, actual logging will only happen if handlers use it
-    if not os.path.exists('flow4ai.log'):
-        with open('flow4ai.log', 'w') as f:
+    if not os.path.exists(log_file):
+        with open(log_file, 'w') as f:
             f.write('# Flow4AI log file - This file is created empty and will be written to only when file logging is enabled\n')
     
     print(f"Logging level: {config['root']['level']}")
+    stop_queue_listener()
     # Apply configuration
     dictConfig(config)
+    if mode == 'queue':
+        _start_queue_logging(logging.getLogger().handlers)
+
+
+def _start_queue_logging(handlers: List[logging.Handler]) -> None:
+    """Move the root logger's handlers behind a queue written by a QueueListener thread."""
+    root = logging.getLogger()
+    handlers = list(handlers)
+    handler = TaskQueueHandler(queue.SimpleQueue())
+    handler.addFilter(TaskContextFilter())
+    for existing in handlers:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    listener = logging.handlers.QueueListener(handler.queue, *handlers, respect_handler_level=True)
+    _queue_logging.handler, _queue_logging.listener = handler, listener
+    listener.start()
+
+
+def stop_queue_listener() -> None:
+    """Write the records queued in the queue log mode and stop its listener thread."""
+    listener, _queue_logging.listener = _queue_logging.listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def _restart_queue_listener() -> None:
+    """
+    The listener thread isn't copied into a forked process, and its queue may have been
+    locked by it, so the child gets its own queue and listener.
+    """
+    if _queue_logging.listener is None:
+        return
+    handlers = _queue_logging.listener.handlers
+    _queue_logging.handler.queue = queue.SimpleQueue()
+    _queue_logging.listener = logging.handlers.QueueListener(_queue_logging.handler.queue, *handlers,
+                                                             respect_handler_level=True)
+    _queue_logging.listener.start()
+
+
+def _flush_on_process_exit(_) -> None:
+    """multiprocessing children exit without running atexit, but run its finalizers."""
+    if _queue_logging.listener is not None:
+        multiprocessing.util.Finalize(None, stop_queue_listener, exitpriority=100)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_queue_listener)
+multiprocessing.util.register_after_fork(_queue_logging, _flush_on_process_exit)
+atexit.register(stop_queue_listener)
 
 # Apply configuration when module is imported
 setup_logging()
@@ -1,30 +1,65 @@
 import asyncio
+import itertools
 import threading
 import time
 from collections import defaultdict
+from concurrent.futures import CancelledError
 from typing import Any, Callable, Dict, List, Optional, Union
 
 from flow4ai import f4a_logging as logging
 from flow4ai.flowmanager_base import FlowManagerABC
 from flow4ai.job import SPLIT_STR, JobABC, Task, job_graph_context_manager
 from flow4ai.job_loader import JobFactory
+from flow4ai.utils.bulkhead import Bulkhead
+from flow4ai.utils.circuit_breaker import CircuitBreaker
+from flow4ai.utils.client_pool import LoopClientPool
+from flow4ai.utils.metrics import FlowMetrics, LoopLagMonitor, MetricsRegistry
+from flow4ai.utils.otel_wrapper import TracerFactory
+from flow4ai.utils.profiler import TaskProfiler
+from flow4ai.utils.single_flight import SingleFlight
+from flow4ai.utils.timeline import TaskTimeline
 
 
 class FlowManager(FlowManagerABC):
     _lock = threading.Lock()  # Lock for thread-safe initialization
     _instance = None  # Singleton instance
+    _loop_ids = itertools.count(1)  # Numbers the event loops of instances in their metrics
     
-    def __init__(self, dsl=None, jobs_dir_mode=False, on_complete: Optional[Callable[[Any], None]] = None):
+    def __init__(self, dsl=None, jobs_dir_mode=False, on_complete: Optional[Callable[[Any], None]] = None,
+                 on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 failure_policy: str = JobABC.FAIL_FAST, timeline: bool = False,
+                 on_timeline: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 profiling: Optional[Dict[str, Any]] = None):
         """Initialize the FlowManager.
         
         Args:
             dsl: A dictionary of job DSLs, a job DSL, a JobABC instance, or a collection of JobABC instances.
             jobs_dir_mode: If True, the FlowManager will load jobs from a directory.
             on_complete: A callback function to be called when a job is completed.
+            on_partial: A callback function called with every chunk yielded by a streaming job, as
+                {'job': short_job_name, 'chunk': chunk, 'task_pass_through': task}. It runs on the
+                FlowManager event loop thread, so it should return quickly.
+            failure_policy: What happens to a task when one of its jobs raises.
+                "fail_fast" (default) cancels the task's other running jobs and fails the task at once.
+                "continue" skips the failed job's successors, lets the other branches finish and
+                returns the tail result with the collected errors under result["ERRORS"].
+            timeline: If True, each task's result holds the timestamps of the task and its jobs
+                under result["TIMELINE"], see TaskTimeline.to_dict().
+            on_timeline: A callback function called with the timeline of every task, failed ones
+                included, e.g. a TimelineWriter. It runs on the FlowManager event loop thread.
+            profiling: Profiles a fraction of tasks per job and graph when given, e.g.
+                {"ratio": 0.1, "mode": "sample"}, see TaskProfiler, get_profile_stats() and write_profile().
         """
         super().__init__()
+        if failure_policy not in JobABC.FAILURE_POLICIES:
+            raise ValueError(f"failure_policy must be one of {JobABC.FAILURE_POLICIES}, got {failure_policy!r}")
         self.jobs_dir_mode = jobs_dir_mode
         self.on_complete = on_complete
+        self.on_partial = on_partial
+        self.failure_policy = failure_policy
+        self.timeline = timeline
+        self.on_timeline = on_timeline
+        self.profiler = TaskProfiler.from_config(profiling)
         self._initialize()
         
         # Add DSL dictionary if provided
@@ -36,6 +71,8 @@ class FlowManager(FlowManagerABC):
         self.loop = asyncio.new_event_loop()
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
         self.thread.start()
+        # Each instance's loop gets its own label, so the lag of different managers isn't merged
+        self.loop_monitor = LoopLagMonitor(self.loop, f"{self.__class__.__name__}-{next(FlowManager._loop_ids)}").start()
         self.head_jobs: List[JobABC] = []
         if self.jobs_dir_mode:
             self.head_jobs = JobFactory.get_head_jobs_from_config()
@@ -66,12 +103,46 @@ class FlowManager(FlowManagerABC):
         Returns:
             The result of the job execution
         """
+        FlowMetrics.get().task_started(task.get_fq_name(), task.submitted_at)
+        # Records logged by the task carry its id, the coroutine runs in its own asyncio task and context
+        logging.task_log_context.set((task.task_id, task.get_fq_name()))
         # Create a job set for this job
         job_set = JobABC.job_set(job)
         
+        context = {JobABC.FAILURE_POLICY: self.failure_policy}
+        if self.on_partial:
+            context[JobABC.PARTIAL_RESULTS] = self.on_partial
+        timeline = None
+        if self.timeline or self.on_timeline:
+            timeline = context[JobABC.TIMELINE] = TaskTimeline.of_task(task)
+        profiled = self.profiler is not None and self.profiler.begin(task.task_id, task.get_fq_name(), job_set)
+
         # Execute the job within the context manager
-        async with job_graph_context_manager(job_set):
-            return await job._execute(task)
+        async with job_graph_context_manager(job_set, context):
+            try:
+                result = JobABC.raise_if_task_failed(await job._execute(task))
+            except BaseException as e:
+                if timeline is not None:
+                    self._emit_timeline(timeline.finish(e))
+                raise
+            finally:
+                if profiled:
+                    self.profiler.end(task.task_id)
+            if timeline is not None:
+                timeline_dict = timeline.finish()
+                if self.timeline and isinstance(result, dict):
+                    result[JobABC.TIMELINE] = timeline_dict
+                self._emit_timeline(timeline_dict)
+            return result
+
+    def _emit_timeline(self, timeline: Dict[str, Any]) -> None:
+        """Pass a task's timeline to on_timeline, a failing callback doesn't fail the task."""
+        if self.on_timeline is None:
+            return
+        try:
+            self.on_timeline(timeline)
+        except Exception as e:
+            self.logger.error(f"on_timeline failed: {e}")
     
 
     def submit_task(self, task: Union[Dict[str, Any], List[Dict[str, Any]], str], fq_name: str = None):
@@ -106,31 +177,35 @@ class FlowManager(FlowManagerABC):
         )
 
     def _handle_completion(self, future, job: JobABC, task: Task):
-        result = None
-        exception = None
-        try:
-            result = future.result()
-            with self._data_lock:
-                self.completed_count += 1
-                # job.name is fq_name
-                self.completed_results[job.name].append(result)
-                
-            if self.on_complete:
+        # On the thread completing the future, outside the task's context
+        with logging.log_task(task.task_id, task.get_fq_name()):
+            FlowMetrics.get().task_finished(task.get_fq_name(), task.submitted_at,
+                                            future.exception() if not future.cancelled() else CancelledError())
+            result = None
+            exception = None
+            try:
+                result = future.result()
                 with self._data_lock:
-                    self.post_processing_count += 1
-                #try: don't catch the exception let it bubble up
-                self.on_complete(result)
+                    self.completed_count += 1
+                    # job.name is fq_name
+                    self.completed_results[job.name].append(result)
+                
+                if self.on_complete:
+                    with self._data_lock:
+                        self.post_processing_count += 1
+                    #try: don't catch the exception let it bubble up
+                    self.on_complete(result)
        
-        except Exception as e:
-            exception = e
-            self.logger.error(f"Error processing result: {e}")
-            self.logger.info("Detailed stack trace:", exc_info=True)
-            with self._data_lock:
-                self.error_count += 1
-                self.error_results[job.name].append({
-                    "error": e,
-                    "task": task
-                })
+            except Exception as e:
+                exception = e
+                self.logger.error(f"Error processing result: {e}")
+                self.logger.info("Detailed stack trace:", exc_info=True)
+                with self._data_lock:
+                    self.error_count += 1
+                    self.error_results[job.name].append({
+                        "error": e,
+                        "task": task
+                    })
 
     def get_fq_names_by_graph(self, graph_name, variant=""):
         """
@@ -214,6 +289,117 @@ class FlowManager(FlowManagerABC):
                 'post_processing': self.post_processing_count
             }
 
+    def get_concurrency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns queue wait and concurrency metrics for concurrency limited jobs:
+            {'jobs': {job_name: stats}, 'groups': {concurrency_group: stats}, 'adaptive': {job_name: stats}}
+        Jobs in a concurrency_group are reported under their group only. See Bulkhead.stats(),
+        and AdaptiveLimiter.stats() for jobs with adaptive_concurrency.
+        """
+        jobs = {}
+        adaptive = {}
+        for head_job in self.job_graph_map.values():
+            for job in JobABC.job_set(head_job):
+                if job.bulkhead is not None and not job.bulkhead.shared:
+                    jobs[job.name] = job.bulkhead.stats()
+                if job.adaptive_limiter is not None:
+                    adaptive[job.name] = job.adaptive_limiter.stats()
+        return {'jobs': jobs, 'groups': Bulkhead.get_group_stats(), 'adaptive': adaptive}
+
+    def get_hedging_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns hedging metrics of jobs with the hedge property: {job_name: stats},
+        see HedgingPolicy.stats().
+        """
+        stats = {}
+        for head_job in self.job_graph_map.values():
+            for job in JobABC.job_set(head_job):
+                if job.hedging_policy is not None:
+                    stats[job.name] = job.hedging_policy.stats()
+        return stats
+
+    def get_circuit_breaker_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the state of circuit breakers:
+            {'jobs': {job_name: stats}, 'groups': {group_name: stats}}
+        Jobs in a group are reported under their group only. See CircuitBreaker.stats().
+        """
+        return CircuitBreaker.collect_stats(
+            job for head_job in self.job_graph_map.values() for job in JobABC.job_set(head_job))
+
+    def configure_trace_sampling(self, ratio: Optional[float] = None, graphs: Optional[Dict[str, float]] = None,
+                                 keep_errors: Optional[bool] = None, slow_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Change which task traces are exported from now on, overriding the sampling section
+        of otel_config.yaml. See TraceSampling.configure().
+
+        Args:
+            ratio: Fraction of tasks traced, for graphs not in graphs.
+            graphs: Ratios by fq_name or graph name.
+            keep_errors: Whether to export the traces of unsampled tasks in which a job failed.
+            slow_ms: Export the traces of unsampled tasks taking at least this long, 0 to stop.
+
+        Returns:
+            The sampling policy and the counts of get_trace_sampling_stats().
+        """
+        TracerFactory.configure_sampling(ratio=ratio, graphs=graphs, keep_errors=keep_errors, slow_ms=slow_ms)
+        return self.get_trace_sampling_stats()
+
+    def get_trace_sampling_stats(self) -> Dict[str, Any]:
+        """
+        Returns the trace sampling policy: ratio, graphs, keep_errors and slow_ms, and the
+        traces kept, discarded, evicted and pending in tail sampling, see TailSamplingProcessor.stats().
+        """
+        sampling = TracerFactory.sampling
+        return {'ratio': sampling.ratio, 'graphs': dict(sampling.graphs), 'keep_errors': sampling.keep_errors,
+                'slow_ms': sampling.slow_ms, **TracerFactory.get_sampling_stats()}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the metrics recorded in this process, by all FlowManagers,
+        see FlowMetrics for the metrics and MetricsRegistry.snapshot() for the format.
+        Pass this method as the source of the exporters in flow4ai.utils.metrics_export.
+        """
+        return MetricsRegistry.default().snapshot()
+
+    def get_loop_stats(self) -> Dict[str, Any]:
+        """
+        Returns the lag of this FlowManager's event loop and the slow callbacks that blocked it,
+        by job, see LoopLagMonitor.stats(). Slow callbacks are also logged as warnings.
+        """
+        return self.loop_monitor.stats()
+
+    def get_profile_stats(self) -> Dict[str, Any]:
+        """
+        Returns the profile of the tasks profiled so far per graph and job, see TaskProfiler.stats(),
+        or {} without the profiling option.
+        """
+        return self.profiler.stats() if self.profiler is not None else {}
+
+    def write_profile(self, output_dir: Optional[str] = None) -> List[str]:
+        """
+        Write the profile of the tasks profiled so far as flamegraph files, see TaskProfiler.write().
+
+        Args:
+            output_dir: Overrides the output_dir of the profiling option.
+
+        Returns:
+            The paths written.
+
+        Raises:
+            ValueError: Without the profiling option
+        """
+        if self.profiler is None:
+            raise ValueError("FlowManager was created without the profiling option")
+        return self.profiler.write(output_dir)
+
+    def get_coalescing_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns request coalescing metrics of jobs with the coalesce property, per group:
+            {group_name: stats}, see SingleFlight.stats().
+        """
+        return SingleFlight.get_group_stats()
+
     def pop_results(self):
         with self._data_lock:
             completed = dict(self.completed_results)
@@ -264,7 +450,37 @@ class FlowManager(FlowManagerABC):
             raise RuntimeError(f"Flow execution completed with {counts['errors']} error(s). Check logs for details.")
             
         return completion_status
-        
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Shut down the event loop: cancel tasks still running, close the pooled clients of the
+        loop (see LoopClientPool) and its async generators, then stop the loop thread.
+        The FlowManager can't run tasks afterwards.
+
+        Args:
+            timeout: Maximum time to wait for the shutdown and for the thread, in seconds.
+        """
+        if self.loop.is_closed():
+            return
+        self.loop_monitor.stop()
+        if self.thread.is_alive():
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout)
+            except Exception as e:
+                self.logger.warning(f"Error shutting down the event loop: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+    async def _shutdown(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await LoopClientPool.aclose_all()
+        await self.loop.shutdown_asyncgens()
+
     def execute(self, task, dsl=None, graph_name=None, fq_name=None, timeout=10):
         """
         Simplified execution method that handles the entire workflow.
@@ -397,7 +613,7 @@ class FlowManager(FlowManagerABC):
         return [job.name for job in self.head_jobs]
 
     @classmethod
-    def run(cls, dsl, task, graph_name="default_graph", timeout=10):
+    def run(cls, dsl, task, graph_name="default_graph", timeout=10, failure_policy=JobABC.FAIL_FAST):
         """
         Static helper method for one-line execution of a DSL graph with a task.
         
@@ -406,6 +622,7 @@ class FlowManager(FlowManagerABC):
             task: Task dictionary to process
             graph_name: Name for the graph
             timeout: Maximum time to wait for completion
+            failure_policy: "fail_fast" or "continue", see __init__
             
         Returns:
             A tuple of (errors, result) where errors is a list of error dictionaries and
@@ -415,8 +632,11 @@ class FlowManager(FlowManagerABC):
             TimeoutError: If tasks don't complete within the timeout period
             Exception: If any errors occurred during execution
         """
-        tm = cls()
-        return tm.execute(task, dsl=dsl, graph_name=graph_name, timeout=timeout)
+        tm = cls(failure_policy=failure_policy)
+        try:
+            return tm.execute(task, dsl=dsl, graph_name=graph_name, timeout=timeout)
+        finally:
+            tm.close()
 
     def display_results(self, results=None):
         """
@@ -468,13 +688,22 @@ class FlowManager(FlowManagerABC):
         
         return results
     @classmethod
-    def instance(cls, dsl=None, jobs_dir_mode=False, on_complete: Optional[Callable[[Any], None]] = None) -> 'FlowManager':
+    def instance(cls, dsl=None, jobs_dir_mode=False, on_complete: Optional[Callable[[Any], None]] = None,
+                 on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 failure_policy: str = JobABC.FAIL_FAST, timeline: bool = False,
+                 on_timeline: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 profiling: Optional[Dict[str, Any]] = None) -> 'FlowManager':
         """Get or create the singleton instance of FlowManager.
         
         Args:
             dsl: A dictionary of job DSLs, a job DSL, a JobABC instance, or a collection of JobABC instances.
             jobs_dir_mode: If True, the FlowManager will load jobs from a directory.
             on_complete: A callback function to be called when a job is completed.
+            on_partial: A callback function called with every chunk yielded by a streaming job.
+            failure_policy: "fail_fast" or "continue", see __init__.
+            timeline: If True, results hold the task's timeline, see __init__.
+            on_timeline: A callback function called with the timeline of every task, see __init__.
+            profiling: Profiles a fraction of tasks when given, see __init__.
             
         Returns:
             The singleton instance of FlowManager
@@ -482,7 +711,8 @@ class FlowManager(FlowManagerABC):
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
-                    cls._instance = cls(dsl, jobs_dir_mode, on_complete)
+                    cls._instance = cls(dsl, jobs_dir_mode, on_complete, on_partial, failure_policy,
+                                        timeline, on_timeline, profiling)
         return cls._instance
     
     @classmethod
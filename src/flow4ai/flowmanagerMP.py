@@ -17,7 +17,14 @@ from . import f4a_logging as logging
 from .dsl import DSLComponent
 from .job import JobABC, Task, job_graph_context_manager
 from .job_loader import ConfigLoader, JobFactory
+from .utils.circuit_breaker import CircuitBreaker
+from .utils.metrics import FlowMetrics, LoopLagMonitor, MetricsRegistry
 from .utils.monitor_utils import should_log_task_stats
+from .utils.otel_wrapper import TracerFactory
+from .utils.profiler import TaskProfiler
+from .utils.timeline import TaskTimeline
+from .utils.trace_propagation import ON_COMPLETE_SPAN, TASK_SPAN, capture_context, continue_trace
+from .utils.trace_sampling import GRAPH_ATTRIBUTE
 
 
 class FlowManagerMP(FlowManagerABC):
@@ -42,6 +49,22 @@ class FlowManagerMP(FlowManagerABC):
             Enables an unpicklable on_complete to callable be used by setting serial_processing=True.  However, in most cases 
             changing on_complete to be picklable is straightforward and should be the default.
             Defaults to False.
+
+        failure_policy (str, optional): What happens to a task when one of its jobs raises.
+            "fail_fast" cancels the task's other running jobs and fails the task at once.
+            "continue" skips the failed job's successors, lets the other branches finish and returns
+            the tail result with the collected errors under result["ERRORS"].
+            Defaults to "fail_fast".
+
+        timeline (bool, optional): If True, each task's result holds the timestamps of the task and its
+            jobs under result["TIMELINE"], see TaskTimeline.to_dict(). Defaults to False.
+
+        on_timeline (Optional[Callable[[Dict[str, Any]], None]]): Called with the timeline of every task,
+            failed ones included, in the job executor process, so it must be picklable, e.g. a TimelineWriter.
+
+        profiling (Optional[Dict[str, Any]]): Profiles a fraction of tasks in the job executor process when
+            given, e.g. {"ratio": 0.1, "mode": "sample", "output_dir": "profiles"}, see TaskProfiler. Its
+            files are written to output_dir when the job executor finishes, see get_profile_stats().
     """
     _lock = mp.RLock()  # Lock for thread-safe initialization
     _instance = None  # Singleton instance
@@ -49,15 +72,22 @@ class FlowManagerMP(FlowManagerABC):
     JOB_MAP_LOAD_TIME = 5  # Timeout in seconds for job map loading
     EXECUTOR_SHUTDOWN_TIMEOUT = -1  # Timeout in seconds for executor shutdown
     RESULT_PROCESSOR_SHUTDOWN_TIMEOUT = -1  # Timeout in seconds for result processor shutdown
+    METRICS_PUBLISH_INTERVAL = 1.0  # Seconds between the job executor's snapshots of its metrics
 
     def __init__(self, dsl: Optional[Any] = None, on_complete: Optional[Callable[[Any], None]] = None, 
-                 serial_processing: bool = False):
+                 serial_processing: bool = False, failure_policy: str = JobABC.FAIL_FAST,
+                 timeline: bool = False, on_timeline: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 profiling: Optional[Dict[str, Any]] = None):
         super().__init__()
+        if failure_policy not in JobABC.FAILURE_POLICIES:
+            raise ValueError(f"failure_policy must be one of {JobABC.FAILURE_POLICIES}, got {failure_policy!r}")
         # Get logger for FlowManagerMP
         self.logger = logging.getLogger('FlowManagerMP')
         self.logger.info("Initializing FlowManagerMP")
         if not serial_processing and on_complete:
             self._check_picklable(on_complete)
+        if on_timeline:
+            self._check_picklable(on_timeline)
         # tasks are created by submit_task(), with [fq_name] added to the task dict
         # tasks are then sent to queue for processing
         self._task_queue: mp.Queue[Task] = mp.Queue()  
@@ -65,17 +95,28 @@ class FlowManagerMP(FlowManagerABC):
         # This queue is for internal communication between the job executor and result processor.
         # To process results, use the on_complete parameter in the FlowManagerMP constructor.
         # See test_result_processing.py for examples of proper result handling.
+        # (result, trace context) pairs from the job executor, then None when it has finished
         self._result_queue = mp.Queue()  # type: mp.Queue
         self.job_executor_process = None
         self.result_processor_process = None
         self.on_complete = on_complete
         self.serial_processing = serial_processing
+        self.failure_policy = failure_policy
+        self.timeline = timeline
+        self.on_timeline = on_timeline
+        # Validated here, the job executor process creates the profiler
+        TaskProfiler.from_config(profiling)
+        self.profiling = profiling
         
         # Create a manager for sharing objects between processes
         self._manager = mp.Manager()
         # !! This object allows us to pass the job name map between processes
         #     so we don't have to pickle the entire job map
         self._fq_name_map = self._manager.dict()
+        # Circuit breakers live in the job executor process, which publishes their state here
+        self._circuit_stats = self._manager.dict()
+        # As do the metrics of jobs and tasks, published every METRICS_PUBLISH_INTERVAL
+        self._metrics = self._manager.dict()
         # Create an event to signal when jobs are loaded
         self._jobs_loaded = mp.Event()
 
@@ -186,7 +227,9 @@ class FlowManagerMP(FlowManagerABC):
             target=self._async_worker,
             args=(self.job_graph_map, self._task_queue, self._result_queue, 
                   self._fq_name_map, self._jobs_loaded, ConfigLoader.directories,
-                  self.tasks_in_progress, self.tasks_completed, self.job_errors), # Pass counters
+                  self.tasks_in_progress, self.tasks_completed, self.job_errors, # Pass counters
+                  self.failure_policy, self._circuit_stats, self._metrics,
+                  self.timeline, self.on_timeline, self.profiling),
             name="JobExecutorProcess"
         )
         self.job_executor_process.start()
@@ -251,6 +294,7 @@ class FlowManagerMP(FlowManagerABC):
         job_name = self._fq_name_map.get(task_obj.get_fq_name())
         if job_name is None:
             raise ValueError(f"Job not found for fq_name: {task_obj.get_fq_name()}")
+        task_obj.trace_context = capture_context()
         self._task_queue.put(task_obj)
         with self.tasks_submitted.get_lock():
             self.tasks_submitted.value += 1
@@ -289,6 +333,19 @@ class FlowManagerMP(FlowManagerABC):
     # Instance methods can't be pickled properly for multiprocessing
     # TODO: it may be necessary to put a flag to execute this using asyncio event loops
     #          for example, when handing off to an async web service
+    @staticmethod
+    def _picklable_exception(e: Exception) -> Exception:
+        """Return e if it survives a pickle round trip, otherwise a RuntimeError describing it.
+
+        Some client exceptions, e.g. openai.APIStatusError, pickle but can't be unpickled
+        because of keyword-only constructor arguments, which would kill the result processor.
+        """
+        try:
+            pickle.loads(pickle.dumps(e))
+            return e
+        except Exception:
+            return RuntimeError(f"{type(e).__name__}: {e}")
+
     @staticmethod
     def _result_processor(on_complete: Callable[[Any], None], result_queue: 'mp.Queue', 
                           post_processing_counter: 'mp.Value'):
@@ -298,21 +355,23 @@ class FlowManagerMP(FlowManagerABC):
 
         while True:
             try:
-                result = result_queue.get()
-                if result is None:
+                item = result_queue.get()
+                if item is None:
                     logger.debug("Received completion signal from result queue")
                     break
+                result, trace_context = item
                 
                 with post_processing_counter.get_lock():
                     post_processing_counter.value += 1
                 
-                logger.debug(f"ResultProcessor received result: {result}")
+                logger.debug("ResultProcessor received result: %s", result)
                 try:
                     # Handle both dictionary and non-dictionary results
                     task_id = result.get('task', str(result)) if isinstance(result, dict) else str(result)
-                    logger.debug(f"Processing result for task {task_id}")
-                    on_complete(result)
-                    logger.debug(f"Finished processing result for task {task_id}")
+                    logger.debug("Processing result for task %s", task_id)
+                    with continue_trace(ON_COMPLETE_SPAN, trace_context, wait_attribute="flow4ai.task.result_queue_ms"):
+                        on_complete(result)
+                    logger.debug("Finished processing result for task %s", task_id)
                 except Exception as e:
                     logger.error(f"Error processing result: {e}")
                     logger.info("Detailed stack trace:", exc_info=True)
@@ -320,6 +379,8 @@ class FlowManagerMP(FlowManagerABC):
                 continue
 
         logger.debug("Result processor shutting down")
+        # The process exits without running atexit handlers, export the last spans now
+        TracerFactory.force_flush()
 
     def _close_running_processes(self, exception=None):
         """Close all running processes.
@@ -361,11 +422,12 @@ class FlowManagerMP(FlowManagerABC):
         while True:
             try:
                 self.logger.debug("Attempting to get result from queue")
-                result = self._result_queue.get(timeout=0.1)
-                if result is None:
+                item = self._result_queue.get(timeout=0.1)
+                if item is None:
                     self.logger.debug("Received completion signal (None) from result queue")
                     self.logger.info("No more results to process.")
                     break
+                result, trace_context = item
                 
                 with self.post_processing_tasks.get_lock():
                     self.post_processing_tasks.value += 1
@@ -374,9 +436,10 @@ class FlowManagerMP(FlowManagerABC):
                     try:
                         # Handle both dictionary and non-dictionary results
                         task_id = result.get('task', str(result)) if isinstance(result, dict) else str(result)
-                        self.logger.debug(f"Processing result for task {task_id}")
-                        self.on_complete(result)
-                        self.logger.debug(f"Finished processing result for task {task_id}")
+                        self.logger.debug("Processing result for task %s", task_id)
+                        with continue_trace(ON_COMPLETE_SPAN, trace_context, wait_attribute="flow4ai.task.result_queue_ms"):
+                            self.on_complete(result)
+                        self.logger.debug("Finished processing result for task %s", task_id)
                     except Exception as e:
                         self.logger.error(f"ERROR in on_complete callback: {e}")
                         import traceback
@@ -394,7 +457,7 @@ class FlowManagerMP(FlowManagerABC):
     def _replace_pydantic_models(data: Any) -> Any:
         """Recursively replace pydantic.BaseModel instances with their JSON dumps."""
         logger = logging.getLogger('FlowManagerMP')
-        logger.debug(f'Processing data type: {type(data)}')
+        logger.debug('Processing data type: %s', type(data))
 
         if isinstance(data, dict):
             return {k: FlowManagerMP._replace_pydantic_models(v) for k, v in data.items()}
@@ -413,7 +476,13 @@ class FlowManagerMP(FlowManagerABC):
                      directories: list[str] = [],
                      tasks_in_progress_counter: 'mp.Value' = None, 
                      tasks_completed_counter: 'mp.Value' = None,
-                     job_errors_counter: 'mp.Value' = None): # Added job_errors_counter
+                     job_errors_counter: 'mp.Value' = None, # Added job_errors_counter
+                     failure_policy: str = JobABC.FAIL_FAST,
+                     circuit_stats: 'mp.managers.DictProxy' = None,
+                     metrics: 'mp.managers.DictProxy' = None,
+                     record_timeline: bool = False,
+                     on_timeline: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     profiling: Optional[Dict[str, Any]] = None):
         """Process that handles making workflow calls using asyncio."""
         # Get logger for AsyncWorker
         logger = logging.getLogger('AsyncWorker')
@@ -435,42 +504,108 @@ class FlowManagerMP(FlowManagerABC):
         # Signal that jobs are loaded
         jobs_loaded.set()
 
+        all_jobs = [job for head_job in job_graph_map.values() for job in JobABC.job_set(head_job)]
+        breakers = {job.circuit_breaker for job in all_jobs if job.circuit_breaker is not None}
+        published_transitions = [-1]
+
+        # The registry was copied from the parent when forked, only this process's metrics are published
+        MetricsRegistry.default().reset()
+        flow_metrics = FlowMetrics.get()
+        metrics_published_at = [0.0]
+        profiler = TaskProfiler.from_config(profiling)
+
+        def publish_metrics(force: bool = False):
+            """Share a snapshot of this process's metrics with the parent process, at most every interval."""
+            now = time.monotonic()
+            if metrics is None or (not force and now - metrics_published_at[0] < FlowManagerMP.METRICS_PUBLISH_INTERVAL):
+                return
+            metrics_published_at[0] = now
+            metrics['snapshot'] = MetricsRegistry.default().snapshot()
+            metrics['loop'] = loop_monitor.stats()
+            if profiler is not None:
+                metrics['profile'] = profiler.stats()
+
+        def emit_timeline(timeline_dict: Dict[str, Any]):
+            """Pass a task's timeline to on_timeline, a failing callback doesn't fail the task."""
+            if on_timeline is None:
+                return
+            try:
+                on_timeline(timeline_dict)
+            except Exception as e:
+                logger.error(f"on_timeline failed: {e}")
+
+        def publish_circuit_stats():
+            """Share circuit breaker state with the parent process when a breaker changes state."""
+            if circuit_stats is None or not breakers:
+                return
+            transitions = sum(breaker.transitions for breaker in breakers)
+            if transitions != published_transitions[0]:
+                published_transitions[0] = transitions
+                circuit_stats.update(CircuitBreaker.collect_stats(all_jobs))
+
         async def process_task(task: Task):
             """Process a single task and return its result"""
             task_id = task.task_id  # task_id is not held in the dictionary itself i.e. NOT task['task_id']
-            logger.debug(f"[TASK_TRACK] Starting task {task_id}")
-            try:
-                # If there's only one job, use it directly
-                if len(job_graph_map) == 1:
-                    job = next(iter(job_graph_map.values()))
-                else:
-                    # Otherwise, get the job from the map using fq_name
-                    fq_name = task.get('fq_name')
-                    if not fq_name:
-                        raise ValueError("Task missing fq_name when multiple jobs are present")
-                    job = job_graph_map[fq_name]
-                job_set = JobABC.job_set(job) #TODO: create a map of job to jobset in _async_worker
-                async with job_graph_context_manager(job_set):
-                    result = await job._execute(task)
-                    processed_result = FlowManagerMP._replace_pydantic_models(result)
-                    logger.debug(f"[TASK_TRACK] Completed task {task_id}, returned by job {processed_result[JobABC.RETURN_JOB]}")
-                    
-                    if tasks_completed_counter:
-                        with tasks_completed_counter.get_lock():
-                            tasks_completed_counter.value += 1
-                    
-                    result_queue.put(processed_result)
-                    logger.debug(f"[TASK_TRACK] Result queued for task {task_id}")
-            except Exception as e:
-                logger.error(f"[TASK_TRACK] Failed task {task_id}: {e}")
-                logger.info("Detailed stack trace:", exc_info=True)
-                if job_errors_counter: # Increment job_errors_counter
-                    with job_errors_counter.get_lock():
-                        job_errors_counter.value += 1
-                # Put the exception in the result queue to propagate error details
-                result_queue.put(e)
-                logger.debug(f"[TASK_TRACK] Exception put in result queue for task {task_id}")
-                raise
+            # Records logged by the task carry its id, each task runs in its own asyncio task and context
+            logging.task_log_context.set((task_id, task.get('fq_name')))
+            logger.debug("[TASK_TRACK] Starting task %s", task_id)
+            # Continues the submitter's trace, the task's job spans nest in this span
+            span_attributes = {"flow4ai.task_id": task_id, GRAPH_ATTRIBUTE: task.get('fq_name') or ""}
+            flow_metrics.task_started(task.get('fq_name'), task.submitted_at)
+            context = {JobABC.FAILURE_POLICY: failure_policy}
+            timeline = None
+            if record_timeline or on_timeline:
+                timeline = context[JobABC.TIMELINE] = TaskTimeline.of_task(task)
+            error = None
+            profiled = False
+            with continue_trace(TASK_SPAN, task.trace_context, span_attributes, wait_attribute="flow4ai.task.queue_ms"):
+                try:
+                    # If there's only one job, use it directly
+                    if len(job_graph_map) == 1:
+                        job = next(iter(job_graph_map.values()))
+                    else:
+                        # Otherwise, get the job from the map using fq_name
+                        fq_name = task.get('fq_name')
+                        if not fq_name:
+                            raise ValueError("Task missing fq_name when multiple jobs are present")
+                        job = job_graph_map[fq_name]
+                    job_set = JobABC.job_set(job) #TODO: create a map of job to jobset in _async_worker
+                    profiled = profiler is not None and profiler.begin(task_id, task.get('fq_name') or job.name, job_set)
+                    async with job_graph_context_manager(job_set, context):
+                        result = JobABC.raise_if_task_failed(await job._execute(task))
+                        if timeline is not None:
+                            timeline_dict = timeline.finish()
+                            if record_timeline and isinstance(result, dict):
+                                result[JobABC.TIMELINE] = timeline_dict
+                            emit_timeline(timeline_dict)
+                        processed_result = FlowManagerMP._replace_pydantic_models(result)
+                        logger.debug("[TASK_TRACK] Completed task %s, returned by job %s", task_id, processed_result[JobABC.RETURN_JOB])
+                        
+                        if tasks_completed_counter:
+                            with tasks_completed_counter.get_lock():
+                                tasks_completed_counter.value += 1
+                        
+                        # Results travel with the trace context, for the result processor's spans
+                        result_queue.put((processed_result, capture_context()))
+                        logger.debug("[TASK_TRACK] Result queued for task %s", task_id)
+                except Exception as e:
+                    error = e
+                    if timeline is not None and timeline.finished is None:
+                        emit_timeline(timeline.finish(e))
+                    logger.error(f"[TASK_TRACK] Failed task {task_id}: {e}")
+                    logger.info("Detailed stack trace:", exc_info=True)
+                    if job_errors_counter: # Increment job_errors_counter
+                        with job_errors_counter.get_lock():
+                            job_errors_counter.value += 1
+                    # Put the exception in the result queue to propagate error details
+                    result_queue.put((FlowManagerMP._picklable_exception(e), capture_context()))
+                    logger.debug("[TASK_TRACK] Exception put in result queue for task %s", task_id)
+                    raise
+                finally:
+                    if profiled:
+                        profiler.end(task_id)
+                    flow_metrics.task_finished(task.get('fq_name'), task.submitted_at, error)
+                    publish_circuit_stats()
 
         async def queue_monitor():
             """Monitor the task queue and create tasks as they arrive"""
@@ -501,11 +636,11 @@ class FlowManagerMP(FlowManagerABC):
 
                 # Create tasks in batch if we have any pending
                 if pending_tasks:
-                    logger.debug(f"Creating {len(pending_tasks)} new tasks")
+                    logger.debug("Creating %d new tasks", len(pending_tasks))
                     new_tasks = {asyncio.create_task(process_task(pending_tasks[i])) for i in range(len(pending_tasks))}
                     tasks.update(new_tasks)
                     tasks_created += len(new_tasks)
-                    logger.debug(f"Total tasks created: {tasks_created}")
+                    logger.debug("Total tasks created: %d", tasks_created)
                     pending_tasks.clear()
 
                 # Clean up completed tasks
@@ -521,8 +656,8 @@ class FlowManagerMP(FlowManagerABC):
                         except asyncio.InvalidStateError:
                             pass  # Task was cancelled or not done
                     tasks_completed_local += len(done_tasks)
-                    logger.debug(f"Cleaned up {len(done_tasks)} completed tasks. Total completed locally: {tasks_completed_local}")
-                    logger.debug(f"Active tasks remaining: {len(tasks)}")
+                    logger.debug("Cleaned up %d completed tasks. Total completed locally: %d", len(done_tasks), tasks_completed_local)
+                    logger.debug("Active tasks remaining: %d", len(tasks))
                 tasks.difference_update(done_tasks)
 
                 # Log task stats periodically
@@ -530,6 +665,7 @@ class FlowManagerMP(FlowManagerABC):
                     if should_log_task_stats(queue_monitor, tasks_created, tasks_completed_local):
                         logger.info(f"Tasks stats - Created: {tasks_created}, Completed Locally: {tasks_completed_local}, Active: {len(tasks)}")
 
+                publish_metrics()
                 # A short pause to reduce CPU usage and avoid a busy-wait state.             
                 await asyncio.sleep(0.0001)
 
@@ -539,6 +675,17 @@ class FlowManagerMP(FlowManagerABC):
                 await asyncio.gather(*tasks)
                 logger.debug("All remaining tasks completed")
 
+            # Publish the final counters before signalling completion
+            published_transitions[0] = -1
+            publish_circuit_stats()
+            loop_monitor.stop()
+            if profiler is not None:
+                try:
+                    metrics['profile_files'] = profiler.write()
+                except OSError as e:
+                    logger.error(f"Failed to write the profile: {e}")
+            publish_metrics(force=True)
+
             # Signal completion
             logger.debug("Sending completion signal to result queue")
             logger.debug(f"Final stats - Created: {tasks_created}, Completed Locally: {tasks_completed_local}")
@@ -549,6 +696,7 @@ class FlowManagerMP(FlowManagerABC):
         logger.debug("Creating event loop")
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        loop_monitor = LoopLagMonitor(loop, "FlowManagerMP").start()
         try:
             logger.debug("Running queue monitor")
             loop.run_until_complete(queue_monitor())
@@ -558,7 +706,52 @@ class FlowManagerMP(FlowManagerABC):
             logger.info("Detailed stack trace:", exc_info=True)
         finally:
             logger.info("Closing event loop")
+            # Lets pooled clients close their connections, see LoopClientPool
+            loop.run_until_complete(loop.shutdown_asyncgens())
             loop.close()
+            # The process exits without running atexit handlers, export the last spans now
+            TracerFactory.force_flush()
+
+    def get_circuit_breaker_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the state of circuit breakers in the job executor process, as last published:
+            {'jobs': {job_name: stats}, 'groups': {group_name: stats}}
+        The worker publishes when a breaker changes state and when it finishes. See CircuitBreaker.stats().
+        """
+        stats = dict(self._circuit_stats)
+        return {'jobs': stats.get('jobs', {}), 'groups': stats.get('groups', {})}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns the snapshot of metrics last published by the job executor process, see
+        FlowMetrics and MetricsRegistry.snapshot(), with flow4ai_task_queue_depth, the tasks
+        submitted and not yet taken from the task queue. The job executor publishes every
+        METRICS_PUBLISH_INTERVAL and when it finishes.
+        """
+        snapshot = dict(self._metrics.get('snapshot') or MetricsRegistry().snapshot())
+        registry = MetricsRegistry()
+        registry.gauge("flow4ai_task_queue_depth", "Tasks submitted to FlowManagerMP and not yet dequeued").labels().set(
+            max(0, self.tasks_submitted.value - self.tasks_in_progress.value))
+        snapshot['metrics'] = snapshot['metrics'] + registry.snapshot()['metrics']
+        return snapshot
+
+    def get_loop_stats(self) -> Dict[str, Any]:
+        """
+        Returns the lag of the job executor's event loop and the slow callbacks that blocked it,
+        by job, as last published with get_metrics(), see LoopLagMonitor.stats(). Empty until
+        the job executor first publishes.
+        """
+        return dict(self._metrics.get('loop') or {})
+
+    def get_profile_stats(self) -> Dict[str, Any]:
+        """
+        Returns the profile of the tasks profiled in the job executor process per graph and job,
+        see TaskProfiler.stats(), as last published with get_metrics(), and under 'files' the
+        files written when it finished. {} without the profiling option.
+        """
+        if self.profiling is None:
+            return {}
+        return {**(self._metrics.get('profile') or {}), 'files': list(self._metrics.get('profile_files') or [])}
 
     def get_fq_names(self) -> list[str]:
         """
@@ -640,7 +833,10 @@ class FlowManagerMP(FlowManagerABC):
 
 
     @classmethod
-    def instance(cls, dsl=None, on_complete=None, serial_processing=False) -> 'FlowManagerMP':
+    def instance(cls, dsl=None, on_complete=None, serial_processing=False,
+                 failure_policy=JobABC.FAIL_FAST, timeline: bool = False,
+                 on_timeline: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 profiling: Optional[Dict[str, Any]] = None) -> 'FlowManagerMP':
         """
         Get or create the singleton instance of FlowManagerMP.
         
@@ -648,6 +844,11 @@ class FlowManagerMP(FlowManagerABC):
             dsl: A dictionary of job DSLs, a job DSL, a JobABC instance, or a collection of JobABC instances.
             on_complete: Code to handle results after the Job executes its task.
             serial_processing: Forces on_complete to execute only after all tasks are completed.
+            failure_policy: "fail_fast" cancels the rest of a task when a job raises, "continue"
+                skips the failed job's successors and returns the collected errors with the result.
+            timeline: If True, results hold the task's timeline, see __init__.
+            on_timeline: A picklable callback called with the timeline of every task, see __init__.
+            profiling: Profiles a fraction of tasks in the job executor process when given, see __init__.
             
         Returns:
             The singleton instance of FlowManagerMP
@@ -667,7 +868,8 @@ class FlowManagerMP(FlowManagerABC):
                             # We can safely ignore it as the method is already configured
                             pass
                     # Create the singleton instance
-                    cls._instance = cls(dsl, on_complete, serial_processing)
+                    cls._instance = cls(dsl, on_complete, serial_processing, failure_policy,
+                                        timeline, on_timeline, profiling)
         return cls._instance
     
     @classmethod
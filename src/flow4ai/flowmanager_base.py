@@ -427,6 +427,6 @@ class FlowManagerABC(ABC):
         # If fq_name is None and there's only one job graph in job_map, use that one
         if fq_name is None and len(job_map_to_use) == 1:
             fq_name = next(iter(job_map_to_use))
-            self.logger.debug(f"Using the only available job graph: {fq_name}")
+            self.logger.debug("Using the only available job graph: %s", fq_name)
 
         return fq_name
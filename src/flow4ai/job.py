@@ -1,12 +1,28 @@
 import asyncio
+import inspect
+import time
 import uuid
 from abc import ABC, ABCMeta, abstractmethod
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
 from contextvars import ContextVar
-from typing import Any, Dict, Optional, Type, Union
+from functools import partial, wraps
+from typing import Any, Awaitable, Callable, Dict, Optional, Type, Union
+
+from opentelemetry import context as otel_context
+from opentelemetry.trace import Status, StatusCode, set_span_in_context
 
 from . import f4a_logging as logging
-from .utils.otel_wrapper import trace_function
+from .job_stream import ResultStream
+from .utils.adaptive import AdaptiveLimiter
+from .utils.bulkhead import Bulkhead
+from .utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from .utils.hedging import HedgingPolicy
+from .utils.metrics import FlowMetrics
+from .utils.otel_wrapper import TracerFactory
+from .utils.retry import RetryPolicy
+from .utils.single_flight import SingleFlight, request_key
+from .utils.timeline import INPUTS_READY, RUN_START, START
+from .utils.trace_sampling import GRAPH_ATTRIBUTE
 
 SPLIT_STR = "$$"
 
@@ -30,6 +46,68 @@ def _mark_traced(method):
     return method
 
 
+# Short job names by job name, parsed once for span attributes
+_span_job_names: Dict[str, str] = {}
+
+
+def trace_job_execution(execute):
+    """
+    Wraps JobABC._execute in a span per job and task, which is current while the job runs
+    so the spans of successor jobs and traced calls nest in it.
+
+    Spans have cheap attributes: flow4ai.job (short job name), flow4ai.task_id, the task's
+    fq_name as flow4ai.graph on head jobs, and once the job has run flow4ai.job.outcome and
+    flow4ai.job.run_ms, the time spent in run including retries. Jobs with the trace
+    property set to False get no span. With detailed_job_trace set in the tracing config the task and the
+    job's fields are recorded too, only for spans that are sampled.
+    """
+    span_name = f"{execute.__module__}.{execute.__name__}"
+
+    @wraps(execute)
+    async def traced_execute(self, task: Union[Task, None]) -> Dict[str, Any]:
+        if not TracerFactory._enabled or not self.traced:
+            return await execute(self, task)
+        job_state = job_graph_context.get().get(self.name)
+        if job_state is not None and job_state.execution_started:
+            # A join job already waiting for its inputs, this call returns straight away
+            return await execute(self, task)
+        job_name = _span_job_names.get(self.name)
+        if job_name is None:
+            job_name = JobABC.parse_job_name(self.name)
+            job_name = _span_job_names[self.name] = self.name if job_name == "UNSUPPORTED NAME FORMAT" else job_name
+        source = task if task is not None else self.get_context().get(JobABC.TASK_PASSTHROUGH_KEY)
+        attributes = {"flow4ai.job": job_name}
+        task_id = getattr(source, 'task_id', None)
+        if task_id is not None:
+            attributes["flow4ai.task_id"] = task_id
+        if task is not None and task.get('fq_name'):
+            # Graph of the task's first span, for sampling by graph, see GraphSampler
+            attributes[GRAPH_ATTRIBUTE] = task['fq_name']
+        span = TracerFactory.get_tracer().start_span(span_name, attributes=attributes)
+        if TracerFactory.detailed_job_trace and span.is_recording():
+            span.set_attribute("function.args", str((self, source)))
+            span.set_attribute("object.fields", str(vars(self)))
+        # Attached by hand, start_as_current_span's context manager costs more than the span
+        context_token = otel_context.attach(set_span_in_context(span))
+        if job_state is not None:
+            job_state.span = span
+        try:
+            return await execute(self, task)
+        except BaseException as e:
+            if span.is_recording():
+                span.set_attribute("flow4ai.job.outcome", "cancelled" if isinstance(e, asyncio.CancelledError) else "error")
+                if isinstance(e, Exception):
+                    span.record_exception(e)
+                    span.set_status(Status(StatusCode.ERROR, f"{type(e).__name__}: {e}"))
+            raise
+        finally:
+            if job_state is not None:
+                job_state.span = None
+            otel_context.detach(context_token)
+            span.end()
+    return traced_execute
+
+
 def traced_job(cls: Type) -> Type:
     """
     Class decorator that ensures the execute method is traced.
@@ -37,7 +115,7 @@ def traced_job(cls: Type) -> Type:
     """
     if hasattr(cls, '_execute'):
         original_execute = cls._execute
-        traced_execute = trace_function(original_execute, detailed_trace=True)
+        traced_execute = trace_job_execution(original_execute)
         traced_execute = _mark_traced(traced_execute)
         # Store original as executeNoTrace
         cls.executeNoTrace = original_execute
@@ -84,6 +162,10 @@ class Task(dict):
         
         super().__init__(data)
         self.task_id:str = str(uuid.uuid4())
+        # Trace context of the submitter, carried to FlowManagerMP's job executor process
+        self.trace_context: Optional[Dict[str, str]] = None
+        # Seconds since the epoch, comparable across processes, for queue wait metrics
+        self.submitted_at: float = time.time()
         if fq_name is not None and self.get('fq_name') is None:
             self['fq_name'] = fq_name
 
@@ -109,19 +191,31 @@ class Task(dict):
 class JobState:
   def __init__(self):
       self.inputs: Dict[str, Dict[str, Any]] = {}
+      # Predecessors that were not selected by a router, see JobABC.select_next_jobs
+      self.skipped_inputs: set[str] = set()
       self.input_event = asyncio.Event()
       self.execution_started = False
+      # The span of the job's execution when traced, see trace_job_execution
+      self.span = None
 
 job_graph_context : ContextVar[dict] = ContextVar('job_graph_context')
 
 @asynccontextmanager
-async def job_graph_context_manager(job_set: set['JobABC']):
-  """Create a new context for job execution, with a new JobState."""
+async def job_graph_context_manager(job_set: set['JobABC'], context: Optional[Dict[str, Any]] = None):
+  """Create a new context for job execution, with a new JobState.
+
+  Args:
+      job_set: All the jobs in the job graph.
+      context: Optional values to seed the shared graph context with, e.g. the
+          JobABC.PARTIAL_RESULTS callback used to forward streamed chunks.
+  """
   new_state = {}
   for job in job_set:
       new_state[job.name] = JobState()
   new_state[JobABC.CONTEXT] = {}
   new_state[JobABC.CONTEXT][JobABC.SAVED_RESULTS] = {}
+  if context:
+      new_state[JobABC.CONTEXT].update(context)
   token = job_graph_context.set(new_state)
   try:
       yield new_state
@@ -142,6 +236,19 @@ class JobABC(ABC, metaclass=JobMeta):
     RETURN_JOB='RETURN_JOB'
     CONTEXT='CONTEXT'
     SAVED_RESULTS='SAVED_RESULTS'
+    # Context key for the callback receiving chunks from streaming jobs
+    PARTIAL_RESULTS='PARTIAL_RESULTS'
+    # Task failure policies, set in the context under FAILURE_POLICY:
+    #   FAIL_FAST cancels the rest of the task when a job raises,
+    #   CONTINUE records the error under ERRORS and skips the failed job's successors.
+    FAILURE_POLICY='FAILURE_POLICY'
+    FAIL_FAST='fail_fast'
+    CONTINUE='continue'
+    FAILURE_POLICIES=(FAIL_FAST, CONTINUE)
+    ERRORS='ERRORS'
+    TASK_FAILED='TASK_FAILED'
+    # Context key of the task's TaskTimeline when one is recorded, and result key of its dict
+    TIMELINE='TIMELINE'
 
     def __init__(self, name: Optional[str] = None, properties: Dict[str, Any] = {}):
         """
@@ -150,10 +257,25 @@ class JobABC(ABC, metaclass=JobMeta):
         Args:
             name (Optional[str], optional): Must be a unique identifier for this job within the context of a FlowManager.
                                             If not provided, a unique name will be auto-generated.
-            properties (Dict[str, Any], optional): configuration properties passed in by jobs.yaml
+            properties (Dict[str, Any], optional): configuration properties passed in by jobs.yaml,
+                                            including "save_result", "retry" (see RetryPolicy), and
+                                            "max_concurrency" and "concurrency_group" (see Bulkhead), and
+                                            "adaptive_concurrency" (see AdaptiveLimiter), "coalesce" (see SingleFlight)
+                                            "hedge" (see HedgingPolicy), "circuit_breaker" (see CircuitBreaker)
+                                            and "trace" (False for no span, see trace_job_execution)
         """
         self.name:str = self._getUniqueName() if name is None else name
         self.save_result: bool = bool(properties.get("save_result", False))
+        self.retry_policy: Optional[RetryPolicy] = RetryPolicy.from_config(properties.get("retry"))
+        self.bulkhead: Optional[Bulkhead] = Bulkhead.from_properties(self.name, properties)
+        self.adaptive_limiter: Optional[AdaptiveLimiter] = AdaptiveLimiter.from_config(
+            self.name, properties.get("adaptive_concurrency"))
+        self.single_flight: Optional[SingleFlight] = SingleFlight.from_config(properties.get("coalesce"))
+        self.hedging_policy: Optional[HedgingPolicy] = HedgingPolicy.from_config(properties.get("hedge"))
+        self.circuit_breaker: Optional[CircuitBreaker] = CircuitBreaker.from_config(
+            self.name, properties.get("circuit_breaker"))
+        self.circuit_fallback = CircuitBreaker.get_fallback(properties.get("circuit_breaker"))
+        self.traced: bool = bool(properties.get("trace", True))
         self.properties:Dict[str, Any] = properties
         self.expected_inputs:set[str] = set()
         self.next_jobs:list[JobABC] = [] 
@@ -161,6 +283,46 @@ class JobABC(ABC, metaclass=JobMeta):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.global_ctx = None
 
+    def update_properties(self, properties: Dict[str, Any]) -> None:
+        """
+        Merge extra properties into this job's properties, e.g. options given to job() in the DSL,
+        and apply the ones JobABC reads at construction.
+        """
+        self.properties = {**self.properties, **properties}
+        if "save_result" in properties:
+            self.save_result = bool(properties["save_result"])
+        if "retry" in properties:
+            self.retry_policy = RetryPolicy.from_config(properties["retry"])
+        if "max_concurrency" in properties or "concurrency_group" in properties:
+            self.bulkhead = Bulkhead.from_properties(self.name, self.properties)
+        if "adaptive_concurrency" in properties:
+            self.adaptive_limiter = AdaptiveLimiter.from_config(self.name, properties["adaptive_concurrency"])
+        if "coalesce" in properties:
+            self.single_flight = SingleFlight.from_config(properties["coalesce"])
+        if "hedge" in properties:
+            self.hedging_policy = HedgingPolicy.from_config(properties["hedge"])
+        if "circuit_breaker" in properties:
+            self.circuit_breaker = CircuitBreaker.from_config(self.name, properties["circuit_breaker"])
+            self.circuit_fallback = CircuitBreaker.get_fallback(properties["circuit_breaker"])
+        if "trace" in properties:
+            self.traced = bool(properties["trace"])
+
+    def get_concurrency_stats(self) -> Optional[Dict[str, Any]]:
+        """Returns the queue wait and concurrency metrics of this job's bulkhead, or None without a limit."""
+        return self.bulkhead.stats() if self.bulkhead is not None else None
+
+    def get_adaptive_concurrency_stats(self) -> Optional[Dict[str, Any]]:
+        """Returns the current limit and limit decisions of this job's adaptive limiter, or None without one."""
+        return self.adaptive_limiter.stats() if self.adaptive_limiter is not None else None
+
+    def get_hedging_stats(self) -> Optional[Dict[str, Any]]:
+        """Returns the hedge rate and latency metrics of this job's hedging policy, or None without one."""
+        return self.hedging_policy.stats() if self.hedging_policy is not None else None
+
+    def get_circuit_breaker_stats(self) -> Optional[Dict[str, Any]]:
+        """Returns the state and counters of this job's circuit breaker, or None without one."""
+        return self.circuit_breaker.stats() if self.circuit_breaker is not None else None
+
     def __or__(self, other):
         """Implements the | operator for parallel composition"""
         # Import DSL classes inline to avoid circular imports
@@ -169,7 +331,7 @@ class JobABC(ABC, metaclass=JobMeta):
 
         if isinstance(other, Parallel):
             # If right side is already a parallel component, add to its components
-            return Parallel(*([self] + other.components))
+            return Parallel(*([self] + list(other.components)))
         elif isinstance(other, JobABC):
             return Parallel(self, other)
         elif isinstance(other, Serial):
@@ -186,7 +348,7 @@ class JobABC(ABC, metaclass=JobMeta):
 
         if isinstance(other, Serial):
             # If right side is already a serial component, add to its components
-            return Serial(*([self] + other.components))
+            return Serial(*([self] + list(other.components)))
         elif isinstance(other, JobABC):
             return Serial(self, other)
         elif isinstance(other, Parallel):
@@ -355,6 +517,9 @@ class JobABC(ABC, metaclass=JobMeta):
         """
         job_state_dict:dict = job_graph_context.get()
         job_state = job_state_dict.get(self.name)
+        timeline = job_state_dict[JobABC.CONTEXT].get(JobABC.TIMELINE)
+        if timeline is not None and not self.expected_inputs:
+            timeline.mark(self.name, INPUTS_READY)
         if self.is_head_job() and  isinstance(task, dict):
             job_state.inputs.update(task)
             self.get_context()[JobABC.TASK_PASSTHROUGH_KEY] = task
@@ -377,72 +542,381 @@ class JobABC(ABC, metaclass=JobMeta):
                     f"Expected: {self.expected_inputs}, "
                     f"Received: {list(job_state.inputs.keys())}"
                 )
+            if self.get_context().get(JobABC.TASK_FAILED) is not None:
+                # Woken because another job failed the task, the error is raised by that job
+                job_state.execution_started = False
+                return None
+
+        if timeline is not None:
+            timeline.mark(self.name, START, self.expected_inputs)
+        run_started = time.perf_counter()
+        try:
+            result = await self._run_with_retry(task)
+        except Exception as e:
+            # An open circuit breaker with the skip fallback skips the job under either policy
+            skip = isinstance(e, CircuitOpenError) and e.skip
+            if not skip and self.get_context().get(JobABC.FAILURE_POLICY, JobABC.FAIL_FAST) != JobABC.CONTINUE:
+                self._record_run(job_state, "error", run_started, e)
+                self._wake_waiting_jobs(e)
+                raise
+            self._record_run(job_state, "skipped" if skip else "error", run_started, e)
+            self._record_error(e)
+            return await self._skip(self.get_task())
+        self._record_run(job_state, "completed", run_started)
+        self.logger.debug("Job %s finished running", self.name)
+
+        # Async generator results are streamed: successors start straight away and
+        # consume the chunks as they arrive, instead of waiting for the full result.
+        if ResultStream.is_stream_source(result):
+            result = ResultStream(result)
+        stream = result if isinstance(result, ResultStream) else None
+        if stream is not None:
+            stream.start(self.name, self._partial_result_callback())
+
+        try:
+            if self.save_result:
+                saved_results = self.get_context()[JobABC.SAVED_RESULTS]
+                saved_results[self.name] = result
+
+            if stream is None and not isinstance(result, dict):
+                result = {'result': result}
+
+            # Clear state for potential reuse
+            job_state.inputs.clear()
+            job_state.skipped_inputs.clear()
+            job_state.input_event.clear()
+            job_state.execution_started = False
+
+            # If this is a tail job, return immediately
+            if not self.next_jobs:
+                if stream is not None:
+                    result = await self._materialize_stream(stream)
+                # Streams returned by a tail job (e.g. via get_inputs()) are aggregated here
+                for key, value in result.items():
+                    if isinstance(value, ResultStream):
+                        result[key] = await value
+                # Store the job name that returns the result
+                result[JobABC.RETURN_JOB] = self.name
+                self.logger.debug("Tail Job %s returning result: %s", self.name, result)
+                task = self.get_context()[JobABC.TASK_PASSTHROUGH_KEY]
+                result[JobABC.TASK_PASSTHROUGH_KEY] = task
+                saved_results = self.get_context().get(JobABC.SAVED_RESULTS, {})
+                if saved_results:
+                    result[JobABC.SAVED_RESULTS] = {
+                        JobABC.parse_job_name(k): (await v) if isinstance(v, ResultStream) else v
+                        for k, v in saved_results.items()
+                    }
+                errors = self.get_context().get(JobABC.ERRORS)
+                if errors:
+                    result[JobABC.ERRORS] = list(errors)
+                return result
+
+            if stream is None:
+                # Store the job name that returns the result
+                result[JobABC.RETURN_JOB] = self.name
+
+            # Check if any child jobs are ready to execute once given this result as input
+            selected_jobs = self.select_next_jobs(result)
+            executing_jobs = []
+            for next_job in self.next_jobs:
+                if next_job in selected_jobs:
+                    # Streams are shared as-is, every successor gets its own cursor over the chunks
+                    input_data = result if stream is not None else result.copy()
+                    # add result data from this job as an input to the next job
+                    await next_job.receive_input(self.name, input_data)
+                else:
+                    await next_job.receive_skip(self.name)
+                # if the next job has all its inputs add coroutine to list to execute
+                if next_job._inputs_ready():
+                    the_task = self.get_task()
+                    executing_jobs.append(next_job._execute_or_skip(task=the_task))
+
+            # If there are any child jobs ready to execute, execute them, else return None 
+            if executing_jobs:
+                # await for all futures to return results
+                child_results = await self._gather_successors(executing_jobs)
+                not_none_results = [r for r in child_results if r is not None]
+                if not_none_results:
+                    # Return the first valid result.
+                    # The recursive nature of the algorithm means that results flow upwards, with the head job appearing
+                    # to return the result of the tail job, so returning the first valid result will return the tail job
+                    # result up the stack.
+                    first_valid_result = not_none_results[0]
+                    self.logger.debug("Job %s propagating first valid result: %s", self.name, first_valid_result)
+                    if stream is not None:
+                        await stream.wait()
+                    return first_valid_result
+
+            # Surface errors from a stream that no successor consumed to the end
+            if stream is not None:
+                await stream.wait()
+
+            # If no child jobs executed or no valid result found, return None
+            return None
+        except BaseException:
+            # The task failed or was cancelled, stop the stream instead of leaving it running
+            if stream is not None and not stream.done:
+                await stream.aclose()
+            raise
+
+    async def _run_with_retry(self, task: Union[Task, None],
+                              call: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """
+        Call run, re-running only this job according to its retry policy. Retries reuse
+        the inputs this job has already received, so upstream jobs are not recomputed.
+
+        Args:
+            task: The task passed to run, and to the circuit breaker's fallback.
+            call: Makes each attempt instead of run(task), e.g. for the items of a MapJob.
+        """
+        attempt = 1
+        while True:
+            try:
+                return await self._guarded_call(task, call)
+            except Exception as e:
+                if self.retry_policy is None or isinstance(e, CircuitOpenError) \
+                        or not self.retry_policy.should_retry(e, attempt):
+                    raise
+                delay = self.retry_policy.backoff(attempt)
+                self.logger.warning(f"Job {self.name} attempt {attempt}/{self.retry_policy.max_attempts} "
+                                    f"failed with {type(e).__name__}: {e}, retrying in {delay:.3f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _guarded_call(self, task: Union[Task, None],
+                            call: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """
+        Make one attempt through this job's circuit breaker, applying its fallback when
+        the breaker rejects the call.
+        """
+        if self.circuit_breaker is None:
+            return await self._limited_call(task, call)
+        try:
+            # Outermost, so an open breaker rejects calls without taking concurrency slots
+            return await self.circuit_breaker.call(lambda: self._limited_call(task, call))
+        except CircuitOpenError as e:
+            if callable(self.circuit_fallback):
+                result = self.circuit_fallback(task)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            e.skip = self.circuit_fallback == CircuitBreaker.SKIP
+            raise
+
+    async def _limited_call(self, task: Union[Task, None],
+                            call: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """Make one attempt, holding this job's concurrency slots for its duration."""
+        if call is None:
+            call = partial(self._call_run, task)
+        if self.bulkhead is None and self.adaptive_limiter is None:
+            return await call()
+        # Each attempt takes its own slots, so backoff doesn't hold one
+        async with AsyncExitStack() as slots:
+            if self.bulkhead is not None:
+                await slots.enter_async_context(self.bulkhead.slot())
+            if self.adaptive_limiter is not None:
+                # Innermost, so only the call itself is timed
+                await slots.enter_async_context(self.adaptive_limiter.slot())
+            return await call()
+
+    async def _coalesce(self, request: tuple, call) -> Any:
+        """
+        Await call(), sharing one in-flight call between concurrent identical requests when
+        this job has the coalesce property, see SingleFlight.
 
-        result = await self.run(task)
-        self.logger.debug(f"Job {self.name} finished running")
+        Args:
+            request: The parts that identify the request, hashed with request_key().
+            call: Returns an awaitable making the request.
+        """
+        if self.single_flight is None:
+            return await call()
+        return await self.single_flight.do(request_key(*request), call)
+
+    async def _hedge(self, call) -> Any:
+        """
+        Await call(), issuing a duplicate call if it is slow when this job has the hedge
+        property, see HedgingPolicy. call must be safe to repeat and to cancel.
+        """
+        if self.hedging_policy is None:
+            return await call()
+        return await self.hedging_policy.run(call)
+
+    async def _call_run(self, task: Union[Task, None]) -> Any:
+        timeline = self._timeline()
+        if timeline is not None:
+            # After any wait for concurrency slots, the first attempt's time is kept
+            timeline.mark(self.name, RUN_START, first=True)
+        result = self.run(task)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
 
-        if self.save_result:
-            saved_results = self.get_context()[JobABC.SAVED_RESULTS]
-            saved_results[self.name] = result
+    def select_next_jobs(self, result: Union[Dict[str, Any], ResultStream]) -> list['JobABC']:
+        """
+        Choose which of next_jobs receive this job's result, the others are skipped.
 
-        if not isinstance(result, dict):
-            result = {'result': result}
+        Override to route tasks, see RouterJob. A skipped job does not run, and is treated
+        as a satisfied input by join jobs, which run with the inputs of the jobs that did.
 
-        # Clear state for potential reuse
-        job_state.inputs.clear()
-        job_state.input_event.clear()
-        job_state.execution_started = False
+        Args:
+            result: The output of this job.
 
-        # Store the job name that returns the result
-        result[JobABC.RETURN_JOB] = self.name
+        Returns:
+            list[JobABC]: The successor jobs to execute, by default all of next_jobs.
+        """
+        return self.next_jobs
 
-        # If this is a tail job, return immediately
-        if not self.next_jobs:
-            self.logger.debug(f"Tail Job {self.name} returning result: {result}")
-            task = self.get_context()[JobABC.TASK_PASSTHROUGH_KEY]
-            result[JobABC.TASK_PASSTHROUGH_KEY] = task
-            saved_results = self.get_context().get(JobABC.SAVED_RESULTS, {})
-            if saved_results:
-                result[JobABC.SAVED_RESULTS] = {JobABC.parse_job_name(k): v for k, v in saved_results.items()}
-            return result
+    async def _execute_or_skip(self, task: Union[Task, None]) -> Optional[Dict[str, Any]]:
+        """Execute this job, or skip it if none of its predecessors selected it."""
+        if self._all_inputs_skipped():
+            return await self._skip(task)
+        return await self._execute(task=task)
+
+    async def _skip(self, task: Union[Task, None]) -> Optional[Dict[str, Any]]:
+        """
+        Skip this job and pass the skip on to its successors, executing any successor
+        that becomes ready because of it.
+
+        Returns:
+            Optional[Dict[str, Any]]: The tail result if a successor reaches the tail, else None.
+        """
+        self.logger.debug("Job %s skipped", self.name)
+        job_state = job_graph_context.get()[self.name]
+        job_state.inputs.clear()
+        job_state.skipped_inputs.clear()
+        job_state.input_event.clear()
 
-        # Check if any child jobs are ready to execute once given this result as input
         executing_jobs = []
         for next_job in self.next_jobs:
-            input_data = result.copy()
-            # add result data from this job as an input to the next job
-            await next_job.receive_input(self.name, input_data)
-            next_job_inputs = job_state_dict.get(next_job.name).inputs
-            # if the next job has all its inputs add coroutine to list to execute
-            if next_job.expected_inputs.issubset(set(next_job_inputs.keys())):
-                the_task = self.get_task()
-                executing_jobs.append(next_job._execute(task=the_task))
-
-        # If there are any child jobs ready to execute, execute them, else return None 
+            await next_job.receive_skip(self.name)
+            if next_job._inputs_ready():
+                executing_jobs.append(next_job._execute_or_skip(task=task))
         if executing_jobs:
-            # await for all futures to return results
-            child_results = await asyncio.gather(*executing_jobs)
+            child_results = await self._gather_successors(executing_jobs)
             not_none_results = [r for r in child_results if r is not None]
             if not_none_results:
-                # Return the first valid result.
-                # The recursive nature of the algorithm means that results flow upwards, with the head job appearing
-                # to return the result of the tail job, so returning the first valid result will return the tail job
-                # result up the stack.
-                first_valid_result = not_none_results[0]
-                self.logger.debug(f"Job {self.name} propagating first valid result: {first_valid_result}")
-                return first_valid_result
-
-        # If no child jobs executed or no valid result found, return None
+                return not_none_results[0]
         return None
 
+    async def _gather_successors(self, coroutines: list) -> list:
+        """
+        Run successor jobs concurrently and return their results in order.
+
+        If one of them raises, the others are cancelled and awaited before the error is
+        re-raised, so a failed task doesn't leave branches running in the background.
+        """
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for pending in tasks:
+                pending.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def _record_run(self, job_state: JobState, outcome: str, run_started: float,
+                    error: Optional[Exception] = None) -> None:
+        """
+        Record the outcome and run time of this job in metrics, in the task's timeline if one is
+        recorded and on its execution span, if it is traced.
+        """
+        run_ms = (time.perf_counter() - run_started) * 1000.0
+        FlowMetrics.get().job_run(self.name, run_ms, error)
+        timeline = self._timeline()
+        if timeline is not None:
+            timeline.end_job(self.name, outcome)
+        span = job_state.span
+        if span is not None and span.is_recording():
+            span.set_attributes({"flow4ai.job.outcome": outcome, "flow4ai.job.run_ms": run_ms})
+
+    def _wake_waiting_jobs(self, error: Exception) -> None:
+        """Mark the task as failed and wake any join job still waiting for its inputs."""
+        job_state_dict:dict = job_graph_context.get()
+        job_state_dict[JobABC.CONTEXT][JobABC.TASK_FAILED] = error
+        for job_state in job_state_dict.values():
+            if isinstance(job_state, JobState):
+                job_state.input_event.set()
+
+    def _record_error(self, error: Exception) -> None:
+        """Collect the error of a failed job when the task continues after failures."""
+        short_name = JobABC.parse_job_name(self.name)
+        if short_name == "UNSUPPORTED NAME FORMAT":
+            short_name = self.name
+        self.logger.error(f"Job {self.name} failed, continuing without it: {error}")
+        self.get_context().setdefault(JobABC.ERRORS, []).append({'job': short_name, 'error': error})
+
+    @classmethod
+    def raise_if_task_failed(cls, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the result of a task, or raises the first collected error if failures meant
+        that no tail job produced a result. Must be called within the task's job_graph_context.
+        """
+        if result is None:
+            errors = job_graph_context.get()[cls.CONTEXT].get(cls.ERRORS)
+            if errors:
+                raise errors[0]['error']
+        return result
+
+    def _partial_result_callback(self):
+        """Returns a callback forwarding streamed chunks to the submitter, or None if nobody listens."""
+        on_partial = self.get_context().get(JobABC.PARTIAL_RESULTS)
+        if on_partial is None:
+            return None
+        task = self.get_context().get(JobABC.TASK_PASSTHROUGH_KEY)
+        short_name = JobABC.parse_job_name(self.name)
+        if short_name == "UNSUPPORTED NAME FORMAT":
+            short_name = self.name
+
+        def forward(chunk):
+            on_partial({'job': short_name, 'chunk': chunk, JobABC.TASK_PASSTHROUGH_KEY: task})
+        return forward
+
+    async def _materialize_stream(self, stream: ResultStream) -> Dict[str, Any]:
+        """Wait for a stream to finish and convert its aggregated value into a result dict."""
+        aggregated = await stream
+        if isinstance(aggregated, dict):
+            return dict(aggregated)
+        return {'result': aggregated}
+
     async def receive_input(self, from_job: str, data: Dict[str, Any]) -> None:
         """Receive input from a predecessor job"""
         job_state_dict:dict = job_graph_context.get()
         job_state = job_state_dict.get(self.name)
         job_state.inputs[from_job] = data
-        if self.expected_inputs.issubset(set(job_state.inputs.keys())):
+        if self._inputs_ready():
+            self._mark_inputs_ready()
             job_state.input_event.set()
 
+    async def receive_skip(self, from_job: str) -> None:
+        """Record that a predecessor job was skipped, or did not select this job"""
+        job_state_dict:dict = job_graph_context.get()
+        job_state = job_state_dict.get(self.name)
+        job_state.skipped_inputs.add(from_job)
+        if self._inputs_ready():
+            self._mark_inputs_ready()
+            job_state.input_event.set()
+
+    def _timeline(self):
+        """The task's TaskTimeline if one is recorded, None also outside a job graph context."""
+        job_state_dict = job_graph_context.get(None)
+        return job_state_dict[JobABC.CONTEXT].get(JobABC.TIMELINE) if job_state_dict is not None else None
+
+    def _mark_inputs_ready(self) -> None:
+        """Record in the task's timeline, if one is recorded, that this job has all its inputs."""
+        timeline = self._timeline()
+        if timeline is not None:
+            timeline.mark(self.name, INPUTS_READY, self.expected_inputs)
+
+    def _inputs_ready(self) -> bool:
+        """True once every expected input has been received or skipped."""
+        job_state = job_graph_context.get()[self.name]
+        return self.expected_inputs.issubset(set(job_state.inputs.keys()) | job_state.skipped_inputs)
+
+    def _all_inputs_skipped(self) -> bool:
+        """True if this job has predecessors and all of them were skipped."""
+        job_state = job_graph_context.get()[self.name]
+        return bool(self.expected_inputs) and self.expected_inputs.issubset(job_state.skipped_inputs)
+
     def job_set_str(self) -> set[str]:
         """
         Returns a set of all unique job names in the job graph by recursively traversing
@@ -505,7 +979,7 @@ class JobABC(ABC, metaclass=JobMeta):
         """
         inputs: Dict[str, Dict[str, Any]] = self._get_long_name_inputs()
         inputs_with_short_job_name = {JobABC.parse_job_name(k): v for k, v in inputs.items()}
-        self.logger.debug(f"Returning inputs: {inputs_with_short_job_name}")
+        self.logger.debug("Returning inputs: %s", inputs_with_short_job_name)
         return inputs_with_short_job_name
 
     def get_task(self) -> Union[Dict[str, Any], Task]:
@@ -567,7 +1041,11 @@ class JobABC(ABC, metaclass=JobMeta):
 
     @abstractmethod
     async def run(self, task: Union[Dict[str, Any], Task]) -> Dict[str, Any]:
-        """Execute the job on the given task. Must be implemented by subclasses."""
+        """Execute the job on the given task. Must be implemented by subclasses.
+
+        May also be implemented as an async generator, in which case the yielded chunks are
+        streamed to successor jobs as a ResultStream (see flow4ai.job_stream).
+        """
         pass
 
 # SimpleJob and SimpleJobFactory have been moved to tests/test_utils/simple_job.py
@@ -329,7 +329,9 @@ class JobFactory:
         
         if len(tail_jobs) > 1:
             # Add a default tail node if there are multiple tail nodes
-            cls.add_default_tail(graph_definition, tail_jobs, job_instances, nodes)
+            default_tail_name = cls.add_default_tail(graph_definition, tail_jobs, job_instances, nodes)
+            # The default tail joins the old tail nodes, so it must wait for all of them
+            incoming_edges[default_tail_name] = set(tail_jobs)
 
         # 2) Set next_jobs for each node
         for job_name, config in graph_definition.items():
@@ -0,0 +1,160 @@
+"""
+Streaming results for jobs whose run method (or wrapped callable) is an async generator.
+
+A ResultStream is handed to successor jobs as soon as the producing job starts
+yielding, so they can consume chunks incrementally:
+
+    async def consume(j_ctx):
+        async for chunk in j_ctx["inputs"]["llm"]:
+            ...
+
+Every consumer gets its own cursor over the buffered chunks, so a stream can be
+fanned out to several successors. Consumers that only need the final value can
+simply await the stream, which returns the aggregated result.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+
+def default_aggregate(chunks: List[Any]) -> Any:
+    """Join string chunks into one string, otherwise return the list of chunks."""
+    if chunks and all(isinstance(chunk, str) for chunk in chunks):
+        return "".join(chunks)
+    return list(chunks)
+
+
+class ResultStream:
+    """
+    Buffered, multi-consumer view over an async iterator produced by a job.
+
+    Args:
+        source: The async iterator (usually an async generator) producing chunks.
+        aggregate: Converts the list of all chunks into the final result, used when the
+            stream is awaited and when the stream reaches a tail job. Defaults to
+            default_aggregate.
+    """
+
+    def __init__(self, source: AsyncIterator[Any],
+                 aggregate: Optional[Callable[[List[Any]], Any]] = None):
+        self._source = source
+        self._aggregate = aggregate or default_aggregate
+        self._chunks: List[Any] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._data_event: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self._on_chunk: Optional[Callable[[Any], None]] = None
+        self.job_name: Optional[str] = None
+
+    @classmethod
+    def is_stream_source(cls, obj: Any) -> bool:
+        """Check if a job result should be treated as a stream rather than a single value."""
+        return hasattr(obj, "__aiter__") and not isinstance(obj, (dict, ResultStream))
+
+    def start(self, job_name: Optional[str] = None,
+              on_chunk: Optional[Callable[[Any], None]] = None) -> 'ResultStream':
+        """
+        Start pulling chunks from the source in a background task. Idempotent.
+
+        Args:
+            job_name: The fully qualified name of the job that produced the stream.
+            on_chunk: Optional callback invoked with every chunk as it arrives.
+        """
+        if self._pump_task is None:
+            self.job_name = job_name
+            self._on_chunk = on_chunk
+            self._data_event = asyncio.Event()
+            self._pump_task = asyncio.ensure_future(self._pump())
+        return self
+
+    async def _pump(self) -> None:
+        try:
+            async for chunk in self._source:
+                self._chunks.append(chunk)
+                if self._on_chunk is not None:
+                    self._on_chunk(chunk)
+                self._notify()
+        except BaseException as e:
+            self._error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self._done = True
+            self._notify()
+
+    def _notify(self) -> None:
+        # Wake every consumer currently waiting, then arm a fresh event for the next chunk.
+        event = self._data_event
+        self._data_event = asyncio.Event()
+        event.set()
+
+    @property
+    def done(self) -> bool:
+        """True once the source is exhausted or has failed."""
+        return self._done
+
+    @property
+    def chunks(self) -> List[Any]:
+        """A copy of the chunks received so far."""
+        return list(self._chunks)
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Any]:
+        self.start()
+        index = 0
+        while True:
+            if index < len(self._chunks):
+                chunk = self._chunks[index]
+                index += 1
+                yield chunk
+            elif self._done:
+                if self._error is not None:
+                    raise self._error
+                return
+            else:
+                await self._data_event.wait()
+
+    async def wait(self) -> None:
+        """Wait until the source is exhausted, re-raising any error it produced."""
+        self.start()
+        if not self._done:
+            try:
+                await asyncio.shield(self._pump_task)
+            except asyncio.CancelledError:
+                if not self._done:
+                    raise
+        if self._error is not None:
+            raise self._error
+
+    async def result(self) -> Any:
+        """Wait for the stream to finish and return the aggregated result."""
+        await self.wait()
+        return self._aggregate(list(self._chunks))
+
+    async def aclose(self) -> None:
+        """
+        Stop pulling chunks and close the source, e.g. because the task failed, so an LLM
+        call isn't left streaming in the background. Consumers get a CancelledError.
+        """
+        if self._pump_task is not None and not self._pump_task.done():
+            self._pump_task.cancel()
+            await asyncio.gather(self._pump_task, return_exceptions=True)
+        if not self._done:
+            # Cancelled before it started pulling
+            self._error = asyncio.CancelledError()
+            self._done = True
+            if self._data_event is not None:
+                self._notify()
+        close = getattr(self._source, "aclose", None)
+        if close is not None:
+            await close()
+
+    def __await__(self):
+        return self.result().__await__()
+
+    def __repr__(self) -> str:
+        state = "done" if self._done else "streaming"
+        return f"ResultStream(job={self.job_name}, chunks={len(self._chunks)}, {state})"
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Callable, Dict, Union
+
+from flow4ai import f4a_logging as logging
+from flow4ai.job import JobABC, Task
+from flow4ai.jobs.wrapping_job import WrappingJob
+from flow4ai.utils.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingJob(WrappingJob):
+    """
+    Wraps a list-accepting function so that the inputs of concurrently running tasks are
+    coalesced into a single call, and each task gets back its own output.
+
+    Created with the batch_size/max_wait_ms options of the job() DSL function, e.g.:
+
+        workflow = job(chunk=chunk_text) >> job(embed=embed_batch, batch_size=64, max_wait_ms=20)
+
+    where embed_batch(items: list) returns a list with one result per item, in the same order.
+    A sync function runs in a thread, so batches don't block the event loop. Batched calls are
+    neither coalesced nor hedged, job() rejects those options together with batch_size.
+
+    The item a task contributes to the batch is taken from this job's task parameters:
+    a single positional argument is used as is, keyword parameters are passed as a dict.
+    Without parameters the item is the output of the single predecessor job, or a dict of
+    predecessor outputs keyed by job name when there is more than one predecessor.
+    """
+
+    def __init__(
+        self,
+        callable_obj: Callable,
+        name: str = None,
+        batch_size: int = 64,
+        max_wait_ms: float = 20.0,
+        properties: Dict[str, Any] = {}
+    ):
+        """
+        Args:
+            callable_obj: The function taking a list of items and returning a list of results
+            name: Identifier for this callable in parameter dictionaries
+            batch_size: Flush a batch as soon as it holds this many items
+            max_wait_ms: Flush a partial batch this long after its first item arrived
+            properties: Job properties, e.g. {"retry": {...}} from the options of job()
+
+        Raises:
+            TypeError: If callable_obj is not actually callable
+            ValueError: If batch_size is less than 1 or max_wait_ms is negative
+        """
+        super().__init__(callable_obj, name, properties)
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        if max_wait_ms < 0:
+            raise ValueError(f"max_wait_ms must not be negative, got {max_wait_ms}")
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self._init_batchers()
+
+    def _init_batchers(self) -> None:
+        # One batcher per event loop, FlowManager instances each run their own loop
+        self._batchers = weakref.WeakKeyDictionary()
+        self._batchers_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_batchers']
+        del state['_batchers_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_batchers()
+
+    async def run(self, task: Union[Dict[str, Any], Task]) -> Any:
+        """
+        Submit this task's item to the current batch and wait for its result.
+
+        Returns:
+            The result of the batch function for this task's item.
+        """
+        item = self._get_item(task)
+        return await self._get_batcher().submit(item)
+
+    def _get_batcher(self) -> MicroBatcher:
+        loop = asyncio.get_running_loop()
+        with self._batchers_lock:
+            batcher = self._batchers.get(loop)
+            if batcher is None:
+                batcher = MicroBatcher(self.callable, self.batch_size, self.max_wait_ms)
+                self._batchers[loop] = batcher
+            return batcher
+
+    def _get_item(self, task: Union[Dict[str, Any], Task]) -> Any:
+        params = task if task else self.get_task()
+        params = self._process_shorthand_params(params)
+        parsed_name = JobABC.parse_job_name(self.name)
+        short_name = self.name if parsed_name == "UNSUPPORTED NAME FORMAT" else parsed_name
+
+        if short_name in params:
+            callable_params = self._create_callable_params(params[short_name])
+            args, kwargs = callable_params["args"], callable_params["kwargs"]
+            if len(args) == 1 and not kwargs:
+                return args[0]
+            if kwargs and not args:
+                return kwargs
+            raise ValueError(f"Batching job '{short_name}' needs a single positional argument "
+                             f"or keyword parameters, got args={args}, kwargs={kwargs}")
+
+        # Only predecessor outputs, a non-head job's own entry in its inputs is the task
+        inputs = {JobABC.parse_job_name(k): v for k, v in self._get_long_name_inputs().items()
+                  if k in self.expected_inputs}
+        if len(inputs) == 1:
+            return next(iter(inputs.values()))
+        if inputs:
+            return inputs
+        raise ValueError(f"No parameters or inputs found for batching job '{short_name}'")
+
+    def get_batch_stats(self) -> Dict[str, Any]:
+        """
+        Returns batching metrics combined over every event loop this job has run on:
+            batches, items, size_flushes, timeout_flushes, avg_batch_size,
+            fill_ratio (average batch size / batch_size), avg_wait_ms and max_wait_ms.
+        """
+        with self._batchers_lock:
+            all_stats = [batcher.stats() for batcher in self._batchers.values()]
+        batches = sum(s['batches'] for s in all_stats)
+        items = sum(s['items'] for s in all_stats)
+        avg_batch_size = items / batches if batches else 0.0
+        return {
+            'batches': batches,
+            'items': items,
+            'size_flushes': sum(s['size_flushes'] for s in all_stats),
+            'timeout_flushes': sum(s['timeout_flushes'] for s in all_stats),
+            'avg_batch_size': avg_batch_size,
+            'fill_ratio': avg_batch_size / self.batch_size,
+            'avg_wait_ms': (sum(s['avg_wait_ms'] * s['items'] for s in all_stats) / items) if items else 0.0,
+            'max_wait_ms': max((s['max_wait_ms'] for s in all_stats), default=0.0),
+        }
@@ -20,5 +20,9 @@ class DefaultTailJob(JobABC):
     async def run(self, task: Union[Dict[str, Any], Task]) -> Dict[str, Any]:
         """Run a simple job that logs and returns the task."""
         logger.info(f"Default tail JOB for {task}")
-        inputs_with_short_job_name = self.get_inputs()
+        # Only the outputs of the joined tail jobs, not this job's own copy of the task
+        inputs_with_short_job_name = {
+            JobABC.parse_job_name(k): v for k, v in self._get_long_name_inputs().items()
+            if k in self.expected_inputs
+        }
         return inputs_with_short_job_name
\ No newline at end of file
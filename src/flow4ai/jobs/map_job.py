@@ -0,0 +1,148 @@
+import asyncio
+import inspect
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from flow4ai import f4a_logging as logging
+from flow4ai.job import JobABC, Task
+from flow4ai.job_stream import ResultStream
+from flow4ai.jobs.wrapping_job import WrappingJob
+
+logger = logging.getLogger(__name__)
+
+
+class MapJob(JobABC):
+    """
+    Fans a job out over a list of items that is only known at runtime and gathers the
+    results, in item order, into a single list for the next job.
+
+    Created with the map_over() DSL function, e.g.:
+
+        workflow = job(chunk=chunk_text) >> map_over(job(embed=embed_chunk), "chunks", max_concurrency=16) >> job(index=index)
+
+    The list of items is looked up under items_key in the outputs of the predecessor jobs,
+    then in this job's task parameters, then at the top level of the task. Each item is passed
+    as the single argument to the mapped callable (or as the task to a mapped JobABC's run method).
+
+    Each item is one call of a mapped job, with the job's retry, circuit breaker, concurrency,
+    coalescing and hedging properties, and the map job gets no span if the mapped job has
+    trace set to False. Unlike in a WrappingJob, sync functions run in a thread, so items run
+    concurrently without blocking the event loop, and can be hedged. Streamed results, from
+    async generators or a ResultStream, are consumed and each item gets their aggregate.
+    """
+
+    def __init__(
+        self,
+        mapped: Union[Callable, JobABC],
+        items_key: str,
+        max_concurrency: Optional[int] = None,
+        name: Optional[str] = None
+    ):
+        """
+        Args:
+            mapped: The function or JobABC instance to apply to each item.
+            items_key: The key holding the list of items to map over.
+            max_concurrency: Maximum number of items processed at once within a single task.
+                None means all items are processed concurrently.
+            name: Identifier for this job, defaults to the name of a mapped JobABC.
+
+        Raises:
+            TypeError: If mapped is neither a JobABC nor a callable
+            ValueError: If max_concurrency is less than 1
+        """
+        if not isinstance(mapped, JobABC) and not callable(mapped):
+            raise TypeError(f"map_over can only map a job or a callable, error due to {type(mapped).__name__}")
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        if name is None and isinstance(mapped, JobABC):
+            name = mapped.name
+        super().__init__(name)
+        self.mapped = mapped
+        self.items_key = items_key
+        self.max_concurrency = max_concurrency
+        if isinstance(mapped, JobABC):
+            self.traced = mapped.traced
+
+    async def run(self, task: Union[Dict[str, Any], Task]) -> List[Any]:
+        """
+        Apply the mapped job to every item and return the results in item order.
+
+        Returns:
+            List[Any]: One result per item, wrapped by the engine as {'result': [...]}.
+        """
+        items = self._find_items(task)
+        if not items:
+            return []
+
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+
+        async def run_item(item):
+            if semaphore is None:
+                return await self._apply(item)
+            async with semaphore:
+                return await self._apply(item)
+
+        pending = [asyncio.ensure_future(run_item(item)) for item in items]
+        try:
+            return await asyncio.gather(*pending)
+        except BaseException:
+            # Fail fast: don't leave the remaining items running after the first failure
+            for future in pending:
+                future.cancel()
+            # Let the cancelled items finish their cleanup before the task fails
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+    async def _apply(self, item: Any) -> Any:
+        if isinstance(self.mapped, JobABC):
+            # Retries, the circuit breaker and concurrency slots apply to each item
+            return await self.mapped._run_with_retry(item, partial(self._call_mapped, item))
+        return await self._call(self.mapped, item)
+
+    async def _call_mapped(self, item: Any) -> Any:
+        mapped = self.mapped
+        if not isinstance(mapped, WrappingJob):
+            return await self._call(mapped.run, item)
+        if inspect.isasyncgenfunction(mapped.callable):
+            return await self._call(mapped.callable, item)
+        if inspect.iscoroutinefunction(mapped.callable):
+            # Coalesced and hedged like the job's own calls
+            return await mapped._execute_callable([item], {})
+        # A hedge can't cancel the slower thread, which finishes in the background
+        request = (id(mapped.callable), [item], {})
+        return await mapped._coalesce(request, partial(mapped._hedge, partial(self._call, mapped.callable, item)))
+
+    @staticmethod
+    async def _call(fn: Callable, item: Any) -> Any:
+        if inspect.iscoroutinefunction(fn) or inspect.isasyncgenfunction(fn):
+            result = fn(item)
+        else:
+            result = await asyncio.to_thread(fn, item)
+        # Streamed results are consumed, an item's result is the aggregate of its chunks
+        if ResultStream.is_stream_source(result):
+            result = ResultStream(result)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _find_items(self, task: Union[Dict[str, Any], Task]) -> List[Any]:
+        """Look up the items in predecessor outputs, then this job's params, then the task."""
+        for output in self.get_inputs().values():
+            if isinstance(output, dict) and self.items_key in output:
+                return self._as_list(output[self.items_key])
+
+        params = self.get_params()
+        if isinstance(params, dict) and self.items_key in params:
+            return self._as_list(params[self.items_key])
+
+        task = task if task else self.get_task()
+        if isinstance(task, dict) and self.items_key in task:
+            return self._as_list(task[self.items_key])
+
+        raise ValueError(f"No items found under '{self.items_key}' for map job '{self.name}'")
+
+    def _as_list(self, items: Any) -> List[Any]:
+        if isinstance(items, (str, bytes, dict)) or not hasattr(items, "__iter__"):
+            raise TypeError(f"Items under '{self.items_key}' for map job '{self.name}' must be a list, "
+                            f"got {type(items).__name__}")
+        return list(items)
@@ -2,36 +2,49 @@ import os
 import warnings
 from typing import Any, Dict, Optional, Union
 
-from aiolimiter import AsyncLimiter
-from openai import AsyncOpenAI
+from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAsyncHttpxClient
 
 from flow4ai.f4a_logging import logging
 from flow4ai.job import JobABC
 from flow4ai.job_loader import JobFactory
+from flow4ai.job_stream import ResultStream
 from flow4ai.utils.api_utils import get_api_key
+from flow4ai.utils.client_pool import LoopClientPool
 from flow4ai.utils.llm_utils import clean_prompt
+from flow4ai.utils.rate_limit import TokenRateLimiter, estimate_tokens
 
 logger = logging.getLogger("OpenAIJob")
 
+def _create_client(params: Dict[str, Any]) -> AsyncOpenAI:
+    # HTTP connection pool limits, defaulting to the OpenAI client's own
+    limits = params.pop("connection_limits", None)
+    if limits and "http_client" not in params:
+        defaults = DEFAULT_CONNECTION_LIMITS
+        params["http_client"] = DefaultAsyncHttpxClient(limits=type(defaults)(
+            max_connections=limits.get("max_connections", defaults.max_connections),
+            max_keepalive_connections=limits.get("max_keepalive_connections", defaults.max_keepalive_connections),
+            keepalive_expiry=limits.get("keepalive_expiry", defaults.keepalive_expiry)))
+
+    # Get API key using our utility function
+    api_key = get_api_key(params, key_name='OPENAI_API_KEY')
+
+    # Create client with remaining params
+    client = AsyncOpenAI(api_key=api_key, **params)
+    logger.info(f"Created client with base_url: {params.get('base_url', 'default')}")
+    return client
+
+
 class OpenAIClient:
     """
-    Singleton class for AsyncOpenAI client.
+    AsyncOpenAI clients pooled per event loop and client params, see LoopClientPool.
+    Jobs with the same client params share a client, and its HTTP connections, within a loop.
     """
-    _client = None
+    pool = LoopClientPool("openai", _create_client)
 
     @classmethod
-    def get_client(cls, params: Dict[str, Any] = None):
-        if cls._client is None:
-            # Initialize params if None
-            params = params or {}
-            
-            # Get API key using our utility function
-            api_key = get_api_key(params, key_name='OPENAI_API_KEY')
-            
-            # Create client with remaining params
-            cls._client = AsyncOpenAI(api_key=api_key, **params)
-            logger.info(f"Created client with base_url: {params.get('base_url', 'default')}")
-        return cls._client
+    def get_client(cls, params: Dict[str, Any] = None) -> AsyncOpenAI:
+        """Returns the client for params in the running event loop, creating it on first use."""
+        return cls.pool.get(params)
 
 class OpenAIJob(JobABC):
     """
@@ -41,12 +54,12 @@ class OpenAIJob(JobABC):
         for recommended patterns.
     """
 
-    # Shared AsyncLimiter for all jobs, default to 5,000 requests per minute
+    # Limiter shared by all jobs with the same rate_limit, default to 5,000 requests per minute
     default_rate_limit = {"max_rate": 5000, "time_period": 60}
 
     def __init__(self, name: Optional[str] = None, properties: Dict[str, Any] = {}):
         """
-        Initialize an OpenAIJob instance with a properties dict containing three top-level keys, client, api, and rate_limit.
+        Initialize an OpenAIJob instance with a properties dict containing the top-level keys client, api, rate_limit and retry.
         All properties are optional.
 
         Args:
@@ -58,9 +71,35 @@ class OpenAIJob(JobABC):
             properties (Dict[str, Any], optional): Optional properties for the job. A dictionary containing the following keys:
 
             {
+                retry: {
+                    max_attempts, initial_backoff, max_backoff, multiplier, jitter and retry_on,
+                    see flow4ai.utils.retry.RetryPolicy. When set, API errors are raised and retried
+                    by the engine instead of being returned as {"error": str(e)}.
+                },
+                hedge: {
+                    percentile, max_hedge_rate, min_samples, window and initial_delay_ms, see
+                    flow4ai.utils.hedging.HedgingPolicy. Calls slower than the percentile of observed
+                    latencies are sent again and the first response is used.
+                },
+                circuit_breaker: {
+                    group, failure_rate_threshold, min_calls, window, open_seconds, half_open_calls, failure_on
+                    and fallback, see flow4ai.utils.circuit_breaker.CircuitBreaker. Without a group, OpenAIJobs
+                    calling the same base_url share one breaker. As with retry, API errors are raised.
+                },
+                coalesce: true or a group name. Concurrent identical requests share one API call,
+                    see flow4ai.utils.single_flight.SingleFlight.
+                adaptive_concurrency: {
+                    initial_limit, min_limit, max_limit, increase, backoff_ratio, latency_threshold_ms,
+                    latency_tolerance and backoff_on, see flow4ai.utils.adaptive.AdaptiveLimiter. Concurrent
+                    calls adapt to errors, 429s and latency, and as with retry, API errors are raised.
+                },
                 rate_limit: {
                     max_rate: Allow up to max_rate / time_period acquisitions before blocking.
                     time_period: duration of the time period in which to limit the rate. Note that up to max_rate acquisitions are allowed within this time period in a burst
+                    max_token_rate: Allow up to max_token_rate tokens / time_period, e.g. the provider's tokens per minute.
+                        Prompt tokens are estimated before each call and reconciled with the usage the API returns.
+                    All OpenAIJobs with the same rate_limit share one budget, also across FlowManagerMP processes,
+                    see flow4ai.utils.rate_limit.TokenRateLimiter
                 },
                 client: {
                     api_key: str | None = None,
@@ -73,7 +112,10 @@ class OpenAIJob(JobABC):
                     default_headers: Mapping[str, str] | None = None,
                     default_query: Mapping[str, object] | None = None,
                     http_client: AsyncClient | None = None,
-                    _strict_response_validation: bool = False
+                    _strict_response_validation: bool = False,
+                    connection_limits: {max_connections, max_keepalive_connections, keepalive_expiry}
+                        HTTP connection pool limits and keep-alive seconds, unless http_client is given.
+                    Clients are pooled per event loop and client params, see OpenAIClient.
                 },
                 api: {
                     messages: Iterable[ChatCompletionMessageParam],
@@ -98,7 +140,8 @@ class OpenAIJob(JobABC):
                     service_tier: NotGiven | Literal['auto', 'default'] | None = NOT_GIVEN,
                     stop: str | List[str] | NotGiven | None = NOT_GIVEN,
                     store: bool | NotGiven | None = NOT_GIVEN,
-                    stream: NotGiven | Literal[False] | None = NOT_GIVEN,
+                    stream: bool | NotGiven | None = NOT_GIVEN,
+                        When true, run returns a ResultStream of content chunks, see _open_stream.
                     stream_options: ChatCompletionStreamOptionsParam | NotGiven | None = NOT_GIVEN,
                     temperature: float | NotGiven | None = NOT_GIVEN,
                     tool_choice: ChatCompletionToolChoiceOptionParam | NotGiven = NOT_GIVEN,
@@ -115,22 +158,28 @@ class OpenAIJob(JobABC):
         """
         super().__init__(name, properties)
         
-        # Defer client initialization until first use
+        # Set to use a specific client, otherwise the OpenAIClient pool provides one per event loop
         self.client = None
         self._client_params = self.properties.get("client", {})
         
         # Rate limiter configuration
         rate_limit_config = self.properties.get("rate_limit", self.default_rate_limit)
-        self.limiter = AsyncLimiter(**rate_limit_config)
+        self.limiter = TokenRateLimiter.get_shared(**rate_limit_config)
+
+        # OpenAIJobs calling the same API share one circuit breaker unless a group is named
+        breaker_config = self.properties.get("circuit_breaker")
+        if isinstance(breaker_config, dict) and breaker_config.get("group") is None:
+            base_url = self._client_params.get("base_url") or "default"
+            self.update_properties({"circuit_breaker": {**breaker_config, "group": f"openai:{base_url}"}})
 
         # Extract other relevant properties for OpenAI client
         self.api_properties = self.properties.get("api", {})
     
-    def _ensure_client(self):
-        """Lazily initialize the OpenAI client on first use."""
-        if self.client is None:
-            self.client = OpenAIClient.get_client(self._client_params)
-        return self.client
+    def _ensure_client(self) -> AsyncOpenAI:
+        """Returns the client assigned to the job, or the pooled client for the running event loop."""
+        if self.client is not None:
+            return self.client
+        return OpenAIClient.get_client(self._client_params)
 
     async def run(self, task: Union[Dict[str, Any], Any]) -> Dict[str, Any]:
         """
@@ -171,27 +220,82 @@ class OpenAIJob(JobABC):
         # Ensure client is initialized before use
         client = self._ensure_client()
         
+        try:
+            if request_properties.get("stream"):
+                return await self._open_stream(client, request_properties)
+            # Identical concurrent requests through the same client share one API call when the
+            # coalesce property is set, and slow calls are duplicated when the hedge property is set.
+            # Clients differ by credentials and headers, not just base_url, so requests of jobs with
+            # other client params never share a call. The in-flight call keeps the client, and its id, alive.
+            return await self._coalesce((id(client), request_properties),
+                                        lambda: self._hedge(lambda: self._request(client, request_properties)))
+        except Exception as e:
+            if self.retry_policy is not None or self.adaptive_limiter is not None or self.circuit_breaker is not None:
+                # Raise so the engine can retry, adapt the limit and trip the breaker,
+                # errors are only returned when none of these are set
+                raise
+            logger.error(f"Error in {self.name}: {e}")
+            return {"error": str(e)}
+
+    async def _request(self, client: AsyncOpenAI, request_properties: Dict[str, Any]) -> Any:
+        """Make one rate limited API call and return the parsed model or {"response": content}."""
         # Acquire the rate limiter before making the request
-        async with self.limiter:
-            try:
-                logger.info(f"{self.name} is making an OpenAI API call.")
-                if "response_format" in request_properties:
-                    response = await client.beta.chat.completions.parse(**request_properties)
-                else:
-                    response = await client.chat.completions.create(**request_properties)
-                logger.info(f"{self.name} received a response.")
-                
-                # Handle the response
-                if hasattr(response, 'choices') and response.choices:
-                    if "response_format" in request_properties:
-                        return response.choices[0].message.parsed
-                    else:
-                        return {"response": response.choices[0].message.content}
-                else:
-                    return {"error": "No valid response content found"}
-            except Exception as e:
-                logger.error(f"Error in {self.name}: {e}")
-                return {"error": str(e)}
+        estimated_tokens = estimate_tokens(request_properties)
+        await self.limiter.acquire(estimated_tokens)
+        logger.info(f"{self.name} is making an OpenAI API call.")
+        if "response_format" in request_properties:
+            response = await client.beta.chat.completions.parse(**request_properties)
+        else:
+            response = await client.chat.completions.create(**request_properties)
+        logger.info(f"{self.name} received a response.")
+
+        # Replace the estimate with the tokens the API counted, failed calls keep the estimate
+        usage = getattr(response, 'usage', None)
+        if usage is not None and getattr(usage, 'total_tokens', None) is not None:
+            self.limiter.reconcile(estimated_tokens, usage.total_tokens)
+
+        # Handle the response
+        if hasattr(response, 'choices') and response.choices:
+            if "response_format" in request_properties:
+                return response.choices[0].message.parsed
+            else:
+                return {"response": response.choices[0].message.content}
+        else:
+            return {"error": "No valid response content found"}
+
+    async def _open_stream(self, client: AsyncOpenAI, request_properties: Dict[str, Any]) -> ResultStream:
+        """
+        Start a streaming API call and return a ResultStream of its content chunks.
+
+        Successors can consume the chunks as they arrive, or await the stream for
+        {"response": full content}, which is also the result when the job is a tail job.
+        Errors starting the call are raised here, so retries and circuit breakers apply.
+        Streams are not coalesced or hedged.
+        """
+        if "response_format" in request_properties:
+            raise ValueError(f"{self.name}: stream can't be combined with response_format")
+        # Ask for usage in the final chunk, so the rate limiter can be reconciled
+        request_properties.setdefault("stream_options", {"include_usage": True})
+        estimated_tokens = estimate_tokens(request_properties)
+        await self.limiter.acquire(estimated_tokens)
+        logger.info(f"{self.name} is making a streaming OpenAI API call.")
+        response = await client.chat.completions.create(**request_properties)
+        return ResultStream(self._stream_chunks(response, estimated_tokens),
+                            aggregate=lambda chunks: {"response": "".join(chunks)})
+
+    async def _stream_chunks(self, response: Any, estimated_tokens: int):
+        """Yield the content of each streamed chunk, reconciling the rate limiter with the reported usage."""
+        try:
+            async for chunk in response:
+                usage = getattr(chunk, 'usage', None)
+                if usage is not None and getattr(usage, 'total_tokens', None) is not None:
+                    self.limiter.reconcile(estimated_tokens, usage.total_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            logger.info(f"{self.name} received the end of a stream.")
+        finally:
+            # Release the connection if consumers stop early
+            await response.close()
 
     def create_prompt(self, request_properties, task):
         # Handle the task input
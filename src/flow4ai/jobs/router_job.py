@@ -0,0 +1,85 @@
+from typing import Any, Callable, Dict, List, Union
+
+from flow4ai import f4a_logging as logging
+from flow4ai.job import JobABC, Task
+from flow4ai.jobs.wrapping_job import WrappingJob
+
+logger = logging.getLogger(__name__)
+
+
+class RouterJob(WrappingJob):
+    """
+    Runs a selector function and only executes the branches it selects, the other
+    branches are skipped.
+
+    Created with the route() DSL function, e.g.:
+
+        workflow = route(pick_model, {"mini": job(mini=ask_mini), "large": job(large=ask_large)}) >> job(report=report)
+
+    The selector is called like any wrapped function, with its task parameters and/or
+    j_ctx, and returns a branch key, a list of branch keys, or None to skip every branch.
+    Its output is {'route': [selected keys]}. Join jobs after the branches run with the
+    inputs of the branches that were executed.
+    """
+
+    ROUTE_KEY = 'route'
+
+    def __init__(self, selector: Callable, routes: Dict[str, Any], name: str = None):
+        """
+        Args:
+            selector: The function choosing the branch keys for a task
+            routes: The branches by key, each a job or a parallel/serial composition
+            name: Identifier for this callable in parameter dictionaries
+
+        Raises:
+            TypeError: If selector is not callable
+            ValueError: If routes is empty
+        """
+        super().__init__(selector, name)
+        if not routes:
+            raise ValueError("route() requires at least one branch")
+        self.routes = dict(routes)
+
+    async def run(self, task: Union[Dict[str, Any], Task]) -> Dict[str, Any]:
+        """
+        Run the selector and validate the keys it returns.
+
+        Returns:
+            Dict[str, Any]: {'route': [selected branch keys]}
+        """
+        selected = await super().run(task)
+        if selected is None:
+            keys = []
+        elif isinstance(selected, str):
+            keys = [selected]
+        else:
+            keys = list(selected)
+        unknown = [key for key in keys if key not in self.routes]
+        if unknown:
+            raise ValueError(f"Router '{self.name}' selected unknown branch(es) {unknown}, "
+                             f"expected one of {list(self.routes)}")
+        return {self.ROUTE_KEY: keys}
+
+    def select_next_jobs(self, result: Dict[str, Any]) -> List[JobABC]:
+        """Returns the head jobs of the selected branches."""
+        selected_heads = []
+        for key in result[self.ROUTE_KEY]:
+            selected_heads.extend(self._branch_heads(self.routes[key]))
+        return [next_job for next_job in self.next_jobs if next_job in selected_heads]
+
+    @classmethod
+    def _branch_heads(cls, component: Any) -> List[JobABC]:
+        """Returns the jobs at the start of a branch."""
+        # Import DSL classes inline to avoid circular imports
+        from flow4ai.dsl import Parallel, Serial
+
+        if isinstance(component, Serial):
+            return cls._branch_heads(component.components[0])
+        if isinstance(component, Parallel):
+            heads = []
+            for sub_component in component.components:
+                heads.extend(cls._branch_heads(sub_component))
+            return heads
+        if isinstance(component, WrappingJob) and isinstance(component.callable, (Parallel, Serial)):
+            return cls._branch_heads(component.callable)
+        return [component]
@@ -11,7 +11,8 @@ class WrappingJob(JobABC):
     def __init__(
         self,
         callable_obj: Callable,
-        name: str = None
+        name: str = None,
+        properties: Dict[str, Any] = {}
     ):
         """
         Initialize a wrapper for a callable object.
@@ -19,6 +20,7 @@ class WrappingJob(JobABC):
         Args:
             callable_obj: The function or method to wrap
             name: Identifier for this callable in parameter dictionaries
+            properties: Job properties, e.g. {"retry": {...}} from the options of job()
         Raises:
             TypeError: If callable_obj is not actually callable
         """
@@ -28,7 +30,7 @@ class WrappingJob(JobABC):
         if not is_callable: #and not isinstance(callable_obj, (JobABC, Parallel, Serial))
             raise TypeError(f"WrappingJob will only wrap a callable, error due to {type(callable_obj).__name__}")
         self.callable = callable_obj
-        super().__init__(name)
+        super().__init__(name, properties)
         self.default_args = []
         self.default_kwargs = {}
 
@@ -256,8 +258,23 @@ class WrappingJob(JobABC):
             kwargs: Keyword arguments to pass
 
         Returns:
-            Result of the callable execution
+            Result of the callable execution. Async generators are returned un-iterated
+            so that JobABC._execute can stream their chunks to successor jobs.
         """
+        async def call():
+            if self.hedging_policy is not None and inspect.iscoroutinefunction(self.callable):
+                # Only async callables can be duplicated and cancelled
+                return await self._hedge(lambda: self._call_callable(args, kwargs))
+            return await self._call_callable(args, kwargs)
+
+        if self.single_flight is not None and not inspect.isasyncgenfunction(self.callable):
+            # Identical calls of the same callable object share one in-flight call, streams are
+            # never shared. Closures of one factory share a qualname, so only identity tells them apart.
+            request = (id(self.callable), args, kwargs)
+            return await self._coalesce(request, call)
+        return await call()
+
+    async def _call_callable(self, args: List[Any], kwargs: Dict[str, Any]) -> Any:
         result = self.callable(*args, **kwargs)
 
         # Check if the result is a coroutine (from an async function)
@@ -0,0 +1,295 @@
+"""
+Adaptive concurrency limits for jobs calling external services, configured with the
+adaptive_concurrency job property or the matching option of job().
+"""
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Sequence, Type, Union
+
+from flow4ai import f4a_logging as logging
+
+from .retry import resolve_exception
+
+logger = logging.getLogger(__name__)
+
+
+class _LoopSlots:
+    """The in-flight calls and queued waiters of one event loop."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.waiters: deque = deque()
+
+
+class AdaptiveLimiter:
+    """
+    Limits concurrent calls to a limit that adapts to how the called service behaves,
+    using additive increase, multiplicative decrease (AIMD).
+
+    While calls succeed within the latency threshold the limit grows by about `increase`
+    for every `limit` calls that complete, as long as the current limit is being used.
+    An error, a 429 (rate limited) response or a latency spike multiplies the limit by
+    backoff_ratio, at most once per congestion event: calls that started before the last
+    decrease don't decrease it again.
+
+    Without latency_threshold_ms, a spike is a latency above latency_tolerance times the
+    moving average latency of healthy calls.
+
+    In jobs.yaml:
+
+        properties:
+          adaptive_concurrency:
+            initial_limit: 8
+            max_limit: 64
+            latency_threshold_ms: 2000
+
+    As with Bulkhead, each event loop, so each FlowManagerMP process, counts its own calls.
+    """
+
+    # Healthy calls needed before the average latency is used to detect spikes
+    MIN_LATENCY_SAMPLES = 10
+    LATENCY_SMOOTHING = 0.2
+    MAX_DECISIONS = 50
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        backoff_ratio: float = 0.5,
+        latency_threshold_ms: Optional[float] = None,
+        latency_tolerance: float = 2.0,
+        backoff_on: Sequence[Union[Type[BaseException], str]] = (Exception,)
+    ):
+        """
+        Args:
+            name: The job name, used in logs.
+            initial_limit: Concurrency limit to start from.
+            min_limit: Lowest limit a decrease can reach.
+            max_limit: Highest limit an increase can reach.
+            increase: Added to the limit for every `limit` healthy calls.
+            backoff_ratio: Factor, between 0 and 1, the limit is multiplied by on a decrease.
+            latency_threshold_ms: Call latency that counts as a spike, None to detect spikes
+                relative to the average latency.
+            latency_tolerance: Multiple of the average latency that counts as a spike when
+                latency_threshold_ms is not set.
+            backoff_on: Exception classes, or their names, that decrease the limit. Other
+                errors are passed through without changing it.
+
+        Raises:
+            ValueError: If the limits are not 1 <= min_limit <= initial_limit <= max_limit,
+                        or backoff_ratio is not between 0 and 1
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(f"Adaptive concurrency limits must satisfy 1 <= min_limit <= initial_limit <= max_limit, "
+                             f"got {min_limit}, {initial_limit}, {max_limit}")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError(f"backoff_ratio must be between 0 and 1, got {backoff_ratio}")
+        self.name = name
+        self.initial_limit = int(initial_limit)
+        self.min_limit = int(min_limit)
+        self.max_limit = int(max_limit)
+        self.increase = float(increase)
+        self.backoff_ratio = float(backoff_ratio)
+        self.latency_threshold_ms = latency_threshold_ms
+        self.latency_tolerance = float(latency_tolerance)
+        self.backoff_on = tuple(resolve_exception(e, "backoff_on") for e in backoff_on)
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._lock = threading.Lock()
+        self._slots = weakref.WeakKeyDictionary()
+        self._limit = float(self.initial_limit)
+        self._epoch = 0
+        self._waiting = 0
+        self._peak_in_flight = 0
+        self._calls = 0
+        self._errors = 0
+        self._avg_latency: Optional[float] = None
+        self._latency_samples = 0
+        self._increases = 0
+        self._decreases = 0
+        self._decrease_reasons = {'error': 0, 'rate_limited': 0, 'latency': 0}
+        self._decisions = deque(maxlen=self.MAX_DECISIONS)
+
+    def __reduce__(self):
+        # Limiters hold locks, so they are re-created with a fresh state on unpickling
+        return (AdaptiveLimiter, (self.name, self.initial_limit, self.min_limit, self.max_limit, self.increase,
+                                  self.backoff_ratio, self.latency_threshold_ms, self.latency_tolerance,
+                                  self.backoff_on))
+
+    @classmethod
+    def from_config(cls, name: str, config: Union[None, bool, Dict[str, Any], 'AdaptiveLimiter']) -> Optional['AdaptiveLimiter']:
+        """
+        Create a limiter from a job property value: None or False (no limiter), True (defaults),
+        an AdaptiveLimiter, or a dict of AdaptiveLimiter arguments.
+        """
+        if config is None or config is False or isinstance(config, AdaptiveLimiter):
+            return config or None
+        if config is True:
+            return cls(name)
+        if isinstance(config, dict):
+            config = dict(config)
+            backoff_on = config.pop("backoff_on", None)
+            if isinstance(backoff_on, (str, type)):
+                backoff_on = [backoff_on]
+            if backoff_on is not None:
+                config["backoff_on"] = backoff_on
+            return cls(name, **config)
+        raise TypeError(f"Invalid adaptive_concurrency configuration: {config!r}")
+
+    @property
+    def limit(self) -> int:
+        """The current concurrency limit."""
+        return max(self.min_limit, int(self._limit))
+
+    def _get_slots(self) -> _LoopSlots:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._slots.get(loop)
+            if slots is None:
+                slots = _LoopSlots()
+                self._slots[loop] = slots
+            return slots
+
+    def _wake(self, slots: _LoopSlots) -> None:
+        free = self.limit - slots.in_flight
+        while free > 0 and slots.waiters:
+            waiter = slots.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def _acquire(self, slots: _LoopSlots) -> None:
+        if slots.in_flight >= self.limit:
+            with self._lock:
+                self._waiting += 1
+            try:
+                while slots.in_flight >= self.limit:
+                    waiter = asyncio.get_running_loop().create_future()
+                    slots.waiters.append(waiter)
+                    try:
+                        await waiter
+                    except asyncio.CancelledError:
+                        if waiter.done() and not waiter.cancelled():
+                            # Pass on the wake-up this waiter can no longer use
+                            self._wake(slots)
+                        elif waiter in slots.waiters:
+                            slots.waiters.remove(waiter)
+                        raise
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        slots.in_flight += 1
+
+    def _release(self, slots: _LoopSlots) -> None:
+        slots.in_flight -= 1
+        self._wake(slots)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait until the call fits in the current limit, then time it and adapt the limit to its outcome."""
+        slots = self._get_slots()
+        await self._acquire(slots)
+        with self._lock:
+            self._peak_in_flight = max(self._peak_in_flight, slots.in_flight)
+            epoch = self._epoch
+        utilised = slots.in_flight * 2 >= self.limit
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._on_complete(time.perf_counter() - start, e, epoch, utilised)
+            raise
+        else:
+            self._on_complete(time.perf_counter() - start, None, epoch, utilised)
+        finally:
+            self._release(slots)
+
+    @staticmethod
+    def _is_rate_limited(error: BaseException) -> bool:
+        # openai.RateLimitError has status_code, aiohttp.ClientResponseError has status
+        return getattr(error, 'status_code', None) == 429 or getattr(error, 'status', None) == 429
+
+    def _is_latency_spike(self, latency: float) -> bool:
+        if self.latency_threshold_ms is not None:
+            return latency * 1000.0 > self.latency_threshold_ms
+        return (self._latency_samples >= self.MIN_LATENCY_SAMPLES
+                and latency > self._avg_latency * self.latency_tolerance)
+
+    def _on_complete(self, latency: float, error: Optional[BaseException], epoch: int, utilised: bool) -> None:
+        with self._lock:
+            self._calls += 1
+            if error is not None:
+                self._errors += 1
+                if not isinstance(error, self.backoff_on):
+                    return
+                reason = 'rate_limited' if self._is_rate_limited(error) else 'error'
+            elif self._is_latency_spike(latency):
+                reason = 'latency'
+            else:
+                self._record_latency(latency)
+                if utilised:
+                    self._increase()
+                return
+            if epoch == self._epoch:
+                self._decrease(reason)
+
+    def _record_latency(self, latency: float) -> None:
+        if self._avg_latency is None:
+            self._avg_latency = latency
+        else:
+            self._avg_latency += self.LATENCY_SMOOTHING * (latency - self._avg_latency)
+        self._latency_samples += 1
+
+    def _increase(self) -> None:
+        previous = self.limit
+        self._limit = min(float(self.max_limit), self._limit + self.increase / self._limit)
+        if self.limit > previous:
+            self._increases += 1
+            self._record_decision('increase', 'healthy')
+
+    def _decrease(self, reason: str) -> None:
+        self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+        self._epoch += 1
+        self._decreases += 1
+        self._decrease_reasons[reason] += 1
+        self._record_decision('decrease', reason)
+        logger.info(f"Adaptive limit of {self.name} decreased to {self.limit} ({reason})")
+
+    def _record_decision(self, action: str, reason: str) -> None:
+        self._decisions.append({'time': time.time(), 'action': action, 'reason': reason, 'limit': self.limit})
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the current limit and the decisions that set it:
+            limit, min_limit, max_limit, in_flight, waiting, peak_in_flight, calls, errors,
+            increases, decreases, decrease_reasons (counts of error, rate_limited and latency),
+            avg_latency_ms of healthy calls, and the most recent decisions, oldest first.
+        """
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'in_flight': sum(slots.in_flight for slots in self._slots.values()),
+                'waiting': self._waiting,
+                'peak_in_flight': self._peak_in_flight,
+                'calls': self._calls,
+                'errors': self._errors,
+                'increases': self._increases,
+                'decreases': self._decreases,
+                'decrease_reasons': dict(self._decrease_reasons),
+                'avg_latency_ms': (self._avg_latency or 0.0) * 1000.0,
+                'decisions': list(self._decisions),
+            }
+
+    def __repr__(self) -> str:
+        return f"AdaptiveLimiter(name={self.name!r}, limit={self.limit}, min_limit={self.min_limit}, max_limit={self.max_limit})"
+
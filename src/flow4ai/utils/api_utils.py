@@ -37,7 +37,7 @@ def get_api_key(params: Optional[Dict[str, Any]] = None,
     load_dotenv(env_file)  # Backward compatibility with api.env
     
     # Extract key name from params or use default
-    env_var = params.pop("api_key", None) if params else key_name
+    env_var = params.pop("api_key", None) or key_name
     
     # Resolve API key: either from the env var specified in params or from default env var
     api_key = os.getenv(env_var)
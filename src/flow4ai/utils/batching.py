@@ -0,0 +1,126 @@
+"""Micro-batching of individual async calls into calls of a list-accepting function."""
+import asyncio
+import inspect
+import threading
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+BatchFunction = Callable[[List[Any]], Any]
+
+
+class MicroBatcher:
+    """
+    Coalesces items submitted by concurrent coroutines into batches for a single call of batch_fn.
+
+    A batch is flushed as soon as it holds batch_size items, or max_wait_ms after its first
+    item arrived, whichever comes first. batch_fn receives a list of items and must return a
+    sequence with one result per item, in the same order. Each submitter receives its own
+    result, or the exception raised by batch_fn. A sync batch_fn runs in a thread
+    (asyncio.to_thread), so the event loop keeps serving other tasks during the call.
+
+    A MicroBatcher binds to the event loop it is first used on.
+    """
+
+    def __init__(self, batch_fn: BatchFunction, batch_size: int = 64, max_wait_ms: float = 20.0):
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        if max_wait_ms < 0:
+            raise ValueError(f"max_wait_ms must not be negative, got {max_wait_ms}")
+        self.batch_fn = batch_fn
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: set = set()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._size_flushes = 0
+        self._timeout_flushes = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        """Add an item to the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.batch_size:
+            self._flush(by_size=True)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush, False)
+        return await future
+
+    def _flush(self, by_size: bool) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # A size flush only sends full batches, a timeout flush sends everything waiting
+        while self._pending and (not by_size or len(self._pending) >= self.batch_size):
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            self._record_batch(batch, by_size)
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        if self._pending:
+            # Leftover items start a new wait window
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush, False)
+
+    async def _run_batch(self, batch: Sequence[Tuple[Any, asyncio.Future, float]]) -> None:
+        items = [item for item, _, _ in batch]
+        try:
+            if inspect.iscoroutinefunction(self.batch_fn):
+                results = await self.batch_fn(items)
+            else:
+                results = await asyncio.to_thread(self.batch_fn, items)
+                if inspect.isawaitable(results):
+                    results = await results
+            results = list(results)
+            if len(results) != len(items):
+                raise ValueError(f"Batch function returned {len(results)} results for {len(items)} items")
+        except BaseException as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record_batch(self, batch: Sequence[Tuple[Any, asyncio.Future, float]], by_size: bool) -> None:
+        now = time.perf_counter()
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            if by_size:
+                self._size_flushes += 1
+            else:
+                self._timeout_flushes += 1
+            for _, _, submitted_at in batch:
+                wait = now - submitted_at
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def stats(self) -> dict:
+        """
+        Returns batching metrics:
+            batches, items, size_flushes, timeout_flushes, avg_batch_size,
+            fill_ratio (average batch size / batch_size), avg_wait_ms and max_wait_ms
+            (time items spent waiting for their batch to be flushed).
+        """
+        with self._stats_lock:
+            avg_batch_size = self._items / self._batches if self._batches else 0.0
+            return {
+                'batches': self._batches,
+                'items': self._items,
+                'size_flushes': self._size_flushes,
+                'timeout_flushes': self._timeout_flushes,
+                'avg_batch_size': avg_batch_size,
+                'fill_ratio': avg_batch_size / self.batch_size,
+                'avg_wait_ms': (self._total_wait / self._items * 1000.0) if self._items else 0.0,
+                'max_wait_ms': self._max_wait * 1000.0,
+            }
@@ -0,0 +1,156 @@
+"""
+Concurrency limits (bulkheads) for jobs, configured with the max_concurrency and
+concurrency_group job properties or the matching options of job().
+"""
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from flow4ai import f4a_logging as logging
+
+logger = logging.getLogger(__name__)
+
+
+class Bulkhead:
+    """
+    Limits how many calls run at once across every in-flight task, and measures how long
+    calls queue for a slot.
+
+    A job with max_concurrency gets its own Bulkhead. Jobs naming the same concurrency_group
+    share one, across graphs, e.g. to protect a vector DB used by several jobs. Each event
+    loop gets its own semaphore, as asyncio primitives are bound to a loop, so the limit
+    applies per FlowManager instance (each runs its own loop) and per process with
+    FlowManagerMP. The stats are shared by every loop using the group.
+    """
+
+    # Named groups shared across jobs and graphs
+    _groups: Dict[str, 'Bulkhead'] = {}
+    _groups_lock = threading.Lock()
+
+    def __init__(self, name: str, limit: int, shared: bool = False):
+        """
+        Args:
+            name: The group name, or the job name for a job's own bulkhead.
+            limit: Maximum number of concurrent calls.
+            shared: True for a named group from get_group().
+
+        Raises:
+            ValueError: If limit is less than 1
+        """
+        if limit < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {limit}")
+        self.name = name
+        self.limit = int(limit)
+        self.shared = shared
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._peak_in_flight = 0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def __reduce__(self):
+        # Re-create on unpickling (e.g. in the FlowManagerMP worker) so named groups stay shared
+        if self.shared:
+            return (Bulkhead.get_group, (self.name, self.limit))
+        return (Bulkhead, (self.name, self.limit))
+
+    @classmethod
+    def get_group(cls, name: str, limit: Optional[int] = None) -> 'Bulkhead':
+        """
+        Returns the named group, creating it with limit if it doesn't exist yet.
+
+        Raises:
+            ValueError: If the group doesn't exist and no limit is given, or exists with a different limit
+        """
+        with cls._groups_lock:
+            group = cls._groups.get(name)
+            if group is None:
+                if limit is None:
+                    raise ValueError(f"concurrency_group '{name}' needs a max_concurrency the first time it is used")
+                group = cls(name, limit, shared=True)
+                cls._groups[name] = group
+            elif limit is not None and limit != group.limit:
+                raise ValueError(f"concurrency_group '{name}' already has max_concurrency {group.limit}, got {limit}")
+            return group
+
+    @classmethod
+    def from_properties(cls, name: str, properties: Dict[str, Any]) -> Optional['Bulkhead']:
+        """Returns the bulkhead configured by a job's properties, or None for no limit."""
+        limit = properties.get("max_concurrency")
+        group = properties.get("concurrency_group")
+        if group is not None:
+            return cls.get_group(group, limit)
+        if limit is not None:
+            return cls(name, limit)
+        return None
+
+    @classmethod
+    def get_group_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Returns the stats of every named group."""
+        with cls._groups_lock:
+            groups = dict(cls._groups)
+        return {name: group.stats() for name, group in groups.items()}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.limit)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a free slot and hold it for the duration of the block."""
+        semaphore = self._get_semaphore()
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        wait = time.perf_counter() - start
+        with self._lock:
+            self._acquired += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns concurrency metrics:
+            limit, in_flight, waiting, peak_in_flight, acquired, and the queue wait for a
+            slot as avg_wait_ms and max_wait_ms.
+        """
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'peak_in_flight': self._peak_in_flight,
+                'acquired': self._acquired,
+                'avg_wait_ms': (self._total_wait / self._acquired * 1000.0) if self._acquired else 0.0,
+                'max_wait_ms': self._max_wait * 1000.0,
+            }
+
+    def __repr__(self) -> str:
+        return f"Bulkhead(name={self.name!r}, limit={self.limit}, shared={self.shared})"
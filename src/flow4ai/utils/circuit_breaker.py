@@ -0,0 +1,326 @@
+"""
+Circuit breakers for jobs calling external dependencies, configured with the circuit_breaker
+job property or the matching option of job().
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Type, Union
+
+from flow4ai import f4a_logging as logging
+
+from .retry import resolve_exception
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+    def __init__(self, breaker_name: str, retry_in: float):
+        super().__init__(f"Circuit breaker '{breaker_name}' is open, calls are rejected for another {retry_in:.1f}s")
+        self.breaker_name = breaker_name
+        self.retry_in = retry_in
+        # Set by the job when its fallback is to skip it, see JobABC._guarded_call
+        self.skip = False
+
+    def __reduce__(self):
+        # Sent back from the FlowManagerMP worker in the result queue
+        return (_open_error, (self.breaker_name, self.retry_in, self.skip))
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency, so tasks fail or fall back at once instead of waiting
+    for client timeouts and holding concurrency slots.
+
+    Closed: calls go through and their outcomes are recorded in a sliding window. Once the
+    window has min_calls outcomes and the failure rate reaches failure_rate_threshold, the
+    breaker opens.
+    Open: calls are rejected with CircuitOpenError, or the job's fallback, for open_seconds.
+    Half-open: up to half_open_calls trial calls go through, others are rejected. If they all
+    succeed the breaker closes, if one fails it opens again.
+
+    Jobs naming the same group share one breaker, across graphs, e.g. for one provider.
+
+    In jobs.yaml:
+
+        properties:
+          circuit_breaker:
+            group: openai
+            failure_rate_threshold: 0.5
+            open_seconds: 30
+            fallback: skip
+
+    As breaker state is held in memory, with FlowManagerMP each process has its own breakers.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    # Fallbacks named in job properties, a callable can be given in Python instead
+    ERROR = 'error'
+    SKIP = 'skip'
+    FALLBACKS = (ERROR, SKIP)
+
+    # Named groups shared across jobs and graphs
+    _groups: Dict[str, 'CircuitBreaker'] = {}
+    _groups_lock = threading.Lock()
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 1,
+        failure_on: Sequence[Union[Type[BaseException], str]] = (Exception,),
+        shared: bool = False
+    ):
+        """
+        Args:
+            name: The group name, or the job name for a job's own breaker.
+            failure_rate_threshold: Fraction of failed calls in the window that opens the breaker.
+            min_calls: Outcomes needed in the window before the failure rate is checked.
+            window: Number of recent call outcomes the failure rate is computed from.
+            open_seconds: How long the breaker stays open before allowing trial calls.
+            half_open_calls: Trial calls that must succeed to close the breaker again.
+            failure_on: Exception classes, or their names, counted as failures. Other errors
+                count as successes, e.g. a ValueError for a bad request.
+            shared: True for a named group from get_group().
+
+        Raises:
+            ValueError: If failure_rate_threshold is not between 0 and 1, or a count is less than 1
+        """
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError(f"failure_rate_threshold must be between 0 and 1, got {failure_rate_threshold}")
+        if min_calls < 1 or window < min_calls or half_open_calls < 1:
+            raise ValueError(f"Circuit breaker needs 1 <= min_calls <= window and half_open_calls >= 1, "
+                             f"got min_calls={min_calls}, window={window}, half_open_calls={half_open_calls}")
+        self.name = name
+        self.failure_rate_threshold = float(failure_rate_threshold)
+        self.min_calls = int(min_calls)
+        self.window = int(window)
+        self.open_seconds = float(open_seconds)
+        self.half_open_calls = int(half_open_calls)
+        self.failure_on = tuple(resolve_exception(e, "failure_on") for e in failure_on)
+        self.shared = shared
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._outcomes = deque(maxlen=self.window)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._calls = 0
+        self._failures = 0
+        self._rejected = 0
+        self._transitions = 0
+        self._last_change = time.time()
+
+    def _settings(self) -> Dict[str, Any]:
+        return {
+            'failure_rate_threshold': self.failure_rate_threshold,
+            'min_calls': self.min_calls,
+            'window': self.window,
+            'open_seconds': self.open_seconds,
+            'half_open_calls': self.half_open_calls,
+            'failure_on': self.failure_on,
+        }
+
+    def __reduce__(self):
+        # Re-create on unpickling (e.g. in the FlowManagerMP worker) so named groups stay shared
+        if self.shared:
+            return (_shared_breaker, (self.name, self._settings()))
+        return (_breaker, (self.name, self._settings()))
+
+    @classmethod
+    def get_group(cls, name: str, settings: Optional[Dict[str, Any]] = None) -> 'CircuitBreaker':
+        """
+        Returns the named group, creating it with settings (CircuitBreaker arguments) if it
+        doesn't exist yet.
+
+        Raises:
+            ValueError: If the group exists with different settings
+        """
+        with cls._groups_lock:
+            breaker = cls._groups.get(name)
+            if breaker is None:
+                breaker = cls(name, shared=True, **(settings or {}))
+                cls._groups[name] = breaker
+            elif settings and cls(name, **settings)._settings() != breaker._settings():
+                raise ValueError(f"circuit breaker group '{name}' already exists with different settings")
+            return breaker
+
+    @classmethod
+    def from_config(cls, name: str, config: Union[None, bool, Dict[str, Any]]) -> Optional['CircuitBreaker']:
+        """
+        Returns the breaker for a circuit_breaker property value: None or False (no breaker),
+        True (defaults) or a dict of CircuitBreaker arguments with an optional group and fallback.
+        """
+        if config is None or config is False:
+            return None
+        if config is True:
+            return cls(name)
+        if not isinstance(config, dict):
+            raise TypeError(f"Invalid circuit_breaker configuration: {config!r}")
+        settings = {key: value for key, value in config.items() if key not in ("group", "fallback")}
+        failure_on = settings.get("failure_on")
+        if isinstance(failure_on, (str, type)):
+            settings["failure_on"] = [failure_on]
+        if config.get("group") is not None:
+            return cls.get_group(config["group"], settings)
+        return cls(name, **settings)
+
+    @classmethod
+    def get_fallback(cls, config: Union[None, bool, Dict[str, Any]]) -> Union[str, Callable]:
+        """
+        Returns the fallback of a circuit_breaker property value: "error" (the default), "skip"
+        or a callable returning the job's result instead.
+
+        Raises:
+            ValueError: If the fallback is not one of these
+        """
+        fallback = config.get("fallback", cls.ERROR) if isinstance(config, dict) else cls.ERROR
+        if fallback not in cls.FALLBACKS and not callable(fallback):
+            raise ValueError(f"circuit breaker fallback must be one of {cls.FALLBACKS} or a callable, got {fallback!r}")
+        return fallback
+
+    @classmethod
+    def get_group_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Returns the stats of every named group."""
+        with cls._groups_lock:
+            groups = dict(cls._groups)
+        return {name: breaker.stats() for name, breaker in groups.items()}
+
+    @classmethod
+    def collect_stats(cls, jobs) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the state of the breakers of jobs and of all named groups:
+            {'jobs': {job_name: stats}, 'groups': {group_name: stats}}
+        Jobs in a group are reported under their group only.
+        """
+        job_stats = {job.name: job.circuit_breaker.stats() for job in jobs
+                     if job.circuit_breaker is not None and not job.circuit_breaker.shared}
+        return {'jobs': job_stats, 'groups': cls.get_group_stats()}
+
+    def _set_state(self, state: str) -> None:
+        logger.info(f"Circuit breaker {self.name} changed from {self._state} to {state}")
+        self._state = state
+        self._transitions += 1
+        self._last_change = time.time()
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+        elif state == self.HALF_OPEN:
+            self._trials = 0
+            self._trial_successes = 0
+        else:
+            self._outcomes.clear()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    @property
+    def state(self) -> str:
+        """The current state: closed, open or half_open."""
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def transitions(self) -> int:
+        """Number of state changes so far."""
+        return self._transitions
+
+    def _before_call(self) -> None:
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return
+            self._rejected += 1
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_in)
+
+    def _after_call(self, error: Optional[BaseException]) -> None:
+        failed = error is not None and isinstance(error, self.failure_on)
+        with self._lock:
+            self._calls += 1
+            if failed:
+                self._failures += 1
+            if self._state == self.HALF_OPEN:
+                if failed:
+                    self._set_state(self.OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._set_state(self.CLOSED)
+            elif self._state == self.CLOSED:
+                self._outcomes.append(failed)
+                if len(self._outcomes) >= self.min_calls and \
+                        sum(self._outcomes) / len(self._outcomes) >= self.failure_rate_threshold:
+                    self._set_state(self.OPEN)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() if the breaker allows it, recording whether it failed.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with all trial calls taken
+        """
+        self._before_call()
+        try:
+            result = await fn()
+        except Exception as e:
+            self._after_call(e)
+            raise
+        except BaseException:
+            # Cancelled, frees a trial call without counting as an outcome
+            with self._lock:
+                if self._state == self.HALF_OPEN:
+                    self._trials = max(0, self._trials - 1)
+            raise
+        self._after_call(None)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the breaker state and counters:
+            state, failure_rate of the current window, calls, failures, rejected calls,
+            transitions (state changes) and last_change (epoch seconds).
+        """
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                'state': self._current_state(),
+                'failure_rate': sum(outcomes) / len(outcomes) if outcomes else 0.0,
+                'calls': self._calls,
+                'failures': self._failures,
+                'rejected': self._rejected,
+                'transitions': self._transitions,
+                'last_change': self._last_change,
+            }
+
+    def __repr__(self) -> str:
+        return f"CircuitBreaker(name={self.name!r}, state={self._state!r}, shared={self.shared})"
+
+
+def _breaker(name: str, settings: Dict[str, Any]) -> CircuitBreaker:
+    return CircuitBreaker(name, **settings)
+
+
+def _open_error(breaker_name: str, retry_in: float, skip: bool) -> CircuitOpenError:
+    error = CircuitOpenError(breaker_name, retry_in)
+    error.skip = skip
+    return error
+
+
+def _shared_breaker(name: str, settings: Dict[str, Any]) -> CircuitBreaker:
+    return CircuitBreaker.get_group(name, settings)
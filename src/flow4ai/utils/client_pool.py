@@ -0,0 +1,208 @@
+"""
+Async API clients pooled per event loop, so jobs never use a client, and its HTTP
+connections, from a loop other than the one it was created in.
+"""
+import asyncio
+import inspect
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from flow4ai import f4a_logging as logging
+
+from .single_flight import request_key
+
+logger = logging.getLogger(__name__)
+
+
+async def close_client(client: Any) -> None:
+    """Close an async client with aclose() (httpx, aiohttp style) or close() (OpenAI style)."""
+    close = getattr(client, "aclose", None) or getattr(client, "close", None)
+    if close is None:
+        return
+    result = close()
+    if inspect.isawaitable(result):
+        await result
+
+
+class _LoopClients:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.clients: Dict[str, Any] = {}
+        # Keeps the shutdown hook alive, the loop only holds it weakly
+        self.closer = None
+
+
+class LoopClientPool:
+    """
+    Creates one client per event loop and configuration, and closes a loop's clients when
+    the loop shuts down (asyncio.run() and FlowManagerMP workers do this on exit) or the
+    FlowManager using the loop is closed. close() and aclose() close them on demand.
+
+    Async clients hold connections bound to the loop that opened them, so a client created
+    in one loop fails, or hangs, when used from another, e.g. a FlowManager thread and the
+    caller's asyncio.run(). With the pool each loop gets its own client and connection pool,
+    shared by every job in that loop with the same configuration.
+
+        _clients = LoopClientPool("embeddings", lambda config: AsyncOpenAI(**config))
+
+        async def embed(text):
+            client = _clients.get()
+            ...
+    """
+
+    # Every pool, so a FlowManager can close the clients of its loop when it is closed
+    _pools: 'weakref.WeakSet[LoopClientPool]' = weakref.WeakSet()
+
+    def __init__(self, name: str, factory: Callable[[Dict[str, Any]], Any],
+                 close: Callable[[Any], Any] = close_client):
+        """
+        Args:
+            name: Identifies the pool in logs and stats.
+            factory: Creates a client from a configuration dict, called once per loop and configuration.
+            close: Closes a client, awaited if it returns an awaitable.
+        """
+        self.name = name
+        self.factory = factory
+        self.close_client = close
+        self._loops: Dict[asyncio.AbstractEventLoop, _LoopClients] = {}
+        # Clients created outside a running loop
+        self._unbound: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = 0
+        LoopClientPool._pools.add(self)
+
+    def get(self, config: Optional[Dict[str, Any]] = None) -> Any:
+        """Returns the client for config in the running event loop, creating it on first use."""
+        config = config or {}
+        key = request_key(config)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            clients = self._unbound if loop is None else self._loop_clients(loop).clients
+            client = clients.get(key)
+            if client is None:
+                client = self.factory(dict(config))
+                clients[key] = client
+                self._created += 1
+                logger.debug(f"Client pool {self.name} created a client for loop {id(loop)}")
+            return client
+
+    def _loop_clients(self, loop: asyncio.AbstractEventLoop) -> _LoopClients:
+        entry = self._loops.get(loop)
+        if entry is None:
+            # Loops closed without shutting down their async generators can't close their clients,
+            # drop them so they can be garbage collected
+            for closed in [other for other in self._loops if other.is_closed()]:
+                del self._loops[closed]
+            entry = _LoopClients(loop)
+            self._loops[loop] = entry
+            entry.closer = self._close_on_shutdown(entry)
+            # Registers the hook with the loop, which finalizes it in shutdown_asyncgens()
+            loop.create_task(entry.closer.__anext__())
+        return entry
+
+    async def _close_on_shutdown(self, entry: _LoopClients):
+        try:
+            yield
+        finally:
+            await self._close_entry(entry)
+
+    async def _close_entry(self, entry: _LoopClients) -> None:
+        with self._lock:
+            if self._loops.get(entry.loop) is entry:
+                del self._loops[entry.loop]
+            clients = list(entry.clients.values())
+            entry.clients.clear()
+        await self._close_clients(clients)
+
+    async def _close_unbound(self) -> None:
+        with self._lock:
+            clients = list(self._unbound.values())
+            self._unbound.clear()
+        await self._close_clients(clients)
+
+    async def _close_clients(self, clients: List[Any]) -> None:
+        for client in clients:
+            try:
+                result = self.close_client(client)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Client pool {self.name} failed to close a client: {e}")
+        with self._lock:
+            self._closed += len(clients)
+
+    async def _close_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        with self._lock:
+            entry = self._loops.get(loop)
+        if entry is not None:
+            await self._close_entry(entry)
+
+    async def aclose(self) -> None:
+        """
+        Close the clients of the running loop now, e.g. before stopping a loop that is never
+        shut down, and the clients created outside a running loop.
+        """
+        await self._close_loop(asyncio.get_running_loop())
+        await self._close_unbound()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Close every client of the pool, from a thread not running an event loop, e.g. on exit.
+
+        Clients are closed in the loop that created them: running loops (such as a FlowManager's)
+        close them in their own thread, idle loops are run until they are closed. Clients of loops
+        closed without shutting down can't be closed and are dropped. Clients created outside a
+        running loop are closed in a new loop.
+
+        Raises:
+            RuntimeError: If called from a running event loop, use aclose() instead
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("LoopClientPool.close() cannot be called from a running event loop, use aclose()")
+        with self._lock:
+            entries = list(self._loops.values())
+        for entry in entries:
+            try:
+                if entry.loop.is_closed():
+                    with self._lock:
+                        self._loops.pop(entry.loop, None)
+                elif entry.loop.is_running():
+                    asyncio.run_coroutine_threadsafe(self._close_entry(entry), entry.loop).result(timeout)
+                else:
+                    entry.loop.run_until_complete(self._close_entry(entry))
+            except Exception as e:
+                logger.warning(f"Client pool {self.name} failed to close the clients of loop {id(entry.loop)}: {e}")
+        if self._unbound:
+            asyncio.run(self._close_unbound())
+
+    @classmethod
+    async def aclose_all(cls) -> None:
+        """Close the clients of the running loop in every pool, e.g. when its FlowManager is closed."""
+        loop = asyncio.get_running_loop()
+        for pool in list(cls._pools):
+            await pool._close_loop(loop)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns pool metrics:
+            loops with clients, open clients, and clients created and closed so far.
+        """
+        with self._lock:
+            return {
+                'loops': len(self._loops),
+                'clients': sum(len(entry.clients) for entry in self._loops.values()) + len(self._unbound),
+                'created': self._created,
+                'closed': self._closed,
+            }
+
+    def __repr__(self) -> str:
+        return f"LoopClientPool(name={self.name!r})"
@@ -0,0 +1,202 @@
+"""
+Hedged requests for jobs calling external services, configured with the hedge job property
+or the matching option of job().
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from flow4ai import f4a_logging as logging
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty collection of values."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class HedgingPolicy:
+    """
+    Cuts tail latency by duplicating slow calls: when a call hasn't returned after the
+    job's observed latency percentile, the same call is issued again, the first response
+    wins and the other call is cancelled.
+
+    Hedges are capped at max_hedge_rate of all calls, so a slow service gets at most that
+    much extra load. Until min_samples latencies have been observed calls are only hedged
+    if initial_delay_ms is set. Only use it for calls that are safe to repeat.
+
+    In jobs.yaml:
+
+        properties:
+          hedge:
+            percentile: 95
+            max_hedge_rate: 0.05
+    """
+
+    # Calls between recomputing the hedge delay from the latency window
+    RECOMPUTE_EVERY = 10
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_hedge_rate: float = 0.05,
+        min_samples: int = 20,
+        window: int = 1000,
+        initial_delay_ms: Optional[float] = None
+    ):
+        """
+        Args:
+            percentile: Latency percentile, of recent successful calls measured from their first
+                attempt, after which a call is hedged.
+            max_hedge_rate: Maximum fraction of calls that are hedged.
+            min_samples: Latencies to observe before hedging at the percentile.
+            window: Number of recent latencies the percentile is computed from.
+            initial_delay_ms: Hedge delay to use before min_samples latencies are observed,
+                None to not hedge until then.
+
+        Raises:
+            ValueError: If percentile is not between 0 and 100, or max_hedge_rate not between 0 and 1
+        """
+        if not 0 < percentile < 100:
+            raise ValueError(f"percentile must be between 0 and 100, got {percentile}")
+        if not 0 < max_hedge_rate <= 1:
+            raise ValueError(f"max_hedge_rate must be between 0 and 1, got {max_hedge_rate}")
+        self.percentile = float(percentile)
+        self.max_hedge_rate = float(max_hedge_rate)
+        self.min_samples = int(min_samples)
+        self.window = int(window)
+        self.initial_delay_ms = initial_delay_ms
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=self.window)
+        self._since_recompute = 0
+        self._delay: Optional[float] = self.initial_delay_ms / 1000.0 if self.initial_delay_ms is not None else None
+        self._calls = 0
+        self._hedged = 0
+        self._hedge_wins = 0
+        self._budget_denied = 0
+
+    def __getstate__(self):
+        return {'percentile': self.percentile, 'max_hedge_rate': self.max_hedge_rate, 'min_samples': self.min_samples,
+                'window': self.window, 'initial_delay_ms': self.initial_delay_ms}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    @classmethod
+    def from_config(cls, config: Union[None, bool, Dict[str, Any], 'HedgingPolicy']) -> Optional['HedgingPolicy']:
+        """
+        Create a policy from a job property value: None or False (no hedging), True (defaults),
+        a HedgingPolicy, or a dict of HedgingPolicy arguments.
+        """
+        if config is None or config is False or isinstance(config, HedgingPolicy):
+            return config or None
+        if config is True:
+            return cls()
+        if isinstance(config, dict):
+            return cls(**config)
+        raise TypeError(f"Invalid hedge configuration: {config!r}")
+
+    def _record_latency(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self._since_recompute += 1
+            if len(self._latencies) >= self.min_samples and (
+                    self._since_recompute >= self.RECOMPUTE_EVERY or len(self._latencies) == self.min_samples):
+                self._delay = percentile(self._latencies, self.percentile)
+                self._since_recompute = 0
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self._hedged + 1 > self.max_hedge_rate * self._calls:
+                self._budget_denied += 1
+                return False
+            self._hedged += 1
+            return True
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await call(), calling it a second time if the first call is slower than the hedge delay.
+
+        Args:
+            call: Returns an awaitable making the call, called once per attempt.
+
+        Returns:
+            The result of the first attempt to succeed. If both fail, the first error is raised.
+        """
+        with self._lock:
+            self._calls += 1
+            delay = self._delay
+        start = time.perf_counter()
+        result = await self._hedged_call(call, delay)
+        # One latency per call, measured from its first attempt: a slow call answered by its
+        # hedge still counts as slow, so the tail stays in the window and the delay doesn't drift down
+        self._record_latency(time.perf_counter() - start)
+        return result
+
+    async def _hedged_call(self, call: Callable[[], Awaitable[Any]], delay: Optional[float]) -> Any:
+        primary = asyncio.ensure_future(call())
+        if delay is None:
+            return await primary
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._take_hedge():
+                return await primary
+            hedge = asyncio.ensure_future(call())
+            return await self._first_success(primary, hedge)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+
+    async def _first_success(self, primary: asyncio.Future, hedge: asyncio.Future) -> Any:
+        pending = {primary, hedge}
+        first_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in (primary, hedge):
+                    if attempt not in done:
+                        continue
+                    if attempt.exception() is None:
+                        if attempt is hedge:
+                            with self._lock:
+                                self._hedge_wins += 1
+                        return attempt.result()
+                    first_error = first_error or attempt.exception()
+            raise first_error
+        finally:
+            for attempt in pending:
+                attempt.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hedging metrics:
+            calls, hedged calls, hedge_wins (hedges that answered first), hedge_rate,
+            budget_denied (slow calls not hedged because of max_hedge_rate), the current
+            delay_ms, and latency_p50_ms and latency_p99_ms of recent calls.
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                'calls': self._calls,
+                'hedged': self._hedged,
+                'hedge_wins': self._hedge_wins,
+                'hedge_rate': self._hedged / self._calls if self._calls else 0.0,
+                'budget_denied': self._budget_denied,
+                'delay_ms': self._delay * 1000.0 if self._delay is not None else None,
+                'latency_p50_ms': percentile(latencies, 50) * 1000.0 if latencies else None,
+                'latency_p99_ms': percentile(latencies, 99) * 1000.0 if latencies else None,
+            }
+
+    def __repr__(self) -> str:
+        return (f"HedgingPolicy(percentile={self.percentile}, max_hedge_rate={self.max_hedge_rate}, "
+                f"min_samples={self.min_samples})")
@@ -0,0 +1,617 @@
+"""
+Runtime metrics: latency histograms per job and graph, task queue wait, tasks in flight,
+errors by exception type and event loop lag.
+
+FlowMetrics records them in the process wide MetricsRegistry.default(). Recording takes a
+dict lookup and a few additions under a lock, cheap enough to leave on in production;
+FLOW4AI_METRICS=false or MetricsRegistry.set_enabled(False) turns it off. LoopLagMonitor
+measures the lag of FlowManager's and FlowManagerMP's event loops and reports the jobs
+blocking them with sync code. snapshot()
+returns a picklable dict, rendered by the exporters in flow4ai.utils.metrics_export and
+published by FlowManagerMP's job executor process to the parent.
+"""
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+from types import FrameType
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from flow4ai import f4a_logging as logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the buckets of latency histograms in ms, above the last is the +Inf bucket
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+LAG_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+# Event loop lag from which LoopLagMonitor reports a slow callback, 0 turns reporting off
+SLOW_CALLBACK_MS = float(os.environ.get('FLOW4AI_SLOW_CALLBACK_MS', 100))
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+class CounterValue:
+    """A monotonically increasing value."""
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        self.value = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'value': self.value}
+
+
+class GaugeValue(CounterValue):
+    """A value that goes up and down."""
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+
+class HistogramValue:
+    """Counts of observations per bucket, with their count and sum."""
+    __slots__ = ('bounds', 'counts', 'count', 'sum', '_lock')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.sum = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'bounds': list(self.bounds), 'counts': list(self.counts), 'count': self.count, 'sum': self.sum}
+
+
+def histogram_quantile(sample: Dict[str, Any], quantile: float) -> Optional[float]:
+    """
+    Estimate a quantile from a histogram sample of a snapshot, interpolating within its
+    bucket as Prometheus' histogram_quantile() does. Returns None without observations and
+    the last bound for quantiles in the +Inf bucket.
+    """
+    if not sample['count']:
+        return None
+    rank = quantile * sample['count']
+    bounds, seen = sample['bounds'], 0
+    for index, count in enumerate(sample['counts']):
+        if count and seen + count >= rank:
+            if index == len(bounds):
+                return bounds[-1] if bounds else None
+            lower = bounds[index - 1] if index else 0.0
+            return lower + (bounds[index] - lower) * (rank - seen) / count
+        seen += count
+    return bounds[-1] if bounds else None
+
+
+class Metric:
+    """A named metric with one value per combination of label values."""
+
+    _value_types = {COUNTER: CounterValue, GAUGE: GaugeValue}
+
+    def __init__(self, name: str, kind: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """
+        The value for these label values, created on first use.
+
+        Raises:
+            ValueError: If the number of values doesn't match the label names
+        """
+        value = self._values.get(values)
+        if value is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} has labels {self.labelnames}, got {values}")
+            with self._lock:
+                value = self._values.get(values)
+                if value is None:
+                    value = HistogramValue(self.buckets) if self.kind == HISTOGRAM else self._value_types[self.kind]()
+                    self._values[values] = value
+        return value
+
+    def reset(self) -> None:
+        """Zero the values in place, so references to them held for speed stay valid."""
+        with self._lock:
+            values = list(self._values.values())
+        for value in values:
+            value.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = list(self._values.items())
+        return {
+            'name': self.name,
+            'type': self.kind,
+            'help': self.help,
+            'samples': [{'labels': dict(zip(self.labelnames, label_values)), **value.snapshot()}
+                        for label_values, value in values],
+        }
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms. MetricsRegistry.default() holds the metrics
+    recorded by Flow4AI, see FlowMetrics.
+    """
+    _default: Optional['MetricsRegistry'] = None
+    _default_lock = threading.Lock()
+    # FLOW4AI_METRICS=false turns recording off, also in FlowManagerMP workers
+    _enabled = os.environ.get('FLOW4AI_METRICS', 'true').strip().lower() not in ('0', 'false', 'no', 'off')
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'MetricsRegistry':
+        """The registry of this process."""
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        """Whether Flow4AI records metrics."""
+        return cls._enabled
+
+    @classmethod
+    def set_enabled(cls, enabled: bool = True) -> None:
+        """Turn the recording of metrics on or off in this process.
+
+        Args:
+            enabled: Whether Flow4AI records metrics
+        """
+        cls._enabled = enabled
+
+    def _metric(self, name: str, kind: str, help: str, labelnames: Sequence[str],
+                buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, Metric(name, kind, help, labelnames, buckets))
+        if metric.kind != kind or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} already registered as a {metric.kind} with labels {metric.labelnames}")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Metric:
+        """Get or register a counter.
+
+        Raises:
+            ValueError: If name is registered with another type or labels
+        """
+        return self._metric(name, COUNTER, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Metric:
+        """Get or register a gauge.
+
+        Raises:
+            ValueError: If name is registered with another type or labels
+        """
+        return self._metric(name, GAUGE, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> Metric:
+        """Get or register a histogram.
+
+        Args:
+            buckets: Ascending upper bounds of the buckets, a +Inf bucket is added.
+
+        Raises:
+            ValueError: If name is registered with another type or labels
+        """
+        return self._metric(name, HISTOGRAM, help, labelnames, buckets)
+
+    def reset(self) -> None:
+        """Zero the values of all metrics, keeping them registered."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the current values as a picklable, JSON serializable dict:
+            {'timestamp': seconds since the epoch, 'pid': process id,
+             'metrics': [{'name', 'type', 'help', 'samples': [{'labels': {...}, ...}]}]}
+        Counter and gauge samples have a 'value'; histogram samples 'bounds', 'counts' per
+        bucket (the last is +Inf), 'count' and 'sum'.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {'timestamp': time.time(), 'pid': os.getpid(), 'metrics': [metric.snapshot() for metric in metrics]}
+
+
+def _graph_label(fq_name: Optional[str]) -> str:
+    """The graph name of an fq_name like graph$$variant$$job$$, or the whole name."""
+    return fq_name.split("$$", 1)[0] if fq_name else ""
+
+
+class FlowMetrics:
+    """
+    The metrics recorded by FlowManager, FlowManagerMP and JobABC, in MetricsRegistry.default():
+
+        flow4ai_job_run_ms{graph, job}                 Time in a job's run, retries included
+        flow4ai_job_errors_total{graph, job, exception} Jobs failed, by exception type
+        flow4ai_task_queue_wait_ms{graph}              Submission until the graph starts executing
+        flow4ai_task_duration_ms{graph}                Submission until the task's result or error
+        flow4ai_tasks_total{graph, outcome}            Tasks finished, completed or error
+        flow4ai_tasks_in_flight{graph}                 Tasks executing
+        flow4ai_event_loop_lag_ms{loop}                Lateness of the loop's callbacks, see LoopLagMonitor
+        flow4ai_slow_callbacks_total{loop, graph, job} Times a job blocked the loop for slow_callback_ms or more
+        flow4ai_event_loop_blocked_ms_total{loop, graph, job} Time those slow callbacks blocked the loop
+    """
+    _instance: Optional['FlowMetrics'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.job_run_ms = registry.histogram(
+            "flow4ai_job_run_ms", "Time a job spent in run, retries included", ("graph", "job"))
+        self.job_errors = registry.counter(
+            "flow4ai_job_errors_total", "Jobs that failed, by exception type", ("graph", "job", "exception"))
+        self.task_queue_wait_ms = registry.histogram(
+            "flow4ai_task_queue_wait_ms", "Time from a task's submission until its graph started executing", ("graph",))
+        self.task_duration_ms = registry.histogram(
+            "flow4ai_task_duration_ms", "Time from a task's submission until its result or error", ("graph",))
+        self.tasks = registry.counter("flow4ai_tasks_total", "Tasks finished, by outcome", ("graph", "outcome"))
+        self.tasks_in_flight = registry.gauge("flow4ai_tasks_in_flight", "Tasks executing", ("graph",))
+        self.loop_lag_ms = registry.histogram(
+            "flow4ai_event_loop_lag_ms", "How late the event loop ran a periodic callback", ("loop",), LAG_BUCKETS_MS)
+        self.slow_callbacks = registry.counter(
+            "flow4ai_slow_callbacks_total", "Times sync code blocked the event loop, by the job running it",
+            ("loop", "graph", "job"))
+        self.loop_blocked_ms = registry.counter(
+            "flow4ai_event_loop_blocked_ms_total", "Time slow callbacks blocked the event loop, by the job running it",
+            ("loop", "graph", "job"))
+        self._job_labels: Dict[str, Tuple[str, str]] = {}
+
+    @classmethod
+    def get(cls) -> 'FlowMetrics':
+        """The metrics of this process, in MetricsRegistry.default()."""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls(MetricsRegistry.default())
+        return cls._instance
+
+    def _labels_of_job(self, job_name: str) -> Tuple[str, str]:
+        labels = self._job_labels.get(job_name)
+        if labels is None:
+            parts = job_name.split("$$")
+            labels = (parts[0], parts[2]) if len(parts) == 4 and parts[3] == "" else ("", job_name)
+            self._job_labels[job_name] = labels
+        return labels
+
+    def job_run(self, job_name: str, run_ms: float, error: Optional[BaseException] = None) -> None:
+        """Record a job's run time and, if it failed, its error."""
+        if not MetricsRegistry._enabled:
+            return
+        labels = self._labels_of_job(job_name)
+        self.job_run_ms.labels(*labels).observe(run_ms)
+        if error is not None:
+            self.job_errors.labels(*labels, type(error).__name__).inc()
+
+    def task_started(self, fq_name: Optional[str], submitted_at: float) -> None:
+        """Record a task starting to execute.
+
+        Args:
+            fq_name: The task's graph
+            submitted_at: When it was submitted, in seconds since the epoch, see Task.submitted_at
+        """
+        if not MetricsRegistry._enabled:
+            return
+        graph = _graph_label(fq_name)
+        self.task_queue_wait_ms.labels(graph).observe(max(0.0, time.time() - submitted_at) * 1000.0)
+        self.tasks_in_flight.labels(graph).inc()
+
+    def task_finished(self, fq_name: Optional[str], submitted_at: float, error: Optional[BaseException] = None) -> None:
+        """Record a task that started with task_started() finishing."""
+        if not MetricsRegistry._enabled:
+            return
+        graph = _graph_label(fq_name)
+        self.task_duration_ms.labels(graph).observe(max(0.0, time.time() - submitted_at) * 1000.0)
+        self.tasks.labels(graph, "error" if error is not None else "completed").inc()
+        self.tasks_in_flight.labels(graph).dec()
+
+
+# Frames in these are skipped when locating the code that blocked a loop
+_LIBRARY_PATHS = tuple({sysconfig.get_paths()[key] for key in ("stdlib", "platstdlib", "purelib", "platlib")})
+_ASYNCIO_PATH = os.path.dirname(asyncio.__file__) + os.sep
+# Sampled while the loop wasn't running a callback, see _blame()
+_WAITING = {'job': None, 'callable': None, 'location': None}
+
+
+def _blame(frame: FrameType) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Attribute the code running in frame, the top of a blocked loop's stack, to the job whose
+    run it is in, the callable that job runs, and the innermost frame outside the standard
+    library and installed packages, e.g. the line calling a blocking client or formatting a
+    large log message.
+
+    Returns _WAITING if the loop wasn't running a callback but waiting in select() or
+    scheduling: a late loop then had nothing blocking it, its thread was waiting for the GIL
+    or the CPU, held by another thread. Returns None if the loop had already recovered and
+    was measuring its lag, so the sample says nothing about the stall.
+    """
+    job_name = target = None
+    location = f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+    found_location = False
+    in_callback = False
+    current: Optional[FrameType] = frame
+    while current is not None:
+        code = current.f_code
+        if code.co_name == "_tick" and code.co_filename == __file__:
+            return None
+        if code.co_filename.startswith(_ASYNCIO_PATH):
+            if code.co_name == "_run":
+                # Handle._run, the loop is running a callback
+                in_callback = True
+            elif code.co_name in ("_run_once", "run_forever"):
+                if not in_callback:
+                    return _WAITING
+                # The frames below started the loop
+                break
+        if not found_location and not code.co_filename.startswith(_LIBRARY_PATHS):
+            location = f"{code.co_filename}:{current.f_lineno} in {code.co_name}"
+            found_location = True
+        if code.co_name == "_call_run":
+            job = current.f_locals.get("self")
+            if job is not None and hasattr(job, "name"):
+                job_name = job.name
+                wrapped = getattr(job, "callable", None)
+                target = getattr(wrapped, "__qualname__", None) or f"{type(job).__qualname__}.run"
+            break
+        current = current.f_back
+    return {'job': job_name, 'callable': target, 'location': location}
+
+
+class LoopWatchdog:
+    """
+    A daemon thread that samples the stack of event loops whose LoopLagMonitor callback is
+    late, so the monitor can attribute the stall to the code blocking the loop. Shared by all
+    monitors of a process, it only reads stacks while a loop is blocked.
+    """
+    PERIOD_SECONDS = 0.02
+    _monitors: 'weakref.WeakSet[LoopLagMonitor]' = weakref.WeakSet()
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def watch(cls, monitor: 'LoopLagMonitor') -> None:
+        with cls._lock:
+            cls._monitors.add(monitor)
+            if cls._thread is None:
+                cls._thread = threading.Thread(target=cls._run, name="flow4ai-loop-watchdog", daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def unwatch(cls, monitor: 'LoopLagMonitor') -> None:
+        with cls._lock:
+            cls._monitors.discard(monitor)
+
+    @classmethod
+    def _run(cls) -> None:
+        while True:
+            time.sleep(cls.PERIOD_SECONDS)
+            with cls._lock:
+                monitors = list(cls._monitors)
+            now = time.monotonic()
+            frames = None
+            for monitor in monitors:
+                if monitor._is_blocked(now):
+                    frames = frames if frames is not None else sys._current_frames()
+                    monitor._sample(frames)
+
+    @classmethod
+    def _after_fork(cls) -> None:
+        # The thread isn't copied into a forked child, nor are the loops watched by the parent
+        cls._lock = threading.Lock()
+        cls._monitors = weakref.WeakSet()
+        cls._thread = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=LoopWatchdog._after_fork)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late an event loop runs a callback scheduled every interval_seconds, which
+    is how long sync code blocked the loop, and records it in flow4ai_event_loop_lag_ms.
+
+    A lag of slow_callback_ms or more is a slow callback: LoopWatchdog samples the loop's
+    stack while it is blocked, and the stall is logged and counted against the job, callable
+    and line that were running, in flow4ai_slow_callbacks_total and stats().
+
+    A lag while the loop had no callback running, or without a sample and with the loop's
+    thread hardly using the CPU, means another thread held the GIL, e.g. CPU-bound code or a
+    C extension. These lags are counted as starved in stats() instead of blamed on the loop.
+    """
+    # Slow callbacks kept for stats()
+    RECENT_STALLS = 20
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, name: str, interval_seconds: float = 0.1,
+                 slow_callback_ms: Optional[float] = None):
+        """
+        Args:
+            loop: The event loop to monitor.
+            name: The loop label of its metrics.
+            interval_seconds: How often the loop's lag is measured.
+            slow_callback_ms: The lag from which a callback is slow, FLOW4AI_SLOW_CALLBACK_MS or 100 by default.
+        """
+        self.loop = loop
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.slow_callback_ms = slow_callback_ms if slow_callback_ms is not None else SLOW_CALLBACK_MS
+        self.max_lag_ms = 0.0
+        self.slow_callbacks = 0
+        self.blocked_ms = 0.0
+        self.starved = 0
+        self.starved_ms = 0.0
+        self._running = False
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected = 0.0
+        self._thread_cpu = 0.0
+        self._thread_id: Optional[int] = None
+        self._blamed: Optional[Dict[str, Optional[str]]] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._recent: deque = deque(maxlen=self.RECENT_STALLS)
+        self._lock = threading.Lock()
+        self._metrics = FlowMetrics.get()
+        self._lag = self._metrics.loop_lag_ms.labels(name)
+
+    def start(self) -> 'LoopLagMonitor':
+        """Start measuring, can be called from any thread."""
+        self._running = True
+        self.loop.call_soon_threadsafe(self._schedule)
+        if self.slow_callback_ms > 0:
+            LoopWatchdog.watch(self)
+        return self
+
+    def stop(self) -> None:
+        """Stop measuring, can be called from any thread."""
+        self._running = False
+        LoopWatchdog.unwatch(self)
+        handle = self._handle
+        if handle is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(handle.cancel)
+
+    def _schedule(self) -> None:
+        if not self._running:
+            return
+        self._thread_id = threading.get_ident()
+        self._thread_cpu = time.thread_time()
+        self._expected = self.loop.time() + self.interval_seconds
+        self._handle = self.loop.call_at(self._expected, self._tick)
+
+    def _is_blocked(self, now: float) -> bool:
+        """Called by LoopWatchdog: whether the loop is blocked and its stack not yet sampled."""
+        return (self._running and self._thread_id is not None and self._blamed is None
+                and (now - self._expected) * 1000.0 >= self.slow_callback_ms / 2)
+
+    def _sample(self, frames: Dict[int, FrameType]) -> None:
+        """Called by LoopWatchdog with the stacks of all threads, while the loop is blocked."""
+        frame = frames.get(self._thread_id)
+        if frame is None:
+            return
+        blamed = _blame(frame)
+        if blamed is None:
+            return
+        with self._lock:
+            # Unless the loop got going again in the meantime
+            if (time.monotonic() - self._expected) * 1000.0 >= self.slow_callback_ms / 2:
+                self._blamed = blamed
+
+    def _tick(self) -> None:
+        lag_ms = max(0.0, self.loop.time() - self._expected) * 1000.0
+        if MetricsRegistry._enabled:
+            self._lag.observe(lag_ms)
+        if lag_ms > self.max_lag_ms:
+            self.max_lag_ms = lag_ms
+        with self._lock:
+            blamed, self._blamed = self._blamed, None
+        if self.slow_callback_ms > 0 and lag_ms >= self.slow_callback_ms:
+            # Without a sample, C code held the GIL throughout: the loop's, if it used the CPU
+            cpu_ms = (time.thread_time() - self._thread_cpu) * 1000.0
+            if blamed is _WAITING or (blamed is None and cpu_ms < lag_ms / 2):
+                self._record_starved(lag_ms)
+            else:
+                self._record_slow_callback(lag_ms, blamed or {'job': None, 'callable': None, 'location': None})
+        self._schedule()
+
+    def _record_starved(self, lag_ms: float) -> None:
+        self.starved += 1
+        self.starved_ms += lag_ms
+        # Counted in stats(), a busy process starves every loop at once so this is only for debugging
+        logger.debug("Event loop %s was %.0fms late without code blocking it, its thread was waiting for "
+                     "the GIL or the CPU held by another thread", self.name, lag_ms)
+
+    def _record_slow_callback(self, lag_ms: float, blamed: Dict[str, Optional[str]]) -> None:
+        graph, job = self._metrics._labels_of_job(blamed['job']) if blamed['job'] else ("", "")
+        self.slow_callbacks += 1
+        self.blocked_ms += lag_ms
+        with self._lock:
+            stats = self._jobs.setdefault(blamed['job'] or "", {'count': 0, 'blocked_ms': 0.0, 'max_ms': 0.0})
+            stats['count'] += 1
+            stats['blocked_ms'] += lag_ms
+            stats['max_ms'] = max(stats['max_ms'], lag_ms)
+            stats['callable'], stats['location'] = blamed['callable'], blamed['location']
+            self._recent.append({'at': time.time(), 'blocked_ms': round(lag_ms, 3), **blamed})
+        if MetricsRegistry._enabled:
+            self._metrics.slow_callbacks.labels(self.name, graph, job).inc()
+            self._metrics.loop_blocked_ms.labels(self.name, graph, job).inc(lag_ms)
+        culprit = f"job {blamed['job']} in {blamed['callable']}" if blamed['job'] else "code outside jobs"
+        logger.warning(f"Event loop {self.name} was blocked for {lag_ms:.0f}ms by {culprit}"
+                       + (f" at {blamed['location']}" if blamed['location'] else "")
+                       + ", offload blocking calls with asyncio.to_thread() or use async clients")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the loop's lag and slow callbacks:
+            {'loop', 'interval_ms', 'slow_callback_ms', 'max_lag_ms', 'lag_p50_ms', 'lag_p99_ms',
+             'slow_callbacks', 'blocked_ms', 'starved', 'starved_ms',
+             'jobs': {job_name: {'count', 'blocked_ms', 'max_ms', 'callable', 'location'}},
+             'recent': [{'at', 'blocked_ms', 'job', 'callable', 'location'}]}
+        Stalls that couldn't be attributed to a job are under the job name "". Lags while
+        another thread held the GIL are only counted in starved and starved_ms.
+        """
+        lag = self._lag.snapshot()
+        with self._lock:
+            jobs = {name: dict(stats) for name, stats in self._jobs.items()}
+            recent = list(self._recent)
+        return {
+            'loop': self.name,
+            'interval_ms': self.interval_seconds * 1000.0,
+            'slow_callback_ms': self.slow_callback_ms,
+            'max_lag_ms': self.max_lag_ms,
+            'lag_p50_ms': histogram_quantile(lag, 0.5),
+            'lag_p99_ms': histogram_quantile(lag, 0.99),
+            'slow_callbacks': self.slow_callbacks,
+            'blocked_ms': self.blocked_ms,
+            'starved': self.starved,
+            'starved_ms': self.starved_ms,
+            'jobs': jobs,
+            'recent': recent,
+        }
@@ -0,0 +1,310 @@
+"""
+Exporters for the snapshots of flow4ai.utils.metrics: a Prometheus text endpoint, JSON
+snapshots appended to a file, and OpenTelemetry metrics sent where the otel_config.yaml
+read by TracerFactory says.
+
+Each takes a source returning a snapshot, MetricsRegistry.default().snapshot by default;
+pass a FlowManagerMP's get_metrics to export the metrics of its job executor process.
+"""
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import (ConsoleMetricExporter, MetricExporter,
+                                              MetricExportResult, MetricReader,
+                                              PeriodicExportingMetricReader)
+from opentelemetry.sdk.resources import Resource
+
+from .metrics import COUNTER, GAUGE, HISTOGRAM, MetricsRegistry
+from .otel_wrapper import TracerFactory
+
+Snapshot = Dict[str, Any]
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _default_source() -> Snapshot:
+    return MetricsRegistry.default().snapshot()
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus(snapshot: Snapshot) -> str:
+    """The metrics of a snapshot in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in snapshot['metrics']:
+        name = metric['name']
+        help_text = metric['help'].replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for sample in metric['samples']:
+            labels = sample['labels']
+            if metric['type'] != HISTOGRAM:
+                lines.append(f"{name}{_format_labels(labels)} {_format_number(sample['value'])}")
+                continue
+            cumulative = 0
+            for bound, count in zip(sample['bounds'] + [math.inf], sample['counts']):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, 'le': _format_number(float(bound))})
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(sample['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusServer:
+    """
+    Serves the metrics for Prometheus to scrape at http://host:port/metrics, from a daemon
+    thread. port=0 picks a free port, see port.
+
+    Usage:
+        with PrometheusServer(fm.get_metrics, port=9464):
+            ...
+    """
+
+    def __init__(self, source: Optional[Callable[[], Snapshot]] = None, host: str = "127.0.0.1", port: int = 9464):
+        self.source = source or _default_source
+        self.host = host
+        self._port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """The port listened on, once started."""
+        return self._server.server_address[1] if self._server else self._port
+
+    def start(self) -> 'PrometheusServer':
+        if self._server is not None:
+            return self
+        source = self.source
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(source()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self._port), MetricsHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="flow4ai-metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server, self._thread = None, None
+
+    def __enter__(self) -> 'PrometheusServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+class JsonSnapshotWriter:
+    """
+    Appends a snapshot as a line of JSON to path every interval_seconds from a daemon
+    thread, and a last one on stop().
+    """
+
+    def __init__(self, path: str, source: Optional[Callable[[], Snapshot]] = None, interval_seconds: float = 10.0):
+        if interval_seconds <= 0:
+            raise ValueError("interval_seconds must be positive")
+        self.path = os.path.expanduser(path)
+        self.source = source or _default_source
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self) -> None:
+        """Append a snapshot now."""
+        line = json.dumps(self.source()) + "\n"
+        with open(self.path, "a") as f:
+            f.write(line)
+
+    def _write_loop(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            self.write()
+
+    def start(self) -> 'JsonSnapshotWriter':
+        if self._thread is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._write_loop, name="flow4ai-metrics-json", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self.write()
+
+    def __enter__(self) -> 'JsonSnapshotWriter':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+class JsonlMetricExporter(MetricExporter):
+    """Appends each export of OpenTelemetry metrics to a file as a line of JSON."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, metrics_data, timeout_millis: float = 10_000, **kwargs) -> MetricExportResult:
+        try:
+            line = metrics_data.to_json(indent=None) + "\n"
+            with self._lock, open(self.path, "a") as f:
+                f.write(line)
+            return MetricExportResult.SUCCESS
+        except Exception:
+            return MetricExportResult.FAILURE
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        return True
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        pass
+
+
+class OTelMetricsExporter:
+    """
+    Publishes the metrics through an OpenTelemetry MeterProvider as observable instruments,
+    using the service_name of TracerFactory's otel_config.yaml and its metrics: section:
+
+        metrics:
+          exporter: otlp              # otlp, console or jsonl, defaults to the span exporter
+          path: ~/.Flow4AI/otel_metrics.jsonl
+          interval_seconds: 60
+
+    Counters and gauges keep their names. Histograms become the counters name_count,
+    name_sum and name_bucket, the last with the cumulative count per 'le' bound, as
+    Prometheus represents them, so their buckets survive any backend's aggregation.
+    Instruments are created for the metrics known when constructed.
+    """
+
+    def __init__(self, source: Optional[Callable[[], Snapshot]] = None, reader: Optional[MetricReader] = None,
+                 interval_seconds: Optional[float] = None):
+        self.source = source or _default_source
+        config = TracerFactory._config or TracerFactory._load_config()
+        metrics_config = config.get('metrics') or {}
+        if reader is None:
+            interval = interval_seconds or metrics_config.get('interval_seconds', 60)
+            reader = PeriodicExportingMetricReader(self._configure_exporter(config, metrics_config),
+                                                   export_interval_millis=interval * 1000)
+        self._snapshot: Optional[Snapshot] = None
+        self._snapshot_at = 0.0
+        self._lock = threading.Lock()
+        self.provider = MeterProvider(resource=Resource.create({"service.name": config['service_name']}),
+                                      metric_readers=[reader])
+        self._meter = self.provider.get_meter("flow4ai")
+        metrics = {metric['name']: metric for metric in MetricsRegistry.default().snapshot()['metrics']}
+        metrics.update((metric['name'], metric) for metric in self._current()['metrics'])
+        for metric in metrics.values():
+            self._register(metric)
+
+    @staticmethod
+    def _configure_exporter(config: Dict[str, Any], metrics_config: Dict[str, Any]) -> MetricExporter:
+        exporter_type = metrics_config.get('exporter') or config['exporter']
+        if exporter_type == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+            return OTLPMetricExporter()  # OTEL_EXPORTER_OTLP_... environment variables apply here
+        elif exporter_type == "console":
+            return ConsoleMetricExporter()
+        elif exporter_type in ("file", "jsonl"):
+            return JsonlMetricExporter(metrics_config.get('path', "~/.Flow4AI/otel_metrics.jsonl"))
+        else:
+            raise ValueError("Unsupported exporter type")
+
+    def _current(self) -> Snapshot:
+        """One snapshot shared by the callbacks of the instruments during a collection."""
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._snapshot_at > 0.5:
+                self._snapshot, self._snapshot_at = self.source(), now
+            return self._snapshot
+
+    def _samples(self, name: str) -> List[Dict[str, Any]]:
+        for metric in self._current()['metrics']:
+            if metric['name'] == name:
+                return metric['samples']
+        return []
+
+    def _register(self, metric: Dict[str, Any]) -> None:
+        name, description = metric['name'], metric['help']
+
+        def values(options: CallbackOptions):
+            return [Observation(sample['value'], sample['labels']) for sample in self._samples(name)]
+
+        if metric['type'] == COUNTER:
+            self._meter.create_observable_counter(name, callbacks=[values], description=description)
+        elif metric['type'] == GAUGE:
+            self._meter.create_observable_gauge(name, callbacks=[values], description=description)
+        elif metric['type'] == HISTOGRAM:
+            def counts(options: CallbackOptions):
+                return [Observation(sample['count'], sample['labels']) for sample in self._samples(name)]
+
+            def sums(options: CallbackOptions):
+                return [Observation(sample['sum'], sample['labels']) for sample in self._samples(name)]
+
+            def buckets(options: CallbackOptions):
+                observations = []
+                for sample in self._samples(name):
+                    cumulative = 0
+                    for bound, count in zip(sample['bounds'] + [math.inf], sample['counts']):
+                        cumulative += count
+                        observations.append(Observation(cumulative, {**sample['labels'],
+                                                                     'le': _format_number(float(bound))}))
+                return observations
+
+            self._meter.create_observable_counter(f"{name}_count", callbacks=[counts], description=description)
+            self._meter.create_observable_counter(f"{name}_sum", callbacks=[sums], description=description)
+            self._meter.create_observable_counter(f"{name}_bucket", callbacks=[buckets], description=description)
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        return self.provider.force_flush(timeout_millis)
+
+    def shutdown(self) -> None:
+        self.provider.shutdown()
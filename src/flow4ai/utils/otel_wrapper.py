@@ -1,9 +1,16 @@
+import datetime
+import gzip
 import inspect
 import json
 import os
+import queue
+import shutil
+import time
+import weakref
+from contextlib import contextmanager
 from functools import wraps
 from importlib import resources
-from threading import Lock
+from threading import Event, Lock, Thread
 from typing import Any, Dict, Optional, Sequence
 
 import yaml
@@ -15,9 +22,71 @@ from opentelemetry.sdk.trace.export import (BatchSpanProcessor,
                                             ConsoleSpanExporter, SpanExporter,
                                             SpanExportResult)
 
+from flow4ai import f4a_logging as logging
+
+from .trace_sampling import GraphSampler, TailSamplingProcessor, TraceSampling
+
+try:
+    import fcntl
+except ImportError:  # Windows, where exports from several processes aren't serialised
+    fcntl = None
+
 # Explicitly define exports
-__all__ = ['TracerFactory', 'trace_function', 'AsyncFileExporter']
+__all__ = ['TracerFactory', 'trace_function', 'AsyncFileExporter', 'JsonlFileExporter']
 DEFAULT_OTEL_CONFIG = "otel_config.yaml"
+FSYNC_POLICIES = ("never", "interval", "always")
+
+logger = logging.getLogger(__name__)
+
+def serialize_span(span: ReadableSpan) -> dict:
+    """Convert a span to a JSON-serializable dictionary.
+
+    Args:
+        span: The span to serialize
+    Returns:
+        dict: JSON-serializable representation of the span
+    """
+    return {
+        'name': span.name,
+        'context': {
+            'trace_id': format(span.context.trace_id, '032x'),
+            'span_id': format(span.context.span_id, '016x'),
+        },
+        'parent_id': format(span.parent.span_id, '016x') if span.parent else None,
+        'start_time': span.start_time,
+        'end_time': span.end_time,
+        'attributes': dict(span.attributes),
+        'events': [
+            {
+                'name': event.name,
+                'timestamp': event.timestamp,
+                'attributes': dict(event.attributes)
+            }
+            for event in span.events
+        ],
+        'status': {
+            'status_code': str(span.status.status_code),
+            'description': span.status.description
+        }
+    }
+
+@contextmanager
+def _file_lock(filepath: str):
+    """
+    Hold an exclusive lock for filepath shared with other processes, e.g. FlowManagerMP's.
+    The lock file, .<name>.lock next to the file, is left in place: deleting it would let a
+    process waiting on it lock a file the others no longer use.
+    """
+    if fcntl is None:
+        yield
+        return
+    directory, name = os.path.split(filepath)
+    with open(os.path.join(directory, f".{name}.lock"), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 class AsyncFileExporter(SpanExporter):
     """Asynchronous file exporter for OpenTelemetry spans with log rotation support."""
@@ -38,6 +107,10 @@ class AsyncFileExporter(SpanExporter):
         # Ensure directory exists
         os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
         self._export_lock = Lock()
+        if hasattr(os, 'register_at_fork'):
+            # Fork only between exports, so a child never inherits the file lock of _process_lock held
+            os.register_at_fork(before=self._export_lock.acquire, after_in_parent=self._export_lock.release,
+                                after_in_child=self._export_lock.release)
         
         # Initialize file with empty array if it doesn't exist
         if not os.path.exists(self.filepath):
@@ -102,29 +175,11 @@ class AsyncFileExporter(SpanExporter):
         Returns:
             dict: JSON-serializable representation of the span
         """
-        return {
-            'name': span.name,
-            'context': {
-                'trace_id': format(span.context.trace_id, '032x'),
-                'span_id': format(span.context.span_id, '016x'),
-            },
-            'parent_id': format(span.parent.span_id, '016x') if span.parent else None,
-            'start_time': span.start_time,
-            'end_time': span.end_time,
-            'attributes': dict(span.attributes),
-            'events': [
-                {
-                    'name': event.name,
-                    'timestamp': event.timestamp,
-                    'attributes': dict(event.attributes)
-                }
-                for event in span.events
-            ],
-            'status': {
-                'status_code': str(span.status.status_code),
-                'description': span.status.description
-            }
-        }
+        return serialize_span(span)
+
+    def _process_lock(self):
+        """Serialise exports with other processes writing the same file, e.g. FlowManagerMP's."""
+        return _file_lock(self.filepath)
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """Export spans to file with rotation support.
@@ -135,7 +190,7 @@ class AsyncFileExporter(SpanExporter):
             SpanExportResult indicating success or failure
         """
         try:
-            with self._export_lock:
+            with self._export_lock, self._process_lock():
                 # Create serializable span data
                 span_data = [self._serialize_span(span) for span in spans]
                 
@@ -163,7 +218,7 @@ class AsyncFileExporter(SpanExporter):
                 existing_spans.extend(span_data)
                 
                 # Write all spans back to file
-                temp_file = f"{self.filepath}.tmp"
+                temp_file = f"{self.filepath}.{os.getpid()}.tmp"
                 try:
                     with open(temp_file, 'w') as f:
                         json.dump(existing_spans, f, indent=2)
@@ -182,6 +237,217 @@ class AsyncFileExporter(SpanExporter):
         """Shutdown the exporter."""
         pass
 
+class JsonlFileExporter(SpanExporter):
+    """Append-only exporter writing one JSON span per line from a background writer thread.
+
+    export() only serializes the spans and queues them, so its cost per span doesn't depend
+    on the size of the file. The writer thread appends the lines and rotates by renaming,
+    so the file is never reread.
+
+    Processes forked after the exporter was created, e.g. FlowManagerMP's, append to the
+    same file. Each batch is written under a lock shared with them, after reopening the file
+    if another process rotated it, so no process writes to a segment that is being rotated.
+    """
+
+    def __init__(self, filepath: str, max_size_bytes: int = None, rotation_time_days: float = None,
+                 max_queue_size: int = 10000, fsync: str = "interval", fsync_interval_seconds: float = 1.0,
+                 compress: bool = False):
+        """Initialize the exporter and start its writer thread.
+
+        Args:
+            filepath: Path to the file where spans will be appended
+            max_size_bytes: Maximum file size in bytes before rotation
+            rotation_time_days: Number of days before rotating file
+            max_queue_size: Batches buffered for the writer, further batches are dropped
+            fsync: "never" (leave it to the OS), "interval" (at most every
+                fsync_interval_seconds) or "always" (after every batch)
+            fsync_interval_seconds: Seconds between fsyncs for the "interval" policy
+            compress: Whether to gzip rotated segments
+
+        Raises:
+            ValueError: If fsync is not a known policy
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.filepath = os.path.expanduser(filepath)
+        self.max_size_bytes = max_size_bytes
+        self.rotation_time_days = rotation_time_days
+        self.fsync = fsync
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.compress = compress
+
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = Lock()
+        self._stats = {'exported': 0, 'dropped': 0, 'written': 0, 'rotations': 0, 'write_errors': 0}
+        self._open()
+        self._last_fsync = time.monotonic()
+        self._shutdown = False
+        self._writer = Thread(target=self._write_loop, name="JsonlFileExporter", daemon=True)
+        self._writer.start()
+        if hasattr(os, 'register_at_fork'):
+            after_fork = weakref.WeakMethod(self._after_fork)
+            os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
+
+    def _after_fork(self) -> None:
+        """Restart the writer in a forked child, e.g. a FlowManagerMP process, as its thread isn't copied."""
+        if self._shutdown:
+            return
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._stats_lock = Lock()
+        self._open()
+        self._writer = Thread(target=self._write_loop, name="JsonlFileExporter", daemon=True)
+        self._writer.start()
+
+    def _open(self) -> None:
+        self._file = open(self.filepath, 'ab')
+        self._size = self._file.tell()
+        self._opened_at = time.time() if self._size == 0 else os.path.getmtime(self.filepath)
+
+    def _should_rotate(self) -> bool:
+        if self._size == 0:
+            return False
+        if self.max_size_bytes and self._size >= self.max_size_bytes:
+            return True
+        return bool(self.rotation_time_days) and (time.time() - self._opened_at) >= self.rotation_time_days * 24 * 3600
+
+    def _reopen_if_rotated(self) -> None:
+        """Reopen the file if another process sharing it rotated it, and update its size."""
+        try:
+            current = os.stat(self.filepath).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self._file.fileno()).st_ino:
+            self._file.close()
+            self._open()
+        else:
+            # Including what other processes appended
+            self._size = os.fstat(self._file.fileno()).st_size
+
+    def _rotate_file(self) -> str:
+        """Close the current file, rename it with a timestamp suffix and start a new one.
+
+        Returns:
+            str: The path the file was renamed to
+        """
+        self._sync()
+        self._file.close()
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        rotated_path = f"{self.filepath}.{timestamp}"
+        os.rename(self.filepath, rotated_path)
+        self._open()
+        with self._stats_lock:
+            self._stats['rotations'] += 1
+        return rotated_path
+
+    def _compress(self, rotated_path: str) -> None:
+        with open(rotated_path, 'rb') as src, gzip.open(f"{rotated_path}.gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.unlink(rotated_path)
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def _write(self, lines: bytes, count: int) -> None:
+        rotated_path = None
+        with _file_lock(self.filepath):
+            self._reopen_if_rotated()
+            if self._should_rotate():
+                rotated_path = self._rotate_file()
+            self._file.write(lines)
+            self._size += len(lines)
+            if self.fsync == "always" or (
+                    self.fsync == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval_seconds):
+                self._sync()
+            else:
+                self._file.flush()
+        # Nobody writes to a renamed segment any more, compress it without holding the lock
+        if rotated_path is not None and self.compress:
+            self._compress(rotated_path)
+        with self._stats_lock:
+            self._stats['written'] += count
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if isinstance(item, Event):
+                # A flush marker, everything queued before it has been written
+                self._sync()
+                item.set()
+                continue
+            try:
+                self._write(*item)
+            except Exception as e:
+                with self._stats_lock:
+                    self._stats['write_errors'] += 1
+                logger.error("Error writing spans to %s: %s", self.filepath, e)
+        self._sync()
+        self._file.close()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """Queue spans to be appended to the file.
+
+        Args:
+            spans: Sequence of spans to export
+        Returns:
+            SpanExportResult.FAILURE if the exporter is shut down or its queue is full, in
+            which case the spans are dropped
+        """
+        if self._shutdown:
+            return SpanExportResult.FAILURE
+        try:
+            lines = "".join(json.dumps(serialize_span(span), separators=(',', ':')) + "\n"
+                            for span in spans).encode('utf-8')
+            self._queue.put_nowait((lines, len(spans)))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['dropped'] += len(spans)
+            return SpanExportResult.FAILURE
+        except Exception as e:
+            logger.error("Error exporting spans to %s: %s", self.filepath, e)
+            return SpanExportResult.FAILURE
+        with self._stats_lock:
+            self._stats['exported'] += len(spans)
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Wait until the spans queued so far are written and synced to disk.
+
+        Args:
+            timeout_millis: Maximum time to wait
+        Returns:
+            bool: True if the spans were written within the timeout
+        """
+        if self._shutdown:
+            return True
+        flushed = Event()
+        try:
+            self._queue.put(flushed, timeout=timeout_millis / 1000)
+        except queue.Full:
+            return False
+        return flushed.wait(timeout_millis / 1000)
+
+    def shutdown(self) -> None:
+        """Write the queued spans, then stop the writer thread and close the file."""
+        if self._shutdown:
+            return
+        self._shutdown = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns counts of spans exported (queued), dropped (queue full) and written, of
+        rotations and write_errors, and the batches still queued as pending."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
 class TestTracerProvider(TracerProvider):
     _instance = None
 
@@ -226,6 +492,27 @@ class TracerFactory:
     _config = None
     _lock = Lock()
     _is_test_mode = False
+    # FLOW4AI_TRACING=false turns job and function tracing off, also in FlowManagerMP workers
+    _enabled = os.environ.get('FLOW4AI_TRACING', 'true').strip().lower() not in ('0', 'false', 'no', 'off')
+    # Set from detailed_job_trace in the config, records the task and fields of traced jobs
+    detailed_job_trace = False
+    # Set from the sampling section of the config, see TraceSampling
+    sampling = TraceSampling()
+    _tail_processor: Optional[TailSamplingProcessor] = None
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        """Whether traced jobs and functions create spans."""
+        return cls._enabled
+
+    @classmethod
+    def set_enabled(cls, enabled: bool = True):
+        """Turn tracing on or off in this process.
+
+        Args:
+            enabled: Whether traced jobs and functions create spans
+        """
+        cls._enabled = enabled
     
     @classmethod
     def set_test_mode(cls, enabled: bool = True):
@@ -237,6 +524,40 @@ class TracerFactory:
         cls._is_test_mode = enabled
         cls._instance = None  # Reset instance to force recreation with new provider
     
+    @classmethod
+    def configure_sampling(cls, **options) -> TraceSampling:
+        """Change the trace sampling policy of this process, see TraceSampling.configure().
+
+        Returns:
+            TraceSampling: The updated policy
+        """
+        cls.get_tracer()
+        cls.sampling.configure(**options)
+        return cls.sampling
+
+    @classmethod
+    def get_sampling_stats(cls) -> Dict[str, int]:
+        """Returns the counts of traces kept and discarded by tail sampling, see TailSamplingProcessor.stats()."""
+        if cls._tail_processor is None:
+            return {'kept': 0, 'discarded': 0, 'evicted': 0, 'pending': 0}
+        return cls._tail_processor.stats()
+
+    @classmethod
+    def force_flush(cls, timeout_millis: int = 30000) -> bool:
+        """Export the spans ended so far, if a tracer has been created in this process.
+
+        Args:
+            timeout_millis: Maximum time to wait
+        Returns:
+            bool: False if the spans weren't exported within the timeout
+        """
+        if cls._instance is None:
+            return True
+        provider = trace.get_tracer_provider()
+        if not hasattr(provider, 'force_flush'):
+            return True
+        return provider.force_flush(timeout_millis)
+
     @classmethod
     def _load_config(cls, yaml_file=None):
         """Load configuration from YAML file.
@@ -279,8 +600,14 @@ class TracerFactory:
                     # Use provided config or load from file
                     cfg = config if config is not None else cls._load_config()
                     
+                    cls.sampling = TraceSampling.from_config(cfg.get('sampling'))
+                    sampler = GraphSampler(cls.sampling)
                     # Use TestTracerProvider in test mode
-                    provider = TestTracerProvider() if cls._is_test_mode else TracerProvider()
+                    if cls._is_test_mode:
+                        provider = TestTracerProvider()
+                        provider.sampler = sampler
+                    else:
+                        provider = TracerProvider(sampler=sampler)
                     
                     # Configure main exporter
                     main_exporter = cls._configure_exporter(cfg['exporter'])
@@ -289,9 +616,12 @@ class TracerFactory:
                         max_queue_size=cfg['batch_processor']['max_queue_size'],
                         schedule_delay_millis=cfg['batch_processor']['schedule_delay_millis']
                     )
-                    provider.add_span_processor(batch_processor)
+                    # Passes sampled spans straight on, holds unsampled ones for tail sampling
+                    cls._tail_processor = TailSamplingProcessor(cls.sampling, batch_processor)
+                    provider.add_span_processor(cls._tail_processor)
                     
                     trace.set_tracer_provider(provider)
+                    cls.detailed_job_trace = bool(cfg.get('detailed_job_trace', False))
                     cls._instance = trace.get_tracer(cfg["service_name"])
         return cls._instance
 
@@ -315,6 +645,11 @@ class TracerFactory:
             max_size_bytes = config.get('file_exporter', {}).get('max_size_bytes')
             rotation_time_days = config.get('file_exporter', {}).get('rotation_time_days')
             return AsyncFileExporter(file_path, max_size_bytes, rotation_time_days)
+        elif exporter_type == "jsonl":
+            # Same file_exporter section, with options for buffering, fsync and compression
+            file_config = dict(TracerFactory._load_config().get('file_exporter') or {})
+            file_path = file_config.pop('path', "~/.Flow4AI/otel_trace.jsonl")
+            return JsonlFileExporter(file_path, **file_config)
         else:
             raise ValueError("Unsupported exporter type")
 
@@ -377,23 +712,52 @@ class TracerFactory:
                     span.set_attribute(key, str(value))
             print(message)
 
+def _set_call_attributes(span, args, kwargs, detailed_trace: bool, attributes: Optional[Dict[str, Any]]):
+    """Set a traced call's attributes, formatting them only if the span is recorded."""
+    if not span.is_recording():
+        return
+    # Record function arguments only if detailed_trace is True
+    if detailed_trace:
+        span.set_attribute("function.args", str(args))
+        span.set_attribute("function.kwargs", str(kwargs))
+        if args and hasattr(args[0], "__dict__"):
+            span.set_attribute("object.fields", str(vars(args[0])))
+    if attributes:
+        for key, value in attributes.items():
+            span.set_attribute(key, str(value))
+
 # Decorator for OpenTelemetry tracing
 def trace_function(func=None, *, detailed_trace: bool = False, attributes: Optional[Dict[str, Any]] = None):
+    """Trace calls of a function, or of a coroutine function until its coroutine completes.
+
+    Args:
+        func: The function to trace
+        detailed_trace: Whether to record the arguments and the fields of the first argument
+        attributes: Optional dictionary of additional attributes to add to the span
+    """
     def decorator(func):
+        span_name = f"{func.__module__}.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not TracerFactory._enabled:
+                    return await func(*args, **kwargs)
+                with TracerFactory.get_tracer().start_as_current_span(span_name) as span:
+                    _set_call_attributes(span, args, kwargs, detailed_trace, attributes)
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        span.record_exception(e)
+                        raise
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            tracer = TracerFactory.get_tracer()
-            span_name = f"{func.__module__}.{func.__name__}"
-            with tracer.start_as_current_span(span_name) as span:
-                # Record function arguments only if detailed_trace is True
-                if detailed_trace:
-                    span.set_attribute("function.args", str(args))
-                    span.set_attribute("function.kwargs", str(kwargs))
-                    if args and hasattr(args[0], "__dict__"):
-                        span.set_attribute("object.fields", str(vars(args[0])))
-                if attributes:
-                    for key, value in attributes.items():
-                        span.set_attribute(key, str(value))
+            if not TracerFactory._enabled:
+                return func(*args, **kwargs)
+            with TracerFactory.get_tracer().start_as_current_span(span_name) as span:
+                _set_call_attributes(span, args, kwargs, detailed_trace, attributes)
                 try:
                     result = func(*args, **kwargs)
                     return result
@@ -0,0 +1,309 @@
+"""
+Profiling of a fraction of tasks, aggregated per graph and job.
+
+TaskProfiler is configured with a dict, given as FlowManager(profiling=...) or
+FlowManagerMP(profiling=...):
+
+    {"ratio": 0.1,                # fraction of tasks profiled
+     "mode": "sample",            # sample: stack sampling, cprofile: cProfile
+     "interval_ms": 5,            # sample mode: time between samples
+     "output_dir": "~/.Flow4AI/profiles"}
+
+In sample mode a thread samples the stack of the event loop thread while profiled tasks are
+in flight. Each sample is attributed to the job whose run is on the stack, or to [flow4ai]
+when the framework is running, and written as collapsed stacks, for flamegraph.pl and
+speedscope, and as a speedscope file with a profile per graph. Sampling doesn't slow the
+profiled code down, unlike cProfile mode, which profiles everything running on the event
+loop thread while profiled tasks are in flight, and writes pstats for pstats or snakeviz.
+"""
+import cProfile
+import json
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from types import CodeType, FrameType
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SAMPLE = "sample"
+CPROFILE = "cprofile"
+MODES = (SAMPLE, CPROFILE)
+# Pseudo jobs of samples taken outside a job's run
+FRAMEWORK = "[flow4ai]"
+DEFAULT_OUTPUT_DIR = "~/.Flow4AI/profiles"
+
+Frame = Tuple[str, str, int]  # function, file, first line
+
+
+def _labels(job_name: str) -> Tuple[str, str]:
+    """The graph and short job names of an fq job name like graph$$variant$$job$$."""
+    parts = job_name.split("$$")
+    return (parts[0], parts[2]) if len(parts) == 4 and parts[3] == "" else ("", job_name)
+
+
+def _frame_key(code: CodeType) -> Frame:
+    return getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno
+
+
+def _frame_name(frame: Frame) -> str:
+    return f"{frame[0]} ({os.path.basename(frame[1])}:{frame[2]})"
+
+
+def _job_code(job) -> Optional[CodeType]:
+    """The code of the function a job runs: its wrapped callable's, or its run method's."""
+    target = getattr(job, "callable", None) or getattr(type(job), "run", None)
+    target = getattr(target, "__func__", target)
+    return getattr(target, "__code__", None) or getattr(getattr(target, "__call__", None), "__code__", None)
+
+
+class TaskProfiler:
+    """
+    Profiles a random fraction of tasks, see the module docstring. Created by the managers
+    from their profiling option, which call begin() and end() around each task on the event
+    loop thread.
+    """
+
+    def __init__(self, ratio: float = 0.1, mode: str = SAMPLE, interval_ms: float = 5.0,
+                 output_dir: Optional[str] = None):
+        """
+        Raises:
+            ValueError: If ratio isn't between 0 and 1, mode isn't sample or cprofile, or interval_ms isn't positive
+        """
+        if not 0.0 <= ratio <= 1.0:
+            raise ValueError(f"ratio must be between 0 and 1, got {ratio}")
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        if interval_ms <= 0:
+            raise ValueError(f"interval_ms must be positive, got {interval_ms}")
+        self.ratio = ratio
+        self.mode = mode
+        self.interval_ms = interval_ms
+        self.output_dir = os.path.expanduser(output_dir or DEFAULT_OUTPUT_DIR)
+        self.tasks_profiled = 0
+        self._in_flight: Dict[str, Optional[str]] = {}
+        self._thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        # Sample mode: {(graph, job): Counter({stack: samples})}, stacks are tuples of Frames, outermost first
+        self._stacks: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        self.samples = 0
+        # cProfile mode
+        self._profile: Optional[cProfile.Profile] = cProfile.Profile() if mode == CPROFILE else None
+        self._job_codes: Dict[str, Dict[str, Frame]] = defaultdict(dict)
+        self._graph_tasks: Counter = Counter()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional['TaskProfiler']:
+        """
+        A profiler from a dict with ratio, mode, interval_ms and output_dir, or None if
+        config is None or {"enabled": False}.
+        """
+        if config is None:
+            return None
+        config = dict(config)
+        if not config.pop("enabled", True):
+            return None
+        return cls(**config)
+
+    def begin(self, task_id: str, fq_name: Optional[str], jobs: Iterable[Any] = ()) -> bool:
+        """
+        Called on the event loop thread when a task starts. Returns whether it is profiled,
+        in which case end() must be called when it finishes.
+
+        Args:
+            task_id: The task's id.
+            fq_name: The task's graph.
+            jobs: The jobs of the graph, for the cProfile statistics per job.
+        """
+        if self.ratio < 1.0 and random.random() >= self.ratio:
+            return False
+        graph = _labels(fq_name or "")[0] or (fq_name or "")
+        with self._lock:
+            self.tasks_profiled += 1
+            self._graph_tasks[graph] += 1
+            self._in_flight[task_id] = graph
+            first = len(self._in_flight) == 1
+        self._thread_id = threading.get_ident()
+        if self.mode == CPROFILE:
+            codes = self._job_codes[graph]
+            for job in jobs:
+                code = _job_code(job)
+                if code is not None:
+                    codes.setdefault(_labels(job.name)[1], _frame_key(code))
+            if first:
+                self._profile.enable()
+        elif first:
+            self._active.set()
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="flow4ai-profiler", daemon=True)
+                self._sampler.start()
+        return True
+
+    def end(self, task_id: str) -> None:
+        """Called on the event loop thread when a task for which begin() returned True finishes."""
+        with self._lock:
+            self._in_flight.pop(task_id, None)
+            last = not self._in_flight
+        if last:
+            if self.mode == CPROFILE:
+                self._profile.disable()
+            else:
+                self._active.clear()
+
+    def _sample_loop(self) -> None:
+        interval = self.interval_ms / 1000.0
+        while True:
+            self._active.wait()
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._sample(frame)
+            time.sleep(interval)
+
+    def _sample(self, frame: FrameType) -> None:
+        """Attribute a sample of the event loop thread's stack to the job, or the graph, running."""
+        stack: List[Frame] = []
+        job_name = graph_job = None
+        current: Optional[FrameType] = frame
+        while current is not None:
+            code = current.f_code
+            if code.co_name in ("_call_run", "_execute") and job_name is None:
+                job = current.f_locals.get("self")
+                name = getattr(job, "name", None)
+                if isinstance(name, str):
+                    if code.co_name == "_call_run":
+                        task = current.f_locals.get("task")
+                        if getattr(task, "task_id", None) not in self._in_flight:
+                            return  # a task that isn't profiled
+                        job_name = name
+                        # The job's own code, without the framework frames beneath it
+                        break
+                    graph_job = name
+            stack.append(_frame_key(code))
+            current = current.f_back
+        if job_name is not None:
+            graph, job = _labels(job_name)
+        elif graph_job is not None:
+            graph, job = _labels(graph_job)[0], FRAMEWORK
+        elif stack and stack[0][0].endswith("select"):
+            return  # the loop is idle
+        else:
+            graph, job = "", FRAMEWORK
+        with self._lock:
+            self._stacks[(graph, job)][tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def stats(self, top: int = 5) -> Dict[str, Any]:
+        """
+        Returns the profile so far per graph and job:
+            {'mode', 'ratio', 'tasks_profiled', 'samples',
+             'graphs': {graph: {'tasks', 'jobs': {job: stats}}}}
+        In sample mode job stats are {'samples', 'ms', 'share' of the graph's samples,
+        'top': [[function, samples where it was running], ...]}, in cProfile mode
+        {'calls', 'cumulative_ms'} of the function the job runs. Samples outside runs are
+        under the job [flow4ai].
+        """
+        graphs: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            graph_tasks = dict(self._graph_tasks)
+            stacks = {key: Counter(counter) for key, counter in self._stacks.items()}
+        for graph, tasks in graph_tasks.items():
+            graphs[graph] = {'tasks': tasks, 'jobs': {}}
+        if self.mode == SAMPLE:
+            totals = Counter()
+            for (graph, job), counter in stacks.items():
+                totals[graph] += sum(counter.values())
+            for (graph, job), counter in stacks.items():
+                samples = sum(counter.values())
+                running = Counter()
+                for stack, count in counter.items():
+                    if stack:
+                        running[_frame_name(stack[-1])] += count
+                graphs.setdefault(graph, {'tasks': 0, 'jobs': {}})['jobs'][job] = {
+                    'samples': samples,
+                    'ms': round(samples * self.interval_ms, 3),
+                    'share': round(samples / totals[graph], 4),
+                    'top': [[name, count] for name, count in running.most_common(top)],
+                }
+        else:
+            profile_stats = self._cprofile_stats()
+            for graph, codes in self._job_codes.items():
+                for job, (function, file, line) in codes.items():
+                    # cProfile's keys are (file, line, function)
+                    cc, nc, tt, ct, callers = profile_stats.get((file, line, function), (0, 0, 0.0, 0.0, {}))
+                    graphs.setdefault(graph, {'tasks': 0, 'jobs': {}})['jobs'][job] = {
+                        'calls': nc, 'cumulative_ms': round(ct * 1000.0, 3)}
+        return {'mode': self.mode, 'ratio': self.ratio, 'tasks_profiled': self.tasks_profiled,
+                'samples': self.samples, 'graphs': graphs}
+
+    def _cprofile_stats(self) -> Dict[Frame, Tuple]:
+        """cProfile's statistics, without disabling it as create_stats() would, as it may be in use."""
+        self._profile.snapshot_stats()
+        return self._profile.stats
+
+    def collapsed(self) -> List[str]:
+        """Sample mode: the samples as collapsed stacks, 'graph;job;outer;...;inner count' lines."""
+        with self._lock:
+            stacks = {key: Counter(counter) for key, counter in self._stacks.items()}
+        lines = []
+        for (graph, job), counter in sorted(stacks.items()):
+            prefix = f"{graph or '[no graph]'};{job}"
+            for stack, count in counter.items():
+                frames = ";".join(_frame_name(frame).replace(";", ":") for frame in stack)
+                lines.append(f"{prefix};{frames} {count}" if frames else f"{prefix} {count}")
+        return lines
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Sample mode: the samples in speedscope's file format, a sampled profile per graph."""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Any, int] = {}
+
+        def frame_index(key: Any, name: str, file: Optional[str] = None, line: Optional[int] = None) -> int:
+            if key not in index:
+                index[key] = len(frames)
+                frames.append({'name': name, **({'file': file, 'line': line} if file else {})})
+            return index[key]
+
+        with self._lock:
+            stacks = {key: Counter(counter) for key, counter in self._stacks.items()}
+        by_graph: Dict[str, List[Tuple[List[int], int]]] = defaultdict(list)
+        for (graph, job), counter in sorted(stacks.items()):
+            job_index = frame_index(("job", job), job)
+            for stack, count in counter.items():
+                sample = [job_index] + [frame_index(frame, frame[0], frame[1], frame[2]) for frame in stack]
+                by_graph[graph or "[no graph]"].append((sample, count))
+        profiles = []
+        for graph, samples in by_graph.items():
+            weights = [count * self.interval_ms for _, count in samples]
+            profiles.append({'type': 'sampled', 'name': graph, 'unit': 'milliseconds', 'startValue': 0,
+                             'endValue': sum(weights), 'samples': [sample for sample, _ in samples],
+                             'weights': weights})
+        return {'$schema': 'https://www.speedscope.app/file-format-schema.json', 'exporter': 'flow4ai',
+                'name': 'flow4ai profile', 'activeProfileIndex': 0, 'shared': {'frames': frames},
+                'profiles': profiles}
+
+    def write(self, output_dir: Optional[str] = None, prefix: Optional[str] = None) -> List[str]:
+        """
+        Write the profile to output_dir, by default the configured one: prefix.collapsed and
+        prefix.speedscope.json in sample mode, prefix.pstats in cProfile mode. prefix defaults
+        to profile-<pid>, so the profiles of several processes don't overwrite each other.
+
+        Returns:
+            The paths written.
+        """
+        output_dir = os.path.expanduser(output_dir) if output_dir else self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, prefix or f"profile-{os.getpid()}")
+        if self.mode == CPROFILE:
+            # What Profile.dump_stats() writes, readable by pstats and snakeviz
+            with open(f"{base}.pstats", "wb") as f:
+                marshal.dump(self._cprofile_stats(), f)
+            return [f"{base}.pstats"]
+        with open(f"{base}.collapsed", "w") as f:
+            f.writelines(line + "\n" for line in self.collapsed())
+        with open(f"{base}.speedscope.json", "w") as f:
+            json.dump(self.speedscope(), f)
+        return [f"{base}.collapsed", f"{base}.speedscope.json"]
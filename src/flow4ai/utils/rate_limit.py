@@ -0,0 +1,186 @@
+"""
+Request and token rate limits for LLM API calls, shared by all jobs with the same limits,
+including jobs running in FlowManagerMP worker processes.
+"""
+import asyncio
+import math
+import multiprocessing as mp
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from flow4ai import f4a_logging as logging
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token of English text, used to estimate prompts before a call
+CHARS_PER_TOKEN = 4
+# Tokens the chat format adds per message and per reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """
+    Estimate the tokens a chat completion request counts against a tokens-per-minute limit:
+    the prompt tokens of its messages, plus max_completion_tokens or max_tokens when set,
+    as providers reserve the requested completion budget too.
+    """
+    tokens = TOKENS_PER_REPLY
+    for message in request.get("messages") or []:
+        tokens += TOKENS_PER_MESSAGE
+        content = message.get("content") if isinstance(message, dict) else message
+        if isinstance(content, list):
+            # Content parts, only text parts are counted
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        tokens += math.ceil(len(str(content or "")) / CHARS_PER_TOKEN)
+    completion = request.get("max_completion_tokens") or request.get("max_tokens")
+    if isinstance(completion, int):
+        tokens += completion
+    return tokens
+
+
+class TokenRateLimiter:
+    """
+    Enforces a request budget and an optional token budget per time period, e.g. a provider's
+    requests per minute (RPM) and tokens per minute (TPM).
+
+    Both budgets are token buckets that refill continuously, so up to max_rate requests and
+    max_token_rate tokens can be used in a burst. Before a call, acquire() waits until the
+    request and its estimated tokens fit. After the call, reconcile() replaces the estimate
+    with the tokens the provider reports as used, refunding or charging the difference.
+
+    The buckets live in shared memory, so a limiter passed to FlowManagerMP worker processes
+    with the job graph keeps one budget across processes. Use get_shared() to share a
+    limiter between all jobs with the same limits.
+    """
+
+    # Shared limiters, keyed by (max_rate, time_period, max_token_rate)
+    _shared: Dict[Tuple[float, float, Optional[float]], 'TokenRateLimiter'] = {}
+    _shared_lock = threading.Lock()
+
+    # Slots of the shared state array
+    _REQUESTS, _TOKENS, _UPDATED, _ACQUIRED, _ESTIMATED, _USED, _THROTTLED, _WAIT = range(8)
+
+    def __init__(self, max_rate: float, time_period: float = 60, max_token_rate: Optional[float] = None):
+        """
+        Args:
+            max_rate: Requests allowed per time_period.
+            time_period: Length of the period in seconds.
+            max_token_rate: Tokens allowed per time_period, None for no token limit.
+
+        Raises:
+            ValueError: If a rate or the time period is not positive
+        """
+        if max_rate <= 0 or time_period <= 0 or (max_token_rate is not None and max_token_rate <= 0):
+            raise ValueError(f"Rate limits must be positive, got max_rate={max_rate}, "
+                             f"time_period={time_period}, max_token_rate={max_token_rate}")
+        self.max_rate = float(max_rate)
+        self.time_period = float(time_period)
+        self.max_token_rate = float(max_token_rate) if max_token_rate is not None else None
+        # time.monotonic() is system-wide, so the update time is valid in every process
+        self._state = mp.RawArray('d', 8)
+        self._state[self._REQUESTS] = self.max_rate
+        self._state[self._TOKENS] = self.max_token_rate or 0.0
+        self._state[self._UPDATED] = time.monotonic()
+        self._lock = mp.Lock()
+
+    @property
+    def key(self) -> Tuple[float, float, Optional[float]]:
+        return (self.max_rate, self.time_period, self.max_token_rate)
+
+    def __setstate__(self, state):
+        # Unpickled in a worker process: share it with the worker's jobs that have the same limits
+        self.__dict__.update(state)
+        with TokenRateLimiter._shared_lock:
+            TokenRateLimiter._shared.setdefault(self.key, self)
+
+    @classmethod
+    def get_shared(cls, max_rate: float, time_period: float = 60,
+                   max_token_rate: Optional[float] = None) -> 'TokenRateLimiter':
+        """Returns the limiter of this process for these limits, creating it on first use."""
+        key = (float(max_rate), float(time_period), float(max_token_rate) if max_token_rate is not None else None)
+        with cls._shared_lock:
+            limiter = cls._shared.get(key)
+            if limiter is None:
+                limiter = cls(max_rate, time_period, max_token_rate)
+                cls._shared[key] = limiter
+            return limiter
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._state[self._UPDATED])
+        self._state[self._UPDATED] = now
+        self._state[self._REQUESTS] = min(self.max_rate,
+                                          self._state[self._REQUESTS] + elapsed * self.max_rate / self.time_period)
+        if self.max_token_rate is not None:
+            self._state[self._TOKENS] = min(self.max_token_rate,
+                                            self._state[self._TOKENS] + elapsed * self.max_token_rate / self.time_period)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take a request and tokens from the buckets, or return the seconds to wait until they fit."""
+        with self._lock:
+            self._refill(time.monotonic())
+            delay = 0.0
+            if self._state[self._REQUESTS] < 1:
+                delay = (1 - self._state[self._REQUESTS]) * self.time_period / self.max_rate
+            if self.max_token_rate is not None:
+                # A request larger than the whole budget goes when the bucket is full
+                needed = min(tokens, self.max_token_rate)
+                if self._state[self._TOKENS] < needed:
+                    delay = max(delay, (needed - self._state[self._TOKENS]) * self.time_period / self.max_token_rate)
+            if delay > 0:
+                return delay
+            self._state[self._REQUESTS] -= 1
+            self._state[self._TOKENS] -= tokens
+            self._state[self._ACQUIRED] += 1
+            self._state[self._ESTIMATED] += tokens
+            return 0.0
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until one request with an estimated number of tokens fits in the budgets."""
+        start = None
+        while True:
+            delay = self._try_acquire(tokens)
+            if delay == 0:
+                break
+            if start is None:
+                start = time.perf_counter()
+            await asyncio.sleep(delay)
+        if start is not None:
+            with self._lock:
+                self._state[self._THROTTLED] += 1
+                self._state[self._WAIT] += time.perf_counter() - start
+
+    def reconcile(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Replace a request's estimated tokens with the tokens it actually used."""
+        with self._lock:
+            self._state[self._USED] += used_tokens
+            if self.max_token_rate is not None:
+                self._state[self._TOKENS] = min(self.max_token_rate,
+                                                self._state[self._TOKENS] + estimated_tokens - used_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns usage of the budgets across all processes sharing this limiter:
+            requests, estimated_tokens, used_tokens (as reported by the provider), throttled
+            requests that had to wait, their total wait_seconds, and the requests and tokens
+            currently available.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'max_rate': self.max_rate,
+                'time_period': self.time_period,
+                'max_token_rate': self.max_token_rate,
+                'requests': int(self._state[self._ACQUIRED]),
+                'estimated_tokens': int(self._state[self._ESTIMATED]),
+                'used_tokens': int(self._state[self._USED]),
+                'throttled': int(self._state[self._THROTTLED]),
+                'wait_seconds': self._state[self._WAIT],
+                'available_requests': self._state[self._REQUESTS],
+                'available_tokens': self._state[self._TOKENS] if self.max_token_rate is not None else None,
+            }
+
+    def __repr__(self) -> str:
+        return (f"TokenRateLimiter(max_rate={self.max_rate}, time_period={self.time_period}, "
+                f"max_token_rate={self.max_token_rate})")
@@ -0,0 +1,123 @@
+"""
+Retry policies for jobs, configured with the "retry" job property or the retry option of job().
+"""
+import builtins
+import importlib
+import random
+from typing import Any, Dict, Optional, Sequence, Tuple, Type, Union
+
+from flow4ai import f4a_logging as logging
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_exception(exception: Union[Type[BaseException], str], option: str) -> Type[BaseException]:
+    """
+    Resolve an exception class from a builtin name or a dotted import path.
+
+    Raises:
+        ValueError: If exception is not an exception class or the name of one, naming option in the message
+    """
+    if isinstance(exception, type) and issubclass(exception, BaseException):
+        return exception
+    if isinstance(exception, str):
+        resolved = getattr(builtins, exception, None)
+        if resolved is None and "." in exception:
+            module_name, _, class_name = exception.rpartition(".")
+            try:
+                resolved = getattr(importlib.import_module(module_name), class_name, None)
+            except ImportError:
+                resolved = None
+        if isinstance(resolved, type) and issubclass(resolved, BaseException):
+            return resolved
+    raise ValueError(f"{option} entries must be exception classes or their names, got {exception!r}")
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed job run is retried and how long to back off before the next attempt.
+
+    Backoff grows exponentially from initial_backoff by multiplier per attempt, capped at max_backoff.
+    With jitter enabled the delay is drawn uniformly between zero and that value ("full jitter"),
+    so that tasks failing together don't retry in lock-step.
+
+    In jobs.yaml:
+
+        properties:
+          retry:
+            max_attempts: 4
+            initial_backoff: 0.5
+            max_backoff: 8
+            retry_on: [TimeoutError, ConnectionError, openai.RateLimitError]
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        initial_backoff: float = 0.1,
+        max_backoff: float = 10.0,
+        multiplier: float = 2.0,
+        jitter: bool = True,
+        retry_on: Sequence[Union[Type[BaseException], str]] = (Exception,)
+    ):
+        """
+        Args:
+            max_attempts: Total number of runs, including the first one.
+            initial_backoff: Seconds to wait before the first retry.
+            max_backoff: Upper bound in seconds for a single backoff.
+            multiplier: Growth factor of the backoff per attempt.
+            jitter: Randomise each backoff between zero and its computed value.
+            retry_on: Exception classes, or their names, that are retried. Others fail at once.
+
+        Raises:
+            ValueError: If max_attempts is less than 1 or a backoff value is negative
+        """
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        if initial_backoff < 0 or max_backoff < 0:
+            raise ValueError("Backoff values must not be negative")
+        self.max_attempts = int(max_attempts)
+        self.initial_backoff = float(initial_backoff)
+        self.max_backoff = float(max_backoff)
+        self.multiplier = float(multiplier)
+        self.jitter = bool(jitter)
+        self.retry_on: Tuple[Type[BaseException], ...] = tuple(resolve_exception(e, "retry_on") for e in retry_on)
+
+    @classmethod
+    def from_config(cls, config: Union[None, int, Dict[str, Any], 'RetryPolicy']) -> Optional['RetryPolicy']:
+        """
+        Create a policy from a job property value: None (no retries), a RetryPolicy,
+        a number of attempts, or a dict of RetryPolicy arguments.
+        """
+        if config is None or isinstance(config, RetryPolicy):
+            return config
+        if isinstance(config, bool):
+            raise TypeError("retry must be a number of attempts or a dict of retry settings, not a bool")
+        if isinstance(config, int):
+            return cls(max_attempts=config)
+        if isinstance(config, dict):
+            config = dict(config)
+            retry_on = config.pop("retry_on", None)
+            if isinstance(retry_on, (str, type)):
+                retry_on = [retry_on]
+            if retry_on is not None:
+                config["retry_on"] = retry_on
+            return cls(**config)
+        raise TypeError(f"Invalid retry configuration: {config!r}")
+
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        """True if a run that failed with error on the given attempt (1-based) should be retried."""
+        return attempt < self.max_attempts and isinstance(error, self.retry_on)
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait after the given failed attempt (1-based) before the next one."""
+        delay = min(self.max_backoff, self.initial_backoff * (self.multiplier ** (attempt - 1)))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def __repr__(self) -> str:
+        names = [e.__name__ for e in self.retry_on]
+        return (f"RetryPolicy(max_attempts={self.max_attempts}, initial_backoff={self.initial_backoff}, "
+                f"max_backoff={self.max_backoff}, multiplier={self.multiplier}, jitter={self.jitter}, "
+                f"retry_on={names})")
@@ -0,0 +1,187 @@
+"""
+Request coalescing (single-flight) for jobs, configured with the coalesce job property
+or the matching option of job().
+"""
+import asyncio
+import dataclasses
+import hashlib
+import json
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from flow4ai import f4a_logging as logging
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical(value: Any) -> Any:
+    # Tagged with the type, so values of different types never share a key
+    kind = f"{type(value).__module__}.{type(value).__qualname__}"
+    if hasattr(value, "model_dump") and not isinstance(value, type):
+        # Pydantic models
+        return {"__type__": kind, "value": value.model_dump()}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {"__type__": kind, "value": dataclasses.asdict(value)}
+    if isinstance(value, (set, frozenset)):
+        return {"__type__": kind, "value": sorted(value, key=repr)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__type__": kind, "value": value.hex()}
+    # Any other object only matches itself, as reprs can be equal for different values
+    # or truncated. Requests hold their arguments, so ids aren't reused while in flight.
+    return {"__type__": kind, "id": id(value)}
+
+
+def request_key(*parts: Any) -> str:
+    """
+    Hash the parts of a request into a key that is equal for byte-identical requests,
+    whatever the order of their dict keys. JSON values, Pydantic models, dataclasses, sets
+    and bytes are compared by value, other objects by identity.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=_canonical)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _own_copy(result: Any) -> Any:
+    # Every caller gets its own top-level container, as the engine adds keys to job results
+    if isinstance(result, dict):
+        return dict(result)
+    if isinstance(result, list):
+        return list(result)
+    return result
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Lets concurrent identical calls share one in-flight call: the first caller for a key
+    runs it, callers arriving while it runs wait for it and all receive its result or error.
+    Once it completes, the next call for the key runs again, so this is not a cache.
+
+    Jobs with `coalesce: true` share the "default" group, `coalesce: <name>` uses a named
+    group. Keys include the callable or request, so jobs can share a group safely.
+    The shared call only stops early if every caller waiting for it is cancelled.
+    """
+
+    DEFAULT_GROUP = "default"
+
+    # Named groups shared across jobs and graphs
+    _groups: Dict[str, 'SingleFlight'] = {}
+    _groups_lock = threading.Lock()
+
+    def __init__(self, name: str):
+        self.name = name
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._flights = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._executed = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+
+    def __reduce__(self):
+        # Re-resolve on unpickling (e.g. in the FlowManagerMP worker) so jobs keep sharing the group
+        return (SingleFlight.get_group, (self.name,))
+
+    @classmethod
+    def get_group(cls, name: str = DEFAULT_GROUP) -> 'SingleFlight':
+        """Returns the named group, creating it on first use."""
+        with cls._groups_lock:
+            group = cls._groups.get(name)
+            if group is None:
+                group = cls(name)
+                cls._groups[name] = group
+            return group
+
+    @classmethod
+    def from_config(cls, config: Union[None, bool, str]) -> Optional['SingleFlight']:
+        """Returns the group for a coalesce property value: None or False (off), True (default group) or a group name."""
+        if config is None or config is False:
+            return None
+        if config is True:
+            return cls.get_group()
+        if isinstance(config, str):
+            return cls.get_group(config)
+        raise TypeError(f"coalesce must be true or a group name, got {config!r}")
+
+    @classmethod
+    def get_group_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Returns the stats of every group."""
+        with cls._groups_lock:
+            groups = dict(cls._groups)
+        return {name: group.stats() for name, group in groups.items()}
+
+    def _loop_flights(self) -> Dict[str, _Flight]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._flights.get(loop)
+            if flights is None:
+                flights = {}
+                self._flights[loop] = flights
+            return flights
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn, unless a call with the same key is in flight, then wait for that call instead.
+
+        Args:
+            key: Identifies identical calls, see request_key().
+            fn: Makes the call, only called by the first caller for the key.
+
+        Returns:
+            The result of the shared call, each caller receiving its own copy of a dict or list.
+        """
+        flights = self._loop_flights()
+        flight = flights.get(key)
+        with self._lock:
+            self._calls += 1
+            if flight is None:
+                self._executed += 1
+            else:
+                self._coalesced += 1
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            flights[key] = flight
+
+            def land(_task, landed=flight):
+                if flights.get(key) is landed:
+                    del flights[key]
+            flight.task.add_done_callback(land)
+        flight.waiters += 1
+        with self._lock:
+            self._max_waiters = max(self._max_waiters, flight.waiters)
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                flight.waiters -= 1
+                if flight.waiters == 0:
+                    flight.task.cancel()
+            raise
+        return _own_copy(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns coalescing metrics:
+            calls, executed (calls that ran), coalesced (calls that shared a running call),
+            coalescing_ratio (coalesced / calls), max_waiters on one call, and in_flight calls.
+        """
+        with self._lock:
+            return {
+                'calls': self._calls,
+                'executed': self._executed,
+                'coalesced': self._coalesced,
+                'coalescing_ratio': self._coalesced / self._calls if self._calls else 0.0,
+                'max_waiters': self._max_waiters,
+                'in_flight': sum(len(flights) for flights in self._flights.values()),
+            }
+
+    def __repr__(self) -> str:
+        return f"SingleFlight(name={self.name!r})"
@@ -0,0 +1,401 @@
+"""
+Per-task execution timelines, and the critical path and slack of jobs across many of them.
+
+A TaskTimeline records on the monotonic clock when a task was submitted and dequeued, and
+for each job when it had all its inputs, started, got its concurrency slots and called run,
+and ended. FlowManager and FlowManagerMP record one per task when created with timeline=True
+or on_timeline, see TaskTimeline.to_dict() for the format. TimelineAnalyzer aggregates them
+to show which job or which wait makes a graph slow:
+
+    analyzer = TimelineAnalyzer()
+    analyzer.add_all(read_timelines("~/.Flow4AI/timelines.jsonl"))
+    report = analyzer.report()
+"""
+import json
+import multiprocessing.util
+import os
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from flow4ai import f4a_logging as logging
+
+logger = logging.getLogger(__name__)
+
+# Job events, in the order they happen
+INPUTS_READY = "inputs_ready"
+START = "start"
+RUN_START = "run_start"
+END = "end"
+EVENTS = (INPUTS_READY, START, RUN_START, END)
+
+
+def _short_name(job_name: str) -> str:
+    """The short job name of an fq job name like graph$$variant$$job$$, or the whole name."""
+    parts = job_name.split("$$")
+    return parts[2] if len(parts) == 4 and parts[3] == "" else job_name
+
+
+class TaskTimeline:
+    """
+    Timestamps of a task and its jobs, on this process's time.monotonic() clock.
+
+    Created when the task is dequeued, in the task's graph context under JobABC.TIMELINE,
+    where JobABC marks the events of its jobs.
+    """
+    __slots__ = ('task_id', 'fq_name', 'submitted_at', 'submitted', 'dequeued', 'finished', 'error', 'jobs')
+
+    def __init__(self, task_id: str, fq_name: Optional[str], submitted_at: float):
+        """
+        Args:
+            task_id: The task's id.
+            fq_name: The task's graph.
+            submitted_at: When the task was submitted, in seconds since the epoch, see Task.submitted_at.
+        """
+        now = time.monotonic()
+        self.task_id = task_id
+        self.fq_name = fq_name
+        self.submitted_at = submitted_at
+        # The wall clock is shared by processes, the submission is moved onto this process's monotonic clock
+        self.submitted = now - max(0.0, time.time() - submitted_at)
+        self.dequeued = now
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def of_task(cls, task) -> 'TaskTimeline':
+        """A timeline of a Task dequeued now."""
+        return cls(task.task_id, task.get_fq_name(), task.submitted_at)
+
+    def mark(self, job_name: str, event: str, predecessors: Iterable[str] = (), first: bool = False) -> None:
+        """
+        Record that an event of a job happened now.
+
+        Args:
+            job_name: The job's name.
+            event: INPUTS_READY, START, RUN_START or END.
+            predecessors: Names of the jobs whose inputs the job expects, recorded with its first event.
+            first: Keep the time of an earlier occurrence of event, e.g. RUN_START of the first attempt.
+        """
+        entry = self.jobs.get(job_name)
+        if entry is None:
+            entry = self.jobs[job_name] = {'after': sorted(_short_name(name) for name in predecessors)}
+        elif first and event in entry:
+            return
+        entry[event] = time.monotonic()
+
+    def end_job(self, job_name: str, outcome: str) -> None:
+        """Record that a job ended now, with outcome completed, error or skipped."""
+        self.mark(job_name, END)
+        self.jobs[job_name]['outcome'] = outcome
+
+    def finish(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Record that the task finished now, with error if it failed, and return to_dict()."""
+        self.finished = time.monotonic()
+        self.error = type(error).__name__ if error is not None else None
+        return self.to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the timeline as a JSON serializable dict, with times in ms since submission:
+            {'task_id', 'fq_name', 'submitted_at': seconds since the epoch,
+             'outcome': 'completed' or 'error', 'error': exception type or None,
+             'dequeued_ms', 'finished_ms',
+             'jobs': {short job name: {'after': [predecessors], 'outcome',
+                                       'inputs_ready_ms', 'start_ms', 'run_start_ms', 'end_ms'}}}
+        A job that was skipped or never started has outcome 'skipped' and only the events it reached.
+        """
+        def ms(timestamp: Optional[float]) -> Optional[float]:
+            return None if timestamp is None else round((timestamp - self.submitted) * 1000.0, 3)
+
+        jobs = {}
+        for job_name, entry in self.jobs.items():
+            job = {'after': entry['after'], 'outcome': entry.get('outcome', 'skipped')}
+            job.update((f"{event}_ms", ms(entry[event])) for event in EVENTS if event in entry)
+            jobs[_short_name(job_name)] = job
+        return {
+            'task_id': self.task_id,
+            'fq_name': self.fq_name,
+            'submitted_at': self.submitted_at,
+            'outcome': 'error' if self.error else 'completed',
+            'error': self.error,
+            'dequeued_ms': ms(self.dequeued),
+            'finished_ms': ms(self.finished),
+            'jobs': jobs,
+        }
+
+
+class TimelineWriter:
+    """
+    An on_timeline sink appending each timeline as a line of JSON to path from a background
+    thread, so the event loop calling it doesn't wait on the disk. Whole lines are written in
+    one call, so FlowManagerMP's job executor and other processes can share the file.
+
+    Timelines still queued are written by flush(), close() and when the process exits. When
+    max_queue_size are queued, further timelines are dropped and counted in dropped.
+    """
+
+    def __init__(self, path: str, max_queue_size: int = 10000):
+        self.path = os.path.expanduser(path)
+        self.max_queue_size = max_queue_size
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._init_writer()
+
+    def _init_writer(self) -> None:
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _start(self) -> None:
+        if self._pid is not None and self._pid != os.getpid():
+            # Forked after the parent started writing, its thread, queue and lock aren't ours
+            self._init_writer()
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._write_loop, name="TimelineWriter", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            # Runs at exit in the main process and in multiprocessing children alike
+            multiprocessing.util.Finalize(None, self.close, exitpriority=100)
+
+    def __call__(self, timeline: Dict[str, Any]) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((json.dumps(timeline) + "\n").encode("utf-8"))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            lines = []
+            while isinstance(item, bytes):
+                lines.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = False
+            if lines:
+                try:
+                    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        os.write(fd, b"".join(lines))
+                    finally:
+                        os.close(fd)
+                except OSError as e:
+                    logger.error("Error writing %d timelines to %s: %s", len(lines), self.path, e)
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                # A flush marker, everything queued before it has been written
+                item.set()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait until the timelines queued so far are written, returns False on timeout."""
+        if self._pid != os.getpid():
+            return True
+        flushed = threading.Event()
+        self._queue.put(flushed, timeout=timeout)
+        return flushed.wait(timeout)
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Write the queued timelines and stop the writer thread, a later call starts it again."""
+        if self._pid != os.getpid():
+            return
+        self._queue.put(None, timeout=timeout)
+        self._thread.join(timeout)
+        with self._lock:
+            self._pid = None
+            self._thread = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_queue_size': self.max_queue_size}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.max_queue_size = state.get('max_queue_size', 10000)
+        self._init_writer()
+
+
+def read_timelines(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the timelines of a file written by TimelineWriter, one line at a time."""
+    with open(os.path.expanduser(path)) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _executed(timeline: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {name: job for name, job in timeline['jobs'].items() if 'end_ms' in job and 'start_ms' in job}
+
+
+def critical_path(timeline: Dict[str, Any]) -> List[str]:
+    """
+    The jobs on the critical path of a timeline dict, head job first: the job that ended
+    last, preceded by its predecessor that ended last, back to a head job.
+    """
+    jobs = _executed(timeline)
+    if not jobs:
+        return []
+    current = max(jobs, key=lambda name: jobs[name]['end_ms'])
+    path = [current]
+    while True:
+        predecessors = [name for name in jobs[current]['after'] if name in jobs]
+        if not predecessors:
+            return path[::-1]
+        current = max(predecessors, key=lambda name: jobs[name]['end_ms'])
+        path.append(current)
+
+
+def job_slack(timeline: Dict[str, Any]) -> Dict[str, float]:
+    """
+    The slack of each job that ran in a timeline dict: how many ms it could have ended later
+    without delaying the end of the task. Jobs on the critical path have none.
+    """
+    jobs = _executed(timeline)
+    successors = defaultdict(list)
+    for name, job in jobs.items():
+        for predecessor in job['after']:
+            if predecessor in jobs:
+                successors[predecessor].append(name)
+    end = timeline['finished_ms'] if timeline['finished_ms'] is not None \
+        else max((job['end_ms'] for job in jobs.values()), default=0.0)
+    slack: Dict[str, float] = {}
+
+    def visit(name: str) -> float:
+        if name not in slack:
+            # The latest the job could end without making a successor, or the task, late
+            latest = end
+            for successor in successors[name]:
+                ready = jobs[successor].get('inputs_ready_ms', jobs[successor]['start_ms'])
+                latest = min(latest, ready + visit(successor))
+            slack[name] = max(0.0, latest - jobs[name]['end_ms'])
+        return slack[name]
+
+    for name in jobs:
+        visit(name)
+    return {name: round(value, 3) for name, value in slack.items()}
+
+
+def job_waits(timeline: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """
+    Where each job that ran in a timeline dict spent its time, in ms:
+        input_wait_ms: from its first predecessor ending until its last did, for joins
+        schedule_ms: from having all inputs until starting
+        slot_wait_ms: from starting until calling run, waiting for concurrency slots or the circuit breaker
+        run_ms: in run, retries included
+    """
+    jobs = _executed(timeline)
+    waits = {}
+    for name, job in jobs.items():
+        ready = job.get('inputs_ready_ms', job['start_ms'])
+        run_start = job.get('run_start_ms', job['start_ms'])
+        predecessor_ends = [jobs[p]['end_ms'] for p in job['after'] if p in jobs]
+        waits[name] = {
+            'input_wait_ms': max(0.0, ready - min(predecessor_ends)) if predecessor_ends else 0.0,
+            'schedule_ms': max(0.0, job['start_ms'] - ready),
+            'slot_wait_ms': max(0.0, run_start - job['start_ms']),
+            'run_ms': max(0.0, job['end_ms'] - run_start),
+        }
+    return waits
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    """Mean, p50, p95, p99 and max of values, by nearest rank."""
+    if not values:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(values)
+
+    def rank(quantile: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(quantile * len(ordered) + 0.5) - 1))]
+    return {'mean': round(sum(ordered) / len(ordered), 3), 'p50': rank(0.5), 'p95': rank(0.95),
+            'p99': rank(0.99), 'max': ordered[-1]}
+
+
+class TimelineAnalyzer:
+    """
+    Aggregates timeline dicts per fq_name into where tasks spend their time: queue wait,
+    the critical paths taken, and per job its time on the critical path, its slack and
+    its waits, see report().
+    """
+
+    def __init__(self):
+        self._graphs: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, timeline: Dict[str, Any]) -> None:
+        """Add the timeline dict of a task."""
+        graph = self._graphs.get(timeline['fq_name'])
+        if graph is None:
+            graph = self._graphs[timeline['fq_name']] = {
+                'tasks': 0, 'errors': 0, 'queue_wait_ms': [], 'duration_ms': [], 'paths': Counter(),
+                'jobs': defaultdict(lambda: defaultdict(list)), 'critical': Counter()}
+        graph['tasks'] += 1
+        if timeline['outcome'] == 'error':
+            graph['errors'] += 1
+        graph['queue_wait_ms'].append(timeline['dequeued_ms'])
+        if timeline['finished_ms'] is not None:
+            graph['duration_ms'].append(timeline['finished_ms'])
+
+        path = critical_path(timeline)
+        graph['paths'][tuple(path)] += 1
+        graph['critical'].update(path)
+        slack = job_slack(timeline)
+        for name, waits in job_waits(timeline).items():
+            values = graph['jobs'][name]
+            for key, value in waits.items():
+                values[key].append(value)
+            values['slack_ms'].append(slack[name])
+        jobs = timeline['jobs']
+        previous_end = timeline['dequeued_ms']
+        for name in path:
+            # Time the job added to the critical path, from its predecessor on the path ending
+            graph['jobs'][name]['critical_ms'].append(max(0.0, jobs[name]['end_ms'] - previous_end))
+            previous_end = jobs[name]['end_ms']
+
+    def add_all(self, timelines: Iterable[Dict[str, Any]]) -> 'TimelineAnalyzer':
+        for timeline in timelines:
+            self.add(timeline)
+        return self
+
+    def report(self, top_paths: int = 5) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns per fq_name:
+            {'tasks', 'errors', 'queue_wait_ms': summary, 'duration_ms': summary,
+             'critical_paths': [{'path': [job, ...], 'share': fraction of tasks}],
+             'jobs': {job: {'runs', 'critical_share', 'critical_ms', 'slack_ms', 'input_wait_ms',
+                            'schedule_ms', 'slot_wait_ms', 'run_ms'}}}
+        where a summary is {'mean', 'p50', 'p95', 'p99', 'max'} in ms, and critical_ms sums up
+        to the time from dequeuing to the last job ending. Jobs are ordered by their mean
+        time on the critical path, the biggest contributor first.
+        """
+        report = {}
+        for fq_name, graph in self._graphs.items():
+            tasks = graph['tasks']
+            jobs = {}
+            for name, values in graph['jobs'].items():
+                critical_total = sum(values['critical_ms'])
+                jobs[name] = {
+                    'runs': len(values['run_ms']),
+                    'critical_share': round(graph['critical'][name] / tasks, 4),
+                    # Averaged over all tasks, so the jobs' means add up to the critical path's
+                    'critical_ms': round(critical_total / tasks, 3),
+                    **{key: _summary(values[key]) for key in
+                       ('slack_ms', 'input_wait_ms', 'schedule_ms', 'slot_wait_ms', 'run_ms')},
+                }
+            report[fq_name] = {
+                'tasks': tasks,
+                'errors': graph['errors'],
+                'queue_wait_ms': _summary(graph['queue_wait_ms']),
+                'duration_ms': _summary(graph['duration_ms']),
+                'critical_paths': [{'path': list(path), 'share': round(count / tasks, 4)}
+                                   for path, count in graph['paths'].most_common(top_paths)],
+                'jobs': dict(sorted(jobs.items(), key=lambda item: -item[1]['critical_ms'])),
+            }
+        return report
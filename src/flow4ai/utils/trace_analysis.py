@@ -0,0 +1,469 @@
+"""
+Offline analysis of trace and timeline files, as the flow4ai-analyze command:
+
+    flow4ai-analyze ~/.Flow4AI/otel_trace.jsonl* --interval 60 --top 10
+
+Reads the spans written by the jsonl and file exporters, as JSON lines or a JSON array,
+gzipped or not, and the timelines written by TimelineWriter, one record at a time so
+files of any size are analyzed in constant memory. Reports per graph and job latency
+percentiles, task throughput and concurrency over time, errors by job and exception type,
+and the slowest tasks.
+
+Spans are grouped into tasks by their flow4ai.task_id attribute. A task's spans are
+written as its jobs finish, so a task is closed once no span of it has ended within
+task_window_seconds of the latest span read, keeping only the tasks in flight in memory.
+Percentiles come from histograms with 2% wide buckets, so they are within 1% of the exact
+values.
+"""
+import argparse
+import gzip
+import heapq
+import json
+import math
+import re
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .trace_sampling import GRAPH_ATTRIBUTE
+
+TASK_ID_ATTRIBUTE = "flow4ai.task_id"
+JOB_ATTRIBUTE = "flow4ai.job"
+JOB_OUTCOME_ATTRIBUTE = "flow4ai.job.outcome"
+JOB_RUN_MS_ATTRIBUTE = "flow4ai.job.run_ms"
+UNKNOWN_GRAPH = "[unknown]"
+QUANTILES = (0.5, 0.95, 0.99)
+
+_CHUNK_SIZE = 1 << 20
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def _open(path: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _iter_json_array(f: IO[str], stats: Counter) -> Iterator[Any]:
+    """Yield the items of a JSON array in f, reading it a chunk at a time."""
+    decoder = json.JSONDecoder()
+    buffer = f.read(_CHUNK_SIZE).lstrip()
+    pos = 1  # past the [
+    eof = False
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos == len(buffer):
+                raise json.JSONDecodeError("End of buffer", buffer, pos)
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer[pos:].strip():
+                    stats['malformed'] += 1  # truncated by a crash mid write
+                return
+            # The item continues in the next chunk
+            chunk = f.read(_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield item
+        if pos > _CHUNK_SIZE:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_records(path: str, stats: Optional[Counter] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the records of a trace or timeline file one at a time, whether it holds a JSON
+    array, from the file exporter, or JSON lines, from the jsonl exporter and
+    TimelineWriter. Files ending in .gz are decompressed.
+
+    Args:
+        path: The file.
+        stats: Counts the lines or items that aren't JSON objects under 'malformed'.
+    """
+    stats = stats if stats is not None else Counter()
+    with _open(path) as f:
+        first = f.read(1024).lstrip()[:1]
+        f.seek(0)
+        if first == "[":
+            records: Iterable[Any] = _iter_json_array(f, stats)
+        else:
+            records = _iter_json_lines(f, stats)
+        for record in records:
+            if isinstance(record, dict):
+                yield record
+            else:
+                stats['malformed'] += 1
+
+
+def _iter_json_lines(f: IO[str], stats: Counter) -> Iterator[Any]:
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            stats['malformed'] += 1
+
+
+class LatencyHistogram:
+    """
+    Count, sum, min, max and quantiles of values with log spaced buckets GROWTH apart, so
+    quantiles are estimated within half a bucket, in memory that grows with the range of
+    values rather than their number.
+    """
+    GROWTH = 1.02
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buckets: Counter = Counter()
+        self._log_growth = math.log(self.GROWTH)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        # Bucket i holds values in [GROWTH**i, GROWTH**(i+1)), values under 1e-3 share a bucket
+        self._buckets[math.floor(math.log(value) / self._log_growth) if value > 1e-3 else None] += 1
+
+    def quantile(self, quantile: float) -> Optional[float]:
+        """The value at quantile, by nearest rank, or None without values."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(quantile * self.count))
+        seen = 0
+        for bucket in sorted(self._buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                if bucket is None:
+                    return self.min
+                # The middle of the bucket, within the values seen
+                return min(self.max, max(self.min, self.GROWTH ** (bucket + 0.5)))
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        """{'count', 'mean', 'p50', 'p95', 'p99', 'max'}, in the values' unit."""
+        if not self.count:
+            return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+        summary = {'count': self.count, 'mean': round(self.sum / self.count, 3)}
+        for quantile in QUANTILES:
+            summary[f"p{int(quantile * 100)}"] = round(self.quantile(quantile), 3)
+        summary['max'] = round(self.max, 3)
+        return summary
+
+
+def _span_error(span: Dict[str, Any]) -> Optional[str]:
+    """The exception type of a span with an error status, else None."""
+    status = span.get('status') or {}
+    if not str(status.get('status_code', '')).endswith("ERROR"):
+        return None
+    for event in span.get('events') or ():
+        exception_type = (event.get('attributes') or {}).get('exception.type')
+        if event.get('name') == "exception" and exception_type:
+            return exception_type.rsplit(".", 1)[-1]
+    description = status.get('description') or ""
+    return description.split(":", 1)[0] if ":" in description else "Error"
+
+
+class TraceAnalyzer:
+    """
+    Aggregates spans and timelines into a report of where and when tasks spent their time,
+    see report(). Records are added one at a time, with add() or add_file().
+    """
+
+    def __init__(self, interval_seconds: float = 60.0, top: int = 10, task_window_seconds: float = 60.0):
+        """
+        Args:
+            interval_seconds: Width of the intervals of throughput and concurrency over time.
+            top: Number of slowest tasks reported.
+            task_window_seconds: How long after its latest span a task is closed.
+
+        Raises:
+            ValueError: If interval_seconds or task_window_seconds isn't positive, or top is negative
+        """
+        if interval_seconds <= 0:
+            raise ValueError(f"interval_seconds must be positive, got {interval_seconds}")
+        if task_window_seconds <= 0:
+            raise ValueError(f"task_window_seconds must be positive, got {task_window_seconds}")
+        if top < 0:
+            raise ValueError(f"top must not be negative, got {top}")
+        self.interval_seconds = interval_seconds
+        self.top = top
+        self.task_window_seconds = task_window_seconds
+        self.stats: Counter = Counter()
+        self.files: List[str] = []
+        # Tasks with spans still to come, least recently updated first
+        self._open: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._latest_end = -math.inf
+        self._graphs: Dict[str, Dict[str, Any]] = {}
+        self._task_ms = LatencyHistogram()
+        self._errors: Counter = Counter()
+        self._intervals: Dict[int, List[float]] = defaultdict(lambda: [0, 0, 0.0])  # completed, errors, busy seconds
+        self._slowest: List[Tuple[float, str, Dict[str, Any]]] = []
+        self._start = math.inf
+        self._end = -math.inf
+
+    def add_file(self, path: str) -> 'TraceAnalyzer':
+        """Add the records of a trace or timeline file, see iter_records()."""
+        self.files.append(path)
+        for record in iter_records(path, self.stats):
+            self.add(record)
+        return self
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Add a span, as serialized by the file exporters, or a timeline dict."""
+        if 'context' in record and 'start_time' in record:
+            self.add_span(record)
+        elif 'task_id' in record and 'jobs' in record:
+            self.add_timeline(record)
+        else:
+            self.stats['unknown'] += 1
+
+    def add_span(self, span: Dict[str, Any]) -> None:
+        """Add a span, closing the tasks without spans in the task window before it."""
+        self.stats['spans'] += 1
+        start, end = span.get('start_time'), span.get('end_time')
+        attributes = span.get('attributes') or {}
+        task_id = attributes.get(TASK_ID_ATTRIBUTE)
+        if task_id is None or start is None or end is None:
+            self.stats['spans_without_task'] += 1
+            return
+        start, end = start / 1e9, end / 1e9
+        task = self._open.get(task_id)
+        if task is None:
+            task = self._open[task_id] = {'task_id': task_id, 'fq_name': None, 'start': start, 'end': end,
+                                          'error': None, 'jobs': []}
+        else:
+            self._open.move_to_end(task_id)
+            task['start'] = min(task['start'], start)
+            task['end'] = max(task['end'], end)
+        if attributes.get(GRAPH_ATTRIBUTE):
+            task['fq_name'] = attributes[GRAPH_ATTRIBUTE]
+        error = _span_error(span)
+        if error is not None and task['error'] is None:
+            task['error'] = error
+        job = attributes.get(JOB_ATTRIBUTE)
+        if job is not None and attributes.get(JOB_OUTCOME_ATTRIBUTE) != "skipped":
+            # A job's span encloses the spans of the jobs it triggers, its run time doesn't
+            run_ms = attributes.get(JOB_RUN_MS_ATTRIBUTE)
+            span_id = (span.get('context') or {}).get('span_id')
+            task['jobs'].append((job, (end - start) * 1000.0 if run_ms is None else run_ms, error,
+                                 span_id, span.get('parent_id')))
+        self._latest_end = max(self._latest_end, end)
+        watermark = self._latest_end - self.task_window_seconds
+        while self._open:
+            oldest = next(iter(self._open.values()))
+            if oldest['end'] >= watermark:
+                break
+            self._close(self._open.popitem(last=False)[1])
+
+    def add_timeline(self, timeline: Dict[str, Any]) -> None:
+        """Add the timeline dict of a task, see TaskTimeline.to_dict()."""
+        self.stats['timelines'] += 1
+        submitted_at = timeline.get('submitted_at') or 0.0
+        jobs = []
+        for job, entry in (timeline.get('jobs') or {}).items():
+            run_start_ms = entry.get('run_start_ms', entry.get('start_ms'))
+            if run_start_ms is not None and 'end_ms' in entry:
+                error = (timeline.get('error') or "Error") if entry.get('outcome') == "error" else None
+                jobs.append((job, entry['end_ms'] - run_start_ms, error, None, None))
+        started_ms = timeline.get('dequeued_ms') or 0.0
+        finished_ms = timeline.get('finished_ms')
+        if finished_ms is None:
+            finished_ms = max([entry['end_ms'] for entry in timeline['jobs'].values() if 'end_ms' in entry],
+                              default=started_ms)
+        self._close({'task_id': timeline['task_id'], 'fq_name': timeline.get('fq_name'),
+                     'start': submitted_at + started_ms / 1000.0, 'end': submitted_at + finished_ms / 1000.0,
+                     'error': timeline.get('error') if timeline.get('outcome') == "error" else None,
+                     'jobs': jobs})
+
+    def _close(self, task: Dict[str, Any]) -> None:
+        """Aggregate a task whose records have all been read."""
+        fq_name = task['fq_name'] or UNKNOWN_GRAPH
+        graph = self._graphs.get(fq_name)
+        if graph is None:
+            graph = self._graphs[fq_name] = {'tasks': 0, 'errors': 0, 'task_ms': LatencyHistogram(),
+                                             'jobs': defaultdict(lambda: {'errors': 0, 'ms': LatencyHistogram()})}
+        task_ms = (task['end'] - task['start']) * 1000.0
+        self.stats['tasks'] += 1
+        graph['tasks'] += 1
+        graph['task_ms'].add(task_ms)
+        self._task_ms.add(task_ms)
+        if task['error'] is not None:
+            self.stats['errors'] += 1
+            graph['errors'] += 1
+        # An exception raised by a job also fails the spans of the jobs that triggered it
+        raised_below = {parent_id for _, _, error, _, parent_id in task['jobs'] if error and parent_id}
+        failed = False
+        for job, job_ms, error, span_id, _ in task['jobs']:
+            entry = graph['jobs'][job]
+            entry['ms'].add(job_ms)
+            if error is not None and (span_id is None or span_id not in raised_below):
+                failed = True
+                entry['errors'] += 1
+                self._errors[(fq_name, job, error)] += 1
+        if task['error'] is not None and not failed:
+            # Failed outside its jobs' spans, e.g. in on_complete
+            self._errors[(fq_name, "", task['error'])] += 1
+
+        self._start = min(self._start, task['start'])
+        self._end = max(self._end, task['end'])
+        interval = self.interval_seconds
+        counts = self._intervals[math.floor(task['end'] / interval)]
+        counts[0] += 1
+        if task['error'] is not None:
+            counts[1] += 1
+        # The task's time in flight, spread over the intervals it overlaps
+        for index in range(math.floor(task['start'] / interval), math.floor(task['end'] / interval) + 1):
+            overlap = min(task['end'], (index + 1) * interval) - max(task['start'], index * interval)
+            if overlap > 0:
+                self._intervals[index][2] += overlap
+
+        if self.top:
+            entry = (task_ms, task['task_id'], {'task_id': task['task_id'], 'fq_name': fq_name,
+                                                'ms': round(task_ms, 3), 'started_at': task['start'],
+                                                'error': task['error']})
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, entry)
+            elif entry[:2] > self._slowest[0][:2]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Closes the tasks still open and returns:
+            {'files', 'spans', 'timelines', 'malformed', 'tasks', 'errors', 'start', 'end': seconds
+             since the epoch, 'duration_s', 'throughput_per_s', 'task_ms': latency summary,
+             'graphs': {fq_name: {'tasks', 'errors', 'task_ms',
+                                  'jobs': {job: {'runs', 'errors', 'ms'}}, slowest at p99 first}},
+             'errors_by_job': [{'fq_name', 'job', 'exception', 'count'}], most first,
+             'intervals': [{'start', 'completed', 'errors', 'throughput_per_s', 'concurrency'}],
+             'slowest': [{'task_id', 'fq_name', 'ms', 'started_at', 'error'}], slowest first}
+        Latency summaries are {'count', 'mean', 'p50', 'p95', 'p99', 'max'} in ms. A job's
+        latency is its time in run, retries included, a task's runs from its first span, or
+        its dequeuing, to its last span's end.
+        Concurrency is the mean number of tasks in flight over the interval.
+        """
+        while self._open:
+            self._close(self._open.popitem(last=False)[1])
+        duration = max(0.0, self._end - self._start) if self.stats['tasks'] else 0.0
+        graphs = {}
+        for fq_name, graph in sorted(self._graphs.items()):
+            jobs = {job: {'runs': entry['ms'].count, 'errors': entry['errors'], 'ms': entry['ms'].summary()}
+                    for job, entry in graph['jobs'].items()}
+            graphs[fq_name] = {
+                'tasks': graph['tasks'], 'errors': graph['errors'], 'task_ms': graph['task_ms'].summary(),
+                'jobs': dict(sorted(jobs.items(), key=lambda item: -(item[1]['ms']['p99'] or 0.0))),
+            }
+        interval = self.interval_seconds
+        intervals = []
+        if self._intervals:
+            # Every interval from the first task to the last, idle ones included
+            for index in range(min(self._intervals), max(self._intervals) + 1):
+                completed, errors, busy = self._intervals.get(index, (0, 0, 0.0))
+                intervals.append({'start': index * interval, 'completed': completed, 'errors': errors,
+                                  'throughput_per_s': round(completed / interval, 3),
+                                  'concurrency': round(busy / interval, 3)})
+        return {
+            'files': list(self.files),
+            'spans': self.stats['spans'],
+            'timelines': self.stats['timelines'],
+            'malformed': self.stats['malformed'],
+            'tasks': self.stats['tasks'],
+            'errors': self.stats['errors'],
+            'start': self._start if self.stats['tasks'] else None,
+            'end': self._end if self.stats['tasks'] else None,
+            'duration_s': round(duration, 3),
+            'throughput_per_s': round(self.stats['tasks'] / duration, 3) if duration else None,
+            'task_ms': self._task_ms.summary(),
+            'graphs': graphs,
+            'errors_by_job': [{'fq_name': fq_name, 'job': job, 'exception': exception, 'count': count}
+                              for (fq_name, job, exception), count in self._errors.most_common()],
+            'intervals': intervals,
+            'slowest': [entry for _, _, entry in sorted(self._slowest, reverse=True)],
+        }
+
+
+def _format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """A report from TraceAnalyzer.report() as text."""
+    lines = [f"{report['tasks']} tasks, {report['errors']} errors from {report['spans']} spans and "
+             f"{report['timelines']} timelines" + (f", {report['malformed']} malformed records skipped"
+                                                  if report['malformed'] else "")]
+    if not report['tasks']:
+        return lines[0]
+    task_ms = report['task_ms']
+    lines.append(f"{_format_time(report['start'])} to {_format_time(report['end'])}, "
+                 f"{report['duration_s']:.1f}s, {report['throughput_per_s'] or 0:.2f} tasks/s")
+    lines.append(f"task ms: p50 {_format_ms(task_ms['p50'])}, p95 {_format_ms(task_ms['p95'])}, "
+                 f"p99 {_format_ms(task_ms['p99'])}, max {_format_ms(task_ms['max'])}")
+    for fq_name, graph in report['graphs'].items():
+        task_ms = graph['task_ms']
+        lines.append("")
+        lines.append(f"{fq_name}: {graph['tasks']} tasks, {graph['errors']} errors, task ms p50 "
+                     f"{_format_ms(task_ms['p50'])}, p99 {_format_ms(task_ms['p99'])}")
+        lines.append(f"  {'job':<30} {'runs':>8} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for job, entry in graph['jobs'].items():
+            ms = entry['ms']
+            lines.append(f"  {job:<30} {entry['runs']:>8} {entry['errors']:>7} {_format_ms(ms['p50']):>9} "
+                         f"{_format_ms(ms['p95']):>9} {_format_ms(ms['p99']):>9} {_format_ms(ms['max']):>9}")
+    if report['errors_by_job']:
+        lines.append("")
+        lines.append("errors:")
+        for error in report['errors_by_job']:
+            lines.append(f"  {error['count']:>8}  {error['fq_name']} {error['job'] or '[task]'}: {error['exception']}")
+    lines.append("")
+    lines.append(f"{'interval':<19} {'tasks':>8} {'errors':>7} {'tasks/s':>9} {'in flight':>9}")
+    for interval in report['intervals']:
+        lines.append(f"{_format_time(interval['start']):<19} {interval['completed']:>8} {interval['errors']:>7} "
+                     f"{interval['throughput_per_s']:>9.2f} {interval['concurrency']:>9.2f}")
+    if report['slowest']:
+        lines.append("")
+        lines.append("slowest tasks:")
+        for task in report['slowest']:
+            error = f" {task['error']}" if task['error'] else ""
+            lines.append(f"  {task['ms']:>10.1f}ms  {task['task_id']}  {task['fq_name']}  "
+                         f"{_format_time(task['started_at'])}{error}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="flow4ai-analyze",
+                                     description="Analyze Flow4AI trace and timeline files")
+    parser.add_argument("paths", nargs="+", help="Trace files from the jsonl or file exporter, or timeline files, "
+                                                 "optionally gzipped")
+    parser.add_argument("--interval", type=float, default=60.0,
+                        help="Seconds per interval of throughput and concurrency over time")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest tasks listed")
+    parser.add_argument("--task-window", type=float, default=60.0,
+                        help="Seconds after its latest span a task is considered finished")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        analyzer = TraceAnalyzer(args.interval, args.top, args.task_window)
+    except ValueError as e:
+        parser.error(str(e))
+    for path in args.paths:
+        try:
+            analyzer.add_file(path)
+        except OSError as e:
+            parser.exit(1, f"flow4ai-analyze: {e}\n")
+    report = analyzer.report()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Carries trace context with tasks and results across FlowManagerMP's process boundary, as
+W3C trace context headers, so the spans a task produces in the job executor and result
+processor processes join the trace of the code that submitted it.
+
+Each carrier also holds the time it was captured, so the span continuing the trace on the
+other side records how long the task or result spent queued, pickling included.
+"""
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry.propagate import extract, inject
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode, set_span_in_context
+
+from .otel_wrapper import TracerFactory
+
+# Carrier key holding the time the carrier was captured, in ns since the epoch
+SENT_AT_KEY = "flow4ai-sent-at"
+# Span of a task in FlowManagerMP's job executor process, the parent of its job spans
+TASK_SPAN = "flow4ai.task.process"
+# Span of on_complete handling a task's result
+ON_COMPLETE_SPAN = "flow4ai.task.on_complete"
+
+
+def capture_context() -> Optional[Dict[str, str]]:
+    """
+    The current trace context as a picklable carrier to send to another process,
+    or None if tracing is off.
+    """
+    if not TracerFactory._enabled:
+        return None
+    carrier = {SENT_AT_KEY: str(time.time_ns())}
+    inject(carrier)
+    return carrier
+
+
+@contextmanager
+def continue_trace(name: str, carrier: Optional[Dict[str, str]], attributes: Optional[Dict[str, Any]] = None,
+                   wait_attribute: Optional[str] = None) -> Iterator[Optional[Span]]:
+    """
+    A consumer span continuing the trace captured in carrier, current until the block exits.
+    Without trace context in carrier the span starts a new trace. Exceptions leaving the
+    block are recorded on the span.
+
+    Args:
+        name: The span name.
+        carrier: From capture_context() in the sending process, no span is created if None.
+        attributes: Attributes of the span, available to the sampler.
+        wait_attribute: Attribute recording the ms between capture_context() and the span starting.
+
+    Yields:
+        The span, or None if carrier is None or tracing is off.
+    """
+    if carrier is None or not TracerFactory._enabled:
+        yield None
+        return
+    started_at = time.time_ns()
+    attributes = dict(attributes) if attributes else {}
+    sent_at = carrier.get(SENT_AT_KEY)
+    if wait_attribute and sent_at:
+        # Processes share the wall clock, clamped in case it was adjusted in between
+        attributes[wait_attribute] = max(0, started_at - int(sent_at)) / 1e6
+    span = TracerFactory.get_tracer().start_span(name, context=extract(carrier), kind=SpanKind.CONSUMER,
+                                                 attributes=attributes, start_time=started_at)
+    context_token = otel_context.attach(set_span_in_context(span))
+    try:
+        yield span
+    except Exception as e:
+        if span.is_recording():
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, f"{type(e).__name__}: {e}"))
+        raise
+    finally:
+        otel_context.detach(context_token)
+        span.end()
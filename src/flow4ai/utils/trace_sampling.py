@@ -0,0 +1,230 @@
+"""
+Sampling of job traces, configured with the sampling section of otel_config.yaml or at
+runtime with FlowManager.configure_trace_sampling().
+
+Head sampling decides per task, when its first span starts, with a ratio per graph. Tail
+sampling records the spans of the other tasks without exporting them, and exports a
+task's trace when it has finished only if it failed or was slow.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult
+from opentelemetry.trace import SpanContext, StatusCode, TraceFlags, get_current_span
+
+# Span attribute naming the graph of a task's first job span, see trace_job_execution
+GRAPH_ATTRIBUTE = "flow4ai.graph"
+# Attribute added to the local root span of traces kept by tail sampling
+SAMPLED_BY_ATTRIBUTE = "flow4ai.sampled_by"
+_TRACE_ID_LIMIT = (1 << 64) - 1
+
+
+class TraceSampling:
+    """
+    Which task traces are exported.
+
+    Each task is head sampled with the ratio of its graph, looked up by fq_name and then
+    by graph name, or the default ratio. When keep_errors or slow_ms is set, the spans of
+    tasks that weren't head sampled are still recorded, and exported only if a job of the
+    task failed or the task took at least slow_ms; otherwise they are discarded without
+    being serialized or exported. With neither set, unsampled tasks aren't recorded at all.
+
+    In otel_config.yaml:
+
+        sampling:
+          ratio: 0.01
+          graphs:
+            rag_pipeline: 0.1
+          keep_errors: true
+          slow_ms: 2000
+    """
+
+    def __init__(
+        self,
+        ratio: float = 1.0,
+        graphs: Optional[Dict[str, float]] = None,
+        keep_errors: bool = True,
+        slow_ms: Optional[float] = None,
+        max_pending_traces: int = 10000
+    ):
+        """
+        Args:
+            ratio: Fraction of tasks whose traces are exported, for graphs not in graphs.
+            graphs: Ratios by fq_name or graph name.
+            keep_errors: Whether to export the traces of unsampled tasks in which a job failed.
+            slow_ms: Export the traces of unsampled tasks taking at least this long, None not to.
+            max_pending_traces: Unfinished unsampled traces to hold, the oldest is discarded beyond it.
+
+        Raises:
+            ValueError: If a ratio is not between 0 and 1
+        """
+        self.ratio = 1.0
+        self.graphs: Dict[str, float] = {}
+        self.keep_errors = True
+        self.slow_ms: Optional[float] = None
+        self.max_pending_traces = int(max_pending_traces)
+        self.configure(ratio=ratio, graphs=graphs, keep_errors=keep_errors, slow_ms=slow_ms)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> 'TraceSampling':
+        """Create from the sampling section of otel_config.yaml, sampling every task if None."""
+        if config is None:
+            return cls()
+        if not isinstance(config, dict):
+            raise TypeError(f"sampling must be a dict, got {type(config).__name__}")
+        return cls(**config)
+
+    def configure(self, ratio: Optional[float] = None, graphs: Optional[Dict[str, float]] = None,
+                  keep_errors: Optional[bool] = None, slow_ms: Optional[float] = None) -> None:
+        """
+        Change the policy, arguments left as None are unchanged. Applies to tasks starting afterwards.
+
+        Args:
+            ratio: Default head sampling ratio.
+            graphs: Ratios by fq_name or graph name, merged into the current ones.
+            keep_errors: Whether to export unsampled traces with failed jobs.
+            slow_ms: Export unsampled traces of tasks at least this slow, 0 to stop.
+
+        Raises:
+            ValueError: If a ratio is not between 0 and 1
+        """
+        for name, value in [("ratio", ratio)] + list((graphs or {}).items()):
+            if value is not None and not 0 <= value <= 1:
+                raise ValueError(f"Sampling ratio for {name} must be between 0 and 1, got {value}")
+        if ratio is not None:
+            self.ratio = float(ratio)
+        if graphs:
+            self.graphs = {**self.graphs, **{name: float(value) for name, value in graphs.items()}}
+        if keep_errors is not None:
+            self.keep_errors = bool(keep_errors)
+        if slow_ms is not None:
+            self.slow_ms = slow_ms or None
+
+    @property
+    def tail_sampling(self) -> bool:
+        """Whether unsampled tasks are recorded so failed or slow ones can still be exported."""
+        return self.keep_errors or self.slow_ms is not None
+
+    def head_ratio(self, graph: Optional[str]) -> float:
+        """The sampling ratio of a graph's tasks, by fq_name or graph name."""
+        if graph and self.graphs:
+            ratio = self.graphs.get(graph)
+            if ratio is None:
+                ratio = self.graphs.get(graph.split("$$", 1)[0])
+            if ratio is not None:
+                return ratio
+        return self.ratio
+
+    def keep(self, spans: List[ReadableSpan], root: ReadableSpan) -> bool:
+        """Whether the finished trace of an unsampled task is exported."""
+        if self.slow_ms is not None and (root.end_time - root.start_time) / 1e6 >= self.slow_ms:
+            return True
+        return self.keep_errors and any(
+            span.status.status_code == StatusCode.ERROR or span.attributes.get("flow4ai.job.outcome") == "error"
+            for span in spans)
+
+    def __repr__(self) -> str:
+        return (f"TraceSampling(ratio={self.ratio}, graphs={self.graphs}, "
+                f"keep_errors={self.keep_errors}, slow_ms={self.slow_ms})")
+
+
+class GraphSampler(Sampler):
+    """Samples root spans by the ratio of their graph and follows the parent for the others."""
+
+    def __init__(self, sampling: TraceSampling):
+        self.sampling = sampling
+
+    def should_sample(self, parent_context: Optional[Context], trace_id: int, name: str, kind=None,
+                      attributes=None, links=None, trace_state=None) -> SamplingResult:
+        parent = get_current_span(parent_context)
+        parent_span_context = parent.get_span_context()
+        if parent_span_context.is_valid:
+            if parent_span_context.trace_flags.sampled:
+                return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes, trace_state)
+            # Children of a recorded but unsampled span are kept for tail sampling, as are the
+            # spans continuing an unsampled trace from another process, e.g. FlowManagerMP tasks
+            if parent.is_recording() or (parent_span_context.is_remote and self.sampling.tail_sampling):
+                return SamplingResult(Decision.RECORD_ONLY, attributes, trace_state)
+            return SamplingResult(Decision.DROP, attributes, trace_state)
+
+        graph = attributes.get(GRAPH_ATTRIBUTE) if attributes else None
+        bound = round(self.sampling.head_ratio(graph) * (_TRACE_ID_LIMIT + 1))
+        if trace_id & _TRACE_ID_LIMIT < bound:
+            return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes, trace_state)
+        decision = Decision.RECORD_ONLY if self.sampling.tail_sampling else Decision.DROP
+        return SamplingResult(decision, attributes, trace_state)
+
+    def get_description(self) -> str:
+        return f"GraphSampler{{{self.sampling!r}}}"
+
+
+def _as_sampled(span: ReadableSpan, root: bool) -> ReadableSpan:
+    """A copy of a recorded, unsampled span flagged as sampled, so exporting processors accept it."""
+    context = SpanContext(span.context.trace_id, span.context.span_id, is_remote=False,
+                          trace_flags=TraceFlags(TraceFlags.SAMPLED), trace_state=span.context.trace_state)
+    attributes = {**span.attributes, SAMPLED_BY_ATTRIBUTE: "tail"} if root else span.attributes
+    return ReadableSpan(name=span.name, context=context, parent=span.parent, resource=span.resource,
+                        attributes=attributes, events=span.events, links=span.links, kind=span.kind,
+                        status=span.status, start_time=span.start_time, end_time=span.end_time,
+                        instrumentation_scope=span.instrumentation_scope)
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Passes sampled spans to the exporting processor, and holds the spans of unsampled traces
+    until their local root span ends, then passes them on only if TraceSampling.keep() says so.
+    """
+
+    def __init__(self, sampling: TraceSampling, processor: SpanProcessor):
+        self.sampling = sampling
+        self.processor = processor
+        self._lock = threading.Lock()
+        self._pending: 'OrderedDict[int, List[ReadableSpan]]' = OrderedDict()
+        self._stats = {'kept': 0, 'discarded': 0, 'evicted': 0}
+
+    def on_start(self, span, parent_context: Optional[Context] = None) -> None:
+        self.processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.context.trace_flags.sampled:
+            self.processor.on_end(span)
+            return
+        trace_id = span.context.trace_id
+        is_root = span.parent is None or span.parent.is_remote
+        with self._lock:
+            spans = self._pending.get(trace_id)
+            if spans is None:
+                spans = self._pending[trace_id] = []
+            spans.append(span)
+            if not is_root:
+                if len(self._pending) > self.sampling.max_pending_traces:
+                    self._pending.popitem(last=False)
+                    self._stats['evicted'] += 1
+                return
+            del self._pending[trace_id]
+        if self.sampling.keep(spans, span):
+            with self._lock:
+                self._stats['kept'] += 1
+            for pending in spans:
+                self.processor.on_end(_as_sampled(pending, pending is span))
+        else:
+            with self._lock:
+                self._stats['discarded'] += 1
+
+    def shutdown(self) -> None:
+        self.processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.processor.force_flush(timeout_millis)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns counts of unsampled traces kept (exported because they failed or were slow),
+        discarded, and evicted (dropped unfinished beyond max_pending_traces), and the number
+        of traces pending.
+        """
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending)}
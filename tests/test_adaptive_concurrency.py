@@ -0,0 +1,147 @@
+"""
+Tests for adaptive (AIMD) concurrency limits.
+
+Tests verify that:
+1. The limit grows while a local fake service answers quickly and without errors
+2. The limit backs off on 429 responses and latency spikes injected by the fake service
+3. A burst of failures from one congestion event decreases the limit only once
+4. The limit and its decisions are exposed as metrics, and the configuration is validated
+"""
+
+import asyncio
+import pickle
+
+import aiohttp
+import pytest
+
+from flow4ai.bench.fake_llm import FakeLLMServer
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.job import JobABC
+from flow4ai.utils.adaptive import AdaptiveLimiter
+from tests.test_utils.run_tasks import run_tasks
+
+
+class FakeService(FakeLLMServer):
+    """
+    A FakeLLMServer with a fixed capacity. Requests beyond capacity get a 429,
+    or if slow_latency is set, are answered after slow_latency instead of latency.
+    """
+
+    def __init__(self, capacity, latency=0.01, slow_latency=None):
+        super().__init__(latency=latency, max_concurrency=capacity, overload_latency=slow_latency)
+
+    @property
+    def rejected(self):
+        return self.stats()["rate_limited"]
+
+
+def client_for(service):
+    async def call_service():
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{service.base_url}/chat/completions", json={"messages": []}) as response:
+                response.raise_for_status()
+                return await response.json()
+    return call_service
+
+
+def test_limit_grows_while_healthy():
+    with FakeService(capacity=100) as service:
+        caller = job(caller=client_for(service), adaptive_concurrency={"initial_limit": 2, "max_limit": 8})
+        fm = FlowManager()
+        run_tasks(fm, fm.add_workflow(caller, "adaptive_healthy"), [{} for _ in range(80)], timeout=30)
+
+    assert fm.get_counts()["completed"] == 80
+    stats = caller.get_adaptive_concurrency_stats()
+    assert stats["limit"] > 2
+    assert stats["increases"] > 0
+    assert stats["decreases"] == 0
+    assert stats["peak_in_flight"] > 2
+    assert all(decision["action"] == "increase" for decision in stats["decisions"])
+    assert fm.get_concurrency_stats()["adaptive"][caller.name] == stats
+
+
+def test_limit_backs_off_on_429():
+    with FakeService(capacity=3) as service:
+        caller = job(caller=client_for(service),
+                     adaptive_concurrency={"initial_limit": 16, "max_limit": 32},
+                     retry={"max_attempts": 10, "initial_backoff": 0.01, "max_backoff": 0.05})
+        fm = FlowManager()
+        run_tasks(fm, fm.add_workflow(caller, "adaptive_429"), [{} for _ in range(60)], timeout=30)
+        rejected = service.rejected
+
+    assert fm.get_counts()["completed"] == 60
+    assert rejected > 0
+    stats = caller.get_adaptive_concurrency_stats()
+    assert stats["limit"] < 16
+    assert stats["decrease_reasons"]["rate_limited"] > 0
+    first = stats["decisions"][0]
+    assert (first["action"], first["reason"], first["limit"]) == ("decrease", "rate_limited", 8)
+
+
+def test_limit_backs_off_on_latency_spikes():
+    with FakeService(capacity=3, latency=0.005, slow_latency=0.1) as service:
+        caller = job(caller=client_for(service),
+                     adaptive_concurrency={"initial_limit": 12, "latency_threshold_ms": 50})
+        fm = FlowManager()
+        run_tasks(fm, fm.add_workflow(caller, "adaptive_latency"), [{} for _ in range(40)], timeout=30)
+
+    assert fm.get_counts()["completed"] == 40
+    stats = caller.get_adaptive_concurrency_stats()
+    assert stats["limit"] < 12
+    assert stats["decrease_reasons"]["latency"] > 0
+    assert stats["errors"] == 0
+
+
+def test_one_decrease_per_congestion_event():
+    limiter = AdaptiveLimiter("burst", initial_limit=8)
+
+    async def failing_call():
+        async with limiter.slot():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("overloaded")
+
+    async def burst():
+        return await asyncio.gather(*(failing_call() for _ in range(8)), return_exceptions=True)
+
+    errors = asyncio.run(burst())
+    assert all(isinstance(e, ConnectionError) for e in errors)
+    stats = limiter.stats()
+    assert stats["errors"] == 8
+    assert stats["decreases"] == 1
+    assert stats["limit"] == 4
+
+
+def test_errors_outside_backoff_on_keep_limit():
+    limiter = AdaptiveLimiter("validation", initial_limit=4, backoff_on=["ConnectionError"])
+
+    async def bad_request():
+        async with limiter.slot():
+            raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(bad_request())
+    assert limiter.stats()["decreases"] == 0
+    assert limiter.limit == 4
+
+
+def test_adaptive_concurrency_config():
+    class Caller(JobABC):
+        async def run(self, task):
+            return {}
+
+    caller = Caller("caller", {"adaptive_concurrency": {"initial_limit": 6, "backoff_on": "TimeoutError"}})
+    assert caller.adaptive_limiter.limit == 6
+    assert caller.adaptive_limiter.backoff_on == (TimeoutError,)
+    assert AdaptiveLimiter.from_config("defaults", True).limit == 4
+    assert AdaptiveLimiter.from_config("off", None) is None
+
+    copy = pickle.loads(pickle.dumps(caller.adaptive_limiter))
+    assert copy.limit == 6 and copy.backoff_on == (TimeoutError,)
+
+    with pytest.raises(ValueError):
+        AdaptiveLimiter("bad", initial_limit=10, max_limit=5)
+    with pytest.raises(ValueError):
+        AdaptiveLimiter("bad", backoff_ratio=1.5)
+    with pytest.raises(TypeError):
+        AdaptiveLimiter.from_config("bad", 8)
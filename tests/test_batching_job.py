@@ -0,0 +1,132 @@
+"""
+Tests for cross-task micro-batching with BatchingJob and job(fn, batch_size=..., max_wait_ms=...).
+
+Tests verify that:
+1. Items from concurrent tasks are coalesced into batch calls and results are scattered back
+2. Batches flush on size and on max_wait_ms
+3. Batch fill ratio and wait time metrics are reported
+4. Batch function errors and result count mismatches fail every task in the batch
+5. Sync batch functions run in a thread, and coalesce and hedge can't be combined with batching
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.jobs.batching_job import BatchingJob
+from flow4ai.utils.batching import MicroBatcher
+
+
+def test_concurrent_tasks_are_batched():
+    calls = []
+
+    async def embed_batch(items):
+        calls.append(list(items))
+        return [len(item["text"]) for item in items]
+
+    embed = job(embed=embed_batch, batch_size=4, max_wait_ms=200)
+    assert isinstance(embed, BatchingJob)
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(embed, "batch_tasks")
+    for i in range(8):
+        fm.submit_task({"embed": {"text": "x" * i}}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    results = fm.pop_results()
+    assert not results["errors"]
+    assert sorted(r["result"] for r in results["completed"][fq_name]) == list(range(8))
+    assert [len(batch) for batch in calls] == [4, 4]
+    assert all(isinstance(item, dict) for batch in calls for item in batch)
+
+    stats = embed.get_batch_stats()
+    assert stats["batches"] == 2
+    assert stats["items"] == 8
+    assert stats["size_flushes"] == 2
+    assert stats["fill_ratio"] == 1.0
+
+
+def test_batching_from_predecessor_output():
+    def upper_batch(items):
+        return [item["result"].upper() for item in items]
+
+    workflow = job(chunk=lambda text: text) >> job(upper=upper_batch, batch_size=8, max_wait_ms=5)
+    errors, result = FlowManager.run(workflow, {"chunk": {"text": "abc"}}, "batch_predecessor")
+
+    assert not errors
+    assert result["result"] == "ABC"
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_flushes_after_max_wait():
+    batcher = MicroBatcher(lambda items: [i * 2 for i in items], batch_size=10, max_wait_ms=20)
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+    assert results == [0, 2, 4]
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["timeout_flushes"] == 1
+    assert stats["fill_ratio"] == pytest.approx(0.3)
+    assert stats["max_wait_ms"] >= 15
+
+
+@pytest.mark.asyncio
+async def test_batch_error_fails_each_item():
+    def broken(items):
+        raise RuntimeError("model unavailable")
+
+    batcher = MicroBatcher(broken, batch_size=2, max_wait_ms=10)
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_result_count_mismatch():
+    batcher = MicroBatcher(lambda items: items[:1], batch_size=2, max_wait_ms=10)
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert "1 results for 2 items" in str(results[0])
+
+
+def test_batch_options_validation():
+    with pytest.raises(TypeError):
+        job(a=job(b=str.upper), batch_size=4)
+    with pytest.raises(ValueError):
+        job(embed=list, batch_size=0)
+    for option in ("coalesce", "hedge"):
+        with pytest.raises(TypeError, match=option):
+            job(embed=list, batch_size=4, **{option: True})
+
+
+@pytest.mark.asyncio
+async def test_sync_batch_function_runs_in_thread():
+    loop_thread = threading.get_ident()
+    ticks = 0
+    seen = {}
+
+    def embed_batch(items):
+        seen["thread"] = threading.get_ident()
+        time.sleep(0.1)
+        # The loop kept ticking while the batch ran
+        seen["ticks"] = ticks
+        return [item.upper() for item in items]
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    batcher = MicroBatcher(embed_batch, batch_size=2, max_wait_ms=10)
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), ticker())
+
+    assert results[:2] == ["A", "B"]
+    assert seen["thread"] != loop_thread
+    assert seen["ticks"] >= 3
@@ -0,0 +1,140 @@
+"""
+Tests for the benchmarking tools in flow4ai.bench.
+
+Tests verify that:
+1. Latency specifications sample the configured distributions and reject unknown ones
+2. FakeLLMServer injects 429s and 500s and rate limits beyond max_concurrency
+   or serves those requests slowly, and returns fixed content, usage and error statuses
+3. OpenAIJob streams and embeds against FakeLLMServer
+4. run_benchmark reports throughput and latency percentiles for FlowManager
+5. Failing OpenAI calls in FlowManagerMP are counted as errors without hanging the run
+"""
+
+import asyncio
+
+import pytest
+from openai import AsyncOpenAI
+
+from flow4ai.bench.fake_llm import API_KEY_ENV, FakeLLMServer, latency_sampler
+from flow4ai.bench.graphs import llm_properties
+from flow4ai.bench.load import run_benchmark
+from flow4ai.job_stream import ResultStream
+from flow4ai.jobs.openai_jobs import OpenAIJob
+
+
+@pytest.fixture(autouse=True)
+def bench_api_key(monkeypatch):
+    monkeypatch.setenv(API_KEY_ENV, "bench")
+
+
+def test_latency_sampler_distributions():
+    assert latency_sampler(0.25)() == 0.25
+    assert latency_sampler({"distribution": "constant", "ms": 40})() == 0.04
+
+    uniform = latency_sampler({"distribution": "uniform", "min_ms": 10, "max_ms": 20}, seed=1)
+    assert all(0.01 <= uniform() <= 0.02 for _ in range(200))
+
+    lognormal = latency_sampler({"distribution": "lognormal", "p50_ms": 50, "p99_ms": 500}, seed=1)
+    samples = sorted(lognormal() for _ in range(5000))
+    assert 0.04 < samples[2500] < 0.06
+    assert 0.3 < samples[4950] < 0.8
+
+    tail = latency_sampler({"ms": 1, "tail_rate": 0.1, "tail_ms": 1000}, seed=1)
+    assert 0.05 < sum(tail() == 1.0 for _ in range(2000)) / 2000 < 0.15
+
+    with pytest.raises(ValueError):
+        latency_sampler({"distribution": "pareto"})
+
+
+def test_server_injects_errors_and_limits_concurrency():
+    async def call_all(server, count):
+        client = AsyncOpenAI(base_url=server.base_url, api_key="bench", max_retries=0)
+        try:
+            return await asyncio.gather(*[
+                client.chat.completions.create(model="fake-model", messages=[{"role": "user", "content": "hi"}])
+                for _ in range(count)], return_exceptions=True)
+        finally:
+            await client.close()
+
+    with FakeLLMServer(error_rate=0.2, rate_limit_rate=0.2, seed=7) as server:
+        results = asyncio.run(call_all(server, 100))
+        stats = server.stats()
+    failures = [r for r in results if isinstance(r, Exception)]
+    assert stats['requests'] == 100
+    assert len(failures) == stats['errors'] + stats['rate_limited']
+    assert stats['errors'] > 0 and stats['rate_limited'] > 0
+    assert stats['completed'] == 100 - len(failures)
+
+    with FakeLLMServer(latency=0.2, max_concurrency=5) as server:
+        results = asyncio.run(call_all(server, 20))
+        stats = server.stats()
+    assert stats['rate_limited'] == 15
+    assert sum(not isinstance(r, Exception) for r in results) == 5
+    assert stats['in_flight'] == 0
+
+
+def test_server_overload_latency_content_and_status():
+    async def call_all(server, count):
+        client = AsyncOpenAI(base_url=server.base_url, api_key="bench", max_retries=0)
+        try:
+            return await asyncio.gather(*[
+                client.chat.completions.create(model="fake-model", messages=[{"role": "user", "content": "hi"}])
+                for _ in range(count)], return_exceptions=True)
+        finally:
+            await client.close()
+
+    with FakeLLMServer(latency=0.05, max_concurrency=2, overload_latency=0.3,
+                       content=["o", "k"], completion_tokens=1, prompt_tokens=9) as server:
+        results = asyncio.run(call_all(server, 6))
+        stats = server.stats()
+    assert stats['rate_limited'] == 0 and stats['completed'] == 6
+    assert all(r.choices[0].message.content == "ok" and r.usage.total_tokens == 10 for r in results)
+
+    with FakeLLMServer(error_rate=1.0, error_status=503) as server:
+        results = asyncio.run(call_all(server, 2))
+    assert all(getattr(r, "status_code", None) == 503 for r in results)
+
+
+def test_openai_job_streams_and_embeds():
+    with FakeLLMServer(completion_tokens=6, tokens_per_second=200) as server:
+        llm = OpenAIJob("bench_stream", llm_properties(server.base_url, {"api": {"model": "fake-model", "stream": True}}))
+
+        async def call():
+            stream = await llm.run({"prompt": "Stream please"})
+            assert isinstance(stream, ResultStream)
+            chunks = [chunk async for chunk in stream]
+            client = AsyncOpenAI(base_url=server.base_url, api_key="bench")
+            embeddings = await client.embeddings.create(model="fake-embedding", input=["a", "b", "a"])
+            await client.close()
+            return chunks, await stream, embeddings
+
+        chunks, result, embeddings = asyncio.run(call())
+        stats = server.stats()
+
+    assert len(chunks) == 6
+    assert result["response"] == "".join(chunks)
+    assert stats['streamed'] == 1 and stats['embeddings'] == 3
+    vectors = [item.embedding for item in embeddings.data]
+    assert len(vectors[0]) == 64
+    assert vectors[0] == vectors[2] and vectors[0] != vectors[1]
+
+
+def test_run_benchmark_reports_percentiles():
+    with FakeLLMServer(latency={"distribution": "uniform", "min_ms": 20, "max_ms": 60}, seed=3) as server:
+        report = run_benchmark("fanout", "flowmanager", tasks=20, server=server, timeout=60)
+
+    assert report['completed'] == 20 and report['errors'] == 0
+    assert report['server']['requests'] == 60
+    latency = report['latency_ms']
+    assert 20 <= latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max']
+    assert report['throughput_per_s'] > 0
+
+
+def test_run_benchmark_mp_counts_failed_calls():
+    with FakeLLMServer(rate_limit_rate=0.3, error_rate=0.1, seed=11) as server:
+        report = run_benchmark("rag", "mp", tasks=20, server=server, timeout=120)
+
+    failed_calls = report['server']['rate_limited'] + report['server']['errors']
+    assert failed_calls > 0
+    assert report['errors'] > 0
+    assert report['completed'] + report['errors'] == 20
@@ -0,0 +1,107 @@
+"""
+Tests for per-job concurrency limits (bulkheads).
+
+Tests verify that:
+1. max_concurrency bounds concurrent calls of a job across all in-flight tasks
+2. Jobs in the same concurrency_group share one limit across graphs
+3. Queue wait metrics are reported
+4. Limits are configured from the DSL and from job properties, and validated
+"""
+
+import asyncio
+import pickle
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.job import JobABC
+from flow4ai.utils.bulkhead import Bulkhead
+
+
+class ConcurrencyProbe:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def call(self):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.02)
+        self.in_flight -= 1
+        return {"ok": True}
+
+
+def test_max_concurrency_across_tasks():
+    probe = ConcurrencyProbe()
+
+    async def query():
+        return await probe.call()
+
+    search = job(search=query, max_concurrency=3)
+    fm = FlowManager()
+    fq_name = fm.add_workflow(search, "bulkhead_tasks")
+    fm.submit_task([{} for _ in range(15)], fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.05)
+
+    assert fm.get_counts()["completed"] == 15
+    assert probe.peak == 3
+    stats = search.get_concurrency_stats()
+    assert stats["limit"] == 3
+    assert stats["acquired"] == 15
+    assert stats["peak_in_flight"] == 3
+    assert stats["in_flight"] == 0
+    assert stats["max_wait_ms"] > 0
+    assert fm.get_concurrency_stats()["jobs"][search.name] == stats
+
+
+def test_concurrency_group_shared_across_graphs():
+    probe = ConcurrencyProbe()
+
+    async def read():
+        return await probe.call()
+
+    async def write():
+        return await probe.call()
+
+    fm = FlowManager()
+    reader = fm.add_workflow(job(read=read, max_concurrency=2, concurrency_group="test_vector_db"), "bulkhead_reader")
+    writer = fm.add_workflow(job(write=write, concurrency_group="test_vector_db"), "bulkhead_writer")
+    for _ in range(6):
+        fm.submit_task({}, reader)
+        fm.submit_task({}, writer)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.05)
+
+    assert fm.get_counts()["completed"] == 12
+    assert probe.peak == 2
+    group_stats = fm.get_concurrency_stats()["groups"]["test_vector_db"]
+    assert group_stats["acquired"] == 12
+    assert group_stats["peak_in_flight"] == 2
+
+
+def test_max_concurrency_from_properties():
+    class Lookup(JobABC):
+        async def run(self, task):
+            return {}
+
+    lookup = Lookup("lookup", {"max_concurrency": 5})
+    assert lookup.bulkhead.limit == 5
+    assert not lookup.bulkhead.shared
+
+    lookup.update_properties({"max_concurrency": 2})
+    assert lookup.bulkhead.limit == 2
+
+
+def test_shared_group_survives_pickling():
+    group = Bulkhead.get_group("test_pickled_group", 4)
+    assert pickle.loads(pickle.dumps(group)) is group
+
+
+def test_bulkhead_validation():
+    with pytest.raises(ValueError):
+        Bulkhead("zero", 0)
+    with pytest.raises(ValueError):
+        Bulkhead.get_group("test_unknown_group")
+    Bulkhead.get_group("test_fixed_group", 3)
+    with pytest.raises(ValueError):
+        Bulkhead.get_group("test_fixed_group", 4)
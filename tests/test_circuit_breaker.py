@@ -0,0 +1,208 @@
+"""
+Tests for circuit breakers.
+
+Tests verify that:
+1. A breaker opens once the failure rate reaches its threshold, and then rejects calls without making them
+2. After open_seconds a half-open trial call closes the breaker again, or reopens it if it fails
+3. The skip fallback skips a job so a parallel graph still completes, a callable fallback returns a result
+4. Jobs naming a group share one breaker, and OpenAIJobs calling the same API share one by default
+5. Breaker state is reported by FlowManager and FlowManagerMP
+6. Breakers are configured from the DSL and from job properties, and validated
+"""
+
+import asyncio
+import pickle
+
+import pytest
+from openai import AsyncOpenAI
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.job import JobABC
+from flow4ai.jobs.openai_jobs import OpenAIJob
+from flow4ai.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from tests.test_utils.fake_openai import FakeOpenAI
+
+
+class FlakyService:
+    def __init__(self):
+        self.healthy = False
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        if not self.healthy:
+            raise ConnectionError("service unavailable")
+        return {"ok": True}
+
+
+def test_opens_on_failure_rate_and_rejects_calls():
+    service = FlakyService()
+    breaker = CircuitBreaker("test_opens", failure_rate_threshold=0.5, min_calls=4, window=4, open_seconds=60)
+
+    async def calls():
+        for _ in range(4):
+            with pytest.raises(ConnectionError):
+                await breaker.call(service.call)
+        with pytest.raises(CircuitOpenError) as rejected:
+            await breaker.call(service.call)
+        return rejected.value
+
+    rejected = asyncio.run(calls())
+    assert service.calls == 4
+    assert rejected.breaker_name == "test_opens"
+    assert rejected.retry_in > 59
+    stats = breaker.stats()
+    assert stats["state"] == CircuitBreaker.OPEN
+    assert stats["failure_rate"] == 1.0
+    assert stats["failures"] == 4
+    assert stats["rejected"] == 1
+
+
+def test_half_open_trial_closes_or_reopens():
+    service = FlakyService()
+    breaker = CircuitBreaker("test_half_open", min_calls=2, window=2, open_seconds=0.05)
+
+    async def calls():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await breaker.call(service.call)
+        assert breaker.state == CircuitBreaker.OPEN
+        await asyncio.sleep(0.06)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # The trial fails, so the breaker opens again
+        with pytest.raises(ConnectionError):
+            await breaker.call(service.call)
+        assert breaker.state == CircuitBreaker.OPEN
+        service.healthy = True
+        await asyncio.sleep(0.06)
+        return await breaker.call(service.call)
+
+    assert asyncio.run(calls()) == {"ok": True}
+    assert breaker.state == CircuitBreaker.CLOSED
+    # closed -> open -> half_open -> open -> half_open -> closed
+    assert breaker.transitions == 5
+
+
+def test_skip_fallback_completes_parallel_graph():
+    service = FlakyService()
+
+    async def search():
+        return await service.call()
+
+    def join(j_ctx):
+        return {"joined": sorted(name for name in ("search", "cached") if name in j_ctx["inputs"])}
+
+    breaker = {"min_calls": 2, "window": 2, "open_seconds": 60, "fallback": "skip"}
+    search_job = job(search=search, circuit_breaker=breaker)
+    workflow = (search_job | job(cached=lambda: {"cached": True})) >> job(join=join)
+    fm = FlowManager()
+    fq_name = fm.add_workflow(workflow, "breaker_skip")
+    fm.submit_task([{} for _ in range(2)], fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.05)
+    assert fm.get_counts()["errors"] == 2
+    fm.pop_results()
+
+    fm.submit_task([{} for _ in range(3)], fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.05)
+
+    # Once open, search is skipped without calling the service and join runs with the other branch
+    assert service.calls == 2
+    results = fm.pop_results()
+    assert not results["errors"]
+    assert [result["joined"] for result in results["completed"][fq_name]] == [["cached"]] * 3
+    stats = fm.get_circuit_breaker_stats()["jobs"][search_job.name]
+    assert stats["state"] == CircuitBreaker.OPEN
+    assert stats["rejected"] == 3
+
+
+def test_callable_fallback_returns_result():
+    class Lookup(JobABC):
+        async def run(self, task):
+            raise ConnectionError("primary down")
+
+    lookup = Lookup("lookup_with_fallback", {
+        "circuit_breaker": {"min_calls": 1, "window": 1, "fallback": lambda task: {"source": "fallback"}}})
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(lookup, "breaker_fallback")
+    with pytest.raises(Exception, match="primary down"):
+        fm.execute({}, fq_name=fq_name)
+
+    errors, result = fm.execute({}, fq_name=fq_name)
+    assert not errors
+    assert result["source"] == "fallback"
+
+
+def test_group_shared_by_jobs_and_openai_jobs():
+    first = job(first=lambda: {}, circuit_breaker={"group": "test_vector_db", "min_calls": 3})
+    second = job(second=lambda: {}, circuit_breaker={"group": "test_vector_db"})
+    assert first.circuit_breaker is second.circuit_breaker
+    assert pickle.loads(pickle.dumps(first.circuit_breaker)) is first.circuit_breaker
+    assert "test_vector_db" in FlowManager().get_circuit_breaker_stats()["groups"]
+
+    breaker = {"min_calls": 2, "window": 2, "open_seconds": 60}
+    llms = [OpenAIJob(f"breaker_llm_{i}", {"api": {"model": "fake-model"}, "circuit_breaker": dict(breaker)})
+            for i in range(2)]
+    assert llms[0].circuit_breaker is llms[1].circuit_breaker
+    assert llms[0].circuit_breaker.name == "openai:default"
+
+    with FakeOpenAI(status=503) as service:
+        for llm in llms:
+            llm.client = AsyncOpenAI(base_url=service.base_url, api_key="test-key", max_retries=0)
+
+        async def calls():
+            outcomes = []
+            for llm in llms * 2:
+                try:
+                    await llm._guarded_call({"prompt": "hello"})
+                except Exception as e:
+                    outcomes.append(type(e))
+            return outcomes
+
+        outcomes = asyncio.run(calls())
+
+    # Two failures, across both jobs, open the shared breaker before the API is called again
+    assert service.calls == 2
+    assert outcomes[2:] == [CircuitOpenError, CircuitOpenError]
+
+
+class FailingMPJob(JobABC):
+    async def run(self, task):
+        raise ConnectionError("mp service unavailable")
+
+
+def test_breaker_stats_in_flowmanagerMP():
+    failing = FailingMPJob("failing_mp", {"circuit_breaker": {"min_calls": 2, "window": 2, "open_seconds": 60}})
+    fm = FlowManagerMP({"mp_breaker": failing}, lambda result: None, serial_processing=True)
+    for i in range(4):
+        fm.submit_task({"id": i})
+    with pytest.raises(RuntimeError, match="4 error"):
+        fm.close_processes()
+
+    stats = fm.get_circuit_breaker_stats()["jobs"][failing.name]
+    assert stats["state"] == CircuitBreaker.OPEN
+    assert stats["failures"] == 2
+    assert stats["rejected"] == 2
+
+
+def test_breaker_configuration():
+    lookup = job(lookup=lambda: {}, circuit_breaker=True)
+    assert lookup.circuit_breaker.name == lookup.name
+    assert lookup.circuit_fallback == CircuitBreaker.ERROR
+    lookup.update_properties({"circuit_breaker": {"failure_on": "TimeoutError", "fallback": "skip"}})
+    assert lookup.circuit_breaker.failure_on == (TimeoutError,)
+    assert lookup.circuit_fallback == CircuitBreaker.SKIP
+
+    with pytest.raises(ValueError):
+        CircuitBreaker("bad_threshold", failure_rate_threshold=0)
+    with pytest.raises(ValueError):
+        CircuitBreaker("bad_window", min_calls=10, window=5)
+    with pytest.raises(ValueError):
+        CircuitBreaker.get_fallback({"fallback": "retry"})
+    with pytest.raises(TypeError):
+        CircuitBreaker.from_config("bad_config", "open")
+    CircuitBreaker.get_group("test_fixed_breaker", {"open_seconds": 10})
+    with pytest.raises(ValueError):
+        CircuitBreaker.get_group("test_fixed_breaker", {"open_seconds": 20})
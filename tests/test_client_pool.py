@@ -0,0 +1,147 @@
+"""
+Tests for clients pooled per event loop.
+
+Tests verify that:
+1. Each event loop and configuration gets one client, shared by calls in that loop
+2. A loop's clients are closed when the loop shuts down, or on demand with aclose()
+3. OpenAIJobs work from asyncio.run() calls and several FlowManagers without resetting clients
+4. HTTP connection pool limits are applied from the client properties
+5. Clients are closed by FlowManager.close() and by close(), including clients created outside a loop
+"""
+
+import asyncio
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.jobs.openai_jobs import OpenAIClient, OpenAIJob
+from flow4ai.utils.client_pool import LoopClientPool
+from tests.test_utils.fake_openai import FakeOpenAI
+
+
+class FakeClient:
+    def __init__(self, config):
+        self.config = config
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_one_client_per_loop_and_config():
+    pool = LoopClientPool("test_per_loop", FakeClient)
+
+    async def get_clients():
+        return pool.get({"model": "a"}), pool.get({"model": "a"}), pool.get({"model": "b"})
+
+    first, same, other = asyncio.run(get_clients())
+    assert first is same
+    assert other is not first
+    assert other.config == {"model": "b"}
+
+    second_loop, _, _ = asyncio.run(get_clients())
+    assert second_loop is not first
+    assert pool.stats()["created"] == 4
+
+
+def test_clients_closed_on_loop_shutdown():
+    pool = LoopClientPool("test_shutdown", FakeClient)
+
+    async def use_client():
+        client = pool.get()
+        assert pool.stats()["loops"] == 1
+        return client
+
+    client = asyncio.run(use_client())
+    assert client.closed
+    stats = pool.stats()
+    assert stats["loops"] == 0
+    assert stats["clients"] == 0
+    assert stats["closed"] == 1
+
+    async def close_early():
+        client = pool.get()
+        await pool.aclose()
+        assert client.closed
+        replacement = pool.get()
+        assert replacement is not client
+        assert not replacement.closed
+
+    asyncio.run(close_early())
+    assert pool.stats()["created"] == 3
+    assert pool.stats()["closed"] == 3
+
+
+def test_openai_jobs_across_loops_and_flowmanagers(monkeypatch):
+    monkeypatch.setenv("FAKE_OPENAI_API_KEY", "test-key")
+    with FakeOpenAI() as service:
+        client = {"base_url": service.base_url, "api_key": "FAKE_OPENAI_API_KEY", "max_retries": 0}
+        llm = OpenAIJob("pooled_llm", {"client": client, "api": {"model": "fake-model"}})
+        closed = OpenAIClient.pool.stats()["closed"]
+
+        # Consecutive asyncio.run() calls used to fail on the client bound to the first loop
+        for _ in range(2):
+            assert asyncio.run(llm.run({"prompt": "hello"})) == {"response": "ok"}
+
+        async def ask(j_ctx):
+            return await llm.run({"prompt": "hello"})
+
+        for graph_name in ("pooled_first", "pooled_second"):
+            errors, result = FlowManager.run(job(ask=ask), {}, graph_name)
+            assert not errors
+            assert result["response"] == "ok"
+
+    assert service.calls == 4
+    # Both asyncio.run() loops and both FlowManagers, closed by run(), closed their clients
+    assert OpenAIClient.pool.stats()["closed"] - closed == 4
+
+
+def test_connection_limits_from_client_properties(monkeypatch):
+    monkeypatch.setenv("FAKE_OPENAI_API_KEY", "test-key")
+    params = {"api_key": "FAKE_OPENAI_API_KEY",
+              "connection_limits": {"max_connections": 8, "max_keepalive_connections": 4, "keepalive_expiry": 2}}
+
+    async def get_client():
+        return OpenAIClient.get_client(params)
+
+    client = asyncio.run(get_client())
+    connections = client._client._transport._pool
+    assert connections._max_connections == 8
+    assert connections._max_keepalive_connections == 4
+    assert connections._keepalive_expiry == 2
+    # The job's params are not consumed by creating the client
+    assert params["api_key"] == "FAKE_OPENAI_API_KEY"
+
+
+def test_clients_closed_by_flowmanager_and_close():
+    pool = LoopClientPool("test_close", FakeClient)
+    unbound = pool.get()
+
+    async def use_client(j_ctx):
+        return {"client": pool.get()}
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(use_client=use_client), "client_pool_close")
+    first = fm.execute({}, fq_name=fq_name)[1]["client"]
+    fm.close()
+    assert first.closed
+    assert not unbound.closed
+
+    # close() reaches clients of loops still running in other threads
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(use_client=use_client), "client_pool_close")
+    second = fm.execute({}, fq_name=fq_name)[1]["client"]
+    pool.close()
+    assert second.closed
+    assert unbound.closed
+    stats = pool.stats()
+    assert stats["clients"] == 0
+    assert stats["closed"] == 3
+    fm.close()
+
+    async def close_in_loop():
+        pool.close()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(close_in_loop())
@@ -3,6 +3,7 @@ Tests for the DSL (Domain Specific Language) module of Flow4AI.
 
 This test suite covers:
 - Wrapping callables with the wrap/w function
+- Functions and jobs named like job() options, e.g. job(retry=fn)
 - Parallel composition using | operator and parallel/p function
 - Serial composition using >> operator and serial/s function
 - Graph evaluation with GraphCreator.evaluate
@@ -185,6 +186,23 @@ class TestWrapping:
         assert isinstance(wrapped2, WrappingJob)
         assert wrapped2.name == "extractor"
 
+    def test_wrap_jobs_named_like_options(self):
+        """Test that functions and jobs passed under job() option names are jobs, not options."""
+        traced = job(trace=mock_text_processing)
+        assert isinstance(traced, WrappingJob)
+        assert traced.name == "trace"
+        assert traced.traced
+
+        jobs = job(retry=mock_data_extraction, hedge=LLMSummarizer())
+        assert set(jobs) == {"retry", "hedge"}
+        assert jobs["retry"].retry_policy is None
+        assert jobs["hedge"].name == "hedge"
+
+        # Option values still apply to the other jobs
+        jobs = job(retry=mock_data_extraction, coalesce=mock_text_processing, trace=False)
+        assert set(jobs) == {"retry", "coalesce"}
+        assert not jobs["retry"].traced and not jobs["coalesce"].traced
+
 
 class TestParallelComposition:
     """Tests for parallel composition using | operator and parallel/p function."""
@@ -0,0 +1,122 @@
+"""
+Tests for task failure policies.
+
+Tests verify that:
+1. fail_fast cancels the in-flight sibling branches of a failed job and fails the task at once
+2. continue lets the other branches finish, joins run without the failed branch and errors are collected
+3. continue fails the task when no tail result could be produced
+4. The policy is validated and also applies in FlowManagerMP
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.job import JobABC
+
+
+def explode():
+    raise RuntimeError("branch exploded")
+
+
+def join(j_ctx):
+    inputs = j_ctx["inputs"]
+    return {"joined": sorted(name for name in ("fails", "slow", "ok") if name in inputs)}
+
+
+def test_fail_fast_cancels_siblings():
+    state = {"cancelled": False, "finished": False}
+
+    async def slow():
+        try:
+            await asyncio.sleep(3)
+            state["finished"] = True
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        return {"slow": True}
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow((job(fails=explode) | job(slow=slow)) >> job(join=join), "fail_fast_siblings")
+    start = time.perf_counter()
+    fm.submit_task({}, fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.05)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.5
+    assert fm.get_counts()["errors"] == 1
+    assert "branch exploded" in str(fm.pop_results()["errors"][fq_name][0]["error"])
+    assert state["cancelled"]
+    assert not state["finished"]
+
+
+def test_continue_collects_errors_and_joins():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {"slow": True}
+
+    workflow = (job(fails=explode) | job(slow=slow) | job(ok=lambda: {"ok": True})) >> job(join=join)
+    errors, result = FlowManager.run(workflow, {}, "continue_join", failure_policy=JobABC.CONTINUE)
+
+    assert not errors
+    assert result["joined"] == ["ok", "slow"]
+    assert len(result[JobABC.ERRORS]) == 1
+    assert result[JobABC.ERRORS][0]["job"] == "fails"
+    assert "branch exploded" in str(result[JobABC.ERRORS][0]["error"])
+
+
+def test_continue_skips_successors_of_failed_job():
+    calls = []
+
+    def after_failure(j_ctx):
+        calls.append("after_failure")
+        return {}
+
+    workflow = (job(fails=explode) >> job(after_failure=after_failure)) | job(ok=lambda: {"ok": True})
+    errors, result = FlowManager.run(workflow, {}, "continue_skip", failure_policy=JobABC.CONTINUE)
+
+    assert not errors
+    assert calls == []
+    assert "ok" in result
+    assert "after_failure" not in result
+
+
+def test_continue_fails_task_without_tail_result():
+    fm = FlowManager(failure_policy=JobABC.CONTINUE)
+    fq_name = fm.add_workflow(job(ok=lambda: {"ok": True}) >> job(fails=explode), "continue_tail_fails")
+    fm.submit_task({}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    assert fm.get_counts()["errors"] == 1
+    assert "branch exploded" in str(fm.pop_results()["errors"][fq_name][0]["error"])
+
+
+def test_invalid_failure_policy():
+    with pytest.raises(ValueError):
+        FlowManager(failure_policy="ignore")
+
+
+class PartialFailureJob(JobABC):
+    async def run(self, task):
+        raise RuntimeError("mp branch exploded")
+
+
+class OkJob(JobABC):
+    async def run(self, task):
+        return {"ok": True}
+
+
+def test_continue_policy_in_flowmanagerMP():
+    results = []
+    workflow = PartialFailureJob("fails_mp") | OkJob("ok_mp")
+    fm = FlowManagerMP({"mp_continue": workflow}, results.append, serial_processing=True, failure_policy=JobABC.CONTINUE)
+    fm.submit_task({"id": 1})
+    fm.close_processes()
+
+    assert len(results) == 1
+    assert results[0]["ok_mp"]["ok"] is True
+    assert results[0][JobABC.ERRORS][0]["job"] == "fails_mp"
@@ -226,6 +226,24 @@ def test_singleton_parameters():
     assert not different_callback_called[0], "New callback should not have been called"
 
 
+def test_singleton_timeline_and_profiling():
+    """Test that FlowManager.instance() passes timeline, on_timeline and profiling on."""
+    FlowManager.reset_instance()
+    timelines = []
+    fm = FlowManager.instance(timeline=True, on_timeline=timelines.append, profiling={"ratio": 1.0})
+    try:
+        fq_name = fm.add_workflow(job({"timed_job": lambda j_ctx: {"ok": True}}), "timeline_singleton")
+        fm.submit_task({"x": 1}, fq_name)
+        assert fm.wait_for_completion(timeout=5)
+
+        result = fm.pop_results()["completed"][fq_name][0]
+        assert "timed_job" in result[JobABC.TIMELINE]["jobs"]
+        assert [t["fq_name"] for t in timelines] == [fq_name]
+        assert fm.get_profile_stats()["tasks_profiled"] == 1
+    finally:
+        FlowManager.reset_instance()
+
+
 def test_wait_for_completion_no_tasks():
     """Test that FlowManager.wait_for_completion() doesn't hang when no tasks are submitted."""
     # Rule Applied: Test code for correctness and Base decisions on evidence
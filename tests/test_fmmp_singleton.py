@@ -17,6 +17,7 @@ from flow4ai import f4a_logging as logging
 from flow4ai.flowmanagerMP import FlowManagerMP
 from flow4ai.job import JobABC
 from flow4ai.job_loader import ConfigLoader
+from flow4ai.utils.timeline import TimelineWriter, read_timelines
 
 # Global results list for picklable on_complete
 RESULTS: List[dict] = []
@@ -276,3 +277,23 @@ def test_multiprocessing_initialization():
     # Verify the task was processed
     assert len(results) == 1
     assert results[0]["status"] == "complete"
+
+
+def test_singleton_timeline_and_profiling(tmp_path):
+    """Test that FlowManagerMP.instance() passes timeline, on_timeline and profiling on."""
+    FlowManagerMP.reset_instance()
+    path = tmp_path / "singleton_timelines.jsonl"
+    results = []
+    fm = FlowManagerMP.instance(BasicTestJob("TimedJob"), results.append, serial_processing=True,
+                                timeline=True, on_timeline=TimelineWriter(str(path)),
+                                profiling={"ratio": 1.0, "output_dir": str(tmp_path)})
+    try:
+        fm.submit_task({"x": 1})
+        fm.close_processes()
+
+        assert len(results) == 1
+        assert "TimedJob" in results[0][JobABC.TIMELINE]["jobs"]
+        assert [t["task_id"] for t in read_timelines(str(path))] == [results[0][JobABC.TIMELINE]["task_id"]]
+        assert fm.get_profile_stats()["tasks_profiled"] == 1
+    finally:
+        FlowManagerMP.reset_instance()
@@ -0,0 +1,168 @@
+"""
+Tests for hedged requests.
+
+Tests verify that:
+1. Against a fake service with heavy-tailed latency, hedging cuts the p99 latency of OpenAIJob
+2. A slow async call is duplicated after the hedge delay, the first response wins and the other is cancelled
+3. Hedges are capped by max_hedge_rate, and errors only surface when every attempt fails
+4. The policy is configured from the DSL and from job properties, and validated
+5. Calls answered by their hedge are recorded as slow, so the hedge delay doesn't drift down
+"""
+
+import asyncio
+import random
+import time
+
+import pytest
+from openai import AsyncOpenAI
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.jobs.openai_jobs import OpenAIJob
+from flow4ai.utils.hedging import HedgingPolicy, percentile
+from tests.test_utils.fake_openai import FakeOpenAI
+
+WARMUP_CALLS = 30
+MEASURED_CALLS = 200
+
+
+def heavy_tailed_latency(seed):
+    """5-15ms for 94% of requests, 1s for the rest."""
+    rng = random.Random(seed)
+    return lambda: 1.0 if rng.random() < 0.06 else rng.uniform(0.005, 0.015)
+
+
+def measure_p99(llm):
+    async def timed_call(semaphore):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await llm.run({"prompt": "Summarise Flow4AI"})
+            assert result == {"response": "ok"}
+            return time.perf_counter() - start
+
+    async def calls():
+        semaphore = asyncio.Semaphore(20)
+        await asyncio.gather(*(timed_call(semaphore) for _ in range(WARMUP_CALLS)))
+        return await asyncio.gather(*(timed_call(semaphore) for _ in range(MEASURED_CALLS)))
+
+    return percentile(asyncio.run(calls()), 99)
+
+
+def test_hedging_cuts_tail_latency():
+    p99 = {}
+    for hedge in (None, {"percentile": 90, "max_hedge_rate": 0.2, "min_samples": 20}):
+        properties = {"api": {"model": "fake-model"}, "rate_limit": {"max_rate": 100000, "time_period": 60}}
+        if hedge:
+            properties["hedge"] = hedge
+        llm = OpenAIJob(f"hedge_bench_{bool(hedge)}", properties)
+        with FakeOpenAI(latency=heavy_tailed_latency(seed=7)) as service:
+            llm.client = AsyncOpenAI(base_url=service.base_url, api_key="test-key")
+            p99[bool(hedge)] = measure_p99(llm)
+
+    assert p99[False] >= 1.0
+    assert p99[True] < p99[False] / 2
+    stats = llm.get_hedging_stats()
+    assert 0 < stats["hedge_rate"] <= 0.2
+    assert stats["hedge_wins"] > 0
+
+
+def test_slow_call_is_hedged_and_cancelled():
+    state = {"calls": 0, "cancelled": 0}
+
+    async def lookup():
+        state["calls"] += 1
+        try:
+            await asyncio.sleep(2 if state["calls"] == 1 else 0.01)
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        return {"attempt": state["calls"]}
+
+    lookup_job = job(lookup=lookup, hedge={"initial_delay_ms": 20, "max_hedge_rate": 1.0})
+    fm = FlowManager()
+    fq_name = fm.add_workflow(lookup_job, "hedge_slow_call")
+    start = time.perf_counter()
+    fm.submit_task({}, fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.02)
+
+    assert time.perf_counter() - start < 1
+    assert fm.pop_results()["completed"][fq_name][0]["attempt"] == 2
+    assert state == {"calls": 2, "cancelled": 1}
+    assert fm.get_hedging_stats()[lookup_job.name]["hedge_wins"] == 1
+
+
+def test_hedges_are_capped_by_budget():
+    policy = HedgingPolicy(initial_delay_ms=1, max_hedge_rate=0.2)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def calls():
+        return await asyncio.gather(*(policy.run(slow) for _ in range(50)))
+
+    assert asyncio.run(calls()) == ["done"] * 50
+    stats = policy.stats()
+    assert stats["hedged"] == 10
+    assert stats["budget_denied"] == 40
+
+
+def test_delay_does_not_shrink_when_hedges_win():
+    policy = HedgingPolicy(percentile=90, max_hedge_rate=1.0, min_samples=20)
+
+    async def calls():
+        delays = []
+        for i in range(60):
+            attempts = []
+
+            async def call():
+                attempts.append(1)
+                # Every fifth call is slow, 100-200ms, unless a hedge answers it in 5ms
+                slow = i % 5 == 0 and len(attempts) == 1
+                await asyncio.sleep(0.1 + 0.025 * (i // 5 % 5) if slow else 0.005)
+                return "ok"
+
+            assert await policy.run(call) == "ok"
+            if i == 19:
+                delays.append(policy.stats()["delay_ms"])
+        return delays[0]
+
+    warm_delay_ms = asyncio.run(calls())
+    stats = policy.stats()
+    assert stats["hedge_wins"] > 0
+    assert warm_delay_ms >= 100
+    assert stats["delay_ms"] >= 100
+
+
+def test_error_only_when_all_attempts_fail():
+    policy = HedgingPolicy(initial_delay_ms=1, max_hedge_rate=1.0)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.02)
+            raise ConnectionError("first attempt failed")
+        await asyncio.sleep(0.05)
+        return "second attempt"
+
+    async def always_fails():
+        await asyncio.sleep(0.01)
+        raise TimeoutError("down")
+
+    assert asyncio.run(policy.run(flaky)) == "second attempt"
+    with pytest.raises(TimeoutError):
+        asyncio.run(policy.run(always_fails))
+
+
+def test_hedge_config():
+    llm = OpenAIJob("hedge_config", {"hedge": {"percentile": 99, "max_hedge_rate": 0.01}})
+    assert llm.hedging_policy.percentile == 99
+    assert job(fn=lambda: {}, hedge=True).hedging_policy.max_hedge_rate == 0.05
+    assert HedgingPolicy.from_config(None) is None
+    with pytest.raises(ValueError):
+        HedgingPolicy(percentile=100)
+    with pytest.raises(ValueError):
+        HedgingPolicy(max_hedge_rate=0)
+    with pytest.raises(TypeError):
+        HedgingPolicy.from_config(95)
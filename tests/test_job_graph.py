@@ -341,6 +341,9 @@ def test_multiple_tail_nodes():
     assert b_job.next_jobs[0].name == default_tail_job.name
     assert c_job.next_jobs[0].name == default_tail_job.name
 
+    # The default tail is a join, waiting for both of the original tails
+    assert default_tail_job.expected_inputs == {"B", "C"}
+
 def test_simple_parallel_jobs():
     """Test that a graph with multiple head nodes and multiple tail nodes 
     is handled correctly by creating both a DefaultHeadJob and a DefaultTailJob."""
@@ -0,0 +1,189 @@
+"""
+Tests for the append-only JsonlFileExporter.
+
+Tests verify that:
+1. Spans are appended one JSON object per line and written by force_flush and shutdown
+2. Files rotate by size into timestamped segments, optionally gzipped, without losing spans
+3. Batches are dropped and counted when the writer's queue is full, and write errors counted and logged
+4. TracerFactory configures the exporter from the jsonl exporter type
+5. The cost of exporting a span doesn't grow with the size of the file
+6. A parent and a forked child sharing the file take turns rotating it without losing spans
+"""
+
+import gzip
+import json
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import pytest
+import yaml
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from flow4ai.utils.otel_wrapper import JsonlFileExporter, TracerFactory
+
+
+def finished_spans(count, name="span"):
+    """Spans created with a private provider, so the global test provider is untouched."""
+    memory = InMemorySpanExporter()
+    provider = TracerProvider(shutdown_on_exit=False)
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    tracer = provider.get_tracer("test_jsonl_exporter")
+    for i in range(count):
+        with tracer.start_as_current_span(f"{name}_{i}") as span:
+            span.set_attribute("index", i)
+    return list(memory.get_finished_spans())
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spans_appended_as_json_lines(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    exporter = JsonlFileExporter(path)
+    spans = finished_spans(5)
+
+    assert exporter.export(spans[:3]) == SpanExportResult.SUCCESS
+    assert exporter.force_flush(5000)
+    assert [span['name'] for span in read_lines(path)] == ["span_0", "span_1", "span_2"]
+
+    exporter.export(spans[3:])
+    exporter.shutdown()
+    lines = read_lines(path)
+    assert [span['attributes']['index'] for span in lines] == [0, 1, 2, 3, 4]
+    assert all(len(span['context']['trace_id']) == 32 for span in lines)
+    assert exporter.export(spans) == SpanExportResult.FAILURE
+    assert exporter.stats()['written'] == 5
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_size_rotation(tmp_path, compress):
+    path = str(tmp_path / "trace.jsonl")
+    exporter = JsonlFileExporter(path, max_size_bytes=2000, fsync="never", compress=compress)
+    for span in finished_spans(60):
+        exporter.export([span])
+    exporter.shutdown()
+
+    segments = sorted(name for name in os.listdir(tmp_path) if name.startswith("trace.jsonl."))
+    assert len(segments) == exporter.stats()['rotations'] >= 2
+    assert all(name.endswith(".gz") == compress for name in segments)
+    names = []
+    for segment in segments:
+        segment_lines = read_lines(str(tmp_path / segment))
+        assert segment_lines
+        names.extend(span['name'] for span in segment_lines)
+    names.extend(span['name'] for span in read_lines(path))
+    assert names == [f"span_{i}" for i in range(60)]
+
+
+def export_each(exporter, spans):
+    for span in spans:
+        exporter.export([span])
+        time.sleep(0.001)
+    exporter.shutdown()
+
+
+def test_rotation_shared_with_forked_child(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    exporter = JsonlFileExporter(path, max_size_bytes=3000, fsync="never", compress=True)
+    child = mp.get_context("fork").Process(target=export_each, args=(exporter, finished_spans(150, "child")))
+    child.start()
+    export_each(exporter, finished_spans(150, "parent"))
+    child.join(30)
+    assert child.exitcode == 0
+
+    segments = [name for name in os.listdir(tmp_path) if name.startswith("trace.jsonl.")]
+    assert len(segments) >= 10 and all(name.endswith(".gz") for name in segments)
+    names = [span['name'] for segment in segments for span in read_lines(str(tmp_path / segment))]
+    names.extend(span['name'] for span in read_lines(path))
+    assert sorted(names) == sorted([f"parent_{i}" for i in range(150)] + [f"child_{i}" for i in range(150)])
+
+
+def test_full_queue_drops_batches(tmp_path):
+    exporter = JsonlFileExporter(str(tmp_path / "trace.jsonl"), max_queue_size=2)
+    release = threading.Event()
+    write = exporter._write
+
+    def blocked_write(lines, count):
+        release.wait(5)
+        write(lines, count)
+
+    exporter._write = blocked_write
+    spans = finished_spans(4)
+    results = [exporter.export([span]) for span in spans]
+    release.set()
+    exporter.shutdown()
+
+    assert results.count(SpanExportResult.FAILURE) >= 1
+    stats = exporter.stats()
+    assert stats['dropped'] == results.count(SpanExportResult.FAILURE)
+    assert stats['written'] == stats['exported'] == 4 - stats['dropped']
+
+    with pytest.raises(ValueError):
+        JsonlFileExporter(str(tmp_path / "other.jsonl"), fsync="sometimes")
+
+
+def test_write_errors_logged(tmp_path, caplog):
+    exporter = JsonlFileExporter(str(tmp_path / "trace.jsonl"))
+
+    def failing_write(lines, count):
+        raise OSError("No space left on device")
+
+    exporter._write = failing_write
+    with caplog.at_level(logging.ERROR, logger="flow4ai.utils.otel_wrapper"):
+        exporter.export(finished_spans(1))
+        exporter.shutdown()
+
+    assert exporter.stats()['write_errors'] == 1
+    assert any("No space left on device" in r.message and r.name == "flow4ai.utils.otel_wrapper"
+               for r in caplog.records)
+
+
+def test_tracer_factory_jsonl_exporter(tmp_path, monkeypatch):
+    path = str(tmp_path / "trace.jsonl")
+    config_path = tmp_path / "otel_config.yaml"
+    config_path.write_text(yaml.dump({
+        "exporter": "jsonl",
+        "service_name": "JsonlTest",
+        "batch_processor": {"max_queue_size": 1000, "schedule_delay_millis": 1000},
+        "file_exporter": {"path": path, "fsync": "always", "compress": True, "max_size_bytes": 1000000},
+    }))
+    monkeypatch.setenv('FLOW4AI_OT_CONFIG', str(config_path))
+    TracerFactory._config = None
+
+    exporter = TracerFactory._configure_exporter("jsonl")
+    try:
+        assert isinstance(exporter, JsonlFileExporter)
+        assert (exporter.filepath, exporter.fsync, exporter.compress, exporter.max_size_bytes) == \
+            (path, "always", True, 1000000)
+    finally:
+        exporter.shutdown()
+        TracerFactory._config = None
+
+
+def test_export_cost_constant_with_file_size(tmp_path):
+    exporter = JsonlFileExporter(str(tmp_path / "trace.jsonl"), fsync="never")
+    batch = finished_spans(200)
+
+    def export_batches(count):
+        start = time.perf_counter()
+        for _ in range(count):
+            exporter.export(batch)
+        assert exporter.force_flush(30000)
+        return (time.perf_counter() - start) / (count * len(batch))
+
+    export_batches(5)  # warm up
+    empty_file = min(export_batches(20) for _ in range(3))
+    export_batches(300)  # 60,000 spans already in the file
+    large_file = min(export_batches(20) for _ in range(3))
+    exporter.shutdown()
+
+    assert os.path.getsize(tmp_path / "trace.jsonl") > 10_000_000
+    assert large_file < empty_file * 3, f"{empty_file * 1e6:.1f}us per span grew to {large_file * 1e6:.1f}us"
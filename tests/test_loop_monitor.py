@@ -0,0 +1,150 @@
+"""
+Tests for detecting sync code that blocks the event loop.
+
+Tests verify that:
+1. A sync job blocking FlowManager's loop is logged and counted against the job, its callable and line
+2. Blocking calls inside async jobs are attributed to the job too
+3. Stalls outside jobs and lags under the threshold are told apart
+4. FlowManagerMP's job executor reports the jobs blocking its loop
+5. An idle loop delayed by another thread holding the GIL is counted as starved, not blamed on code,
+   and only logged at DEBUG
+6. Each FlowManager's loop has its own label in the lag metrics
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.utils.metrics import _WAITING, LoopLagMonitor, MetricsRegistry, _blame
+from tests.test_utils.run_tasks import run_tasks
+
+
+def blocking_lookup(j_ctx):
+    time.sleep(0.3)  # a sync client call
+    return {"found": True}
+
+
+async def async_with_blocking_call(j_ctx):
+    await asyncio.sleep(0.01)
+    time.sleep(0.3)
+    return {"found": True}
+
+
+def quick(j_ctx):
+    return {"ok": True}
+
+
+def counter_value(name, **labels):
+    for metric in MetricsRegistry.default().snapshot()['metrics']:
+        if metric['name'] == name:
+            return sum(s['value'] for s in metric['samples']
+                       if all(s['labels'].get(k) == v for k, v in labels.items()))
+    return 0
+
+
+def test_sync_job_blocking_loop_attributed(caplog):
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(blocking_lookup=blocking_lookup), "blocking_graph")
+    before = counter_value("flow4ai_slow_callbacks_total", graph="blocking_graph", job="blocking_lookup")
+    with caplog.at_level(logging.WARNING):
+        run_tasks(fm, fq_name, {"q": 1})
+        time.sleep(0.15)
+
+    stats = fm.get_loop_stats()
+    assert stats['loop'] == fm.loop_monitor.name and stats['slow_callbacks'] >= 1
+    assert stats['max_lag_ms'] >= 150
+    blocked = stats['jobs'][fq_name]
+    assert blocked['count'] == 1 and blocked['max_ms'] >= 150
+    assert blocked['callable'] == "blocking_lookup"
+    assert blocked['location'].startswith(__file__) and blocked['location'].endswith("in blocking_lookup")
+    assert stats['recent'][-1]['job'] == fq_name
+    assert counter_value("flow4ai_slow_callbacks_total", graph="blocking_graph", job="blocking_lookup") == before + 1
+    assert any("blocked for" in r.message and "blocking_lookup" in r.message for r in caplog.records)
+
+
+def test_blocking_call_in_async_job():
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(quick=quick) >> job(async_lookup=async_with_blocking_call), "async_blocking_graph")
+    run_tasks(fm, fq_name, {"q": 1})
+    time.sleep(0.15)
+
+    blocked = fm.get_loop_stats()['jobs']
+    assert list(blocked) == [next(name for name in blocked if name.endswith("async_lookup$$"))]
+    assert blocked[list(blocked)[0]]['callable'] == "async_with_blocking_call"
+
+
+def test_stalls_outside_jobs_and_threshold():
+    fm = FlowManager()
+    monitor = LoopLagMonitor(fm.loop, "threshold_loop", interval_seconds=0.02, slow_callback_ms=200).start()
+    try:
+        time.sleep(0.05)
+        fm.loop.call_soon_threadsafe(time.sleep, 0.1)
+        time.sleep(0.2)
+        assert monitor.slow_callbacks == 0 and monitor.max_lag_ms >= 50
+
+        fm.loop.call_soon_threadsafe(time.sleep, 0.3)
+        time.sleep(0.4)
+    finally:
+        monitor.stop()
+
+    stats = monitor.stats()
+    assert stats['slow_callbacks'] == 1
+    assert stats['jobs'][""]['count'] == 1 and stats['jobs'][""]['callable'] is None
+    assert stats['lag_p50_ms'] < 50
+
+    disabled = LoopLagMonitor(fm.loop, "disabled_loop", interval_seconds=0.02, slow_callback_ms=0).start()
+    try:
+        fm.loop.call_soon_threadsafe(time.sleep, 0.2)
+        time.sleep(0.3)
+    finally:
+        disabled.stop()
+    assert disabled.slow_callbacks == 0 and disabled.max_lag_ms >= 100
+
+
+def test_flowmanagerMP_loop_stats():
+    fm = FlowManagerMP({"mp_blocking": job(blocking_lookup=blocking_lookup)}, quick)
+    fm.submit_task([{"n": i} for i in range(2)])
+    fm.close_processes()
+
+    stats = fm.get_loop_stats()
+    assert stats['loop'] == "FlowManagerMP"
+    assert stats['slow_callbacks'] >= 1
+    (job_name, blocked), = stats['jobs'].items()
+    assert job_name.endswith("blocking_lookup$$") and blocked['callable'] == "blocking_lookup"
+
+
+def test_loop_starved_by_another_thread(caplog):
+    fm = FlowManager()
+    monitor = LoopLagMonitor(fm.loop, "starved_loop", interval_seconds=0.02, slow_callback_ms=100).start()
+    values = [random.random() for _ in range(2_000_000)]
+    try:
+        time.sleep(0.05)
+        assert _blame(sys._current_frames()[monitor._thread_id]) is _WAITING
+        with caplog.at_level(logging.DEBUG):
+            for _ in range(2):
+                sorted(values)  # holds the GIL in C code, while the loop waits in select()
+                time.sleep(0.1)
+    finally:
+        monitor.stop()
+
+    stats = monitor.stats()
+    assert stats['starved'] >= 2 and stats['starved_ms'] >= 200
+    assert stats['slow_callbacks'] == 0 and stats['jobs'] == {}
+    # Only logged for debugging, every loop of the process is starved at once
+    starved_logs = [r for r in caplog.records if "starved_loop" in r.message and "GIL" in r.message]
+    assert starved_logs and all(r.levelno == logging.DEBUG for r in starved_logs)
+
+
+def test_each_flowmanager_loop_has_its_own_label():
+    first, second = FlowManager(), FlowManager()
+    try:
+        assert first.get_loop_stats()['loop'] != second.get_loop_stats()['loop']
+        assert first.loop_monitor.name.startswith("FlowManager-")
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,235 @@
+"""
+Tests for the map_over() DSL construct.
+
+Tests verify that:
+1. A job is applied to every item of a runtime list and results keep item order
+2. max_concurrency bounds the number of items in flight
+3. Items can come from a predecessor's output, the job's params or the task
+4. Mapped JobABC instances and failures are handled
+5. Each item gets the mapped job's retry and concurrency properties, and sync functions run in threads
+6. After a failure the remaining items are cancelled and finish their cleanup before the task fails
+7. Streamed results are consumed into their aggregate and mapped sync functions are hedged
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from flow4ai.dsl import job, map_over
+from flow4ai.flowmanager import FlowManager
+from flow4ai.job import JobABC
+from flow4ai.jobs.map_job import MapJob
+
+
+def chunk_text(text: str):
+    return {"chunks": text.split()}
+
+
+def test_map_over_gathers_results_in_order():
+    async def embed(chunk):
+        # Later items finish first, results must still come back in item order
+        await asyncio.sleep(0.01 * (5 - len(chunk)))
+        return chunk.upper()
+
+    def index(j_ctx):
+        return {"indexed": j_ctx["inputs"]["embed"]["result"]}
+
+    workflow = job(chunk=chunk_text) >> map_over(job(embed=embed), "chunks") >> job(index=index)
+    errors, result = FlowManager.run(workflow, {"chunk.text": "a bb ccc dddd"}, "map_order")
+
+    assert not errors
+    assert result["indexed"] == ["A", "BB", "CCC", "DDDD"]
+
+
+def test_map_over_respects_max_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def embed(chunk):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return len(chunk)
+
+    workflow = job(chunk=chunk_text) >> map_over(job(embed=embed), "chunks", max_concurrency=3)
+    errors, result = FlowManager.run(workflow, {"chunk.text": " ".join(["x"] * 20)}, "map_bounded")
+
+    assert not errors
+    assert result["result"] == [1] * 20
+    assert peak == 3
+
+
+def test_map_over_items_from_task_params():
+    workflow = job(double=map_over(lambda x: x * 2, "items"))
+    errors, result = FlowManager.run(workflow, {"double": {"items": [1, 2, 3]}}, "map_params")
+
+    assert not errors
+    assert result["result"] == [2, 4, 6]
+
+
+def test_map_over_jobabc():
+    class Square(JobABC):
+        async def run(self, task):
+            return task * task
+
+    workflow = map_over(Square("square"), "items", max_concurrency=2)
+    assert workflow.name == "square"
+    errors, result = FlowManager.run(workflow, {"items": [1, 2, 3, 4]}, "map_jobabc")
+
+    assert not errors
+    assert result["result"] == [1, 4, 9, 16]
+
+
+def test_map_over_empty_list():
+    workflow = job(chunk=chunk_text) >> map_over(job(embed=str.upper), "chunks")
+    errors, result = FlowManager.run(workflow, {"chunk.text": ""}, "map_empty")
+
+    assert not errors
+    assert result["result"] == []
+
+
+def test_map_over_failure_fails_task():
+    def explode(item):
+        if item == "bad":
+            raise ValueError("bad item")
+        return item
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(chunk=chunk_text) >> map_over(job(embed=explode), "chunks"), "map_failure")
+    fm.submit_task({"chunk.text": "ok bad ok"}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    errors = fm.pop_results()["errors"]
+    assert "bad item" in str(errors[fq_name][0]["error"])
+
+
+def test_map_over_applies_mapped_job_properties():
+    attempts = {}
+    in_flight = 0
+    peak = 0
+
+    async def flaky(item):
+        nonlocal in_flight, peak
+        attempts[item] = attempts.get(item, 0) + 1
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            in_flight -= 1
+        if item == "b" and attempts[item] == 1:
+            raise ConnectionError("flaky")
+        return item.upper()
+
+    mapped = job(flaky=flaky, retry={"max_attempts": 2, "initial_backoff": 0}, max_concurrency=2)
+    errors, result = FlowManager.run(map_over(mapped, "items"), {"items": ["a", "b", "c", "d"]}, "map_properties")
+
+    assert not errors
+    assert result["result"] == ["A", "B", "C", "D"]
+    assert attempts == {"a": 1, "b": 2, "c": 1, "d": 1}
+    assert peak == 2
+
+
+def test_map_over_runs_sync_functions_in_threads():
+    threads = set()
+
+    def blocking(item):
+        threads.add(threading.get_ident())
+        time.sleep(0.2)
+        return item
+
+    start = time.perf_counter()
+    errors, result = FlowManager.run(map_over(blocking, "items"), {"items": [1, 2, 3, 4]}, "map_sync")
+
+    assert not errors
+    assert result["result"] == [1, 2, 3, 4]
+    assert len(threads) == 4
+    assert time.perf_counter() - start < 0.6
+
+
+def test_map_over_failure_waits_for_cancelled_items():
+    cleaned = []
+
+    async def embed(item):
+        if item == "bad":
+            raise ValueError("bad item")
+        try:
+            await asyncio.sleep(10)
+        finally:
+            # Longer than wait_for_completion's polling interval
+            await asyncio.sleep(0.3)
+            cleaned.append(item)
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(map_over(embed, "items"), "map_failure_cleanup")
+    fm.submit_task({"items": ["a", "bad", "c"]}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    errors = fm.pop_results()["errors"]
+    assert "bad item" in str(errors[fq_name][0]["error"])
+    assert sorted(cleaned) == ["a", "c"]
+    fm.close()
+
+
+def test_map_over_consumes_streamed_results():
+    class Spell(JobABC):
+        async def run(self, task):
+            for char in task:
+                yield char
+
+    async def words(item):
+        for word in item.split():
+            yield word
+
+    errors, result = FlowManager.run(map_over(Spell("spell"), "items"), {"items": ["ab", "cd"]}, "map_stream_jobabc")
+    assert not errors
+    assert result["result"] == ["ab", "cd"]
+
+    errors, result = FlowManager.run(map_over(job(words=words), "items"), {"items": ["a b", "c"]}, "map_stream_fn")
+    assert not errors
+    assert result["result"] == ["ab", "c"]
+
+
+def test_map_over_hedges_sync_functions():
+    calls = []
+
+    def lookup(item):
+        calls.append(item)
+        # Only the first call is slow, its hedge answers first
+        time.sleep(0.5 if len(calls) == 1 else 0.01)
+        return item
+
+    mapped = job(lookup=lookup, hedge={"initial_delay_ms": 20, "max_hedge_rate": 1.0})
+    fm = FlowManager()
+    fq_name = fm.add_workflow(map_over(mapped, "items"), "map_hedge")
+    start = time.perf_counter()
+    fm.submit_task({"items": ["a"]}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    assert time.perf_counter() - start < 0.4
+    assert fm.pop_results()["completed"][fq_name][0]["result"] == ["a"]
+    assert mapped.get_hedging_stats()["hedged"] == 1
+    fm.close()
+
+
+def test_map_over_missing_items_key():
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(chunk=chunk_text) >> map_over(job(embed=str.upper), "missing"), "map_missing")
+    fm.submit_task({"chunk.text": "a b"}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    errors = fm.pop_results()["errors"]
+    assert "No items found under 'missing'" in str(errors[fq_name][0]["error"])
+
+
+def test_map_over_validation():
+    with pytest.raises(TypeError):
+        map_over("not callable", "items")
+    with pytest.raises(ValueError):
+        MapJob(str.upper, "items", max_concurrency=0)
+    with pytest.raises(TypeError):
+        map_over(job(a=str.upper) | job(b=str.lower), "items")
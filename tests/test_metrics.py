@@ -0,0 +1,186 @@
+"""
+Tests for the built-in metrics and their exporters.
+
+Tests verify that:
+1. The registry keeps labelled counters, gauges and histograms and estimates quantiles
+2. FlowManager records job run times, errors by type, queue wait, task outcomes and in flight tasks
+3. The event loop lag of a job blocking FlowManager's loop is measured
+4. FlowManagerMP publishes its job executor's metrics with the task queue depth
+5. Metrics are served to Prometheus, appended as JSON and collected through OpenTelemetry
+6. Recording a job's metrics costs microseconds
+"""
+
+import json
+import time
+import urllib.request
+
+import pytest
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.utils.metrics import (FlowMetrics, LoopLagMonitor, MetricsRegistry,
+                                   histogram_quantile)
+from flow4ai.utils.metrics_export import (JsonSnapshotWriter, OTelMetricsExporter,
+                                          PrometheusServer, render_prometheus)
+
+
+def sample(snapshot, name, **labels):
+    metric = next(metric for metric in snapshot['metrics'] if metric['name'] == name)
+    return next(s for s in metric['samples'] if all(s['labels'].get(k) == v for k, v in labels.items()))
+
+
+def fetch(j_ctx):
+    if j_ctx["task"].get("fail"):
+        raise ConnectionError("service down")
+    return {"fetched": True}
+
+
+def summarise(j_ctx):
+    return {"summary": "done"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    MetricsRegistry.default().reset()
+    yield
+
+
+def test_registry_and_quantiles():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    requests.labels("/a").inc()
+    requests.labels("/a").inc(2)
+    registry.gauge("connections", "Open connections").labels().set(4)
+    latency = registry.histogram("latency_ms", "Latency", ("route",), buckets=(10, 100))
+    for value in (5, 5, 50, 50, 50, 50, 50, 50, 500, 500):
+        latency.labels("/a").observe(value)
+
+    assert registry.counter("requests_total", "Requests", ("route",)) is requests
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests", ("route",))
+    with pytest.raises(ValueError):
+        requests.labels("/a", "extra")
+
+    snapshot = registry.snapshot()
+    assert json.loads(json.dumps(snapshot)) == snapshot
+    assert sample(snapshot, "requests_total", route="/a")['value'] == 3
+    assert sample(snapshot, "connections")['value'] == 4
+    histogram = sample(snapshot, "latency_ms", route="/a")
+    assert (histogram['counts'], histogram['count'], histogram['sum']) == ([2, 6, 2], 10, 1310)
+    assert histogram_quantile(histogram, 0.5) == pytest.approx(10 + 90 * 3 / 6)
+    assert histogram_quantile(histogram, 0.99) == 100
+    registry.reset()
+    assert histogram_quantile(sample(registry.snapshot(), "latency_ms"), 0.5) is None
+
+
+def test_flowmanager_job_and_task_metrics():
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(fetch=fetch) >> job(summarise=summarise), "metrics_graph")
+    fm.set_raise_on_error(False)
+    try:
+        fm.submit_task([{"n": i} for i in range(4)] + [{"fail": True}], fq_name)
+        assert fm.wait_for_completion(timeout=10, check_interval=0.01)
+    finally:
+        fm.set_raise_on_error(True)
+
+    snapshot = fm.get_metrics()
+    assert sample(snapshot, "flow4ai_job_run_ms", graph="metrics_graph", job="fetch")['count'] == 5
+    assert sample(snapshot, "flow4ai_job_run_ms", graph="metrics_graph", job="summarise")['count'] == 4
+    assert sample(snapshot, "flow4ai_job_errors_total", job="fetch")['labels']['exception'] == "ConnectionError"
+    assert sample(snapshot, "flow4ai_task_queue_wait_ms", graph="metrics_graph")['count'] == 5
+    assert sample(snapshot, "flow4ai_task_duration_ms", graph="metrics_graph")['count'] == 5
+    assert sample(snapshot, "flow4ai_tasks_total", graph="metrics_graph", outcome="completed")['value'] == 4
+    assert sample(snapshot, "flow4ai_tasks_total", graph="metrics_graph", outcome="error")['value'] == 1
+    assert sample(snapshot, "flow4ai_tasks_in_flight", graph="metrics_graph")['value'] == 0
+
+
+def test_loop_lag_of_blocking_job():
+    def blocking(j_ctx):
+        time.sleep(0.3)
+        return {"blocked": True}
+
+    fm = FlowManager()
+    monitor = LoopLagMonitor(fm.loop, "blocked_loop", interval_seconds=0.02).start()
+    try:
+        time.sleep(0.1)
+        fq_name = fm.add_workflow(job(blocking=blocking), "lag_graph")
+        fm.submit_task({"n": 1}, fq_name)
+        assert fm.wait_for_completion(timeout=10, check_interval=0.01)
+        time.sleep(0.1)
+    finally:
+        monitor.stop()
+
+    assert monitor.max_lag_ms >= 200
+    lag = sample(fm.get_metrics(), "flow4ai_event_loop_lag_ms", loop="blocked_loop")
+    assert lag['count'] > 5 and histogram_quantile(lag, 1.0) >= 100
+    assert sample(fm.get_metrics(), "flow4ai_event_loop_lag_ms", loop=fm.loop_monitor.name)['count'] > 0
+
+
+def test_flowmanagerMP_metrics():
+    fm = FlowManagerMP({"mp_metrics": job(fetch=fetch) >> job(summarise=summarise)}, summarise)
+    fm.submit_task([{"n": i} for i in range(5)])
+    assert sample(fm.get_metrics(), "flow4ai_task_queue_depth")['value'] >= 0
+    fm.close_processes()
+
+    snapshot = fm.get_metrics()
+    assert snapshot['pid'] != fm._manager._process.pid
+    assert sample(snapshot, "flow4ai_job_run_ms", graph="mp_metrics", job="fetch")['count'] == 5
+    assert sample(snapshot, "flow4ai_tasks_total", graph="mp_metrics", outcome="completed")['value'] == 5
+    assert sample(snapshot, "flow4ai_tasks_in_flight", graph="mp_metrics")['value'] == 0
+    assert sample(snapshot, "flow4ai_task_queue_depth")['value'] == 0
+    # The worker's loop is monitored, though it may have finished before a measurement
+    assert sample(snapshot, "flow4ai_event_loop_lag_ms", loop="FlowManagerMP")['count'] >= 0
+
+
+def test_exporters(tmp_path):
+    flow_metrics = FlowMetrics.get()
+    for run_ms in (3, 30, 300):
+        flow_metrics.job_run("export_graph$$$$answer$$", run_ms)
+    flow_metrics.job_run("export_graph$$$$answer$$", 1, ValueError('bad "input"'))
+
+    text = render_prometheus(MetricsRegistry.default().snapshot())
+    assert "# TYPE flow4ai_job_run_ms histogram" in text
+    assert 'flow4ai_job_run_ms_bucket{graph="export_graph",job="answer",le="5.0"} 2' in text
+    assert 'flow4ai_job_run_ms_bucket{graph="export_graph",job="answer",le="+Inf"} 4' in text
+    assert 'flow4ai_job_run_ms_count{graph="export_graph",job="answer"} 4' in text
+    assert 'flow4ai_job_errors_total{graph="export_graph",job="answer",exception="ValueError"} 1' in text
+
+    with PrometheusServer(port=0) as server:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.headers['Content-Type'].startswith("text/plain; version=0.0.4")
+            assert 'flow4ai_job_run_ms_sum{graph="export_graph",job="answer"} 334' in response.read().decode()
+
+    path = tmp_path / "metrics" / "snapshots.jsonl"
+    with JsonSnapshotWriter(str(path), interval_seconds=0.05):
+        time.sleep(0.2)
+    snapshots = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(snapshots) >= 2
+    assert sample(snapshots[-1], "flow4ai_job_run_ms", job="answer")['count'] == 4
+
+    reader = InMemoryMetricReader()
+    exporter = OTelMetricsExporter(reader=reader)
+    try:
+        points = {}
+        for resource_metrics in reader.get_metrics_data().resource_metrics:
+            for scope_metrics in resource_metrics.scope_metrics:
+                for metric in scope_metrics.metrics:
+                    for point in metric.data.data_points:
+                        points[(metric.name, tuple(sorted(point.attributes.items())))] = point.value
+    finally:
+        exporter.shutdown()
+    labels = (("graph", "export_graph"), ("job", "answer"))
+    assert points[("flow4ai_job_run_ms_count", labels)] == 4
+    assert points[("flow4ai_job_run_ms_bucket", tuple(sorted(labels + (("le", "50.0"),))))] == 3
+    assert points[("flow4ai_job_errors_total", tuple(sorted(labels + (("exception", "ValueError"),))))] == 1
+
+
+def test_recording_overhead():
+    flow_metrics = FlowMetrics.get()
+    runs = 20000
+    started = time.perf_counter()
+    for i in range(runs):
+        flow_metrics.job_run("overhead_graph$$$$answer$$", i % 100)
+    per_run_us = (time.perf_counter() - started) / runs * 1e6
+    assert per_run_us < 20, f"Recording a job run took {per_run_us:.1f}us"
@@ -0,0 +1,108 @@
+"""
+Tests for streaming OpenAIJob responses.
+
+Tests verify that:
+1. With stream set, run returns a ResultStream of content chunks that aggregates to {"response": ...}
+2. Successor jobs consume the chunks while the response is still streaming
+3. The submitter receives chunks through on_partial and the aggregated result at the end
+4. Streamed usage is reconciled with the rate limiter, and invalid combinations are rejected
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.job_stream import ResultStream
+from flow4ai.jobs.openai_jobs import OpenAIJob
+from tests.test_utils.fake_openai import FakeOpenAI
+
+CHUNKS = ("Streaming", " from", " a", " fake", " server")
+
+
+def streaming_llm(name, service, **api):
+    return OpenAIJob(name, {
+        "client": {"base_url": service.base_url, "api_key": "FAKE_OPENAI_API_KEY", "max_retries": 0},
+        "api": {"model": "fake-model", "stream": True, **api},
+        "rate_limit": {"max_rate": 1000, "time_period": 60, "max_token_rate": 100000},
+    })
+
+
+@pytest.fixture(autouse=True)
+def fake_api_key(monkeypatch):
+    monkeypatch.setenv("FAKE_OPENAI_API_KEY", "test-key")
+
+
+def test_run_returns_result_stream():
+    with FakeOpenAI(stream_chunks=CHUNKS, total_tokens=40) as service:
+        llm = streaming_llm("stream_direct", service)
+
+        async def consume():
+            stream = await llm.run({"prompt": "Tell me about Flow4AI"})
+            assert isinstance(stream, ResultStream)
+            chunks = [chunk async for chunk in stream]
+            return chunks, await stream
+
+        chunks, result = asyncio.run(consume())
+
+    assert chunks == list(CHUNKS)
+    assert result == {"response": "Streaming from a fake server"}
+    assert llm.limiter.stats()["used_tokens"] == 40
+
+
+def test_successor_consumes_while_streaming():
+    timeline = {}
+
+    async def consumer(j_ctx):
+        start = time.perf_counter()
+        received = []
+        async for chunk in j_ctx["inputs"]["stream_llm"]:
+            timeline.setdefault("first_chunk", time.perf_counter() - start)
+            received.append(chunk)
+        timeline["last_chunk"] = time.perf_counter() - start
+        return {"received": received}
+
+    with FakeOpenAI(stream_chunks=CHUNKS, chunk_delay=0.05) as service:
+        workflow = streaming_llm("stream_llm", service) >> job(consumer=consumer)
+        errors, result = FlowManager.run(workflow, {"prompt": "hello"}, "stream_successor")
+
+    assert not errors
+    assert result["received"] == list(CHUNKS)
+    assert timeline["first_chunk"] < timeline["last_chunk"] / 2
+
+
+def test_submitter_receives_partials_and_aggregate():
+    partials = []
+    with FakeOpenAI(stream_chunks=CHUNKS) as service:
+        fm = FlowManager(on_partial=partials.append)
+        fq_name = fm.add_workflow(streaming_llm("stream_tail", service), "stream_tail")
+        fm.submit_task({"prompt": "hello"}, fq_name)
+        assert fm.wait_for_completion(timeout=5, check_interval=0.05)
+
+    assert [partial["chunk"] for partial in partials] == list(CHUNKS)
+    assert all(partial["job"] == "stream_tail" for partial in partials)
+    result = fm.pop_results()["completed"][fq_name][0]
+    assert result["response"] == "Streaming from a fake server"
+
+
+def test_non_streaming_successor_awaits_aggregate():
+    async def summarise(j_ctx):
+        answer = await j_ctx["inputs"]["stream_answer"]
+        return {"words": len(answer["response"].split())}
+
+    with FakeOpenAI(stream_chunks=CHUNKS) as service:
+        workflow = streaming_llm("stream_answer", service) >> job(summarise=summarise)
+        errors, result = FlowManager.run(workflow, {"prompt": "hello"}, "stream_await")
+
+    assert result["words"] == 5
+
+
+def test_stream_with_response_format_is_rejected():
+    with FakeOpenAI() as service:
+        llm = streaming_llm("stream_structured", service, response_format={"type": "json_object"})
+        llm.update_properties({"retry": {"max_attempts": 1}})
+        with pytest.raises(ValueError):
+            asyncio.run(llm.run({"prompt": "hello"}))
+        assert service.calls == 0
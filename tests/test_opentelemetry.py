@@ -21,9 +21,11 @@ def trace_file():
     temp_file = "tests/temp_otel_trace.json"
     yield temp_file
     
-    # Clean up the main trace file
-    if os.path.exists(temp_file):
-        os.unlink(temp_file)
+    # Clean up the main trace file and the lock file serialising exports to it
+    lock_file = os.path.join(os.path.dirname(temp_file), f".{os.path.basename(temp_file)}.lock")
+    for path in (temp_file, lock_file):
+        if os.path.exists(path):
+            os.unlink(path)
     
     # Clean up any rotated files
     test_dir = os.path.dirname(temp_file)
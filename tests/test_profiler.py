@@ -0,0 +1,132 @@
+"""
+Tests for profiling a fraction of tasks per job and graph.
+
+Tests verify that:
+1. Sample mode attributes the time of a CPU bound job to the job and the function it spends it in
+2. Sample mode writes collapsed stacks and a speedscope file per process
+3. The ratio selects the tasks profiled and invalid options are rejected
+4. cProfile mode reports the cumulative time of each job and writes pstats
+5. FlowManagerMP profiles in its job executor process and writes its files there
+"""
+
+import json
+import os
+import pstats
+import time
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.utils.profiler import FRAMEWORK, TaskProfiler
+from tests.test_utils.run_tasks import run_tasks
+
+
+def busy_loop(milliseconds):
+    deadline = time.perf_counter() + milliseconds / 1000.0
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def crunch(j_ctx):
+    return {"total": busy_loop(200)}
+
+
+def light(j_ctx):
+    return {"total": busy_loop(20)}
+
+
+def test_sample_mode_attributes_jobs():
+    fm = FlowManager(profiling={"ratio": 1.0, "interval_ms": 2})
+    fq_name = fm.add_workflow(job(light=light) >> job(crunch=crunch), "sampled_graph")
+    run_tasks(fm, fq_name, {"n": 1}, timeout=20)
+
+    stats = fm.get_profile_stats()
+    assert (stats['mode'], stats['tasks_profiled']) == ("sample", 1)
+    graph = stats['graphs']['sampled_graph']
+    assert graph['tasks'] == 1
+    jobs = graph['jobs']
+    assert jobs['crunch']['samples'] > jobs['light']['samples'] > 0
+    assert jobs['crunch']['share'] > 0.5
+    assert jobs['crunch']['top'][0][0].startswith("busy_loop (test_profiler.py:")
+    assert sum(job['share'] for job in jobs.values()) == pytest.approx(1.0, abs=0.01)
+    assert set(jobs) <= {"light", "crunch", FRAMEWORK}
+
+
+def test_sample_mode_flamegraph_files(tmp_path):
+    fm = FlowManager(profiling={"ratio": 1.0, "interval_ms": 2, "output_dir": str(tmp_path)})
+    fq_name = fm.add_workflow(job(crunch=crunch), "flamegraph_graph")
+    run_tasks(fm, fq_name, {"n": 1}, timeout=20)
+
+    collapsed_path, speedscope_path = fm.write_profile()
+    assert collapsed_path == str(tmp_path / f"profile-{os.getpid()}.collapsed")
+    lines = open(collapsed_path).read().splitlines()
+    crunch_lines = [line for line in lines if line.startswith("flamegraph_graph;crunch;")]
+    assert crunch_lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(";crunch (test_profiler.py:" in line and ";busy_loop (" in line for line in crunch_lines)
+
+    with open(speedscope_path) as f:
+        speedscope = json.load(f)
+    frames = speedscope['shared']['frames']
+    profile = next(p for p in speedscope['profiles'] if p['name'] == "flamegraph_graph")
+    assert profile['type'] == "sampled" and len(profile['samples']) == len(profile['weights'])
+    assert profile['endValue'] == pytest.approx(sum(profile['weights']))
+    assert all(0 <= index < len(frames) for sample in profile['samples'] for index in sample)
+    assert {"crunch", "busy_loop"} <= {frame['name'] for frame in frames}
+
+
+def test_ratio_and_options():
+    fm = FlowManager(profiling={"ratio": 0.0})
+    fq_name = fm.add_workflow(job(light=light), "unprofiled_graph")
+    run_tasks(fm, fq_name, [{"n": i} for i in range(3)], timeout=20)
+    assert fm.get_profile_stats()['tasks_profiled'] == 0
+
+    profiler = TaskProfiler(ratio=0.5)
+    selected = sum(profiler.begin(f"task-{i}", "graph$$$$job$$") for i in range(400))
+    assert 140 < selected < 260 and profiler.tasks_profiled == selected
+
+    assert TaskProfiler.from_config(None) is None
+    assert TaskProfiler.from_config({"enabled": False, "ratio": 1.0}) is None
+    assert FlowManager().get_profile_stats() == {}
+    with pytest.raises(ValueError):
+        FlowManager().write_profile()
+    for config in ({"ratio": 1.5}, {"mode": "perf"}, {"interval_ms": 0}):
+        with pytest.raises(ValueError):
+            TaskProfiler.from_config(config)
+
+
+def test_cprofile_mode(tmp_path):
+    fm = FlowManager(profiling={"ratio": 1.0, "mode": "cprofile", "output_dir": str(tmp_path)})
+    fq_name = fm.add_workflow(job(light=light) >> job(crunch=crunch), "cprofile_graph")
+    run_tasks(fm, fq_name, [{"n": 1}, {"n": 2}], timeout=20)
+
+    jobs = fm.get_profile_stats()['graphs']['cprofile_graph']['jobs']
+    assert jobs['crunch']['calls'] == 2 and jobs['light']['calls'] == 2
+    assert jobs['crunch']['cumulative_ms'] >= 350
+    assert jobs['light']['cumulative_ms'] < jobs['crunch']['cumulative_ms']
+
+    path, = fm.write_profile()
+    assert path.endswith(".pstats")
+    functions = {func[2]: stat for func, stat in pstats.Stats(path).stats.items()}
+    assert functions['busy_loop'][1] == 4
+
+
+def test_flowmanagerMP_profiling(tmp_path):
+    results = []
+    fm = FlowManagerMP({"mp_profiled": job(crunch=crunch)}, results.append, serial_processing=True,
+                       profiling={"ratio": 1.0, "interval_ms": 2, "output_dir": str(tmp_path)})
+    fm.submit_task([{"n": i} for i in range(2)])
+    fm.close_processes()
+
+    assert len(results) == 2
+    stats = fm.get_profile_stats()
+    assert stats['tasks_profiled'] == 2
+    assert stats['graphs']['mp_profiled']['jobs']['crunch']['samples'] > 0
+    collapsed_path, speedscope_path = stats['files']
+    assert os.path.dirname(collapsed_path) == str(tmp_path)
+    assert os.path.basename(collapsed_path) != f"profile-{os.getpid()}.collapsed"
+    assert any(line.startswith("mp_profiled;crunch;") for line in open(collapsed_path))
+    assert os.path.exists(speedscope_path)
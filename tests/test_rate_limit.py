@@ -0,0 +1,99 @@
+"""
+Tests for request and token rate limits of OpenAIJob.
+
+Tests verify that:
+1. Prompt tokens are estimated before a call, including the requested completion budget
+2. The token budget throttles calls while the request budget is idle, and estimates are
+   reconciled with the usage the API reports
+3. OpenAIJobs with the same rate_limit share one budget, including across processes
+"""
+
+import asyncio
+import multiprocessing as mp
+import time
+
+from openai import AsyncOpenAI
+
+from flow4ai.jobs.openai_jobs import OpenAIJob
+from flow4ai.utils.rate_limit import TokenRateLimiter, estimate_tokens
+from tests.test_utils.fake_openai import FakeOpenAI
+
+
+def test_estimate_tokens():
+    request = {"messages": [{"role": "user", "content": "x" * 400}]}
+    assert estimate_tokens(request) == 100 + 4 + 3
+    assert estimate_tokens({**request, "max_tokens": 50}) == 157
+    parts = {"messages": [{"role": "user", "content": [{"type": "text", "text": "x" * 40}]}]}
+    assert estimate_tokens(parts) == 10 + 4 + 3
+
+
+def test_token_budget_throttles_requests():
+    limiter = TokenRateLimiter(max_rate=1000, time_period=1, max_token_rate=1000)
+
+    async def calls():
+        start = time.perf_counter()
+        for _ in range(5):
+            await limiter.acquire(400)
+        return time.perf_counter() - start
+
+    # Two calls fit the bucket, the other three wait for 1000 more tokens to refill at 1000/s
+    elapsed = asyncio.run(calls())
+    assert 0.9 <= elapsed < 2.0
+    stats = limiter.stats()
+    assert stats["requests"] == 5
+    assert stats["estimated_tokens"] == 2000
+    assert stats["throttled"] == 3
+
+
+def test_reconcile_refunds_overestimates():
+    limiter = TokenRateLimiter(max_rate=1000, time_period=60, max_token_rate=1000)
+
+    async def calls():
+        await limiter.acquire(900)
+        limiter.reconcile(900, 100)
+        start = time.perf_counter()
+        await limiter.acquire(800)
+        return time.perf_counter() - start
+
+    assert asyncio.run(calls()) < 0.1
+    assert limiter.stats()["used_tokens"] == 100
+
+
+def test_openai_jobs_share_token_budget():
+    rate_limit = {"max_rate": 1000, "time_period": 1, "max_token_rate": 300}
+    first = OpenAIJob("tpm_first", {"rate_limit": rate_limit, "api": {"model": "fake-model"}})
+    second = OpenAIJob("tpm_second", {"rate_limit": dict(rate_limit), "api": {"model": "fake-model"}})
+    assert first.limiter is second.limiter
+
+    with FakeOpenAI(total_tokens=50) as service:
+        for job in (first, second):
+            job.client = AsyncOpenAI(base_url=service.base_url, api_key="test-key")
+
+        async def calls():
+            return await asyncio.gather(*(job.run({"prompt": "x" * 400}) for job in (first, second) * 2))
+
+        results = asyncio.run(calls())
+
+    assert all(result == {"response": "ok"} for result in results)
+    stats = first.limiter.stats()
+    assert stats["requests"] == 4
+    assert stats["used_tokens"] == 200
+    # 4 calls of 118 estimated tokens against 300 tokens per second, the last two wait
+    assert stats["estimated_tokens"] == 472
+    assert stats["throttled"] == 2
+
+
+def _use_budget(limiter, tokens):
+    asyncio.run(limiter.acquire(tokens))
+
+
+def test_budget_shared_across_processes():
+    limiter = TokenRateLimiter(max_rate=10, time_period=60, max_token_rate=1000)
+    worker = mp.Process(target=_use_budget, args=(limiter, 700))
+    worker.start()
+    worker.join(10)
+
+    stats = limiter.stats()
+    assert stats["requests"] == 1
+    assert stats["estimated_tokens"] == 700
+    assert stats["available_tokens"] < 400
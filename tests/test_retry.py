@@ -0,0 +1,124 @@
+"""
+Tests for per-job retry policies.
+
+Tests verify that:
+1. A failed job is re-run without recomputing upstream jobs, using the inputs it already received
+2. Only the configured exception classes are retried, and attempts are bounded
+3. Backoff grows exponentially, is capped and jittered
+4. Policies are configured from the DSL and from job properties (as in jobs.yaml)
+"""
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.job import JobABC
+from flow4ai.utils.retry import RetryPolicy
+
+NO_WAIT = {"initial_backoff": 0.001, "max_backoff": 0.001}
+
+
+def test_retry_reruns_only_failed_job():
+    calls = {"upstream": 0, "flaky": 0}
+
+    def upstream():
+        calls["upstream"] += 1
+        return {"value": 21}
+
+    def flaky(j_ctx):
+        calls["flaky"] += 1
+        if calls["flaky"] < 3:
+            raise ConnectionError("transient")
+        return {"doubled": j_ctx["inputs"]["upstream"]["value"] * 2}
+
+    workflow = job(upstream=upstream) >> job(flaky=flaky, retry={"max_attempts": 3, **NO_WAIT})
+    errors, result = FlowManager.run(workflow, {}, "retry_rerun")
+
+    assert not errors
+    assert result["doubled"] == 42
+    assert calls == {"upstream": 1, "flaky": 3}
+
+
+def test_retry_gives_up_after_max_attempts():
+    calls = []
+
+    def always_fails():
+        calls.append(1)
+        raise TimeoutError("still down")
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(down=always_fails, retry={"max_attempts": 2, **NO_WAIT}), "retry_exhausted")
+    fm.submit_task({}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    assert len(calls) == 2
+    assert "still down" in str(fm.pop_results()["errors"][fq_name][0]["error"])
+
+
+def test_non_retryable_error_fails_at_once():
+    calls = []
+
+    def bad_input():
+        calls.append(1)
+        raise ValueError("bad input")
+
+    retry = {"max_attempts": 5, "retry_on": ["TimeoutError", "ConnectionError"], **NO_WAIT}
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(bad=bad_input, retry=retry), "retry_not_retryable")
+    fm.submit_task({}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    assert len(calls) == 1
+    assert fm.get_counts()["errors"] == 1
+
+
+def test_retry_from_job_properties():
+    class FlakyJob(JobABC):
+        attempts = 0
+
+        async def run(self, task):
+            FlakyJob.attempts += 1
+            if FlakyJob.attempts == 1:
+                raise ConnectionError("first call fails")
+            return {"attempts": FlakyJob.attempts}
+
+    # The same properties dict a jobs.yaml "properties:" section produces
+    properties = {"retry": {"max_attempts": 2, "retry_on": "ConnectionError", "jitter": False, **NO_WAIT}}
+    flaky = FlakyJob("flaky", properties)
+    assert flaky.retry_policy.retry_on == (ConnectionError,)
+
+    errors, result = FlowManager.run(flaky, {}, "retry_properties")
+    assert not errors
+    assert result["attempts"] == 2
+
+
+def test_retry_option_on_job_instance():
+    class Echo(JobABC):
+        async def run(self, task):
+            return {}
+
+    echo = job(echo=Echo(), retry=4)
+    assert echo.retry_policy.max_attempts == 4
+    assert echo.properties["retry"] == 4
+
+
+def test_backoff_is_exponential_capped_and_jittered():
+    policy = RetryPolicy(initial_backoff=0.1, max_backoff=0.5, multiplier=2, jitter=False)
+    assert [policy.backoff(attempt) for attempt in range(1, 5)] == [0.1, 0.2, 0.4, 0.5]
+
+    jittered = RetryPolicy(initial_backoff=1.0, max_backoff=1.0)
+    delays = [jittered.backoff(1) for _ in range(50)]
+    assert all(0 <= d <= 1.0 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_policy_config_validation():
+    assert RetryPolicy.from_config(None) is None
+    assert RetryPolicy.from_config(3).max_attempts == 3
+    assert RetryPolicy.from_config({"retry_on": ["asyncio.TimeoutError"]}).retry_on
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+    with pytest.raises(ValueError):
+        RetryPolicy.from_config({"retry_on": ["NoSuchError"]})
+    with pytest.raises(TypeError):
+        RetryPolicy.from_config("three")
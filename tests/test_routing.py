@@ -0,0 +1,179 @@
+"""
+Tests for conditional routing with the route() DSL function.
+
+Tests verify that:
+1. Only the branches chosen by the selector execute
+2. Joins run with the inputs of executed branches once every branch was executed or skipped
+3. Skips propagate through serial branches and selectors can choose several or no branches
+4. Unknown branch keys fail the task
+"""
+
+import pytest
+
+from flow4ai.dsl import job, route
+from flow4ai.flowmanager import FlowManager
+from flow4ai.jobs.router_job import RouterJob
+
+
+def make_branches(calls):
+    def ask_mini(prompt):
+        calls.append("mini")
+        return {"answer": f"mini: {prompt}"}
+
+    def ask_large(prompt):
+        calls.append("large")
+        return {"answer": f"large: {prompt}"}
+
+    def ask_reasoning(prompt):
+        calls.append("reasoning")
+        return {"answer": f"reasoning: {prompt}"}
+
+    return {
+        "mini": job(mini=ask_mini),
+        "large": job(large=ask_large),
+        "reasoning": job(reasoning=ask_reasoning),
+    }
+
+
+def compare(j_ctx):
+    inputs = j_ctx["inputs"]
+    return {"answers": {name: inputs[name]["answer"] for name in ("mini", "large", "reasoning", "quick", "polish")
+                        if name in inputs}}
+
+
+def prompt_task(prompt, models):
+    return {
+        "pick.models": models,
+        "mini.prompt": prompt,
+        "large.prompt": prompt,
+        "reasoning.prompt": prompt,
+    }
+
+
+def pick(models):
+    return models
+
+
+def test_only_selected_branch_runs():
+    calls = []
+    workflow = route(pick, make_branches(calls), name="pick") >> job(compare=compare)
+    errors, result = FlowManager.run(workflow, prompt_task("hi", "large"), "route_single")
+
+    assert not errors
+    assert calls == ["large"]
+    assert result["answers"] == {"large": "large: hi"}
+
+
+def test_multiple_branches_selected():
+    calls = []
+    workflow = route(pick, make_branches(calls), name="pick") >> job(compare=compare)
+    errors, result = FlowManager.run(workflow, prompt_task("hi", ["mini", "reasoning"]), "route_multi")
+
+    assert not errors
+    assert sorted(calls) == ["mini", "reasoning"]
+    assert result["answers"] == {"mini": "mini: hi", "reasoning": "reasoning: hi"}
+
+
+def test_routes_differ_per_task():
+    calls = []
+    fm = FlowManager()
+    fq_name = fm.add_workflow(route(pick, make_branches(calls), name="pick") >> job(compare=compare), "route_per_task")
+    fm.submit_task(prompt_task("a", "mini"), fq_name)
+    fm.submit_task(prompt_task("b", "large"), fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    results = fm.pop_results()
+    assert not results["errors"]
+    answers = sorted(tuple(r["answers"].items()) for r in results["completed"][fq_name])
+    assert answers == [(("large", "large: b"),), (("mini", "mini: a"),)]
+    assert sorted(calls) == ["large", "mini"]
+
+
+def test_skip_propagates_through_serial_branch():
+    calls = []
+
+    def draft(prompt):
+        calls.append("draft")
+        return {"answer": prompt}
+
+    def polish(j_ctx):
+        calls.append("polish")
+        return {"answer": j_ctx["inputs"]["draft"]["answer"].title()}
+
+    def quick(prompt):
+        calls.append("quick")
+        return {"answer": prompt.upper()}
+
+    def build():
+        branches = {"careful": job(draft=draft) >> job(polish=polish), "fast": job(quick=quick)}
+        return route(lambda choice: choice, branches, name="choose") >> job(compare=compare)
+
+    task = {"choose.choice": "fast", "draft.prompt": "hi there", "quick.prompt": "hi there"}
+    errors, result = FlowManager.run(build(), task, "route_serial_fast")
+
+    assert not errors
+    assert calls == ["quick"]
+    assert result["answers"] == {"quick": "HI THERE"}
+
+    calls.clear()
+    task["choose.choice"] = "careful"
+    errors, result = FlowManager.run(build(), task, "route_serial_careful")
+
+    assert not errors
+    assert calls == ["draft", "polish"]
+    assert result["answers"] == {"polish": "Hi There"}
+
+
+def test_route_after_job():
+    def classify(text):
+        return {"hard": len(text) > 5}
+
+    def pick_by_difficulty(j_ctx):
+        return "large" if j_ctx["inputs"]["classify"]["hard"] else "mini"
+
+    calls = []
+    workflow = job(classify=classify) >> route(pick_by_difficulty, make_branches(calls)) >> job(compare=compare)
+    task = {"classify.text": "a long question", "mini.prompt": "q", "large.prompt": "q", "reasoning.prompt": "q"}
+    errors, result = FlowManager.run(workflow, task, "route_after_job")
+
+    assert not errors
+    assert calls == ["large"]
+    assert result["answers"] == {"large": "large: q"}
+
+
+def test_route_without_join_uses_default_tail():
+    calls = []
+    workflow = route(pick, make_branches(calls), name="pick")
+    errors, result = FlowManager.run(workflow, prompt_task("hi", "mini"), "route_default_tail")
+
+    assert not errors
+    assert calls == ["mini"]
+    assert result["mini"]["answer"] == "mini: hi"
+    assert "large" not in result
+
+
+def test_no_branch_selected():
+    calls = []
+    workflow = route(pick, make_branches(calls), name="pick") >> job(compare=compare)
+    errors, result = FlowManager.run(workflow, prompt_task("hi", None), "route_none")
+
+    assert not errors
+    assert calls == []
+    assert result is None
+
+
+def test_unknown_branch_fails_task():
+    fm = FlowManager()
+    fq_name = fm.add_workflow(route(pick, make_branches([]), name="pick") >> job(compare=compare), "route_unknown")
+    fm.submit_task(prompt_task("hi", "huge"), fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    errors = fm.pop_results()["errors"]
+    assert "unknown branch(es) ['huge']" in str(errors[fq_name][0]["error"])
+
+
+def test_route_validation():
+    with pytest.raises(ValueError):
+        route(pick, {})
+    with pytest.raises(TypeError):
+        RouterJob("not callable", {"a": job(a=str.upper)})
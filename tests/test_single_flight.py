@@ -0,0 +1,204 @@
+"""
+Tests for request coalescing (single-flight).
+
+Tests verify that:
+1. Concurrent tasks making identical calls share one in-flight call and all get its result
+2. Calls with different arguments, and calls after the shared call completed, run separately
+3. The error of a shared call reaches every caller
+4. Identical concurrent OpenAIJob requests share one API call, and coalescing ratios are reported
+   Requests of OpenAIJobs with different credentials on the same base_url are never shared
+5. Only calls of the same callable object are shared, closures of one factory aren't, and partials
+   and callable instances can be coalesced
+6. Request keys compare objects without a canonical form by identity, not by their repr
+"""
+
+import asyncio
+import functools
+
+import pytest
+from openai import AsyncOpenAI
+
+from flow4ai.bench.fake_llm import FakeLLMServer
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.jobs.openai_jobs import OpenAIJob
+from flow4ai.utils.single_flight import SingleFlight, request_key
+from tests.test_utils.fake_openai import FakeOpenAI
+
+
+def test_identical_tasks_share_one_call():
+    calls = []
+
+    async def embed(text):
+        calls.append(text)
+        await asyncio.sleep(0.1)
+        return {"embedding": [len(text)]}
+
+    embedder = job(embed=embed, coalesce="test_embeddings")
+    fm = FlowManager()
+    fq_name = fm.add_workflow(embedder, "coalesce_identical")
+    fm.submit_task([{"embed": {"text": "same question"}} for _ in range(10)]
+                   + [{"embed": {"text": "other question"}}], fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.05)
+
+    results = fm.pop_results()["completed"][fq_name]
+    assert len(results) == 11
+    assert sorted(calls) == ["other question", "same question"]
+    assert sorted(result["embedding"][0] for result in results).count(13) == 10
+    stats = fm.get_coalescing_stats()["test_embeddings"]
+    assert stats["calls"] == 11
+    assert stats["executed"] == 2
+    assert stats["coalesced"] == 9
+    assert stats["coalescing_ratio"] == pytest.approx(9 / 11)
+    assert stats["in_flight"] == 0
+
+
+def test_completed_calls_are_not_cached():
+    flight = SingleFlight("test_not_cached")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    async def sequential():
+        first = await flight.do("key", fetch)
+        second = await flight.do("key", fetch)
+        return first, second
+
+    assert asyncio.run(sequential()) == ({"value": 1}, {"value": 2})
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_shared_error_reaches_every_caller():
+    flight = SingleFlight("test_shared_error")
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ConnectionError("upstream down")
+
+    async def concurrent():
+        return await asyncio.gather(*(flight.do("key", failing) for _ in range(4)), return_exceptions=True)
+
+    errors = asyncio.run(concurrent())
+    assert len(calls) == 1
+    assert all(isinstance(e, ConnectionError) for e in errors)
+
+
+def test_callers_get_their_own_result():
+    flight = SingleFlight("test_own_result")
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return {"value": 1}
+
+    async def concurrent():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)))
+
+    results = asyncio.run(concurrent())
+    results[0]["extra"] = True
+    assert results[1] == {"value": 1}
+    assert results[0] is not results[1]
+
+
+def test_request_key_is_canonical():
+    assert request_key({"a": 1, "b": [1, 2]}) == request_key({"b": [1, 2], "a": 1})
+    assert request_key({"a": 1}) != request_key({"a": 2})
+
+
+def make_lookup(source):
+    async def lookup(query):
+        await asyncio.sleep(0.05)
+        return {"source": source}
+    return lookup
+
+
+class Lookup:
+    async def __call__(self, query):
+        await asyncio.sleep(0.05)
+        return {"source": "instance"}
+
+
+def test_only_the_same_callable_is_coalesced():
+    fm = FlowManager()
+    graphs = {
+        "a": fm.add_workflow(job(a=make_lookup("A"), coalesce="test_callables"), "coalesce_closure_a"),
+        "b": fm.add_workflow(job(b=make_lookup("B"), coalesce="test_callables"), "coalesce_closure_b"),
+        "p": fm.add_workflow(job(p=functools.partial(make_lookup("partial")), coalesce="test_callables"),
+                             "coalesce_partial"),
+        "c": fm.add_workflow(job(c=Lookup(), coalesce="test_callables"), "coalesce_instance"),
+    }
+    for name, fq_name in graphs.items():
+        fm.submit_task([{name: {"query": "same"}} for _ in range(2)], fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.01)
+
+    results = fm.pop_results()
+    assert not results["errors"]
+    sources = {name: [result["source"] for result in results["completed"][fq_name]]
+               for name, fq_name in graphs.items()}
+    assert sources == {"a": ["A", "A"], "b": ["B", "B"], "p": ["partial", "partial"], "c": ["instance", "instance"]}
+    assert SingleFlight.get_group("test_callables").stats()["coalesced"] == 4
+
+
+class Truncated:
+    def __init__(self, values):
+        self.values = values
+
+    def __repr__(self):
+        return f"Truncated({self.values[0]}, ...)"
+
+
+def test_request_key_compares_objects_by_identity():
+    first, second = Truncated([1, 2]), Truncated([1, 3])
+    assert repr(first) == repr(second)
+    assert request_key(first) != request_key(second)
+    assert request_key(first) == request_key(first)
+    assert request_key({1, 2}) == request_key({2, 1}) != request_key([1, 2])
+    assert request_key(b"ab") != request_key("6162")
+
+
+def test_identical_openai_requests_share_one_call():
+    properties = {"api": {"model": "fake-model"}, "coalesce": "test_openai",
+                  "rate_limit": {"max_rate": 1000, "time_period": 60}}
+    first = OpenAIJob("coalesce_first", properties)
+    second = OpenAIJob("coalesce_second", properties)
+
+    with FakeOpenAI(latency=0.1) as service:
+        client = AsyncOpenAI(base_url=service.base_url, api_key="test-key")
+        for llm in (first, second):
+            llm.client = client
+
+        async def calls():
+            same = [llm.run({"prompt": "What is Flow4AI?"}) for llm in (first, second) * 3]
+            return await asyncio.gather(*same, first.run({"prompt": "Something else"}))
+
+        results = asyncio.run(calls())
+        server_calls = service.calls
+
+    assert all(result == {"response": "ok"} for result in results)
+    assert server_calls == 2
+    stats = SingleFlight.get_group("test_openai").stats()
+    assert stats["coalesced"] == 5
+    assert stats["max_waiters"] == 6
+
+
+def test_openai_requests_with_other_credentials_are_not_shared(monkeypatch):
+    monkeypatch.setenv("TENANT_A_API_KEY", "key-a")
+    monkeypatch.setenv("TENANT_B_API_KEY", "key-b")
+
+    with FakeLLMServer(latency=0.1) as service:
+        tenants = [OpenAIJob(f"tenant_{tenant}", {
+            "client": {"base_url": service.base_url, "api_key": f"TENANT_{tenant.upper()}_API_KEY", "max_retries": 0},
+            "api": {"model": "fake-model"}, "coalesce": True,
+            "rate_limit": {"max_rate": 1000, "time_period": 60}}) for tenant in ("a", "b")]
+
+        async def calls():
+            return await asyncio.gather(*(llm.run({"prompt": "What is Flow4AI?"}) for llm in tenants))
+
+        results = asyncio.run(calls())
+        stats = service.stats()
+
+    assert all("response" in result for result in results)
+    assert stats["requests"] == 2
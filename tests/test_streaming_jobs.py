@@ -0,0 +1,215 @@
+"""
+Tests for streaming jobs: run methods and wrapped callables that are async generators.
+
+Tests verify that:
+1. Successor jobs start consuming a stream before the producer has finished
+2. Streams are aggregated into a normal result when they reach a tail job
+3. Non-streaming consumers can await a stream for its aggregated value
+4. FlowManager forwards streamed chunks to the on_partial callback
+5. Errors raised while streaming fail the task
+6. A stream stops being pulled, and its source is closed, when the task fails or is cancelled
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.job import JobABC
+from flow4ai.job_stream import ResultStream, default_aggregate
+
+
+class TokenJob(JobABC):
+    """Streaming JobABC subclass - run is an async generator."""
+    def __init__(self, name='tokens'):
+        super().__init__(name)
+
+    async def run(self, task):
+        for token in ["Hello", ", ", "world"]:
+            await asyncio.sleep(0.01)
+            yield token
+
+
+def test_default_aggregate():
+    assert default_aggregate(["a", "b"]) == "ab"
+    assert default_aggregate([1, 2]) == [1, 2]
+    assert default_aggregate([]) == []
+
+
+@pytest.mark.asyncio
+async def test_result_stream_multiple_consumers():
+    async def source():
+        for i in range(3):
+            await asyncio.sleep(0.001)
+            yield i
+
+    stream = ResultStream(source()).start("producer")
+
+    async def consume():
+        return [chunk async for chunk in stream]
+
+    first, second = await asyncio.gather(consume(), consume())
+    assert first == second == [0, 1, 2]
+    assert await stream == [0, 1, 2]
+    assert stream.done
+
+
+def test_streaming_tail_job_is_aggregated():
+    errors, result = FlowManager.run(TokenJob(), {}, "stream_tail")
+    assert not errors
+    assert result["result"] == "Hello, world"
+    assert result[JobABC.RETURN_JOB].endswith("tokens$$")
+
+
+def test_downstream_consumes_incrementally():
+    timings = {}
+
+    async def llm():
+        for i in range(5):
+            await asyncio.sleep(0.05)
+            yield f"tok{i} "
+        timings["producer_done"] = time.perf_counter()
+
+    async def printer(j_ctx):
+        chunks = []
+        async for chunk in j_ctx["inputs"]["llm"]:
+            timings.setdefault("first_chunk", time.perf_counter())
+            chunks.append(chunk)
+        return {"text": "".join(chunks), "count": len(chunks)}
+
+    workflow = job(llm=llm) >> job(printer=printer)
+    errors, result = FlowManager.run(workflow, {}, "stream_downstream")
+
+    assert not errors
+    assert result["text"] == "tok0 tok1 tok2 tok3 tok4 "
+    assert result["count"] == 5
+    # The consumer saw its first chunk well before the producer finished
+    assert timings["first_chunk"] < timings["producer_done"] - 0.1
+
+
+def test_non_streaming_consumer_awaits_stream():
+    async def consumer(j_ctx):
+        text = await j_ctx["inputs"]["tokens"]
+        return {"upper": text.upper()}
+
+    workflow = TokenJob() >> job(consumer=consumer)
+    errors, result = FlowManager.run(workflow, {}, "stream_await")
+
+    assert not errors
+    assert result["upper"] == "HELLO, WORLD"
+
+
+def test_streams_fanned_out_to_parallel_branches():
+    async def count_chunks(j_ctx):
+        return {"n": len([c async for c in j_ctx["inputs"]["tokens"]])}
+
+    async def join_text(j_ctx):
+        return {"text": await j_ctx["inputs"]["tokens"]}
+
+    def collect(j_ctx):
+        inputs = j_ctx["inputs"]
+        return {"n": inputs["count_chunks"]["n"], "text": inputs["join_text"]["text"]}
+
+    workflow = TokenJob() >> (job(count_chunks=count_chunks) | job(join_text=join_text)) >> job(collect=collect)
+    errors, result = FlowManager.run(workflow, {}, "stream_fan_out")
+
+    assert not errors
+    assert result["n"] == 3
+    assert result["text"] == "Hello, world"
+
+
+def test_saved_stream_result_is_aggregated():
+    tokens = TokenJob()
+    tokens.save_result = True
+
+    def done():
+        return {"done": True}
+
+    errors, result = FlowManager.run(tokens >> job(done=done), {}, "stream_saved")
+
+    assert not errors
+    assert result[JobABC.SAVED_RESULTS]["tokens"] == "Hello, world"
+
+
+def test_on_partial_receives_chunks():
+    partials = []
+    fm = FlowManager(on_partial=partials.append)
+    fq_name = fm.add_workflow(TokenJob(), "stream_partials")
+
+    fm.submit_task({"id": 1}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    assert [p["chunk"] for p in partials] == ["Hello", ", ", "world"]
+    assert all(p["job"] == "tokens" for p in partials)
+    assert partials[0][JobABC.TASK_PASSTHROUGH_KEY]["id"] == 1
+    result = fm.pop_results()["completed"][fq_name][0]
+    assert result["result"] == "Hello, world"
+
+
+def test_stream_error_fails_task():
+    async def broken():
+        yield "partial"
+        raise RuntimeError("stream broke")
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(broken=broken), "stream_error")
+    fm.submit_task({}, fq_name)
+    assert fm.wait_for_completion(timeout=5)
+
+    assert fm.get_counts()["errors"] == 1
+    errors = fm.pop_results()["errors"]
+    assert "stream broke" in str(errors[fq_name][0]["error"])
+
+
+def test_stream_closed_when_task_fails():
+    produced = []
+    closed = []
+
+    async def endless():
+        try:
+            for i in range(1000):
+                produced.append(i)
+                await asyncio.sleep(0.01)
+                yield f"chunk {i}"
+        finally:
+            closed.append(True)
+
+    def validate(j_ctx):
+        raise ValueError("invalid")
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(endless=endless) >> job(validate=validate), "stream_closed")
+    fm.submit_task({}, fq_name)
+    assert fm.wait_for_completion(timeout=5, check_interval=0.01)
+    assert fm.get_counts()["errors"] == 1
+
+    produced_at_failure = len(produced)
+    time.sleep(0.2)
+    assert closed == [True]
+    assert len(produced) == produced_at_failure < 10
+
+
+@pytest.mark.asyncio
+async def test_result_stream_aclose():
+    closed = []
+
+    async def source():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "chunk"
+        finally:
+            closed.append(True)
+
+    stream = ResultStream(source()).start()
+    await asyncio.sleep(0.05)
+    await stream.aclose()
+    chunks = len(stream.chunks)
+    await asyncio.sleep(0.05)
+    assert stream.done and len(stream.chunks) == chunks
+    assert closed == [True]
+    with pytest.raises(asyncio.CancelledError):
+        await stream
+    await stream.aclose()
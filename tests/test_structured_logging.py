@@ -0,0 +1,161 @@
+"""
+Tests for JSON logging, the queue log mode and task correlation.
+
+Tests verify that:
+1. Records logged by a task's jobs carry its task_id and fq_name as JSON, records outside tasks don't
+2. The queue mode writes records from a listener thread, flushed when it stops or logging is set up again
+3. FlowManagerMP's job executor, a forked process, writes its queued records with their task ids
+4. Hot path debug messages don't format results unless DEBUG is on
+5. The logging benchmark reports the records and overhead per task
+"""
+
+import json
+import logging as std_logging
+
+import pytest
+
+from flow4ai import f4a_logging as logging
+from flow4ai.bench.logging_overhead import run_logging_benchmark
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.job import JobABC
+
+logger = logging.getLogger("StructuredLoggingTest")
+
+
+def lookup(j_ctx):
+    logger.info("Looking up %s", j_ctx["task"]["q"])
+    return {"found": True}
+
+
+def summarise(j_ctx):
+    logger.warning("Summarising")
+    return {"summary": "done"}
+
+
+class CountedRepr:
+    """A result value counting how often it is formatted."""
+    calls = 0
+
+    def __repr__(self):
+        CountedRepr.calls += 1
+        return "CountedRepr()"
+
+
+def counted(j_ctx):
+    return {"value": CountedRepr()}
+
+
+def read_json_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.startswith("{")]
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    for variable in ("FLOW4AI_LOG_LEVEL", "FLOW4AI_LOG_HANDLERS", "FLOW4AI_LOG_MODE", "FLOW4AI_LOG_FORMAT"):
+        monkeypatch.delenv(variable, raising=False)
+    yield str(tmp_path / "flow4ai.log")
+    logging.setup_logging()
+
+
+def test_json_records_carry_task(log_file):
+    logging.setup_logging(handlers=["file"], log_format="json", filename=log_file)
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(lookup=lookup) >> job(summarise=summarise), "logged_graph")
+    fm.submit_task([{"q": "a"}, {"q": "b"}], fq_name)
+    assert fm.wait_for_completion(timeout=10, check_interval=0.01)
+    task_ids = {result[JobABC.TASK_PASSTHROUGH_KEY].task_id for result in fm.pop_results()["completed"][fq_name]}
+    logger.info("Outside a task")
+
+    records = [record for record in read_json_lines(log_file) if record["logger"] == "StructuredLoggingTest"]
+    job_records = records[:-1]
+    assert sorted(record["message"] for record in job_records) == [
+        "Looking up a", "Looking up b", "Summarising", "Summarising"]
+    assert {record["task_id"] for record in job_records} == task_ids
+    assert all(record["fq_name"] == fq_name for record in job_records)
+    assert {record["level"] for record in job_records} == {"INFO", "WARNING"}
+    assert records[-1]["message"] == "Outside a task" and records[-1]["task_id"] is None
+    assert records[-1]["module"] == "test_structured_logging" and records[-1]["line"] > 0
+
+    with logging.log_task("task-1", "graph$$$$job$$"):
+        try:
+            raise KeyError("missing")
+        except KeyError:
+            logger.exception("Failed")
+    failed = read_json_lines(log_file)[-1]
+    assert (failed["task_id"], failed["level"]) == ("task-1", "ERROR")
+    assert "KeyError: 'missing'" in failed["exception"]
+
+
+def test_queue_mode(log_file):
+    logging.setup_logging(handlers=["file"], mode="queue", filename=log_file)
+    root_handlers = std_logging.getLogger().handlers
+    assert [type(handler) for handler in root_handlers] == [logging.TaskQueueHandler]
+    writer = root_handlers[0]
+
+    with logging.log_task("task-2", None):
+        for i in range(200):
+            logger.info("Record %d of %s", i, ["mutable"])
+    # Reconfiguring stops the listener, writing what it had queued
+    logging.setup_logging(handlers=["file"], mode="queue", log_format="json", filename=log_file)
+    with open(log_file) as f:
+        text_lines = [line for line in f if "StructuredLoggingTest" in line]
+    assert len(text_lines) == 200 and "Record 199 of ['mutable']" in text_lines[-1]
+    assert std_logging.getLogger().handlers[0] is not writer
+
+    logger.error("Queued as JSON")
+    logging.stop_queue_listener()
+    assert read_json_lines(log_file)[-1]["message"] == "Queued as JSON"
+    with pytest.raises(ValueError):
+        logging.setup_logging(mode="async")
+    with pytest.raises(ValueError):
+        logging.get_logging_config(log_format="xml")
+
+
+def test_queue_mode_in_flowmanagerMP(log_file):
+    logging.setup_logging(handlers=["file"], mode="queue", log_format="json", filename=log_file)
+    results = []
+    fm = FlowManagerMP({"mp_logged": job(lookup=lookup)}, results.append, serial_processing=True)
+    fm.submit_task([{"q": f"mp{i}"} for i in range(3)])
+    fm.close_processes()
+    logging.stop_queue_listener()
+
+    records = [record for record in read_json_lines(log_file) if record["logger"] == "StructuredLoggingTest"]
+    assert sorted(record["message"] for record in records) == ["Looking up mp0", "Looking up mp1", "Looking up mp2"]
+    assert len({record["task_id"] for record in records}) == 3 and None not in {r["task_id"] for r in records}
+    assert {record["process"] for record in records} == {fm.job_executor_process.pid}
+
+
+def test_debug_messages_formatted_lazily(log_file):
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(counted=counted), "lazy_graph")
+    logging.setup_logging("INFO", ["file"], filename=log_file)
+    CountedRepr.calls = 0
+    fm.submit_task({"q": 1}, fq_name)
+    assert fm.wait_for_completion(timeout=10, check_interval=0.01)
+    assert CountedRepr.calls == 0
+
+    logging.setup_logging("DEBUG", ["file"], filename=log_file)
+    fm.submit_task({"q": 2}, fq_name)
+    assert fm.wait_for_completion(timeout=10, check_interval=0.01)
+    assert CountedRepr.calls > 0
+    with open(log_file) as f:
+        assert any("returning result" in line and "CountedRepr()" in line for line in f)
+
+
+def test_logging_benchmark(log_file, tmp_path):
+    info = run_logging_benchmark(tasks=50, level="INFO", mode="queue", repeat=1, log_dir=str(tmp_path))
+    assert (info['level'], info['mode'], info['format'], info['tasks']) == ("INFO", "queue", "text", 50)
+    # The jobs' three records, and any the framework or other threads log at INFO meanwhile
+    assert info['records_per_task'] >= 3.0 and info['bytes_per_task'] > 0
+    assert info['baseline_us'] > 0 and info['per_task_us'] > 0
+
+    debug = run_logging_benchmark(tasks=50, level="DEBUG", log_format="json", repeat=1, log_dir=str(tmp_path))
+    assert debug['records_per_task'] > info['records_per_task']
+    assert debug['bytes_per_task'] > info['bytes_per_task']
+    with pytest.raises(ValueError):
+        run_logging_benchmark(level="TRACE")
+    # Logging is set up from the environment again
+    assert not isinstance(std_logging.getLogger().handlers[0], logging.TaskQueueHandler)
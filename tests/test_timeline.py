@@ -0,0 +1,174 @@
+"""
+Tests for per-task execution timelines and their critical path analysis.
+
+Tests verify that:
+1. A task's result holds the times its jobs got their inputs, started, ran and ended
+2. The critical path follows the slow branch of a graph and the fast branch has slack
+3. The analyzer aggregates many tasks, attributing time to queue, slot waits and runs
+4. on_timeline receives the timelines of failed tasks, written and read back as JSON lines
+5. FlowManagerMP records timelines in its job executor process
+6. TimelineWriter writes from its own thread, so callers don't wait on the disk, and drops when its queue is full
+"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.job import JobABC
+from flow4ai.utils.timeline import (TimelineAnalyzer, TimelineWriter, critical_path, job_slack,
+                                    job_waits, read_timelines)
+from tests.test_utils.run_tasks import run_tasks
+
+
+async def fetch(j_ctx):
+    if j_ctx["task"].get("fail"):
+        raise ConnectionError("service down")
+    return {"fetched": True}
+
+
+async def slow_search(j_ctx):
+    await asyncio.sleep(0.1)
+    return {"documents": ["a", "b"]}
+
+
+async def fast_lookup(j_ctx):
+    await asyncio.sleep(0.01)
+    return {"facts": ["c"]}
+
+
+def answer(j_ctx):
+    return {"answer": "done"}
+
+
+def diamond():
+    return job(fetch=fetch) >> (job(slow_search=slow_search) | job(fast_lookup=fast_lookup)) >> job(answer=answer)
+
+
+def test_timeline_attached_to_result():
+    fm = FlowManager(timeline=True)
+    fq_name = fm.add_workflow(diamond(), "timeline_graph")
+    results = run_tasks(fm, fq_name, {"q": "why"})
+
+    timeline = results["completed"][fq_name][0][JobABC.TIMELINE]
+    assert timeline["fq_name"] == fq_name and timeline["outcome"] == "completed"
+    jobs = timeline["jobs"]
+    assert set(jobs) == {"fetch", "slow_search", "fast_lookup", "answer"}
+    assert sorted(jobs["answer"]["after"]) == ["fast_lookup", "slow_search"]
+    for entry in jobs.values():
+        assert entry["outcome"] == "completed"
+        assert entry["inputs_ready_ms"] <= entry["start_ms"] <= entry["run_start_ms"] <= entry["end_ms"]
+    assert 0 <= timeline["dequeued_ms"] <= jobs["fetch"]["start_ms"]
+    # The join is ready once its slowest input arrives
+    assert jobs["answer"]["inputs_ready_ms"] >= jobs["slow_search"]["end_ms"] >= jobs["fast_lookup"]["end_ms"]
+    assert jobs["slow_search"]["end_ms"] - jobs["slow_search"]["run_start_ms"] >= 100
+    assert timeline["finished_ms"] >= jobs["answer"]["end_ms"]
+
+    # Not recorded unless asked for
+    plain = FlowManager()
+    plain_fq_name = plain.add_workflow(job(plain_answer=answer), "no_timeline_graph")
+    assert JobABC.TIMELINE not in run_tasks(plain, plain_fq_name, {"q": "why"})["completed"][plain_fq_name][0]
+
+
+def test_critical_path_and_slack():
+    fm = FlowManager(timeline=True)
+    fq_name = fm.add_workflow(diamond(), "critical_graph")
+    timeline = run_tasks(fm, fq_name, {"q": "why"})["completed"][fq_name][0][JobABC.TIMELINE]
+
+    assert critical_path(timeline) == ["fetch", "slow_search", "answer"]
+    slack = job_slack(timeline)
+    assert slack["fast_lookup"] >= 60
+    assert max(slack[name] for name in ("fetch", "slow_search", "answer")) < 20
+    waits = job_waits(timeline)
+    assert waits["answer"]["input_wait_ms"] >= 60
+    assert waits["slow_search"]["run_ms"] >= 100
+
+
+def test_analyzer_over_many_tasks():
+    async def limited(j_ctx):
+        await asyncio.sleep(0.01)
+        return {"limited": True}
+
+    timelines = []
+    fm = FlowManager(on_timeline=timelines.append)
+    fq_name = fm.add_workflow(job(fetch=fetch) >> job(limited=limited, max_concurrency=2) >> job(answer=answer),
+                              "analyzed_graph")
+    run_tasks(fm, fq_name, [{"n": i} for i in range(20)])
+
+    report = TimelineAnalyzer().add_all(timelines).report()[fq_name]
+    assert (report["tasks"], report["errors"]) == (20, 0)
+    assert report["critical_paths"] == [{"path": ["fetch", "limited", "answer"], "share": 1.0}]
+    jobs = report["jobs"]
+    assert list(jobs)[0] == "limited"
+    assert jobs["limited"]["runs"] == 20 and jobs["limited"]["critical_share"] == 1.0
+    # Tasks queue for the two slots, ten deep
+    assert jobs["limited"]["slot_wait_ms"]["max"] >= 50
+    assert jobs["limited"]["run_ms"]["p50"] >= 10
+    # The jobs' time on the critical path adds up to the mean time from dequeuing to the end
+    mean_end = sum(t["jobs"]["answer"]["end_ms"] - t["dequeued_ms"] for t in timelines) / 20
+    assert sum(job["critical_ms"] for job in jobs.values()) == pytest.approx(mean_end, rel=0.01)
+
+
+def test_failed_task_timeline_written(tmp_path):
+    path = tmp_path / "timelines" / "timelines.jsonl"
+    writer = TimelineWriter(str(path))
+    fm = FlowManager(on_timeline=writer)
+    fq_name = fm.add_workflow(job(fetch=fetch) >> job(answer=answer), "failing_timeline_graph")
+    run_tasks(fm, fq_name, [{"n": 1}, {"fail": True}])
+    assert writer.flush()
+
+    timelines = sorted(read_timelines(str(path)), key=lambda t: t["outcome"])
+    assert [t["outcome"] for t in timelines] == ["completed", "error"]
+    failed = timelines[1]
+    assert failed["error"] == "ConnectionError"
+    assert failed["jobs"]["fetch"]["outcome"] == "error"
+    assert "answer" not in failed["jobs"]
+    assert critical_path(failed) == ["fetch"]
+
+
+def test_flowmanagerMP_timeline(tmp_path):
+    path = tmp_path / "mp_timelines.jsonl"
+    results = []
+    fm = FlowManagerMP({"mp_timeline": diamond()}, results.append, serial_processing=True,
+                       timeline=True, on_timeline=TimelineWriter(str(path)))
+    fm.submit_task([{"n": i} for i in range(3)])
+    fm.close_processes()
+
+    assert len(results) == 3
+    for result in results:
+        assert critical_path(result[JobABC.TIMELINE]) == ["fetch", "slow_search", "answer"]
+    written = list(read_timelines(str(path)))
+    assert {t["task_id"] for t in written} == {r[JobABC.TIMELINE]["task_id"] for r in results}
+    report = TimelineAnalyzer().add_all(written).report()
+    assert next(iter(report.values()))["jobs"]["fast_lookup"]["slack_ms"]["p50"] >= 60
+
+
+def test_timeline_writer_thread(tmp_path, monkeypatch):
+    path = str(tmp_path / "writer.jsonl")
+    writer = TimelineWriter(path, max_queue_size=3)
+    release = threading.Event()
+    writers = []
+    open_file = os.open
+
+    def slow_open(*args, **kwargs):
+        writers.append(threading.current_thread().name)
+        release.wait(5)
+        return open_file(*args, **kwargs)
+
+    monkeypatch.setattr(os, "open", slow_open)
+    for i in range(10):
+        writer({"task_id": i})
+    release.set()
+    assert writer.flush()
+
+    written = [t["task_id"] for t in read_timelines(path)]
+    assert len(written) + writer.dropped == 10 and writer.dropped >= 6
+    assert written == sorted(written) and set(writers) == {"TimelineWriter"}
+    writer.close()
+    writer({"task_id": 10})
+    writer.close()
+    assert [t["task_id"] for t in read_timelines(path)][-1] == 10
@@ -0,0 +1,187 @@
+"""
+Tests for the flow4ai-analyze trace and timeline analysis.
+
+Tests verify that:
+1. Spans of a FlowManager trace are grouped into tasks, with job latency and errors by job and exception
+2. JSON array traces are read a chunk at a time and give the same report as JSON lines, gzipped or truncated
+3. Timelines give throughput and concurrency over time and the slowest tasks
+4. Tasks are closed as the trace moves on, so memory doesn't grow with the file, and percentiles are accurate
+5. The command prints the report as text or JSON
+"""
+
+import asyncio
+import gzip
+import json
+import random
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.utils import trace_analysis
+from flow4ai.utils.otel_wrapper import AsyncFileExporter, JsonlFileExporter, TracerFactory
+from flow4ai.utils.timeline import TimelineWriter
+from flow4ai.utils.trace_analysis import (LatencyHistogram, TraceAnalyzer, format_report,
+                                          iter_records, main)
+
+
+async def fetch(j_ctx):
+    if j_ctx["task"].get("fail") == "fetch":
+        raise ConnectionError("service down")
+    await asyncio.sleep(0.01)
+    return {"fetched": True}
+
+
+async def summarise(j_ctx):
+    await asyncio.sleep(0.05)
+    if j_ctx["task"].get("fail") == "summarise":
+        raise KeyError("summary")
+    return {"summary": "done"}
+
+
+def run_traced(exporter, tasks):
+    provider = TracerProvider(shutdown_on_exit=False)
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    saved = TracerFactory._instance
+    TracerFactory._instance = provider.get_tracer("test_trace_analysis")
+    try:
+        fm = FlowManager()
+        fq_name = fm.add_workflow(job(fetch=fetch) >> job(summarise=summarise), "analyzed_graph")
+        fm.set_raise_on_error(False)
+        fm.submit_task(tasks, fq_name)
+        assert fm.wait_for_completion(timeout=10, check_interval=0.01)
+    finally:
+        fm.set_raise_on_error(True)
+        TracerFactory._instance = saved
+        exporter.shutdown()
+    return fq_name
+
+
+def test_spans_grouped_into_tasks(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    fq_name = run_traced(JsonlFileExporter(path), [{"n": i} for i in range(8)] + [{"fail": "fetch"}, {"fail": "summarise"}])
+
+    report = TraceAnalyzer().add_file(path).report()
+    assert (report['tasks'], report['errors'], report['timelines']) == (10, 2, 0)
+    graph = report['graphs'][fq_name]
+    assert (graph['tasks'], graph['errors']) == (10, 2)
+    jobs = graph['jobs']
+    assert list(jobs) == ["summarise", "fetch"]  # slowest at p99 first
+    assert (jobs['fetch']['runs'], jobs['summarise']['runs']) == (10, 9)
+    # The failure of summarise also fails the span of fetch, which triggered it
+    assert (jobs['fetch']['errors'], jobs['summarise']['errors']) == (1, 1)
+    assert jobs['summarise']['ms']['p50'] >= 50 and jobs['fetch']['ms']['p50'] >= 10
+    assert graph['task_ms']['p50'] >= 60
+    assert sorted((error['job'], error['exception'], error['count']) for error in report['errors_by_job']) == [
+        ("fetch", "ConnectionError", 1), ("summarise", "KeyError", 1)]
+    assert len(report['slowest']) == 10 and report['slowest'][-1]['error'] == "ConnectionError"
+    assert report['slowest'][0]['ms'] >= report['slowest'][1]['ms']
+
+
+def test_json_array_traces(tmp_path, monkeypatch):
+    path = str(tmp_path / "trace.json")
+    run_traced(AsyncFileExporter(path), [{"n": i} for i in range(6)])
+    jsonl_path = str(tmp_path / "trace.jsonl.gz")
+    with open(path) as f, gzip.open(jsonl_path, "wt") as out:
+        spans = json.load(f)
+        out.writelines(json.dumps(span) + "\n" for span in spans)
+
+    # Spans split across many chunks
+    monkeypatch.setattr(trace_analysis, "_CHUNK_SIZE", 300)
+    assert list(iter_records(path)) == spans
+    report = TraceAnalyzer().add_file(path).report()
+    assert report['spans'] == len(spans) and report['tasks'] == 6
+    assert report['graphs'] == TraceAnalyzer().add_file(jsonl_path).report()['graphs']
+
+    # Cut off mid span, as by a crash while writing
+    text = open(path).read()
+    truncated = str(tmp_path / "truncated.json")
+    with open(truncated, "w") as f:
+        f.write(text[:text.rindex('"name"')])
+    truncated_report = TraceAnalyzer().add_file(truncated).report()
+    assert truncated_report['malformed'] == 1 and truncated_report['spans'] == len(spans) - 1
+
+
+def timeline(task_id, submitted_at, finished_ms, error=None):
+    return {'task_id': task_id, 'fq_name': "timeline_graph$$$$fetch$$", 'submitted_at': submitted_at,
+            'outcome': "error" if error else "completed", 'error': error, 'dequeued_ms': 0.0,
+            'finished_ms': finished_ms,
+            'jobs': {'fetch': {'after': [], 'outcome': "error" if error else "completed",
+                               'inputs_ready_ms': 0.0, 'start_ms': 0.0, 'run_start_ms': 0.0,
+                               'end_ms': finished_ms}}}
+
+
+def test_timelines_over_time(tmp_path):
+    path = str(tmp_path / "timelines.jsonl")
+    writer = TimelineWriter(path)
+    # Two tasks in flight at a time for the first 10s, then one for the next 10s
+    for i in range(10):
+        writer(timeline(f"a{i}", 1000.0 + i, 2000.0))
+    for i in range(10):
+        writer(timeline(f"b{i}", 1010.0 + i, 1000.0, error="TimeoutError" if i == 9 else None))
+    writer.close()
+
+    report = TraceAnalyzer(interval_seconds=10, top=3).add_file(path).report()
+    assert (report['tasks'], report['errors'], report['duration_s']) == (20, 1, 20.0)
+    assert report['throughput_per_s'] == 1.0
+    intervals = [(i['start'], i['completed'], i['errors'], i['concurrency']) for i in report['intervals']]
+    assert intervals == [(1000.0, 8, 0, 1.9), (1010.0, 11, 0, 1.1), (1020.0, 1, 1, 0.0)]
+    assert [task['task_id'] for task in report['slowest']] == ["a9", "a8", "a7"]
+    assert report['errors_by_job'] == [{'fq_name': "timeline_graph$$$$fetch$$", 'job': "fetch",
+                                        'exception': "TimeoutError", 'count': 1}]
+    assert report['graphs']["timeline_graph$$$$fetch$$"]['jobs']['fetch']['ms']['max'] == 2000.0
+
+
+def test_tasks_closed_as_trace_moves_on():
+    analyzer = TraceAnalyzer(task_window_seconds=5)
+    rng = random.Random(7)
+    durations = []
+    open_tasks = 0
+    for i in range(5000):
+        start = i * 0.1
+        for job_name, offset in (("fetch", 0.0), ("answer", 0.02)):
+            ms = rng.lognormvariate(3, 0.5)
+            if job_name == "answer":
+                durations.append(ms)
+            analyzer.add({'name': "flow4ai.job._execute", 'context': {}, 'parent_id': None,
+                          'start_time': int((start + offset) * 1e9), 'end_time': int((start + offset + ms / 1000) * 1e9),
+                          'attributes': {'flow4ai.task_id': f"task-{i}", 'flow4ai.job': job_name},
+                          'events': [], 'status': {'status_code': "StatusCode.UNSET", 'description': None}})
+        open_tasks = max(open_tasks, len(analyzer._open))
+    assert open_tasks <= 60
+
+    answer = analyzer.report()['graphs']["[unknown]"]['jobs']['answer']['ms']
+    assert answer['count'] == 5000
+    durations.sort()
+    for quantile in (0.5, 0.95, 0.99):
+        exact = durations[int(quantile * 5000) - 1]
+        assert answer[f"p{int(quantile * 100)}"] == pytest.approx(exact, rel=0.015)
+
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.5) is None and histogram.summary()['p99'] is None
+    with pytest.raises(ValueError):
+        TraceAnalyzer(interval_seconds=0)
+
+
+def test_command(tmp_path, capsys):
+    path = str(tmp_path / "timelines.jsonl")
+    writer = TimelineWriter(path)
+    for i in range(5):
+        writer(timeline(f"t{i}", 1000.0 + i, 100.0 * (i + 1), error="ValueError" if i == 0 else None))
+    writer.close()
+
+    main([path, "--interval", "1", "--top", "2"])
+    text = capsys.readouterr().out
+    assert text == format_report(TraceAnalyzer(1, 2).add_file(path).report()) + "\n"
+    assert text.startswith("5 tasks, 1 errors from 0 spans and 5 timelines")
+    assert "timeline_graph$$$$fetch$$: 5 tasks, 1 errors" in text
+    assert "ValueError" in text and "slowest tasks:" in text
+
+    main([path, "--json"])
+    report = json.loads(capsys.readouterr().out)
+    assert report['tasks'] == 5 and report['files'] == [path]
+
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "missing.jsonl")])
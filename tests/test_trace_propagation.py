@@ -0,0 +1,186 @@
+"""
+Tests for carrying trace context across FlowManagerMP's process boundary.
+
+Tests verify that:
+1. A captured context survives pickling and is continued by a consumer span recording the wait
+2. Tasks, their jobs and on_complete in FlowManagerMP's processes join the submitter's trace
+3. Failed tasks record the error and still link the result processor's span
+4. Spans continuing an unsampled remote trace are kept for tail sampling only when it is on
+5. File exporters don't lose spans exported from several or forked processes
+"""
+
+import json
+import multiprocessing as mp
+import pickle
+import time
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import Decision
+from opentelemetry.trace import (NonRecordingSpan, SpanContext, SpanKind, TraceFlags,
+                                 set_span_in_context)
+
+from flow4ai.dsl import job
+from flow4ai.flowmanagerMP import FlowManagerMP
+from flow4ai.utils.otel_wrapper import AsyncFileExporter, JsonlFileExporter, TracerFactory
+from flow4ai.utils.trace_propagation import (ON_COMPLETE_SPAN, TASK_SPAN, capture_context,
+                                             continue_trace)
+from flow4ai.utils.trace_sampling import GraphSampler, TraceSampling
+
+
+def fetch(j_ctx):
+    if j_ctx["task"].get("fail"):
+        raise ConnectionError("service down")
+    return {"fetched": True}
+
+
+def summarise(j_ctx):
+    return {"summary": "done"}
+
+
+def ignore_result(result):
+    """A picklable on_complete for the result processor process."""
+
+
+def use_tracer(provider):
+    saved = TracerFactory._instance
+    TracerFactory._instance = provider.get_tracer("test_trace_propagation")
+    return saved
+
+
+@pytest.fixture
+def memory_spans():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(shutdown_on_exit=False)
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    saved = use_tracer(provider)
+    yield exporter
+    TracerFactory._instance = saved
+
+
+@pytest.fixture
+def file_spans(tmp_path):
+    """A tracer exporting synchronously to a file, inherited by FlowManagerMP's processes."""
+    path = str(tmp_path / "trace.json")
+    provider = TracerProvider(shutdown_on_exit=False)
+    provider.add_span_processor(SimpleSpanProcessor(AsyncFileExporter(path)))
+    saved = use_tracer(provider)
+
+    def read():
+        with open(path) as f:
+            return json.load(f)
+    yield read
+    TracerFactory._instance = saved
+
+
+def test_context_continued_after_pickling(memory_spans):
+    with TracerFactory.get_tracer().start_as_current_span("submit") as submit:
+        carrier = pickle.loads(pickle.dumps(capture_context()))
+    time.sleep(0.05)
+    with continue_trace("consume", carrier, {"n": 1}, wait_attribute="wait_ms") as span:
+        assert span is not None
+
+    consume = memory_spans.get_finished_spans()[-1]
+    assert consume.kind == SpanKind.CONSUMER
+    assert consume.parent.span_id == submit.get_span_context().span_id
+    assert consume.parent.is_remote
+    assert consume.context.trace_id == submit.get_span_context().trace_id
+    assert consume.attributes["n"] == 1 and consume.attributes["wait_ms"] >= 50
+
+    with continue_trace("no_carrier", None) as span:
+        assert span is None
+    TracerFactory.set_enabled(False)
+    try:
+        assert capture_context() is None
+    finally:
+        TracerFactory.set_enabled(True)
+
+
+def test_mp_spans_join_submitter_trace(file_spans):
+    fm = FlowManagerMP({"propagation": job(fetch=fetch) >> job(summarise=summarise)}, ignore_result)
+    with TracerFactory.get_tracer().start_as_current_span("request") as request:
+        fm.submit_task([{"n": i} for i in range(3)])
+    fm.close_processes()
+
+    spans = file_spans()
+    request_context = request.get_span_context()
+    assert {span['context']['trace_id'] for span in spans} == {format(request_context.trace_id, '032x')}
+    tasks = [span for span in spans if span['name'] == TASK_SPAN]
+    assert len(tasks) == 3
+    assert all(span['parent_id'] == format(request_context.span_id, '016x') for span in tasks)
+    assert all(span['attributes']['flow4ai.task.queue_ms'] >= 0 for span in tasks)
+    task_ids = {span['context']['span_id'] for span in tasks}
+
+    jobs = [span for span in spans if span['name'].endswith('._execute')]
+    heads = [span for span in jobs if span['attributes']['flow4ai.job'] == 'fetch']
+    assert len(jobs) == 6 and {span['parent_id'] for span in heads} == task_ids
+    on_complete = [span for span in spans if span['name'] == ON_COMPLETE_SPAN]
+    assert {span['parent_id'] for span in on_complete} == task_ids
+    assert all('flow4ai.task.result_queue_ms' in span['attributes'] for span in on_complete)
+
+
+def test_mp_failed_task_span(file_spans):
+    results = []
+    fm = FlowManagerMP({"propagation_failure": job(fetch=fetch) >> job(summarise=summarise)},
+                       results.append, serial_processing=True)
+    fm.set_raise_on_error(False)
+    try:
+        fm.submit_task({"fail": True})
+        fm.close_processes()
+    finally:
+        fm.set_raise_on_error(True)
+
+    assert isinstance(results[0], Exception)
+    spans = file_spans()
+    task = next(span for span in spans if span['name'] == TASK_SPAN)
+    assert task['status']['status_code'] == "StatusCode.ERROR"
+    assert "service down" in task['status']['description']
+    # A new trace, as nothing was traced when the task was submitted
+    assert task['parent_id'] is None
+    on_complete = next(span for span in spans if span['name'] == ON_COMPLETE_SPAN)
+    assert on_complete['parent_id'] == task['context']['span_id']
+
+
+def test_unsampled_remote_parent():
+    remote = NonRecordingSpan(SpanContext(0x1234, 0x5678, is_remote=True, trace_flags=TraceFlags(TraceFlags.DEFAULT)))
+    parent_context = set_span_in_context(remote)
+
+    tail = GraphSampler(TraceSampling(ratio=0.0, keep_errors=True))
+    assert tail.should_sample(parent_context, 0x1234, TASK_SPAN).decision == Decision.RECORD_ONLY
+    head_only = GraphSampler(TraceSampling(ratio=0.0, keep_errors=False))
+    assert head_only.should_sample(parent_context, 0x1234, TASK_SPAN).decision == Decision.DROP
+
+
+def export_spans(path, name, count, exporter=None):
+    exporter = exporter or AsyncFileExporter(path)
+    tracer = TracerProvider(shutdown_on_exit=False).get_tracer("test_trace_propagation")
+    for i in range(count):
+        span = tracer.start_span(f"{name}_{i}")
+        span.end()
+        exporter.export([span])
+    exporter.force_flush()
+
+
+def test_file_exporter_shared_by_processes(tmp_path):
+    path = str(tmp_path / "trace.json")
+    processes = [mp.Process(target=export_spans, args=(path, f"process{p}", 25)) for p in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+
+    with open(path) as f:
+        names = {span['name'] for span in json.load(f)}
+    assert names == {f"process{p}_{i}" for p in range(3) for i in range(25)}
+
+    # The writer thread of an exporter created before forking is restarted in the child
+    jsonl_path = str(tmp_path / "trace.jsonl")
+    exporter = JsonlFileExporter(jsonl_path)
+    child = mp.Process(target=export_spans, args=(jsonl_path, "child", 10, exporter))
+    child.start()
+    child.join(30)
+    exporter.shutdown()
+    with open(jsonl_path) as f:
+        assert [json.loads(line)['name'] for line in f] == [f"child_{i}" for i in range(10)]
@@ -0,0 +1,154 @@
+"""
+Tests for sampling job traces.
+
+Tests verify that:
+1. Tasks are head sampled with the ratio of their graph, by graph name or fq_name
+2. Unsampled traces are exported when a job failed or the task was slow, others are discarded
+3. Without tail sampling unsampled tasks are not recorded at all
+4. Jobs with trace=False get no span
+5. Sampling is configured from otel_config.yaml and at runtime on the FlowManager
+"""
+
+import asyncio
+import random
+
+import pytest
+import yaml
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import Decision
+
+from flow4ai.dsl import job
+from flow4ai.flowmanager import FlowManager
+from flow4ai.utils.otel_wrapper import TracerFactory
+from flow4ai.utils.trace_sampling import (GRAPH_ATTRIBUTE, SAMPLED_BY_ATTRIBUTE, GraphSampler,
+                                          TailSamplingProcessor, TraceSampling)
+from tests.test_utils.run_tasks import run_tasks
+
+
+@pytest.fixture
+def sampled_spans():
+    """Points TracerFactory at a private provider with sampling, exporting to memory."""
+    exporter = InMemorySpanExporter()
+    sampling = TraceSampling()
+    provider = TracerProvider(sampler=GraphSampler(sampling), shutdown_on_exit=False)
+    processor = TailSamplingProcessor(sampling, SimpleSpanProcessor(exporter))
+    provider.add_span_processor(processor)
+    saved = TracerFactory._instance, TracerFactory.sampling, TracerFactory._tail_processor
+    TracerFactory._instance = provider.get_tracer("test_trace_sampling")
+    TracerFactory.sampling, TracerFactory._tail_processor = sampling, processor
+    yield exporter
+    TracerFactory._instance, TracerFactory.sampling, TracerFactory._tail_processor = saved
+
+
+def job_spans(exporter):
+    return [span for span in exporter.get_finished_spans() if span.name == "flow4ai.job._execute"]
+
+
+def test_head_sampling_by_graph(sampled_spans):
+    def answer(j_ctx):
+        return {"ok": True}
+
+    TracerFactory.sampling.configure(ratio=0.0, graphs={"sampled_graph": 1.0}, keep_errors=False)
+    fm = FlowManager()
+    sampled = fm.add_workflow(job(sampled_answer=answer), "sampled_graph")
+    unsampled = fm.add_workflow(job(unsampled_answer=answer), "unsampled_graph")
+    run_tasks(fm, sampled, [{"n": i} for i in range(5)])
+    run_tasks(fm, unsampled, [{"n": i} for i in range(5)])
+
+    spans = job_spans(sampled_spans)
+    assert len(spans) == 5
+    assert {span.attributes[GRAPH_ATTRIBUTE] for span in spans} == {sampled}
+
+    sampler = GraphSampler(TraceSampling(ratio=0.5, graphs={unsampled: 0.1}))
+    rng = random.Random(0)
+    decisions = [sampler.should_sample(None, rng.getrandbits(128), "span", attributes={GRAPH_ATTRIBUTE: graph}).decision
+                 for graph in ("other_graph", unsampled) for _ in range(2000)]
+    default, by_fq_name = decisions[:2000], decisions[2000:]
+    assert 0.4 < default.count(Decision.RECORD_AND_SAMPLE) / 2000 < 0.6
+    assert 0.05 < by_fq_name.count(Decision.RECORD_AND_SAMPLE) / 2000 < 0.15
+
+
+def test_tail_sampling_keeps_failed_and_slow_tasks(sampled_spans):
+    async def fetch(j_ctx):
+        task = j_ctx["task"]
+        if task.get("fail"):
+            raise ConnectionError("service down")
+        await asyncio.sleep(task.get("delay", 0))
+        return {"fetched": True}
+
+    def summarise(j_ctx):
+        return {"summary": "done"}
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(fetch=fetch) >> job(summarise=summarise), "tail_graph")
+    fm.configure_trace_sampling(ratio=0.0, keep_errors=True, slow_ms=80)
+    run_tasks(fm, fq_name, [{"n": 0, "fail": True}, {"n": 1, "delay": 0.15}] + [{"n": i} for i in range(2, 10)])
+
+    spans = job_spans(sampled_spans)
+    traces = {span.context.trace_id for span in spans}
+    assert len(traces) == 2
+    roots = [span for span in spans if span.parent is None]
+    assert all(span.attributes[SAMPLED_BY_ATTRIBUTE] == "tail" for span in roots)
+    assert {span.attributes["flow4ai.job.outcome"] for span in roots} == {"error", "completed"}
+    # The slow task's trace is complete, its successor span included
+    assert len(spans) == 3
+    stats = fm.get_trace_sampling_stats()
+    assert (stats['kept'], stats['discarded'], stats['pending']) == (2, 8, 0)
+
+
+def test_unsampled_tasks_not_recorded_without_tail_sampling(sampled_spans):
+    def answer(j_ctx):
+        return {"ok": True}
+
+    fm = FlowManager()
+    fq_name = fm.add_workflow(job(quiet_answer=answer), "quiet_graph")
+    fm.configure_trace_sampling(ratio=0.0, keep_errors=False, slow_ms=0)
+    assert not TracerFactory.sampling.tail_sampling
+    run_tasks(fm, fq_name, [{"n": i} for i in range(5)])
+
+    assert not sampled_spans.get_finished_spans()
+    stats = fm.get_trace_sampling_stats()
+    assert (stats['kept'], stats['discarded'], stats['pending']) == (0, 0, 0)
+
+
+def test_job_opt_out(sampled_spans):
+    def normalise(j_ctx):
+        return {"text": "normalised"}
+
+    def answer(j_ctx):
+        return {"ok": True}
+
+    workflow = job(normalise=normalise, trace=False) >> job(traced_answer=answer)
+    errors, result = FlowManager.run(workflow, {"text": "Hello"}, "opt_out_graph")
+
+    assert result["ok"]
+    assert [span.attributes["flow4ai.job"] for span in job_spans(sampled_spans)] == ["traced_answer"]
+
+
+def test_sampling_from_config(tmp_path, monkeypatch):
+    config_path = tmp_path / "otel_config.yaml"
+    config_path.write_text(yaml.dump({
+        "exporter": "jsonl",
+        "service_name": "SamplingTest",
+        "file_exporter": {"path": str(tmp_path / "trace.jsonl")},
+        "batch_processor": {"max_queue_size": 1000, "schedule_delay_millis": 1000},
+        "sampling": {"ratio": 0.05, "graphs": {"rag": 0.5}, "keep_errors": False, "slow_ms": 500},
+    }))
+    monkeypatch.setenv('FLOW4AI_OT_CONFIG', str(config_path))
+    saved = TracerFactory._instance, TracerFactory._config, TracerFactory.sampling, TracerFactory._tail_processor
+    TracerFactory._instance, TracerFactory._config = None, None
+    try:
+        TracerFactory.get_tracer()
+        sampling = TracerFactory.sampling
+        assert (sampling.ratio, sampling.keep_errors, sampling.slow_ms) == (0.05, False, 500)
+        assert sampling.head_ratio("rag$$$$retrieve$$") == 0.5
+        assert sampling.head_ratio("chat$$$$llm$$") == 0.05
+
+        TracerFactory.configure_sampling(graphs={"chat": 1.0})
+        assert sampling.head_ratio("chat$$$$llm$$") == 1.0
+        with pytest.raises(ValueError):
+            TracerFactory.configure_sampling(ratio=1.5)
+    finally:
+        TracerFactory._instance, TracerFactory._config, TracerFactory.sampling, TracerFactory._tail_processor = saved
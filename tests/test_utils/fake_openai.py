@@ -0,0 +1,27 @@
+"""
+Test utilities for Flow4AI tests.
+
+A local fake of the OpenAI chat completions endpoint, so OpenAIJob can be tested
+without an API key. Not intended for production use.
+"""
+from flow4ai.bench.fake_llm import FakeLLMServer
+
+
+class FakeOpenAI(FakeLLMServer):
+    """
+    A FakeLLMServer answering every request with "ok" after latency seconds and reporting
+    total_tokens as its usage. latency can also be a function returning the latency of each request.
+    Set status to an error code to make the service fail, e.g. 503.
+
+    Streaming requests are answered with server-sent events, one chunk per item of
+    stream_chunks every chunk_delay seconds, then a usage chunk if it was requested.
+    """
+
+    def __init__(self, total_tokens=50, latency=0.0, status=200, stream_chunks=("o", "k"), chunk_delay=0.0):
+        super().__init__(latency=latency, completion_tokens=1, prompt_tokens=total_tokens - 1,
+                         tokens_per_second=1 / chunk_delay if chunk_delay else None,
+                         content=stream_chunks, error_rate=0.0 if status == 200 else 1.0, error_status=status)
+
+    @property
+    def calls(self):
+        return self.stats()["requests"]
@@ -0,0 +1,20 @@
+"""
+Test utilities for Flow4AI tests.
+
+Runs tasks through a FlowManager and collects their results. Not intended for production use.
+"""
+
+
+def run_tasks(fm, fq_name, tasks, timeout=10):
+    """
+    Submit tasks to a graph of fm, wait until they have completed or failed and return
+    fm.pop_results(). Failed tasks are collected under 'errors' instead of raising.
+    """
+    raise_on_error = fm.get_raise_on_error()
+    fm.set_raise_on_error(False)
+    try:
+        fm.submit_task(tasks, fq_name)
+        assert fm.wait_for_completion(timeout=timeout, check_interval=0.01)
+    finally:
+        fm.set_raise_on_error(raise_on_error)
+    return fm.pop_results()
@@ -24,9 +24,9 @@ def test_zzz_ensure_all_trace_files_cleaned():
     # Perform direct cleanup of trace files
     test_dir = "tests"
     try:
-        # Look for any temp_otel_trace files or rotated versions
+        # Look for any temp_otel_trace files, rotated versions or lock files
         otel_files = [f for f in os.listdir(test_dir) 
-                    if f.startswith("temp_otel_trace")]
+                    if f.startswith(("temp_otel_trace", ".temp_otel_trace"))]
         
         logger.info(f"Found {len(otel_files)} trace files to remove")
         
@@ -42,7 +42,7 @@ def test_zzz_ensure_all_trace_files_cleaned():
         logger.error(f"Error during cleanup: {e}")
     
     # Verify all files were actually removed
-    remaining = [f for f in os.listdir(test_dir) if f.startswith("temp_otel_trace")]
+    remaining = [f for f in os.listdir(test_dir) if f.startswith(("temp_otel_trace", ".temp_otel_trace"))]
     
     if remaining:
         logger.warning(f"Found {len(remaining)} trace files after cleanup: {remaining}")
@@ -61,7 +61,7 @@ def test_zzz_ensure_all_trace_files_cleaned():
                 logger.error(f"Error during second cleanup of {trace_file}: {e}")
         
         # Final verification
-        remaining = [f for f in os.listdir(test_dir) if f.startswith("temp_otel_trace")]
+        remaining = [f for f in os.listdir(test_dir) if f.startswith(("temp_otel_trace", ".temp_otel_trace"))]
         assert len(remaining) == 0, f"Cleanup failed, {len(remaining)} trace files still remain: {remaining}"
     
     logger.info("All OpenTelemetry trace files successfully cleaned up")